@@ -0,0 +1,79 @@
+"""Portable messages table and BIGINT Telegram IDs.
+
+Таблица messages исторически создавалась через init_db (create_all),
+поэтому на чистой БД (например, PostgreSQL) миграции ее не создавали.
+Telegram ID не помещаются в 32-битный INTEGER PostgreSQL, поэтому
+на PostgreSQL колонки с Telegram ID расширяются до BIGINT.
+В SQLite INTEGER и так 64-битный - схема там не меняется.
+
+Revision ID: b7e4c2a91f30
+Revises: optimize_001
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e4c2a91f30"
+down_revision: Union[str, None] = "optimize_001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (таблица, колонка) с Telegram ID
+TELEGRAM_ID_COLUMNS = [
+    ("users", "telegram_id"),
+    ("messages", "user_id"),
+    ("chat_sessions", "user_id"),
+]
+
+
+def upgrade() -> None:
+    """Create messages if missing and widen Telegram ID columns on PostgreSQL."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "messages" not in inspector.get_table_names():
+        op.create_table(
+            "messages",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column(
+                "user_id",
+                sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+                nullable=False,
+            ),
+            sa.Column("role", sa.String(20), nullable=False),
+            sa.Column("content", sa.Text(), nullable=False),
+            sa.Column("length", sa.Integer(), nullable=False),
+            sa.Column(
+                "created_at",
+                sa.DateTime(),
+                server_default=sa.func.current_timestamp(),
+                nullable=False,
+            ),
+            sa.Column("is_deleted", sa.Boolean(), server_default="0", nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_messages_user_id", "messages", ["user_id"])
+        op.create_index("ix_messages_is_deleted", "messages", ["is_deleted"])
+
+    if bind.dialect.name == "postgresql":
+        for table, column in TELEGRAM_ID_COLUMNS:
+            op.alter_column(
+                table, column, type_=sa.BigInteger(), existing_type=sa.Integer()
+            )
+
+
+def downgrade() -> None:
+    """Narrow Telegram ID columns back on PostgreSQL.
+
+    Таблица messages не удаляется: на существующих SQLite БД она создана
+    до этой миграции через init_db.
+    """
+    if op.get_bind().dialect.name == "postgresql":
+        for table, column in TELEGRAM_ID_COLUMNS:
+            op.alter_column(
+                table, column, type_=sa.Integer(), existing_type=sa.BigInteger()
+            )
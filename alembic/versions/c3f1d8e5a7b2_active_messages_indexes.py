@@ -0,0 +1,62 @@
+"""Partial composite indexes for active messages.
+
+История пользователя (DatabaseContextStorage.get_context) и статистика
+(RealStatCollector) читают только не удаленные сообщения. Частичные
+индексы покрывают фильтр и порядок этих запросов. Индекс по одному
+is_deleted удаляется: он почти не селективен, но без статистики (ANALYZE)
+планировщик SQLite выбирает его вместо составных индексов.
+
+Revision ID: c3f1d8e5a7b2
+Revises: b7e4c2a91f30
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f1d8e5a7b2"
+down_revision: Union[str, None] = "b7e4c2a91f30"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _active_messages() -> dict[str, sa.TextClause]:
+    """Условие частичного индекса в том же виде, что и в запросах."""
+    value = "false" if op.get_bind().dialect.name == "postgresql" else "0"
+    where = sa.text(f"is_deleted = {value}")
+    return {"sqlite_where": where, "postgresql_where": where}
+
+
+def upgrade() -> None:
+    """Create partial indexes on active messages and drop ix_messages_is_deleted."""
+    op.create_index(
+        "ix_messages_active_user_recent",
+        "messages",
+        ["user_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        if_not_exists=True,
+        **_active_messages(),
+    )
+    op.create_index(
+        "ix_messages_active_created_role",
+        "messages",
+        ["created_at", "role"],
+        if_not_exists=True,
+        **_active_messages(),
+    )
+    op.drop_index("ix_messages_is_deleted", table_name="messages", if_exists=True)
+
+
+def downgrade() -> None:
+    """Restore ix_messages_is_deleted and drop the partial indexes."""
+    op.create_index(
+        "ix_messages_is_deleted", "messages", ["is_deleted"], if_not_exists=True
+    )
+    op.drop_index(
+        "ix_messages_active_created_role", table_name="messages", if_exists=True
+    )
+    op.drop_index(
+        "ix_messages_active_user_recent", table_name="messages", if_exists=True
+    )
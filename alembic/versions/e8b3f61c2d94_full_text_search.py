@@ -0,0 +1,78 @@
+"""Full-text search over messages and chat_messages.
+
+SQLite: внешние таблицы FTS5 messages_fts и chat_messages_fts (без копии
+текста) с триггерами синхронизации; существующие строки индексируются
+командой rebuild. PostgreSQL: GIN-индексы по to_tsvector('simple', content),
+создаются CONCURRENTLY, без блокировки записи.
+
+Revision ID: e8b3f61c2d94
+Revises: c3f1d8e5a7b2
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e8b3f61c2d94"
+down_revision: Union[str, None] = "c3f1d8e5a7b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица -> колонка rowid для FTS5 (у chat_messages id строковый, берем неявный rowid)
+SEARCH_TABLES = {"messages": "id", "chat_messages": "rowid"}
+
+
+def _sqlite_upgrade() -> None:
+    for table, rowid in SEARCH_TABLES.items():
+        fts = f"{table}_fts"
+        delete_old = (
+            f"INSERT INTO {fts}({fts}, rowid, content) "
+            f"VALUES ('delete', old.{rowid}, old.content);"
+        )
+        insert_new = f"INSERT INTO {fts}(rowid, content) VALUES (new.{rowid}, new.content);"
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(content, "
+            f"content='{table}', content_rowid='{rowid}', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} "
+            f"BEGIN {insert_new} END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} "
+            f"BEGIN {delete_old} END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF content ON {table} "
+            f"BEGIN {delete_old} {insert_new} END"
+        )
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def upgrade() -> None:
+    """Create FTS5 tables with triggers (SQLite) or GIN tsvector indexes (PostgreSQL)."""
+    if op.get_bind().dialect.name == "sqlite":
+        _sqlite_upgrade()
+        return
+    with op.get_context().autocommit_block():
+        for table in SEARCH_TABLES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_content_search "
+                f"ON {table} USING gin (to_tsvector('simple', content))"
+            )
+
+
+def downgrade() -> None:
+    """Drop full-text search objects."""
+    if op.get_bind().dialect.name == "sqlite":
+        for table in SEARCH_TABLES:
+            for suffix in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        return
+    with op.get_context().autocommit_block():
+        for table in SEARCH_TABLES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_content_search")
@@ -0,0 +1,37 @@
+"""Processed Telegram updates.
+
+Последние обработанные update_id каждого бота: после рестарта
+MessageCoalescingMiddleware отбрасывает повторно доставленные обновления.
+
+Revision ID: f4a9c3e71b05
+Revises: e8b3f61c2d94
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f4a9c3e71b05"
+down_revision: Union[str, None] = "e8b3f61c2d94"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create processed_updates table."""
+    op.create_table(
+        "processed_updates",
+        sa.Column("bot_id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False),
+        sa.Column(
+            "update_id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("bot_id", "update_id"),
+    )
+
+
+def downgrade() -> None:
+    """Drop processed_updates table."""
+    op.drop_table("processed_updates")
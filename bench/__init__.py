@@ -0,0 +1 @@
+"""Нагрузочное тестирование: локальные заглушки OpenRouter и Telegram и генератор нагрузки."""
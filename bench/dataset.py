@@ -0,0 +1,484 @@
+"""
+Генератор синтетических данных для проверки запросов на больших объемах.
+
+Заполняет users, messages, chat_sessions и chat_messages правдоподобными
+данными: активность пользователей распределена по степенному закону,
+сообщения следуют суточному и недельному ритму, длины сообщений
+логнормальные, часть диалогов помечена удаленными (soft delete).
+Одинаковые seed и параметры дают одинаковые данные.
+
+Примеры:
+    python -m bench.dataset --database-url sqlite+aiosqlite:///data/scale.db \\
+        --messages 10000000 --users 50000 --seed 42
+    python -m bench.dataset --database-url postgresql+asyncpg://user@localhost/bench \\
+        --messages 1000000 --truncate
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import sqlite3
+import sys
+import time
+import uuid
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import Index, func, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.models import Base, create_search_index, drop_search_triggers
+
+# Доля сообщений по часам суток: ночью тихо, пик вечером
+HOUR_WEIGHTS = (
+    1.0, 0.6, 0.4, 0.3, 0.3, 0.4, 0.8, 1.6, 2.6, 3.4, 3.8, 4.0,
+    4.1, 4.2, 4.0, 3.9, 3.9, 4.0, 4.3, 4.8, 5.2, 5.0, 3.8, 2.2,
+)  # fmt: skip
+WEEKEND_FACTOR = 0.75
+
+FIRST_NAMES = (
+    "Alexey", "Anna", "Dmitry", "Elena", "Ivan", "Maria", "Sergey", "Olga",
+    "Pavel", "Natalia", "Andrey", "Irina", "Mikhail", "Tatiana", "John", "Emma",
+)  # fmt: skip
+LAST_NAMES = (
+    "Ivanov", "Smirnova", "Kuznetsov", "Popova", "Sokolov", "Lebedeva",
+    "Kozlov", "Novikova", "Morozov", "Petrova", "Smith", "Brown",
+)  # fmt: skip
+LANGUAGES = (("ru", 70), ("en", 18), ("uk", 5), ("kk", 3), (None, 4))
+WORDS = (
+    "как", "что", "можно", "сделать", "данные", "запрос", "ответ", "пример",
+    "код", "python", "ошибка", "функция", "таблица", "пользователь", "бот",
+    "сообщение", "почему", "работает", "нужно", "спасибо", "помоги", "объясни",
+    "the", "how", "to", "list", "value", "error", "и", "в", "не", "на", "с",
+)  # fmt: skip
+ADMIN_SQL = (
+    "SELECT COUNT(*) FROM messages WHERE is_deleted = FALSE",
+    "SELECT user_id, COUNT(*) AS total FROM messages GROUP BY user_id ORDER BY total DESC LIMIT 10",
+    "SELECT DATE(created_at) AS day, COUNT(*) FROM messages GROUP BY day ORDER BY day",
+    "SELECT COUNT(DISTINCT user_id) FROM messages WHERE role = 'user'",
+)
+
+USER_COLUMNS = (
+    "telegram_id", "username", "first_name", "last_name",
+    "language_code", "created_at", "updated_at",
+)  # fmt: skip
+MESSAGE_COLUMNS = ("user_id", "role", "content", "length", "created_at", "is_deleted")
+CHAT_SESSION_COLUMNS = ("id", "user_id", "mode", "created_at")
+CHAT_MESSAGE_COLUMNS = (
+    "id",
+    "user_session_id",
+    "content",
+    "role",
+    "mode",
+    "sql_query",
+    "created_at",
+)
+TABLES = ("users", "messages", "chat_sessions", "chat_messages")
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """Объем и форма генерируемых данных."""
+
+    users: int = 10_000
+    messages: int = 1_000_000
+    chat_sessions: int = 5_000
+    chat_messages: int = 100_000
+    days: int = 90
+    end: datetime = datetime(2025, 1, 1)
+    deleted_ratio: float = 0.05  # Доля диалогов, помеченных удаленными
+    activity_exponent: float = 1.1  # Показатель степенного закона активности
+    seed: int = 42
+
+
+def _power_law_cum_weights(count: int, exponent: float) -> list[float]:
+    """Накопленные веса 1/rank^exponent для random.choices."""
+    return list(itertools.accumulate(1 / (rank**exponent) for rank in range(1, count + 1)))
+
+
+def _split(total: int, weights: Sequence[float]) -> list[int]:
+    """Разделить total пропорционально весам (метод наибольших остатков)."""
+    scale = total / sum(weights)
+    exact = [weight * scale for weight in weights]
+    counts = [int(value) for value in exact]
+    remainders = sorted(range(len(exact)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in remainders[: total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+class DatasetGenerator:
+    """
+    Генерирует строки таблиц потоком, не держа весь набор в памяти.
+
+    Для каждой таблицы используется свой генератор случайных чисел,
+    производный от seed, поэтому данные таблицы не зависят от объема
+    остальных таблиц.
+    """
+
+    def __init__(self, spec: DatasetSpec) -> None:
+        """
+        Инициализация генератора.
+
+        Args:
+            spec: Объем и форма данных
+        """
+        self.spec = spec
+        self.start = spec.end - timedelta(days=spec.days)
+        rng = random.Random(f"{spec.seed}:users")
+        self.user_ids = rng.sample(range(100_000_000, 8_000_000_000), spec.users)
+        self._user_cum_weights = _power_law_cum_weights(spec.users, spec.activity_exponent)
+        pool_rng = random.Random(f"{spec.seed}:text")
+        self._text = " ".join(pool_rng.choice(WORDS) for _ in range(200_000))
+
+    def _day_weights(self) -> list[float]:
+        """Вес каждого дня окна: выходные тише будней."""
+        return [
+            WEEKEND_FACTOR if (self.start + timedelta(days=day)).weekday() >= 5 else 1.0
+            for day in range(self.spec.days)
+        ]
+
+    def _times_in_day(self, rng: random.Random, day: int, count: int) -> list[datetime]:
+        """Отсортированные моменты внутри дня по суточному профилю."""
+        day_start = self.start + timedelta(days=day)
+        hours = rng.choices(range(24), weights=HOUR_WEIGHTS, k=count)
+        seconds = sorted(hour * 3600 + rng.random() * 3600 for hour in hours)
+        return [day_start + timedelta(seconds=second) for second in seconds]
+
+    def _content(self, rng: random.Random, mu: float, sigma: float, limit: int) -> str:
+        """Текст логнормальной длины (в символах) из пула слов."""
+        length = max(1, min(limit, int(rng.lognormvariate(mu, sigma))))
+        offset = rng.randrange(len(self._text) - limit)
+        return self._text[offset : offset + length].strip() or "ok"
+
+    def users(self) -> Iterator[tuple]:
+        """Строки таблицы users в порядке USER_COLUMNS."""
+        rng = random.Random(f"{self.spec.seed}:user_rows")
+        languages = [language for language, _ in LANGUAGES]
+        language_weights = [weight for _, weight in LANGUAGES]
+        for index, telegram_id in enumerate(self.user_ids):
+            first_name = rng.choice(FIRST_NAMES)
+            username = f"{first_name.lower()}_{index}" if rng.random() < 0.85 else None
+            last_name = rng.choice(LAST_NAMES) if rng.random() < 0.6 else None
+            created_at = self.start - timedelta(seconds=rng.random() * 365 * 86400)
+            updated_at = created_at + (self.spec.end - created_at) * rng.random()
+            language = rng.choices(languages, weights=language_weights)[0]
+            yield telegram_id, username, first_name, last_name, language, created_at, updated_at
+
+    def messages(self) -> Iterator[tuple]:
+        """
+        Строки таблицы messages в порядке MESSAGE_COLUMNS.
+
+        Сообщения идут парами вопрос-ответ в хронологическом порядке,
+        как их записывает бот. Ответ приходит через несколько секунд.
+        """
+        rng = random.Random(f"{self.spec.seed}:messages")
+        pairs_per_day = _split(self.spec.messages // 2, self._day_weights())
+        for day, pairs in enumerate(pairs_per_day):
+            times = self._times_in_day(rng, day, pairs)
+            users = rng.choices(self.user_ids, cum_weights=self._user_cum_weights, k=pairs)
+            for user_id, asked_at in zip(users, times, strict=True):
+                deleted = rng.random() < self.spec.deleted_ratio
+                question = self._content(rng, 3.6, 0.9, 4000)
+                answer = self._content(rng, 6.0, 0.6, 4096)
+                answered_at = asked_at + timedelta(seconds=rng.lognormvariate(1.5, 0.6))
+                yield user_id, "user", question, len(question), asked_at, deleted
+                yield user_id, "assistant", answer, len(answer), answered_at, deleted
+
+    def _uuid(self, rng: random.Random) -> str:
+        """UUID4, воспроизводимый из seed."""
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def chat(self) -> Iterator[tuple[str, tuple]]:
+        """
+        Сессии веб-чата и их сообщения.
+
+        Yields:
+            tuple[str, tuple]: ("chat_sessions", строка) или ("chat_messages", строка)
+        """
+        rng = random.Random(f"{self.spec.seed}:chat")
+        sessions = self.spec.chat_sessions
+        if sessions == 0:
+            return
+        session_weights = _power_law_cum_weights(sessions, self.spec.activity_exponent)
+        pair_counts = Counter(
+            rng.choices(
+                range(sessions), cum_weights=session_weights, k=self.spec.chat_messages // 2
+            )
+        )
+        rng.shuffle(order := list(range(sessions)))
+        sessions_per_day = _split(sessions, self._day_weights())
+        index = 0
+        for day, count in enumerate(sessions_per_day):
+            for created_at in self._times_in_day(rng, day, count):
+                session_id = self._uuid(rng)
+                user_id = rng.choices(self.user_ids, cum_weights=self._user_cum_weights)[0]
+                mode = "admin" if rng.random() < 0.15 else "normal"
+                yield "chat_sessions", (session_id, user_id, mode, created_at)
+
+                at = created_at
+                for _ in range(pair_counts[order[index]]):
+                    at += timedelta(seconds=rng.lognormvariate(4.0, 0.8))
+                    question = self._content(rng, 3.6, 0.8, 2000)
+                    yield (
+                        "chat_messages",
+                        (self._uuid(rng), session_id, question, "user", mode, None, at),
+                    )
+                    at += timedelta(seconds=rng.lognormvariate(1.5, 0.6))
+                    sql = rng.choice(ADMIN_SQL) if mode == "admin" and rng.random() < 0.7 else None
+                    answer = self._content(rng, 5.8, 0.7, 4096)
+                    yield (
+                        "chat_messages",
+                        (self._uuid(rng), session_id, answer, "assistant", mode, sql, at),
+                    )
+                index += 1
+
+
+def _sqlite_timestamp(value: datetime) -> str:
+    """Время в формате, который пишет и читает SQLAlchemy для SQLite."""
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+class SqliteWriter:
+    """
+    Пакетная вставка через sqlite3.executemany.
+
+    На время загрузки журнал держится в памяти, а fsync отключен: при
+    сбое базу проще сгенерировать заново.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Открыть базу.
+
+        Args:
+            path: Путь к файлу SQLite
+        """
+        sqlite3.register_adapter(datetime, _sqlite_timestamp)
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=MEMORY")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute("PRAGMA cache_size=-262144")
+
+    async def insert(self, table: str, columns: Sequence[str], rows: Sequence[tuple]) -> None:
+        """Вставить пакет строк одной транзакцией."""
+        placeholders = ", ".join("?" * len(columns))
+        self._conn.execute("BEGIN")
+        self._conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+        )
+        self._conn.execute("COMMIT")
+
+    async def close(self) -> None:
+        """Закрыть соединение."""
+        self._conn.close()
+
+
+class PostgresWriter:
+    """Пакетная вставка через COPY (asyncpg.copy_records_to_table)."""
+
+    def __init__(self, dsn: str) -> None:
+        """
+        Запомнить адрес базы.
+
+        Args:
+            dsn: postgresql://... без драйвера SQLAlchemy
+        """
+        self._dsn = dsn
+        self._conn = None
+
+    async def insert(self, table: str, columns: Sequence[str], rows: Sequence[tuple]) -> None:
+        """Передать пакет строк одной командой COPY."""
+        if self._conn is None:
+            import asyncpg
+
+            self._conn = await asyncpg.connect(self._dsn)
+        await self._conn.copy_records_to_table(table, records=rows, columns=list(columns))
+
+    async def close(self) -> None:
+        """Закрыть соединение."""
+        if self._conn is not None:
+            await self._conn.close()
+
+
+async def _prepare_schema(engine: AsyncEngine, truncate: bool) -> list[Index]:
+    """
+    Создать таблицы и снять индексы моделей (и триггеры FTS5) на время загрузки.
+
+    Returns:
+        list[Index]: Снятые индексы, их нужно вернуть после загрузки
+
+    Raises:
+        RuntimeError: Если таблицы не пусты, а truncate не задан
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # Индекс FTS5 пересобирается целиком после загрузки (и после truncate)
+        await conn.run_sync(drop_search_triggers)
+        for name in TABLES:
+            table = Base.metadata.tables[name]
+            if truncate:
+                await conn.execute(table.delete())
+            elif await conn.scalar(select(func.count()).select_from(table)):
+                raise RuntimeError(f"Table {name} is not empty, use --truncate to replace data")
+        indexes = [index for name in TABLES for index in Base.metadata.tables[name].indexes]
+        for index in indexes:
+            await conn.run_sync(index.drop, checkfirst=True)
+    return indexes
+
+
+async def _restore_indexes(engine: AsyncEngine, indexes: list[Index]) -> None:
+    """Построить снятые индексы и FTS5 и обновить статистику планировщика."""
+    async with engine.begin() as conn:
+        for index in indexes:
+            await conn.run_sync(index.create, checkfirst=True)
+        await conn.run_sync(create_search_index, True)
+        await conn.execute(text("ANALYZE"))
+
+
+def _writer_for(database_url: str) -> SqliteWriter | PostgresWriter:
+    """Писатель для SQLite или PostgreSQL по URL SQLAlchemy."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        if not url.database or url.database == ":memory:":
+            raise ValueError("SQLite dataset needs a file database")
+        return SqliteWriter(url.database)
+    if url.get_backend_name() == "postgresql":
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresWriter(dsn)
+    raise ValueError(f"Unsupported database: {url.get_backend_name()}")
+
+
+async def _load(
+    writer: SqliteWriter | PostgresWriter,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[tuple],
+    batch_size: int,
+) -> int:
+    """Загрузить поток строк пакетами, печатая прогресс в stderr."""
+    started = time.perf_counter()
+    total = 0
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        await writer.insert(table, columns, batch)
+        total += len(batch)
+        rate = total / (time.perf_counter() - started)
+        print(f"\r{table}: {total:,} rows ({rate:,.0f} rows/s)", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    return total
+
+
+async def generate_dataset(
+    database_url: str, spec: DatasetSpec, batch_size: int = 50_000, truncate: bool = False
+) -> dict[str, int]:
+    """
+    Сгенерировать и загрузить набор данных.
+
+    Args:
+        database_url: URL базы SQLAlchemy (sqlite+aiosqlite:///... или postgresql+asyncpg://...)
+        spec: Объем и форма данных
+        batch_size: Строк в одном пакете вставки
+        truncate: Удалить существующие строки перед загрузкой
+
+    Returns:
+        dict[str, int]: Количество загруженных строк по таблицам
+
+    Raises:
+        RuntimeError: Если таблицы не пусты, а truncate не задан
+        ValueError: Если база не поддерживается
+    """
+    writer = _writer_for(database_url)
+    engine = create_async_engine(database_url)
+    generator = DatasetGenerator(spec)
+    loaded = {}
+    try:
+        indexes = await _prepare_schema(engine, truncate)
+        loaded["users"] = await _load(writer, "users", USER_COLUMNS, generator.users(), batch_size)
+        loaded["messages"] = await _load(
+            writer, "messages", MESSAGE_COLUMNS, generator.messages(), batch_size
+        )
+
+        # Сессии и их сообщения генерируются вместе; сессий мало, их копим целиком
+        sessions: list[tuple] = []
+
+        def chat_messages() -> Iterator[tuple]:
+            for table, row in generator.chat():
+                if table == "chat_sessions":
+                    sessions.append(row)
+                else:
+                    yield row
+
+        loaded["chat_messages"] = await _load(
+            writer, "chat_messages", CHAT_MESSAGE_COLUMNS, chat_messages(), batch_size
+        )
+        loaded["chat_sessions"] = await _load(
+            writer, "chat_sessions", CHAT_SESSION_COLUMNS, sessions, batch_size
+        )
+        print("Building indexes...", file=sys.stderr)
+        await _restore_indexes(engine, indexes)
+    finally:
+        await writer.close()
+        await engine.dispose()
+    return loaded
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Парсер аргументов CLI."""
+    defaults = DatasetSpec()
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--messages", type=int, default=defaults.messages)
+    parser.add_argument("--chat-sessions", type=int, default=defaults.chat_sessions)
+    parser.add_argument("--chat-messages", type=int, default=defaults.chat_messages)
+    parser.add_argument("--days", type=int, default=defaults.days, help="Длина окна в днях")
+    parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Конец окна, YYYY-MM-DD (по умолчанию сегодня; задайте для воспроизводимости)",
+    )
+    parser.add_argument("--deleted-ratio", type=float, default=defaults.deleted_ratio)
+    parser.add_argument("--activity-exponent", type=float, default=defaults.activity_exponent)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--truncate", action="store_true", help="Удалить существующие строки")
+    return parser
+
+
+def main() -> None:
+    """Точка входа: python -m bench.dataset."""
+    args = build_parser().parse_args()
+    today = datetime.now(UTC).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    spec = DatasetSpec(
+        users=args.users,
+        messages=args.messages,
+        chat_sessions=args.chat_sessions,
+        chat_messages=args.chat_messages,
+        days=args.days,
+        end=args.end or today,
+        deleted_ratio=args.deleted_ratio,
+        activity_exponent=args.activity_exponent,
+        seed=args.seed,
+    )
+    started = time.perf_counter()
+    try:
+        loaded = asyncio.run(
+            generate_dataset(args.database_url, spec, args.batch_size, args.truncate)
+        )
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    summary = ", ".join(f"{table}={count:,}" for table, count in loaded.items())
+    print(f"Loaded {summary} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
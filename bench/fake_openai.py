@@ -0,0 +1,201 @@
+"""Локальный OpenAI-совместимый сервер с управляемой задержкой и ошибками 429."""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+from aiohttp import web
+
+# Слова для сгенерированных ответов (длина ответа задается в токенах)
+_WORDS = (
+    "данные", "сообщения", "пользователь", "запрос", "ответ", "статистика",
+    "неделя", "активность", "чат", "модель", "результат", "анализ",
+)  # fmt: skip
+
+
+@dataclass
+class FakeLLMSettings:
+    """Поведение заглушки LLM."""
+
+    latency: float = 0.5  # Задержка до начала генерации, секунды
+    jitter: float = 0.1  # Случайная добавка к latency (0..jitter), секунды
+    token_rate: float = 50.0  # Скорость генерации, токенов в секунду (0 - мгновенно)
+    reply_tokens: int = 60  # Длина ответа в токенах
+    rate_limit_ratio: float = 0.0  # Доля запросов, получающих 429
+    retry_after: float = 1.0  # Значение Retry-After для 429
+    seed: int | None = None  # Seed для воспроизводимых задержек и ошибок
+
+
+class FakeOpenAI:
+    """
+    Заглушка /v1/chat/completions.
+
+    Отвечает в формате OpenAI (в том числе потоково при stream=true),
+    поэтому с ней работает настоящий AsyncOpenAI из LLMClient: достаточно
+    указать OPENROUTER_BASE_URL=http://host:port/v1.
+    """
+
+    def __init__(self, settings: FakeLLMSettings | None = None) -> None:
+        """
+        Инициализация заглушки.
+
+        Args:
+            settings: Поведение (задержка, скорость токенов, доля 429)
+        """
+        self.settings = settings or FakeLLMSettings()
+        self._random = random.Random(self.settings.seed)
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+        self.requests = 0
+        self.rate_limited = 0
+
+    def _reply(self) -> str:
+        """Сгенерировать ответ длиной reply_tokens слов."""
+        return " ".join(self._random.choice(_WORDS) for _ in range(self.settings.reply_tokens))
+
+    async def handle_completions(self, request: web.Request) -> web.StreamResponse:
+        """Обработать POST /v1/chat/completions."""
+        self.requests += 1
+        body = await request.json()
+        settings = self.settings
+
+        if self._random.random() < settings.rate_limit_ratio:
+            self.rate_limited += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit", "code": 429}},
+                status=429,
+                headers={"Retry-After": str(settings.retry_after)},
+            )
+
+        await asyncio.sleep(settings.latency + self._random.random() * settings.jitter)
+        tokens = self._reply().split(" ")
+        token_delay = 1 / settings.token_rate if settings.token_rate > 0 else 0.0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "fake-model")
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body["messages"])
+
+        if not body.get("stream"):
+            await asyncio.sleep(token_delay * len(tokens))
+            return web.json_response(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": " ".join(tokens)},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": prompt_tokens + len(tokens),
+                    },
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for index, token in enumerate(tokens):
+            await asyncio.sleep(token_delay)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": token if index == 0 else " " + token},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Запустить сервер.
+
+        Args:
+            host: Адрес для прослушивания
+            port: Порт (0 - любой свободный)
+
+        Returns:
+            str: Базовый URL для OPENROUTER_BASE_URL
+        """
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle_completions)
+        app.router.add_post("/chat/completions", self.handle_completions)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_host, bound_port = self._runner.addresses[0][:2]
+        self.url = f"http://{bound_host}:{bound_port}/v1"
+        return self.url
+
+    async def stop(self) -> None:
+        """Остановить сервер."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Добавить в CLI параметры поведения заглушки LLM."""
+    defaults = FakeLLMSettings()
+    parser.add_argument("--llm-latency", type=float, default=defaults.latency)
+    parser.add_argument("--llm-jitter", type=float, default=defaults.jitter)
+    parser.add_argument("--llm-token-rate", type=float, default=defaults.token_rate)
+    parser.add_argument("--llm-reply-tokens", type=int, default=defaults.reply_tokens)
+    parser.add_argument("--llm-429-ratio", type=float, default=defaults.rate_limit_ratio)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def settings_from_args(args: argparse.Namespace) -> FakeLLMSettings:
+    """Собрать FakeLLMSettings из аргументов CLI."""
+    return FakeLLMSettings(
+        latency=args.llm_latency,
+        jitter=args.llm_jitter,
+        token_rate=args.llm_token_rate,
+        reply_tokens=args.llm_reply_tokens,
+        rate_limit_ratio=args.llm_429_ratio,
+        seed=args.seed,
+    )
+
+
+async def _serve(host: str, port: int, settings: FakeLLMSettings) -> None:
+    server = FakeOpenAI(settings)
+    url = await server.start(host, port)
+    print(f"Fake OpenAI API listening at {url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    """Запустить заглушку отдельно: python -m bench.fake_openai --port 8090."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve(args.host, args.port, settings_from_args(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Локальная заглушка Telegram Bot API: выдает обновления и принимает ответы бота."""
+
+import asyncio
+import contextlib
+import itertools
+import time
+
+from aiohttp import web
+
+
+class FakeTelegramAPI:
+    """
+    Минимальный Bot API для бота в режиме polling.
+
+    Генератор нагрузки кладет сообщения через push_message() и ждет
+    возвращенный future: он завершается, когда бот отправит в этот чат
+    первое сообщение (sendMessage). Бот подключается к заглушке через
+    TELEGRAM_API_URL.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация заглушки."""
+        self._updates: list[dict] = []
+        self._new_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._replies: dict[int, asyncio.Future[float]] = {}
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+        self.sent = 0
+        self.polls = 0  # Вызовы getUpdates: бот подключился и опрашивает заглушку
+
+    def push_message(self, chat_id: int, text: str) -> asyncio.Future[float]:
+        """
+        Поставить в очередь текстовое сообщение пользователя.
+
+        Args:
+            chat_id: ID чата (он же ID пользователя)
+            text: Текст сообщения
+
+        Returns:
+            asyncio.Future[float]: Время (time.perf_counter) первого ответа бота в чат
+        """
+        update_id = next(self._update_ids)
+        user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+        self._updates.append(
+            {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": user,
+                    "text": text,
+                },
+            }
+        )
+        self._new_updates.set()
+        reply = self._replies.get(chat_id)
+        if reply is None or reply.done():
+            reply = self._replies[chat_id] = asyncio.get_running_loop().create_future()
+        return reply
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        self.polls += 1
+        offset = int(params.get("offset") or 0)
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            timeout = min(float(params.get("timeout") or 0), 1.0)
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+        limit = int(params.get("limit") or 100)
+        return self._updates[:limit]
+
+    def _send_message(self, params: dict) -> dict:
+        self.sent += 1
+        chat_id = int(params["chat_id"])
+        reply = self._replies.get(chat_id)
+        if reply is not None and not reply.done():
+            reply.set_result(time.perf_counter())
+        return {
+            "message_id": self.sent,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", ""),
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Обработать вызов метода Bot API."""
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+        if method == "getupdates":
+            result: object = await self._get_updates(params)
+        elif method == "sendmessage":
+            result = self._send_message(params)
+        elif method == "getme":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        else:
+            # sendChatAction, deleteWebhook и прочие служебные вызовы
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Запустить сервер.
+
+        Args:
+            host: Адрес для прослушивания
+            port: Порт (0 - любой свободный)
+
+        Returns:
+            str: Базовый URL для TELEGRAM_API_URL
+        """
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        bound_host, bound_port = self._runner.addresses[0][:2]
+        self.url = f"http://{bound_host}:{bound_port}"
+        return self.url
+
+    async def stop(self) -> None:
+        """Остановить сервер и отменить ожидание ответов."""
+        for reply in self._replies.values():
+            reply.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
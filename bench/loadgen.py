@@ -0,0 +1,212 @@
+"""Генератор нагрузки с открытым циклом и сводка задержек."""
+
+import asyncio
+import json
+import math
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+import aiohttp
+
+from bench.fake_telegram import FakeTelegramAPI
+
+
+@dataclass
+class RequestResult:
+    """Итог одного запроса генератора нагрузки."""
+
+    latency: float  # От запланированного старта до полного ответа, секунды
+    first_chunk: float | None = None  # До первого chunk ответа (TTFT), секунды
+    error: str | None = None  # Тип ошибки (None - успех)
+
+
+Send = Callable[[int], Awaitable[RequestResult]]
+
+
+async def run_open_loop(
+    send: Send, rps: float, duration: float
+) -> tuple[list[RequestResult], float]:
+    """
+    Отправлять запросы с постоянной частотой, не дожидаясь ответов.
+
+    Открытый цикл не сбавляет темп, когда система тормозит, поэтому
+    задержка считается от запланированного момента старта и очередь
+    перед сервером попадает в результат (нет coordinated omission).
+
+    Args:
+        send: Корутина запроса по его номеру; задержку она считает от
+            момента вызова, опоздание старта добавляется здесь
+        rps: Целевая частота запросов в секунду
+        duration: Длительность подачи нагрузки в секундах
+
+    Returns:
+        tuple[list[RequestResult], float]: Результаты и полное время прогона
+    """
+    total = max(1, int(rps * duration))
+    started = time.perf_counter()
+
+    async def timed(index: int, scheduled: float) -> RequestResult:
+        lag = time.perf_counter() - scheduled
+        result = await send(index)
+        result.latency += lag
+        if result.first_chunk is not None:
+            result.first_chunk += lag
+        return result
+
+    tasks = []
+    for index in range(total):
+        scheduled = started + index / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(timed(index, scheduled)))
+    results = await asyncio.gather(*tasks)
+    return list(results), time.perf_counter() - started
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Перцентиль с линейной интерполяцией.
+
+    Args:
+        values: Значения (не обязательно отсортированные)
+        q: Перцентиль от 0 до 100
+
+    Returns:
+        float: Значение перцентиля (nan для пустого списка)
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _distribution_ms(values: list[float]) -> dict[str, float | None]:
+    """p50/p95/p99/mean/max в миллисекундах (None без данных)."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    return {
+        "p50": round(percentile(values, 50) * 1000, 2),
+        "p95": round(percentile(values, 95) * 1000, 2),
+        "p99": round(percentile(values, 99) * 1000, 2),
+        "mean": round(sum(values) / len(values) * 1000, 2),
+        "max": round(max(values) * 1000, 2),
+    }
+
+
+def summarize(
+    scenario: str, results: list[RequestResult], elapsed: float, target_rps: float
+) -> dict:
+    """
+    Сводка прогона в виде JSON-совместимого словаря.
+
+    Args:
+        scenario: Имя сценария (api_chat, bot)
+        results: Результаты запросов
+        elapsed: Полное время прогона в секундах
+        target_rps: Целевая частота запросов
+
+    Returns:
+        dict: Задержки (по успешным запросам), TTFT, пропускная способность и ошибки
+    """
+    ok = [result for result in results if result.error is None]
+    errors = Counter(result.error for result in results if result.error is not None)
+    return {
+        "scenario": scenario,
+        "target_rps": target_rps,
+        "requests": len(results),
+        "succeeded": len(ok),
+        "error_rate": round(len(results) and sum(errors.values()) / len(results), 4),
+        "errors": dict(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": _distribution_ms([result.latency for result in ok]),
+        "ttft_ms": _distribution_ms(
+            [result.first_chunk for result in ok if result.first_chunk is not None]
+        ),
+    }
+
+
+def api_chat_sender(
+    session: aiohttp.ClientSession, base_url: str, sessions: int = 50, timeout: float = 120.0
+) -> Send:
+    """
+    Запросы POST /api/chat/message с чтением SSE-потока.
+
+    Args:
+        session: HTTP-сессия генератора
+        base_url: Адрес API, например http://127.0.0.1:8000
+        sessions: Сколько разных чат-сессий использовать по кругу
+        timeout: Таймаут одного запроса в секундах
+
+    Returns:
+        Send: Функция запроса для run_open_loop
+    """
+
+    async def send(index: int) -> RequestResult:
+        started = time.perf_counter()
+        first_chunk = None
+        params = {"message": f"Вопрос номер {index}", "session_id": f"bench-{index % sessions}"}
+        try:
+            async with session.post(
+                f"{base_url}/api/chat/message",
+                params=params,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+            ) as response:
+                if response.status != 200:
+                    await response.read()
+                    return RequestResult(
+                        time.perf_counter() - started, error=f"http_{response.status}"
+                    )
+                error = None
+                async for line in response.content:
+                    if not line.startswith(b"data: {"):
+                        continue
+                    event = json.loads(line[len(b"data: ") :])
+                    if "error" in event:
+                        error = "stream_error"
+                    elif first_chunk is None:
+                        first_chunk = time.perf_counter() - started
+                return RequestResult(time.perf_counter() - started, first_chunk, error)
+        except TimeoutError:
+            return RequestResult(time.perf_counter() - started, error="timeout")
+        except aiohttp.ClientError as e:
+            return RequestResult(time.perf_counter() - started, error=type(e).__name__)
+
+    return send
+
+
+def bot_sender(
+    telegram: FakeTelegramAPI, timeout: float = 120.0, first_chat_id: int = 10_000
+) -> Send:
+    """
+    Сообщения боту через заглушку Bot API; ответ - первый sendMessage в чат.
+
+    Каждый запрос идет от нового пользователя, чтобы склейка сообщений
+    и лимит отправки на чат не искажали задержку.
+
+    Args:
+        telegram: Заглушка Bot API, к которой подключен бот
+        timeout: Сколько ждать ответа в секундах
+        first_chat_id: ID чата первого запроса
+
+    Returns:
+        Send: Функция запроса для run_open_loop
+    """
+
+    async def send(index: int) -> RequestResult:
+        started = time.perf_counter()
+        reply = telegram.push_message(first_chat_id + index, f"Вопрос номер {index}")
+        try:
+            replied_at = await asyncio.wait_for(reply, timeout)
+        except TimeoutError:
+            return RequestResult(time.perf_counter() - started, error="timeout")
+        latency = replied_at - started
+        return RequestResult(latency, first_chunk=latency)
+
+    return send
@@ -0,0 +1,260 @@
+"""
+Нагрузочный прогон API чата и бота на локальных заглушках.
+
+Запускает заглушки OpenAI и Telegram в этом процессе, а API (uvicorn)
+и бота (src.main) - отдельными процессами с настоящей конфигурацией,
+подает нагрузку с заданной частотой и пишет сводку в JSON.
+
+Примеры:
+    python -m bench.run --target api --rps 20 --duration 30 --output bench.json
+    python -m bench.run --target bot --llm-429-ratio 0.05 --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from pathlib import Path
+
+import aiohttp
+
+from bench import fake_openai
+from bench.fake_openai import FakeOpenAI
+from bench.fake_telegram import FakeTelegramAPI
+from bench.loadgen import api_chat_sender, bot_sender, run_open_loop, summarize
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    """Свободный TCP-порт на localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit() -> str | None:
+    """Текущий коммит (для сравнения прогонов)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _wait_until(
+    check: Callable[[], Awaitable[bool]], process: subprocess.Popen, what: str
+) -> None:
+    """Дождаться готовности процесса (до 30 секунд)."""
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{what} exited with code {process.returncode} during startup")
+        if await check():
+            return
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{what} did not become ready in 30s")
+
+
+def _stop_process(process: subprocess.Popen) -> None:
+    """Остановить процесс через SIGTERM (штатное завершение), затем SIGKILL."""
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+async def _bench_api(args: argparse.Namespace, env: dict[str, str]) -> dict:
+    """Прогон POST /api/chat/message против uvicorn с приложением API."""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [sys.executable, "-m", "uvicorn", "src.api.main:app", "--host", "127.0.0.1"]
+    command += ["--port", str(port), "--log-level", "warning", "--no-access-log"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    try:
+        async with aiohttp.ClientSession() as session:
+
+            async def ready() -> bool:
+                try:
+                    async with session.get(f"{base_url}/") as response:
+                        return response.status == 200
+                except aiohttp.ClientError:
+                    return False
+
+            await _wait_until(ready, process, "API server")
+            send = api_chat_sender(session, base_url, timeout=args.timeout)
+            results, elapsed = await run_open_loop(send, args.rps, args.duration)
+    finally:
+        _stop_process(process)
+    return summarize("api_chat", results, elapsed, args.rps)
+
+
+async def _bench_bot(
+    args: argparse.Namespace, env: dict[str, str], telegram: FakeTelegramAPI
+) -> dict:
+    """Прогон бота в режиме polling против заглушки Bot API."""
+    process = subprocess.Popen([sys.executable, "-m", "src.main"], cwd=ROOT, env=env)
+    try:
+
+        async def ready() -> bool:
+            return telegram.polls > 0
+
+        await _wait_until(ready, process, "Bot")
+        send = bot_sender(telegram, timeout=args.timeout)
+        results, elapsed = await run_open_loop(send, args.rps, args.duration)
+    finally:
+        _stop_process(process)
+    return summarize("bot", results, elapsed, args.rps)
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    """
+    Выполнить прогон по аргументам CLI.
+
+    Args:
+        args: Аргументы (см. build_parser)
+
+    Returns:
+        dict: Отчет с параметрами прогона и сводкой по каждому сценарию
+    """
+    llm = FakeOpenAI(fake_openai.settings_from_args(args))
+    telegram = FakeTelegramAPI()
+    await llm.start()
+    await telegram.start()
+    workdir = Path(tempfile.mkdtemp(prefix="bench-"))
+    env = {
+        **os.environ,
+        "TELEGRAM_BOT_TOKEN": "123456:BENCH",
+        "TELEGRAM_API_URL": telegram.url,
+        "OPENROUTER_API_KEY": "bench",
+        "OPENROUTER_BASE_URL": llm.url,
+        "DATABASE_URL": args.database_url or f"sqlite+aiosqlite:///{workdir / 'bench.db'}",
+        "LOG_FILE_PATH": str(workdir / "bench.log"),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        "BOT_MODE": "polling",
+    }
+
+    scenarios = []
+    try:
+        if args.target in ("api", "all"):
+            scenarios.append(await _bench_api(args, env))
+        if args.target in ("bot", "all"):
+            scenarios.append(await _bench_bot(args, env, telegram))
+    finally:
+        await telegram.stop()
+        await llm.stop()
+
+    return {
+        "started_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "database": env["DATABASE_URL"].split(":", 1)[0],
+        "duration_s": args.duration,
+        "llm": {
+            "latency_s": llm.settings.latency,
+            "jitter_s": llm.settings.jitter,
+            "token_rate": llm.settings.token_rate,
+            "reply_tokens": llm.settings.reply_tokens,
+            "rate_limit_ratio": llm.settings.rate_limit_ratio,
+            "requests": llm.requests,
+            "rate_limited": llm.rate_limited,
+        },
+        "scenarios": scenarios,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Найти регрессии относительно прошлого прогона.
+
+    Сравниваются p95 задержки и TTFT (рост больше чем на tolerance),
+    пропускная способность (падение больше чем на tolerance) и доля
+    ошибок (рост больше чем на 1 п.п.).
+
+    Args:
+        report: Текущий отчет
+        baseline: Отчет прошлого прогона
+        tolerance: Допустимое относительное ухудшение (0.1 = 10%)
+
+    Returns:
+        list[str]: Описания регрессий (пустой список - регрессий нет)
+    """
+    previous = {scenario["scenario"]: scenario for scenario in baseline.get("scenarios", [])}
+    regressions = []
+    for current in report["scenarios"]:
+        name = current["scenario"]
+        old = previous.get(name)
+        if old is None:
+            continue
+        for metric in ("latency_ms", "ttft_ms"):
+            now, before = current[metric]["p95"], old[metric]["p95"]
+            if now is not None and before and now > before * (1 + tolerance):
+                regressions.append(f"{name}: {metric} p95 {before} -> {now}")
+        if current["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {old['throughput_rps']} -> {current['throughput_rps']} rps"
+            )
+        if current["error_rate"] > old["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {old['error_rate']} -> {current['error_rate']}")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Парсер аргументов CLI."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--target", choices=("api", "bot", "all"), default="all")
+    parser.add_argument("--rps", type=float, default=10.0, help="Целевая частота запросов")
+    parser.add_argument("--duration", type=float, default=30.0, help="Длительность, секунды")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Таймаут запроса, секунды")
+    parser.add_argument("--database-url", help="БД для сервисов (по умолчанию временный SQLite)")
+    parser.add_argument("--output", help="Куда записать JSON-отчет (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON-отчет прошлого прогона для сравнения")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.1, help="Допустимое ухудшение (0.1 = 10%%)"
+    )
+    fake_openai.add_arguments(parser)
+    return parser
+
+
+def main() -> None:
+    """Точка входа: python -m bench.run."""
+    args = build_parser().parse_args()
+    report = asyncio.run(run_benchmark(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    with contextlib.suppress(KeyboardInterrupt):
+        main()
@@ -0,0 +1,142 @@
+"""
+Микробенчмарк подготовки потокового ответа чата.
+
+Сравнивает нарезку ответа на chunks (ChatService._optimize_streaming_chunks)
+и сборку кадров SSE (src.api.sse) с прежней реализацией: посимвольная
+склейка chunk'а и json.dumps + f-строка на каждый кадр. Ответы -
+синтетический текст заданного размера с предложениями и запятыми.
+
+Примеры:
+    python -m bench.streaming
+    python -m bench.streaming --size 100000 --repeat 20 --output streaming.json
+"""
+
+import argparse
+import json
+import logging
+import random
+import statistics
+import time
+from collections.abc import Callable
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from src.api import sse
+from src.api.chat_service import ChatService
+
+WORDS = ("погода", "завтра", "будет", "отчет", "пользователь", "сообщение", "answer", "data")
+
+
+def make_answer(size: int, seed: int = 0) -> str:
+    """Синтетический ответ LLM длиной size символов."""
+    rnd = random.Random(seed)
+    parts: list[str] = []
+    length = 0
+    while length < size:
+        sentence = " ".join(rnd.choices(WORDS, k=rnd.randint(3, 25)))
+        if rnd.random() < 0.5:
+            sentence += ", " + " ".join(rnd.choices(WORDS, k=rnd.randint(2, 10)))
+        sentence = sentence.capitalize() + rnd.choice(".!?;") + " "
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)[:size]
+
+
+def legacy_chunks(text: str, chunk_size: int) -> list[str]:
+    """Прежняя нарезка: chunk собирается по одному символу."""
+    chunks = []
+    current_chunk = ""
+    for i, char in enumerate(text):
+        current_chunk += char
+        # Запятая проверялась отдельно, с порогом 0.8 * chunk_size, который
+        # после len >= chunk_size всегда выполнен
+        should_split = i == len(text) - 1 or (len(current_chunk) >= chunk_size and char in ".!?;,")
+        if should_split and current_chunk.strip():
+            chunks.append(current_chunk)
+            current_chunk = ""
+    return chunks if chunks else [text]
+
+
+def legacy_frames(chunks: list[str]) -> list[bytes]:
+    """Прежние кадры: json.dumps и f-строка, кодирование в StreamingResponse."""
+    frames = []
+    for chunk in chunks:
+        escaped_chunk = json.dumps(chunk, ensure_ascii=False)
+        frames.append(f'data: {{"content": {escaped_chunk}}}\n\n'.encode())
+    frames.append(b"data: [DONE]\n\n")
+    return frames
+
+
+def current_frames(chunks: list[str]) -> list[bytes]:
+    """Текущие кадры: src.api.sse."""
+    frames = [sse.sse_frame({"content": chunk}) for chunk in chunks]
+    frames.append(sse.DONE_FRAME)
+    return frames
+
+
+def _measure(func: Callable[[], object], repeat: int) -> float:
+    """Медиана времени вызова, миллисекунды."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def run(size: int = 100_000, chunk_size: int = 50, repeat: int = 10) -> dict:
+    """
+    Замерить нарезку и сборку кадров для одного ответа.
+
+    Returns:
+        dict: Медианы в миллисекундах (legacy/current) и ускорения
+    """
+    answer = make_answer(size)
+    service = ChatService(MagicMock(), MagicMock(), logging.getLogger(__name__), chunk_size)
+    chunks = service._optimize_streaming_chunks(answer)
+    if chunks != legacy_chunks(answer, chunk_size):
+        raise AssertionError("chunk boundaries differ from the legacy implementation")
+
+    result = {
+        "answer_chars": len(answer),
+        "chunks": len(chunks),
+        "json_backend": "orjson" if sse.orjson is not None else "json",
+        "chunking_ms": {
+            "legacy": _measure(lambda: legacy_chunks(answer, chunk_size), repeat),
+            "current": _measure(lambda: service._optimize_streaming_chunks(answer), repeat),
+        },
+        "framing_ms": {
+            "legacy": _measure(lambda: legacy_frames(chunks), repeat),
+            "current": _measure(lambda: current_frames(chunks), repeat),
+        },
+    }
+    for key in ("chunking_ms", "framing_ms"):
+        timings = result[key]
+        timings["speedup"] = round(timings["legacy"] / max(timings["current"], 1e-9), 1)
+    return result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size", type=int, default=100_000, help="Длина ответа, символов")
+    parser.add_argument("--chunk-size", type=int, default=50, help="ChatService.chunk_size")
+    parser.add_argument("--repeat", type=int, default=10, help="Повторов на замер")
+    parser.add_argument("--output", type=Path, help="Файл для JSON-сводки")
+    return parser
+
+
+def main() -> None:
+    """Точка входа CLI."""
+    args = build_parser().parse_args()
+    result = run(args.size, args.chunk_size, args.repeat)
+    report = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(report, encoding="utf-8")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 "use client";
 
-import { useCallback, useEffect, useState } from "react";
-import { getStats } from "@/lib/api";
+import { useEffect, useState } from "react";
+import { subscribeStats } from "@/lib/api";
 import { Period, StatsResponse } from "@/types/stats";
 import { StatsCard } from "@/components/dashboard/stats-card";
 import { PeriodSelector } from "@/components/dashboard/period-selector";
@@ -20,25 +20,26 @@ export default function DashboardPage() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [sidebarOpen, setSidebarOpen] = useState(false);
+  const [attempt, setAttempt] = useState(0);
 
-  const loadData = useCallback(async () => {
-    try {
-      setLoading(true);
-      setError(null);
-      const stats = await getStats(period);
-      setData(stats);
-    } catch (err) {
-      setError(
-        err instanceof Error ? err.message : "Не удалось загрузить данные"
-      );
-    } finally {
-      setLoading(false);
-    }
-  }, [period]);
-
+  // Живые обновления: полный снимок, затем только изменения
   useEffect(() => {
-    loadData();
-  }, [loadData]);
+    setLoading(true);
+    setError(null);
+    return subscribeStats(
+      period,
+      (stats) => {
+        setData(stats);
+        setLoading(false);
+      },
+      (err) => {
+        setError(err.message || "Не удалось загрузить данные");
+        setLoading(false);
+      }
+    );
+  }, [period, attempt]);
+
+  const retry = () => setAttempt((value) => value + 1);
 
   const handleNewDialog = () => {
     console.log('📌 Создание нового диалога...');
@@ -64,7 +65,7 @@ export default function DashboardPage() {
           <div className="mb-6 flex items-center justify-between">
             <h1 className="text-3xl font-bold">Статистика диалогов</h1>
           </div>
-          <ErrorMessage message={error} onRetry={loadData} />
+          <ErrorMessage message={error} onRetry={retry} />
         </main>
         <QuickActionMenu
           onNewDialog={handleNewDialog}
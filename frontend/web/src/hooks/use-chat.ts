@@ -92,10 +92,12 @@ export function useChat(userId?: number) {
         let assistantContent = "";
 
         try {
+          // id сообщения - ключ идемпотентности: повтор не вызовет LLM заново
           for await (const chunk of apiChatMessage(
             content,
             sessionId,
-            currentMode
+            currentMode,
+            userMessage.id
           )) {
             assistantContent += chunk;
           }
@@ -1,4 +1,4 @@
-import { StatsResponse, Period } from "@/types/stats";
+import { StatsResponse, Period, Summary } from "@/types/stats";
 import type {
   ChatMode,
   ChatMessage,
@@ -64,15 +64,88 @@ export async function getStats(
   }
 }
 
+/**
+ * Изменения статистики из /stats/stream (event: delta)
+ */
+export interface StatsDelta {
+  summary?: Partial<Summary>;
+  activity_timeline?: StatsResponse["activity_timeline"];
+  top_users?: StatsResponse["top_users"];
+  recent_dialogs?: StatsResponse["recent_dialogs"];
+}
+
+/**
+ * Применяет delta к снимку статистики.
+ * Точки графика заменяются по date, окно остается прежней длины.
+ */
+export function applyStatsDelta(
+  stats: StatsResponse,
+  delta: StatsDelta
+): StatsResponse {
+  let timeline = stats.activity_timeline;
+  if (delta.activity_timeline) {
+    const byDate = new Map(timeline.map((point) => [point.date, point]));
+    for (const point of delta.activity_timeline) {
+      byDate.set(point.date, point);
+    }
+    timeline = [...byDate.values()]
+      .sort((a, b) => a.date.localeCompare(b.date))
+      .slice(-stats.activity_timeline.length);
+  }
+  return {
+    summary: { ...stats.summary, ...delta.summary },
+    activity_timeline: timeline,
+    top_users: delta.top_users ?? stats.top_users,
+    recent_dialogs: delta.recent_dialogs ?? stats.recent_dialogs,
+  };
+}
+
+/**
+ * Подписка на живые обновления статистики (SSE) вместо опроса /stats.
+ * Сервер присылает snapshot, затем delta; EventSource сам переподключается
+ * при обрыве и получает новый snapshot.
+ *
+ * @returns функция отписки
+ */
+export function subscribeStats(
+  period: Period,
+  onData: (stats: StatsResponse) => void,
+  onError: (error: ApiError) => void
+): () => void {
+  const source = new EventSource(`${API_URL}/stats/stream?period=${period}`);
+  let current: StatsResponse | null = null;
+
+  source.addEventListener("snapshot", (event) => {
+    current = JSON.parse((event as MessageEvent).data) as StatsResponse;
+    onData(current);
+  });
+  source.addEventListener("delta", (event) => {
+    if (!current) return;
+    const delta = JSON.parse((event as MessageEvent).data) as StatsDelta;
+    current = applyStatsDelta(current, delta);
+    onData(current);
+  });
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) {
+      onError(new ApiError("Stats stream closed"));
+    }
+  };
+
+  return () => source.close();
+}
+
 /**
  * Отправляет сообщение в чат и возвращает streaming ответ
  * Использует Server-Sent Events (SSE) для получения chunks ответа
  * Поддерживает увеличенный таймаут для админ-режима (сложные запросы SQL)
+ * idempotencyKey - один на логическое сообщение: повторная отправка с тем же
+ * ключом не вызывает LLM заново, а получает тот же ответ
  */
 export async function* chatMessage(
   message: string,
   sessionId: string,
-  mode: ChatMode = "normal"
+  mode: ChatMode = "normal",
+  idempotencyKey?: string
 ): AsyncGenerator<string> {
   const params = new URLSearchParams({
     message,
@@ -87,6 +160,7 @@ export async function* chatMessage(
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        ...(idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {}),
       },
       signal: withTimeout(TIMEOUT_CONFIG.chat),
     });
@@ -0,0 +1,218 @@
+"""Разбиение длинных ответов на сообщения Telegram и их последовательная отправка."""
+
+import asyncio
+import re
+from collections.abc import AsyncIterable, Awaitable, Callable
+from typing import Any
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+FENCE_MARK = "```"
+_FENCE_CLOSE = "\n" + FENCE_MARK
+
+# Границы разбиения от лучших к худшим; позиция разреза - конец совпадения
+_BOUNDARY_PATTERNS = (
+    re.compile(r"\n\n+|\n(?=[ \t]*```)"),  # абзац или начало code fence
+    re.compile(r"\n"),  # строка
+    re.compile(r"[.!?…][\"')\]»]*[ \t]+"),  # предложение
+    re.compile(r"[ \t]+"),  # слово
+)
+
+
+def _find_cut(text: str, budget: int) -> int:
+    """
+    Найти позицию разреза не дальше budget символов.
+
+    Берется самая поздняя граница самого крупного уровня, при которой
+    часть заполнена хотя бы наполовину; иначе - разрез по budget.
+    """
+    window = text[: budget + 1]
+    for pattern in _BOUNDARY_PATTERNS:
+        cut = 0
+        for match in pattern.finditer(window):
+            if match.end() > budget:
+                break
+            cut = match.end()
+        if cut and cut >= budget // 2:
+            return cut
+    return max(budget, 1)
+
+
+def _fence_after(text: str, fence: str | None) -> str | None:
+    """Открытый code fence (строка открытия) после text, если fence был открыт до него."""
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith(FENCE_MARK):
+            fence = None if fence is not None else stripped
+    return fence
+
+
+class AnswerSplitter:
+    """
+    Инкрементальное разбиение текста на части не длиннее limit.
+
+    Режет по абзацам, затем по строкам, предложениям и словам. Если разрез
+    попал внутрь блока кода, блок закрывается в конце части и открывается
+    заново (с тем же языком) в начале следующей, чтобы разметка каждой
+    части была корректной. Текст можно подавать кусками по мере генерации:
+    feed() возвращает только окончательно сформированные части.
+    """
+
+    def __init__(self, limit: int = TELEGRAM_MESSAGE_LIMIT) -> None:
+        """
+        Инициализация разбиения.
+
+        Args:
+            limit: Максимальная длина части в символах
+        """
+        self._limit = limit
+        self._buffer = ""
+        self._fence: str | None = None
+
+    def _prefix(self) -> str:
+        """Повторное открытие блока кода в начале части."""
+        return f"{self._fence}\n" if self._fence else ""
+
+    def feed(self, fragment: str) -> list[str]:
+        """
+        Добавить текст.
+
+        Args:
+            fragment: Очередной фрагмент ответа
+
+        Returns:
+            list[str]: Части, которые уже можно отправлять
+        """
+        self._buffer += fragment
+        parts = []
+        while len(self._prefix()) + len(self._buffer) > self._limit:
+            prefix = self._prefix()
+            budget = self._limit - len(prefix) - len(_FENCE_CLOSE)
+            cut = _find_cut(self._buffer, budget)
+            segment = self._buffer[:cut].rstrip()
+            self._fence = _fence_after(segment, self._fence)
+            if segment:
+                parts.append(prefix + segment + (_FENCE_CLOSE if self._fence else ""))
+            self._buffer = self._buffer[cut:].lstrip("\n")
+        return parts
+
+    def finish(self) -> list[str]:
+        """
+        Завершить разбиение.
+
+        Returns:
+            list[str]: Оставшаяся часть (пустой список, если текста не осталось)
+        """
+        rest = self._buffer.rstrip()
+        prefix = self._prefix()
+        self._buffer = ""
+        self._fence = None
+        return [prefix + rest] if rest.strip() else []
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> list[str]:
+    """
+    Разбить текст на части для отправки в Telegram.
+
+    Args:
+        text: Текст ответа
+        limit: Максимальная длина части
+
+    Returns:
+        list[str]: Части в порядке отправки
+    """
+    splitter = AnswerSplitter(limit)
+    return splitter.feed(text) + splitter.finish()
+
+
+class AnswerSender:
+    """
+    Конвейерная отправка длинного ответа частями.
+
+    Готовые части ставятся в очередь и отправляются фоновой задачей строго
+    по порядку, пока продолжается прием текста: при потоковой генерации
+    первая часть уходит, как только набрана, не дожидаясь конца ответа.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[Any]],
+        limit: int = TELEGRAM_MESSAGE_LIMIT,
+    ) -> None:
+        """
+        Инициализация отправителя.
+
+        Args:
+            send: Отправка одной части (например, через SendScheduler)
+            limit: Максимальная длина части
+        """
+        self._send = send
+        self._splitter = AnswerSplitter(limit)
+        self._queue: asyncio.Queue[str | None] = asyncio.Queue()
+        self._worker: asyncio.Task[None] | None = None
+        self.parts_sent = 0
+
+    def feed(self, fragment: str) -> None:
+        """
+        Добавить фрагмент ответа; готовые части сразу уходят в отправку.
+
+        Args:
+            fragment: Очередной фрагмент текста
+        """
+        self._enqueue(self._splitter.feed(fragment))
+
+    async def finish(self) -> int:
+        """
+        Отправить остаток и дождаться отправки всех частей.
+
+        Returns:
+            int: Количество отправленных частей
+
+        Raises:
+            Exception: Ошибка отправки части (последующие части не отправляются)
+        """
+        self._enqueue(self._splitter.finish())
+        if self._worker is None:
+            return self.parts_sent
+        self._queue.put_nowait(None)
+        await self._worker
+        return self.parts_sent
+
+    async def send_all(self, fragments: str | AsyncIterable[str]) -> int:
+        """
+        Отправить весь ответ: строку целиком или поток фрагментов.
+
+        Args:
+            fragments: Готовый текст или асинхронный поток фрагментов
+
+        Returns:
+            int: Количество отправленных частей
+        """
+        try:
+            if isinstance(fragments, str):
+                self.feed(fragments)
+            else:
+                async for fragment in fragments:
+                    self.feed(fragment)
+                    if self._worker is not None and self._worker.done():
+                        break
+        except BaseException:
+            if self._worker is not None:
+                self._worker.cancel()
+            raise
+        return await self.finish()
+
+    def _enqueue(self, parts: list[str]) -> None:
+        """Поставить части в очередь и запустить отправку при необходимости."""
+        if not parts:
+            return
+        for part in parts:
+            self._queue.put_nowait(part)
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        """Отправлять части по порядку до маркера конца."""
+        while (part := await self._queue.get()) is not None:
+            await self._send(part)
+            self.parts_sent += 1
@@ -0,0 +1,45 @@
+"""Доступ к административным эндпоинтам API по токену."""
+
+import hmac
+
+from fastapi import Header, HTTPException
+
+# Токен администратора API (API_ADMIN_TOKEN); None - эндпоинты закрыты
+_admin_token: str | None = None
+
+
+def set_admin_token(token: str | None) -> None:
+    """
+    Задать токен администратора API.
+
+    Args:
+        token: Значение API_ADMIN_TOKEN (None или пустая строка - доступ закрыт)
+    """
+    global _admin_token
+    _admin_token = token or None
+
+
+def require_admin(
+    authorization: str | None = Header(None, description="Bearer <API_ADMIN_TOKEN>"),
+) -> None:
+    """
+    Зависимость FastAPI: пропустить только запрос с токеном администратора.
+
+    Выгрузки и поиск отдают историю любых пользователей, поэтому без
+    настроенного токена они недоступны совсем.
+
+    Args:
+        authorization: Заголовок Authorization вида "Bearer <token>"
+
+    Raises:
+        HTTPException: 403, если токен не настроен; 401, если он не передан или неверен
+    """
+    if _admin_token is None:
+        raise HTTPException(status_code=403, detail="Admin API is disabled: set API_ADMIN_TOKEN")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), _admin_token.encode()):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or missing admin token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
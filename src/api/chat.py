@@ -1,11 +1,19 @@
 """API endpoints для чата."""
 
-from fastapi import APIRouter, Query, Depends
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Query, Depends, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
 import logging
 
+from src.api.auth import require_admin
 from src.api.models import ChatMode, TextToSqlRequest
 from src.api.chat_service import ChatService
+from src.api.idempotency import IdempotencyKeyReusedError, IdempotentStreams
+from src.api.sse import DONE_FRAME, cancel_on_disconnect, sse_frame
+from src.export import ExportFilter, export_filename, export_stream
 from src.database import DatabaseManager
 from src.llm_client import LLMClient
 
@@ -14,6 +22,8 @@ router = APIRouter(prefix="/api/chat", tags=["chat"])
 # Global instances - will be set during app initialization
 _chat_service: ChatService | None = None
 _logger: logging.Logger | None = None
+# Ответы на запросы с Idempotency-Key (повторы и двойные клики)
+_idempotent_streams = IdempotentStreams()
 
 
 def set_chat_service(service: ChatService, logger: logging.Logger) -> None:
@@ -21,6 +31,7 @@ def set_chat_service(service: ChatService, logger: logging.Logger) -> None:
     global _chat_service, _logger
     _chat_service = service
     _logger = logger
+    _idempotent_streams.logger = logger
 
 
 def get_chat_service() -> ChatService:
@@ -32,48 +43,129 @@ def get_chat_service() -> ChatService:
 
 @router.post("/message")
 async def chat_message(
+    request: Request,
     message: str = Query(..., description="Сообщение от пользователя"),
     session_id: str = Query(..., description="ID сессии чата"),
     mode: ChatMode = Query(ChatMode.NORMAL, description="Режим чата (normal/admin)"),
     service: ChatService = Depends(get_chat_service),
+    idempotency_key: str | None = Header(
+        None,
+        alias="Idempotency-Key",
+        min_length=1,
+        max_length=255,
+        description="Ключ логического запроса: повторы с ним не вызывают LLM заново",
+    ),
 ) -> StreamingResponse:
     """
     Обрабатывает сообщение пользователя и возвращает потоковый ответ (SSE).
 
+    Если клиент закрыл соединение, обработка отменяется: ожидание LLM и
+    SQL прерывается, повторные попытки не запускаются (см.
+    ChatService.process_message - что при этом сохраняется в историю).
+
+    С заголовком Idempotency-Key повтор запроса в той же сессии не
+    обрабатывается заново: пока ответ генерируется, повтор подключается
+    к нему, после - получает сохраненный ответ (заголовок ответа
+    Idempotent-Replayed: true). Ключ с другим сообщением или режимом - 422.
+
     Args:
+        request: HTTP запрос (для проверки отключения клиента)
         message: Текст сообщения
         session_id: ID сессии чата
         mode: Режим работы (normal или admin)
         service: ChatService для обработки
+        idempotency_key: Ключ идемпотентности (опционально)
 
     Returns:
         StreamingResponse с SSE событиями
 
     Example:
         POST /api/chat/message?message=Привет&session_id=uuid&mode=normal
+        Idempotency-Key: 5f0c...
     """
-    async def generate():
-        import json
+    if service.in_flight.closing:
+        # Сервер останавливается: клиент повторит запрос к другому экземпляру
+        raise HTTPException(
+            status_code=503, detail="Server is shutting down", headers={"Retry-After": "5"}
+        )
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+    if idempotency_key is None:
+        chunks = service.process_message(message, session_id, mode)
+    else:
         try:
-            async for chunk in service.process_message(message, session_id, mode):
-                # Properly escape the JSON string
-                escaped_chunk = json.dumps(chunk, ensure_ascii=False)
-                yield f'data: {{"content": {escaped_chunk}}}\n\n'
+            chunks, replayed = _idempotent_streams.open(
+                session_id,
+                idempotency_key,
+                (message, mode),
+                lambda: service.process_message(message, session_id, mode),
+            )
+        except IdempotencyKeyReusedError as e:
+            raise HTTPException(status_code=422, detail=str(e)) from None
+        if replayed:
+            headers["Idempotent-Replayed"] = "true"
+
+    async def generate() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in cancel_on_disconnect(request, chunks):
+                yield sse_frame({"content": chunk})
         except Exception as e:
-            error_msg = str(e)[:100]
-            escaped_error = json.dumps(error_msg, ensure_ascii=False)
-            yield f'data: {{"error": {escaped_error}}}\n\n'
-        finally:
-            yield "data: [DONE]\n\n"
+            yield sse_frame({"error": str(e)[:100]})
+        yield DONE_FRAME
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers=headers)
+
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+async def export_history(
+    table: Literal["messages", "chat_messages"] = Query(
+        "messages", description="messages (бот) или chat_messages (веб-чат)"
+    ),
+    user_id: int | None = Query(None, description="Telegram ID пользователя"),
+    session_id: str | None = Query(None, description="ID сессии веб-чата (chat_messages)"),
+    since: datetime | None = Query(None, description="Начало периода (включительно)"),
+    until: datetime | None = Query(None, description="Конец периода (не включительно)"),
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Формат выгрузки"),
+    gzip: bool = Query(False, description="Сжать выгрузку gzip"),
+    include_archived: bool = Query(False, description="Добавить строки из архива"),
+    service: ChatService = Depends(get_chat_service),
+) -> StreamingResponse:
+    """
+    Потоковая выгрузка истории пользователя, сессии или периода.
+
+    Строки читаются из БД пакетами и сразу уходят клиенту, поэтому
+    память сервера не растет с объемом выгрузки. Нужен хотя бы один
+    фильтр: user_id, session_id, since или until.
+    Доступна только администратору: заголовок Authorization: Bearer
+    <API_ADMIN_TOKEN>.
+
+    Returns:
+        StreamingResponse с NDJSON или CSV (при gzip=true - файл .gz)
+
+    Example:
+        GET /api/chat/export?user_id=123456&since=2026-01-01&format=csv&gzip=true
+        Authorization: Bearer <API_ADMIN_TOKEN>
+    """
+    export_filter = ExportFilter(user_id=user_id, session_id=session_id, since=since, until=until)
+    archive = service.archive if include_archived else None
+    try:
+        stream = export_stream(service.db_manager, table, export_filter, format, gzip, archive)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from None
 
+    if gzip:
+        media_type = "application/gzip"
+    else:
+        media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = export_filename(table, format, gzip)
     return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
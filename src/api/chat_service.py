@@ -1,7 +1,9 @@
 """Сервис для обработки чат-сообщений с поддержкой streaming."""
 
 import asyncio
+import contextlib
 import logging
+import re
 import time
 import uuid
 from typing import TYPE_CHECKING, AsyncGenerator
@@ -13,8 +15,14 @@ from src.api.models import ChatMode, ChatMessage as ChatMessageModel, MessageRol
 from src.models import ChatMessage as ChatMessageDB, ChatSession as ChatSessionDB
 from src.text2sql import Text2SqlConverter
 from src.llm_client import RateLimitExceededError
+from src.database import db_operation
+from src.metrics import CHAT_CANCELLED, CHAT_FIRST_CHUNK_SECONDS
+from src.shutdown import InFlightTracker
+from src.tracing import tracer
 
 if TYPE_CHECKING:
+    from src.archive import MessageArchive
+    from src.context_storage import ContextStorage
     from src.llm_client import LLMClient
     from src.database import DatabaseManager
 
@@ -40,6 +48,9 @@ Be friendly and professional in your responses.""",
 Be precise and fact-based in your responses."""
 }
 
+# Символы, после которых chunk можно завершить (когда набрано chunk_size)
+_CHUNK_BOUNDARY = re.compile(r"[.!?;,]")
+
 
 class ChatService:
     """Сервис для обработки сообщений чата в обоих режимах."""
@@ -52,6 +63,7 @@ class ChatService:
         chunk_size: int = 50,
         request_timeout: float = 30.0,
         text2sql_timeout: float = 5.0,
+        archive: "MessageArchive | None" = None,
     ) -> None:
         """
         Инициализация сервиса.
@@ -63,14 +75,17 @@ class ChatService:
             chunk_size: Размер chunk'а для streaming (количество символов)
             request_timeout: Таймаут для LLM request в секундах (default 30s)
             text2sql_timeout: Таймаут для Text-to-SQL в секундах (default 5s)
+            archive: Архив старых сообщений для выгрузок и Text-to-SQL (опционально)
         """
         self.llm_client = llm_client
         self.db_manager = db_manager
         self.logger = logger
-        self.text2sql = Text2SqlConverter(llm_client, db_manager, logger)
+        self.archive = archive
+        self.text2sql = Text2SqlConverter(llm_client, db_manager, logger, archive=archive)
         self.chunk_size = chunk_size
         self.request_timeout = request_timeout
         self.text2sql_timeout = text2sql_timeout
+        self.in_flight = InFlightTracker()
 
         # Temperature config per mode
         self.temperature_config = {
@@ -79,8 +94,9 @@ class ChatService:
         }
 
         self.logger.info(
-            f"ChatService initialized with timeouts: "
-            f"request={request_timeout}s, text2sql={text2sql_timeout}s"
+            "ChatService initialized with timeouts: request=%ss, text2sql=%ss",
+            request_timeout,
+            text2sql_timeout,
         )
 
     async def process_message(
@@ -94,6 +110,13 @@ class ChatService:
         """
         Обрабатывает сообщение пользователя и возвращает streaming ответ.
 
+        Отмена (задача отменена или генератор закрыт, не дочитав ответ)
+        прерывает ожидание LLM и SQL и не запускает повторные попытки.
+        Сообщение пользователя уже сохранено; ответ ассистента сохраняется,
+        только если клиент успел получить его часть: ровно те chunks, после
+        которых потребитель запросил продолжение (для StreamingResponse -
+        отправленные клиенту), см. _save_partial_answer.
+
         Args:
             message: Сообщение от пользователя
             session_id: ID сессии чата
@@ -103,7 +126,52 @@ class ChatService:
 
         Yields:
             Части ответа ассистента
+
+        Raises:
+            ShuttingDownError: Если сервис уже останавливается
         """
+        async with self.in_flight.track():
+            received_at = time.perf_counter()
+            with tracer.start_as_current_span(
+                "chat.process_message",
+                {"chat.mode": mode.value, "chat.session_id": session_id},
+            ) as span:
+                first_chunk = True
+                try:
+                    async with contextlib.aclosing(
+                        self._handle_message(
+                            message, session_id, mode, context_storage, max_retries
+                        )
+                    ) as chunks:
+                        async for chunk in chunks:
+                            if first_chunk:
+                                first_chunk = False
+                                span.add_event("first_chunk")
+                                CHAT_FIRST_CHUNK_SECONDS.labels(mode.value).observe(
+                                    time.perf_counter() - received_at
+                                )
+                            yield chunk
+                except (asyncio.CancelledError, GeneratorExit):
+                    stage = "waiting" if first_chunk else "streaming"
+                    CHAT_CANCELLED.labels(mode.value, stage).inc()
+                    span.add_event("cancelled", {"chat.stage": stage})
+                    self.logger.info(
+                        "Chat request cancelled (%s, %s). Session: %s",
+                        mode.value,
+                        stage,
+                        session_id,
+                    )
+                    raise
+
+    async def _handle_message(
+        self,
+        message: str,
+        session_id: str,
+        mode: ChatMode,
+        context_storage: "ContextStorage | None",
+        max_retries: int,
+    ) -> AsyncGenerator[str, None]:
+        """Сохранить сообщение и выдать ответ выбранного режима (см. process_message)."""
         # Сохраняем сообщение пользователя
         user_msg_id = str(uuid.uuid4())
         user_message = ChatMessageDB(
@@ -118,20 +186,20 @@ class ChatService:
         try:
             if mode == ChatMode.ADMIN:
                 # Админ режим: Text-to-SQL pipeline с retry logic
-                async for chunk in self._process_admin_mode_with_retry(
-                    message, session_id, max_retries
-                ):
-                    yield chunk
+                answer = self._process_admin_mode_with_retry(message, session_id, max_retries)
             else:
                 # Обычный режим: LLM ассистент с retry logic
-                async for chunk in self._process_normal_mode_with_retry(
+                answer = self._process_normal_mode_with_retry(
                     message, session_id, context_storage, max_retries
-                ):
+                )
+            # aclosing: при отмене режим успевает сохранить отданную часть ответа
+            async with contextlib.aclosing(answer) as chunks:
+                async for chunk in chunks:
                     yield chunk
 
         except RateLimitExceededError as e:
             # Специальная обработка для rate limit ошибок
-            self.logger.error(f"Rate limit in chat service: {e}")
+            self.logger.error("Rate limit in chat service: %s", e)
 
             # Формируем дружественное сообщение на русском
             error_message = (
@@ -156,7 +224,7 @@ class ChatService:
             await self.save_message(error_msg)
 
         except Exception as e:
-            self.logger.error(f"Error processing message in {mode.value} mode: {e}")
+            self.logger.error("Error processing message in %s mode: %s", mode.value, e)
             error_message = (
                 f"Error processing your request: {str(e)[:100]}. "
                 "Please try again with a simpler question."
@@ -173,6 +241,28 @@ class ChatService:
             )
             await self.save_message(error_msg)
 
+    async def shutdown(self, timeout: float) -> bool:
+        """
+        Перестать принимать сообщения и дождаться обработки начатых.
+
+        Ответы LLM и их сохранение в БД завершаются до закрытия подключений.
+
+        Args:
+            timeout: Максимальное ожидание в секундах
+
+        Returns:
+            bool: True, если все сообщения обработаны до таймаута
+        """
+        self.logger.info("ChatService draining %s in-flight messages", self.in_flight.active)
+        drained = await self.in_flight.drain(timeout)
+        if not drained:
+            self.logger.warning(
+                "ChatService shutdown timed out after %.0fs with %s messages in flight",
+                timeout,
+                self.in_flight.active,
+            )
+        return drained
+
     async def _process_normal_mode_with_retry(
         self,
         message: str,
@@ -183,23 +273,24 @@ class ChatService:
         """Process normal mode with retry logic."""
         for attempt in range(max_retries):
             try:
-                async for chunk in self._process_normal_mode(
-                    message, session_id, context_storage
-                ):
-                    yield chunk
+                async with contextlib.aclosing(
+                    self._process_normal_mode(message, session_id, context_storage)
+                ) as chunks:
+                    async for chunk in chunks:
+                        yield chunk
                 return
             except RateLimitExceededError:
                 # Don't retry for rate limits, just raise immediately
-                self.logger.error(f"Rate limit error - no retry for rate limits")
+                self.logger.error("Rate limit error - no retry for rate limits")
                 raise
             except asyncio.TimeoutError:
-                self.logger.warning(f"Normal mode timeout on attempt {attempt + 1}")
+                self.logger.warning("Normal mode timeout on attempt %s", attempt + 1)
                 if attempt < max_retries - 1:
                     await asyncio.sleep(0.5 * (attempt + 1))  # Exponential backoff
                     continue
                 raise
             except Exception as e:
-                self.logger.error(f"Normal mode error on attempt {attempt + 1}: {e}")
+                self.logger.error("Normal mode error on attempt %s: %s", attempt + 1, e)
                 if attempt < max_retries - 1:
                     await asyncio.sleep(0.5 * (attempt + 1))
                     continue
@@ -214,21 +305,24 @@ class ChatService:
         """Process admin mode with retry logic."""
         for attempt in range(max_retries):
             try:
-                async for chunk in self._process_admin_mode(message, session_id):
-                    yield chunk
+                async with contextlib.aclosing(
+                    self._process_admin_mode(message, session_id)
+                ) as chunks:
+                    async for chunk in chunks:
+                        yield chunk
                 return
             except RateLimitExceededError:
                 # Don't retry for rate limits, just raise immediately
-                self.logger.error(f"Rate limit error - no retry for rate limits")
+                self.logger.error("Rate limit error - no retry for rate limits")
                 raise
             except asyncio.TimeoutError:
-                self.logger.warning(f"Admin mode timeout on attempt {attempt + 1}")
+                self.logger.warning("Admin mode timeout on attempt %s", attempt + 1)
                 if attempt < max_retries - 1:
                     await asyncio.sleep(0.5 * (attempt + 1))  # Exponential backoff
                     continue
                 raise
             except Exception as e:
-                self.logger.error(f"Admin mode error on attempt {attempt + 1}: {e}")
+                self.logger.error("Admin mode error on attempt %s: %s", attempt + 1, e)
                 if attempt < max_retries - 1:
                     await asyncio.sleep(0.5 * (attempt + 1))
                     continue
@@ -241,31 +335,23 @@ class ChatService:
         Выбрать точки разбиения:
         - После каждых ~chunk_size символов
         - На границах предложений (. ! ? ;)
-        - После запятых и двоеточий для естественного разбиения
+        - После запятых для естественного разбиения
+
+        Граница ищется регулярным выражением сразу с позиции chunk_size,
+        а chunk - срез строки: без посимвольной склейки, за O(n) на ответ.
         """
         chunks = []
-        current_chunk = ""
-
-        for i, char in enumerate(text):
-            current_chunk += char
-
-            # Check if we should split
-            should_split = False
-            if len(current_chunk) >= self.chunk_size:
-                # Look for natural break points
-                if char in ".!?;":
-                    should_split = True
-                elif char == "," and len(current_chunk) >= self.chunk_size * 0.8:
-                    should_split = True
-                elif i == len(text) - 1:  # Last character
-                    should_split = True
-            elif i == len(text) - 1:  # Last character
-                should_split = True
-
-            if should_split and current_chunk.strip():
-                chunks.append(current_chunk)
-                current_chunk = ""
-
+        min_length = max(self.chunk_size, 1)
+        start = 0
+        while start < len(text):
+            boundary = _CHUNK_BOUNDARY.search(text, start + min_length - 1)
+            end = boundary.end() if boundary else len(text)
+            chunks.append(text[start:end])
+            start = end
+
+        # Хвост из одних пробелов не отправляется отдельным chunk'ом
+        if len(chunks) > 1 and not chunks[-1].strip():
+            chunks.pop()
         return chunks if chunks else [text]
 
     async def _process_normal_mode(
@@ -308,8 +394,9 @@ class ChatService:
             })
 
             self.logger.info(
-                f"Processing message in normal mode with {len(history)} history messages. "
-                f"Session: {session_id}"
+                "Processing message in normal mode with %s history messages. Session: %s",
+                len(history),
+                session_id,
             )
 
             # Вызываем LLM с полным контекстом (напрямую, не через context_storage)
@@ -322,9 +409,14 @@ class ChatService:
             # Оптимизировать chunks для streaming
             chunks = self._optimize_streaming_chunks(response)
 
-            for chunk in chunks:
-                full_response += chunk
-                yield chunk
+            try:
+                for chunk in chunks:
+                    yield chunk
+                    # Chunk учитывается, когда потребитель запросил следующий
+                    full_response += chunk
+            except GeneratorExit:
+                await self._save_partial_answer(session_id, ChatMode.NORMAL, full_response)
+                raise
 
             # Сохранить ответ в БД
             assistant_msg = ChatMessageDB(
@@ -337,7 +429,7 @@ class ChatService:
             await self.save_message(assistant_msg)
 
         except asyncio.TimeoutError:
-            self.logger.error(f"LLM timeout after {self.request_timeout}s")
+            self.logger.error("LLM timeout after %ss", self.request_timeout)
             yield f"Sorry, the response took too long ({self.request_timeout}s). Please try with a simpler question."
 
     async def _call_llm_with_messages(self, messages: list[dict]) -> str:
@@ -351,10 +443,10 @@ class ChatService:
             Ответ от LLM
         """
         try:
-            response = await self.llm_client._api_call_with_retry(messages)
+            response = await self.llm_client._api_call_with_retry(messages, task="web_chat")
             return response
         except Exception as e:
-            self.logger.error(f"Error calling LLM: {e}")
+            self.logger.error("Error calling LLM: %s", e)
             raise
 
     async def _process_admin_mode(
@@ -410,16 +502,23 @@ Provide a clear, factual answer based on the data."""
 
             full_response = ""
             llm_response = await asyncio.wait_for(
-                self.llm_client.get_response(llm_prompt),
+                self.llm_client.get_response(llm_prompt, task="interpretation"),
                 timeout=self.request_timeout  # Использует настраиваемый таймаут
             )
 
             # Оптимизировать chunks для streaming
             chunks = self._optimize_streaming_chunks(llm_response)
 
-            for chunk in chunks:
-                full_response += chunk
-                yield chunk
+            try:
+                for chunk in chunks:
+                    yield chunk
+                    # Chunk учитывается, когда потребитель запросил следующий
+                    full_response += chunk
+            except GeneratorExit:
+                await self._save_partial_answer(
+                    session_id, ChatMode.ADMIN, full_response, text2sql_response.sql
+                )
+                raise
 
             # Сохранить полный ответ в БД (с SQL запросом)
             assistant_msg = ChatMessageDB(
@@ -439,9 +538,41 @@ Provide a clear, factual answer based on the data."""
             )
             yield error_msg
         except Exception as e:
-            self.logger.error(f"Error in admin mode: {e}")
+            self.logger.error("Error in admin mode: %s", e)
             yield f"Error processing your request: {str(e)[:100]}"
 
+    async def _save_partial_answer(
+        self, session_id: str, mode: ChatMode, content: str, sql_query: str | None = None
+    ) -> None:
+        """
+        Сохранить часть ответа, которую клиент получил до отмены запроса.
+
+        В историю попадают chunks, после которых потребитель запросил
+        следующий, без пометок: последний выданный, но не подтвержденный
+        chunk мог не дойти до клиента. Следующий запрос сессии видит в
+        контексте то же, что видел пользователь.
+        Ошибка записи только логируется - отмену она не прерывает.
+
+        Args:
+            session_id: ID сессии
+            mode: Режим чата
+            content: Полученная клиентом часть ответа
+            sql_query: SQL запрос (админ-режим)
+        """
+        try:
+            await self.save_message(
+                ChatMessageDB(
+                    id=str(uuid.uuid4()),
+                    user_session_id=session_id,
+                    content=content,
+                    role=MessageRole.ASSISTANT.value,
+                    mode=mode.value,
+                    sql_query=sql_query,
+                )
+            )
+        except Exception as e:
+            self.logger.warning("Partial answer was not saved: %s", e)
+
     async def save_message(self, message: ChatMessageDB) -> None:
         """
         Сохраняет сообщение в БД.
@@ -450,12 +581,13 @@ Provide a clear, factual answer based on the data."""
             message: Сообщение для сохранения
         """
         try:
-            session = self.db_manager.create_session()
-            session.add(message)
-            await session.commit()
-            self.logger.debug(f"Message saved: {message.id}")
+            with db_operation("save_message"):
+                session = self.db_manager.create_session()
+                session.add(message)
+                await session.commit()
+            self.logger.debug("Message saved: %s", message.id)
         except Exception as e:
-            self.logger.error(f"Error saving message: {e}")
+            self.logger.error("Error saving message: %s", e)
             raise
 
     async def get_history(
@@ -472,15 +604,16 @@ Provide a clear, factual answer based on the data."""
             Список сообщений из БД
         """
         try:
-            session = self.db_manager.create_session()
             stmt = (
                 select(ChatMessageDB)
                 .where(ChatMessageDB.user_session_id == session_id)
                 .order_by(ChatMessageDB.created_at.asc())
                 .limit(limit)
             )
-            result = await session.execute(stmt)
-            messages = result.scalars().all()
+            with db_operation("get_history"):
+                async with self.db_manager.get_read_session() as session:
+                    result = await session.execute(stmt)
+                    messages = result.scalars().all()
 
             # Конвертируем в Pydantic модели
             return [
@@ -497,7 +630,7 @@ Provide a clear, factual answer based on the data."""
             ]
 
         except Exception as e:
-            self.logger.error(f"Error getting history: {e}")
+            self.logger.error("Error getting history: %s", e)
             return []
 
     async def create_session(
@@ -521,14 +654,15 @@ Provide a clear, factual answer based on the data."""
                 mode=mode.value,
             )
 
-            db_session = self.db_manager.create_session()
-            db_session.add(session)
-            await db_session.commit()
-            self.logger.info(f"Chat session created: {session_id} for user {user_id}")
+            with db_operation("create_session"):
+                db_session = self.db_manager.create_session()
+                db_session.add(session)
+                await db_session.commit()
+            self.logger.info("Chat session created: %s for user %s", session_id, user_id)
             return session_id
 
         except Exception as e:
-            self.logger.error(f"Error creating session: {e}")
+            self.logger.error("Error creating session: %s", e)
             raise
 
     async def get_session(self, session_id: str) -> ChatSessionDB | None:
@@ -542,11 +676,12 @@ Provide a clear, factual answer based on the data."""
             Объект сессии или None
         """
         try:
-            db_session = self.db_manager.create_session()
             stmt = select(ChatSessionDB).where(ChatSessionDB.id == session_id)
-            result = await db_session.execute(stmt)
-            return result.scalars().first()
+            with db_operation("get_session"):
+                async with self.db_manager.get_read_session() as db_session:
+                    result = await db_session.execute(stmt)
+                    return result.scalars().first()
 
         except Exception as e:
-            self.logger.error(f"Error getting session: {e}")
+            self.logger.error("Error getting session: %s", e)
             return None
@@ -0,0 +1,186 @@
+"""Идемпотентные запросы к чату: один ответ на все повторы с тем же Idempotency-Key."""
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Callable, Hashable
+from dataclasses import dataclass, field
+
+from src.metrics import record_cache
+
+# Сколько ждать повтора, прежде чем отменить ответ, брошенный всеми клиентами, секунды
+ORPHAN_GRACE_SECONDS = 5.0
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """Ключ уже использован для запроса с другими параметрами."""
+
+
+@dataclass
+class _Run:
+    """Один ответ: его chunks, состояние и подписчики."""
+
+    fingerprint: Hashable
+    chunks: list[str] = field(default_factory=list)
+    done: bool = False
+    error: Exception | None = None
+    subscribers: int = 0
+    finished_at: float = 0.0
+    task: asyncio.Task[None] | None = None
+    orphan_timer: asyncio.TimerHandle | None = None
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def notify(self) -> None:
+        """Разбудить подписчиков, ждущих новых chunks."""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class IdempotentStreams:
+    """
+    Раздача одного потокового ответа всем запросам с одним ключом.
+
+    Первый запрос с ключом запускает источник (process_message) в
+    отдельной задаче; повтор, пришедший во время ответа, получает уже
+    выданные chunks и дальше читает вместе с остальными; повтор после
+    завершения получает сохраненный ответ целиком. Так логический запрос
+    стоит одного вызова LLM и одной записи сообщения пользователя.
+
+    Завершенные ответы хранятся не дольше ttl и не больше max_entries
+    (вытесняются самые старые). Ответ, завершившийся ошибкой или
+    отменой, не хранится: повтор выполнит запрос заново. Если все
+    клиенты отключились, ответ отменяется через orphan_grace секунд,
+    если за это время не пришел повтор. Кеш локален для процесса.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 600.0,
+        orphan_grace: float = ORPHAN_GRACE_SECONDS,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        Инициализация.
+
+        Args:
+            max_entries: Максимальное количество завершенных ответов в кеше
+            ttl: Время хранения завершенного ответа, секунды
+            orphan_grace: Ожидание повтора перед отменой брошенного ответа, секунды
+            logger: Логгер (опционально)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.orphan_grace = orphan_grace
+        self.logger = logger or logging.getLogger(__name__)
+        self._active: dict[tuple[str, str], _Run] = {}
+        self._completed: OrderedDict[tuple[str, str], _Run] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Ответов в кеше: выполняющихся и завершенных."""
+        return len(self._active) + len(self._completed)
+
+    def open(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: Hashable,
+        source: Callable[[], AsyncGenerator[str, None]],
+    ) -> tuple[AsyncGenerator[str, None], bool]:
+        """
+        Подписаться на ответ по ключу, запустив источник, если ответа еще нет.
+
+        Args:
+            scope: Область ключа (ID сессии): одинаковые ключи разных сессий не пересекаются
+            key: Значение заголовка Idempotency-Key
+            fingerprint: Параметры запроса; повтор с тем же ключом должен совпадать
+            source: Фабрика потока chunks (вызывается только для нового ответа)
+
+        Returns:
+            tuple[AsyncGenerator[str, None], bool]: Поток chunks и признак повтора
+                (True - ответ уже выполнялся или выполнен)
+
+        Raises:
+            IdempotencyKeyReusedError: Если ключ использован с другими параметрами
+        """
+        entry_key = (scope, key)
+        run = self._lookup(entry_key)
+        if run is not None:
+            if run.fingerprint != fingerprint:
+                raise IdempotencyKeyReusedError(
+                    "Idempotency-Key was already used for a different request"
+                )
+            record_cache("chat_idempotency", hit=True)
+            return self._follow(entry_key, run), True
+
+        record_cache("chat_idempotency", hit=False)
+        run = _Run(fingerprint)
+        self._active[entry_key] = run
+        run.task = asyncio.create_task(self._produce(entry_key, run, source()))
+        return self._follow(entry_key, run), False
+
+    def _lookup(self, entry_key: tuple[str, str]) -> _Run | None:
+        run = self._active.get(entry_key)
+        if run is not None:
+            return run
+        run = self._completed.get(entry_key)
+        if run is not None and time.monotonic() - run.finished_at > self.ttl:
+            del self._completed[entry_key]
+            return None
+        return run
+
+    async def _produce(
+        self, entry_key: tuple[str, str], run: _Run, source: AsyncGenerator[str, None]
+    ) -> None:
+        try:
+            async with contextlib.aclosing(source) as chunks:
+                async for chunk in chunks:
+                    run.chunks.append(chunk)
+                    run.notify()
+        except asyncio.CancelledError:
+            run.error = RuntimeError("Request was cancelled")
+            raise
+        except Exception as e:
+            run.error = e
+        finally:
+            run.done = True
+            run.finished_at = time.monotonic()
+            if self._active.get(entry_key) is run:
+                del self._active[entry_key]
+            if run.error is None:
+                self._completed[entry_key] = run
+                while len(self._completed) > self.max_entries:
+                    self._completed.popitem(last=False)
+            run.notify()
+
+    async def _follow(self, entry_key: tuple[str, str], run: _Run) -> AsyncGenerator[str, None]:
+        run.subscribers += 1
+        if run.orphan_timer is not None:
+            run.orphan_timer.cancel()
+            run.orphan_timer = None
+        sent = 0
+        try:
+            while True:
+                while sent < len(run.chunks):
+                    sent += 1
+                    yield run.chunks[sent - 1]
+                if run.done:
+                    break
+                await run.changed.wait()
+            if run.error is not None:
+                raise run.error
+        finally:
+            run.subscribers -= 1
+            if not run.subscribers and not run.done:
+                run.orphan_timer = asyncio.get_running_loop().call_later(
+                    self.orphan_grace, self._cancel_orphan, entry_key, run
+                )
+
+    def _cancel_orphan(self, entry_key: tuple[str, str], run: _Run) -> None:
+        run.orphan_timer = None
+        if run.subscribers or run.done or run.task is None:
+            return
+        self.logger.info("Idempotent chat request abandoned by all clients: %s", entry_key[1])
+        run.task.cancel()
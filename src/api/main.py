@@ -1,18 +1,29 @@
 """FastAPI приложение для API статистики."""
 
-from fastapi import FastAPI, Query
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any, Literal
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 import logging
 
 from src.api.mock_stats import MockStatCollector
-from src.api.models import Period, StatsResponse
+from src.api.models import Period, SearchHit, SearchResponse, StatsResponse
 from src.api.stats import StatCollector
-from src.api import chat
+from src.api.stats_stream import StatsBroadcaster
+from src.api import auth, chat
 from src.api.chat_service import ChatService
 from src.api.real_stats import RealStatCollector
+from src.api.sse import PING_FRAME, sse_frame
+from src.archive import MessageArchive
 from src.database import DatabaseManager
 from src.llm_client import LLMClient
-from src.logger import setup_logger
+from src.metrics import CONTENT_TYPE, REGISTRY
+from src.search import search_messages
+from src.tracing import configure_tracing, get_recent_traces, shutdown_tracing
+from src.logger import setup_logger_from_config, stop_logging
 from src.config import Config
 
 # Создание FastAPI приложения
@@ -37,24 +48,38 @@ app.add_middleware(
 _logger: logging.Logger | None = None
 _db_manager: DatabaseManager | None = None
 _llm_client: LLMClient | None = None
+_chat_service: ChatService | None = None
+_stats_broadcaster: StatsBroadcaster | None = None
+_shutdown_timeout: float = Config.shutdown_timeout
+
+# Комментарий-пинг в SSE: прокси не закрывают простаивающее соединение
+SSE_PING_SECONDS = 15.0
 
 
 @app.on_event("startup")
 async def startup_event() -> None:
     """Initialize services on startup."""
-    global _logger, _db_manager, _llm_client
+    global _logger, _db_manager, _llm_client, _chat_service, _stats_broadcaster, _shutdown_timeout
 
     try:
         # Load config
         config = Config.from_env()
 
         # Setup logger
-        _logger = setup_logger(config.log_file_path, config.log_level)
+        _logger = setup_logger_from_config(config)
+        configure_tracing(config.trace_exporter, config.trace_file, config.trace_buffer_size)
         _logger.info("Initializing API services...")
+        _shutdown_timeout = config.shutdown_timeout
+        auth.set_admin_token(config.api_admin_token)
 
         # Initialize database
-        _db_manager = DatabaseManager(database_url=config.database_url, logger=_logger)
+        _db_manager = DatabaseManager(
+            database_url=config.database_url,
+            logger=_logger,
+            read_database_url=config.database_read_url,
+        )
         await _db_manager.init_db()
+        _stats_broadcaster = StatsBroadcaster(get_stat_collector, _db_manager, logger=_logger)
 
         # Load system prompt
         try:
@@ -73,31 +98,78 @@ async def startup_event() -> None:
         )
 
         # Initialize ChatService
-        chat_service = ChatService(
+        _chat_service = ChatService(
             llm_client=_llm_client,
             db_manager=_db_manager,
             logger=_logger,
             request_timeout=90.0,  # Increased from 60s to 90s for complex queries
             text2sql_timeout=30.0,  # Increased from 5s to 30s for SQL generation
+            archive=MessageArchive(config.archive_dir, config.archive_compression or None),
         )
 
         # Register chat service
-        chat.set_chat_service(chat_service, _logger)
+        chat.set_chat_service(_chat_service, _logger)
+        REGISTRY.register_stats(
+            "chat_service",
+            "Web chat service",
+            lambda: {
+                "in_flight": _chat_service.in_flight.active,
+                "text2sql_cache_size": len(_chat_service.text2sql.cache),
+                "idempotency_cache_size": len(chat._idempotent_streams),
+            },
+        )
+        REGISTRY.register_stats(
+            "stats_stream",
+            "Dashboard SSE subscribers",
+            lambda: {"subscribers": _stats_broadcaster.subscriber_count},
+        )
 
         _logger.info("API services initialized successfully")
     except Exception as e:
         if _logger:
-            _logger.error(f"Failed to initialize services: {e}", exc_info=True)
+            _logger.error("Failed to initialize services: %s", e, exc_info=True)
         raise
 
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
-    """Cleanup on shutdown."""
+    """Drain in-flight chat messages, then close database connections."""
+    if _chat_service:
+        # Ответы LLM и их запись в БД завершаются до закрытия пула
+        await _chat_service.shutdown(_shutdown_timeout)
+    if _stats_broadcaster:
+        await _stats_broadcaster.close()
     if _db_manager:
         await _db_manager.close()
+    shutdown_tracing()
     if _logger:
         _logger.info("API services shutdown complete")
+    stop_logging()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Метрики процесса API в текстовом формате Prometheus."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get(
+    "/debug/traces", include_in_schema=False, dependencies=[Depends(auth.require_admin)]
+)
+async def debug_traces(
+    limit: int = Query(20, ge=1, le=200, description="Количество последних трасс"),
+    trace_id: str | None = Query(None, description="Показать только эту трассу"),
+) -> list[dict[str, Any]]:
+    """
+    Последние трассы из кольцевого буфера (TRACE_EXPORTER=memory).
+
+    Атрибуты спанов содержат ID сессий, тексты ошибок и SQL, поэтому
+    эндпоинт доступен только с токеном администратора.
+    """
+    traces = get_recent_traces(limit, trace_id)
+    if traces is None:
+        raise HTTPException(status_code=404, detail="In-memory trace exporter is disabled")
+    return traces
 
 
 # Dependency Injection для StatCollector
@@ -128,5 +200,94 @@ async def get_stats(
     collector = get_stat_collector()
     return await collector.get_stats(period)
 
+
+@app.get("/stats/stream")
+async def stats_stream(
+    request: Request,
+    period: Period = Query(Period.WEEK, description="Период для статистики"),
+) -> StreamingResponse:
+    """
+    Живые обновления статистики (SSE) вместо периодического опроса /stats.
+
+    Первое событие - snapshot (полный StatsResponse), далее delta только
+    с изменившимися частями: summary - изменившиеся поля, activity_timeline -
+    новые и изменившиеся точки (заменяются по date), top_users и
+    recent_dialogs - списки целиком. Расчет общий для всех подписчиков
+    периода, поэтому нагрузка не зависит от числа открытых дашбордов.
+
+    Example:
+        GET /stats/stream?period=week
+        event: snapshot
+        data: {"summary": {...}, "activity_timeline": [...], ...}
+    """
+    if _stats_broadcaster is None:
+        raise HTTPException(status_code=503, detail="Stats stream is not initialized")
+    broadcaster = _stats_broadcaster
+
+    async def generate() -> AsyncIterator[bytes]:
+        async with broadcaster.subscribe(period) as events:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(events.get(), SSE_PING_SECONDS)
+                except TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield PING_FRAME
+                    continue
+                yield sse_frame(data, event)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@app.get(
+    "/api/search", response_model=SearchResponse, dependencies=[Depends(auth.require_admin)]
+)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Слова для поиска"),
+    table: Literal["messages", "chat_messages"] = Query(
+        "messages", description="messages (бот) или chat_messages (веб-чат)"
+    ),
+    user_id: int | None = Query(None, description="Только сообщения пользователя"),
+    limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    offset: int = Query(0, ge=0, description="Смещение от начала"),
+) -> SearchResponse:
+    """
+    Полнотекстовый поиск по истории сообщений.
+
+    Все слова запроса должны встретиться в сообщении; слово с * на конце
+    ищется как префикс. Результаты упорядочены по релевантности.
+    Доступен только администратору: заголовок Authorization: Bearer
+    <API_ADMIN_TOKEN>.
+
+    Example:
+        GET /api/search?q=погода&user_id=123456&limit=20&offset=0
+        Authorization: Bearer <API_ADMIN_TOKEN>
+    """
+    if _db_manager is None:
+        raise HTTPException(status_code=503, detail="Database is not initialized")
+    try:
+        page = await search_messages(_db_manager, q, table, user_id, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from None
+    items = [
+        SearchHit(**{**row, "id": str(row["id"]), "created_at": row["created_at"].isoformat()})
+        for row in page.items
+    ]
+    return SearchResponse(
+        items=items,
+        total=page.total,
+        offset=offset,
+        limit=limit,
+        hasMore=offset + len(items) < page.total,
+    )
+
 # Подключение chat endpoints
 app.include_router(chat.router)
@@ -166,3 +166,25 @@ class PaginatedResponse(BaseModel):
     offset: int = Field(..., description="Текущее смещение")
     limit: int = Field(..., description="Использованный лимит")
     hasMore: bool = Field(..., description="Есть ли еще элементы")
+
+
+class SearchHit(BaseModel):
+    """Найденное сообщение."""
+
+    id: str = Field(..., description="ID сообщения (messages.id или chat_messages.id)")
+    user_id: int | None = Field(None, description="Telegram ID пользователя")
+    session_id: str | None = Field(None, description="ID сессии веб-чата (chat_messages)")
+    role: MessageRole = Field(..., description="Роль отправителя")
+    created_at: str = Field(..., description="Дата создания (ISO формат)")
+    snippet: str = Field(..., description="Фрагмент текста (HTML, совпадения в <mark>)")
+    score: float = Field(..., description="Релевантность: больше - лучше")
+
+
+class SearchResponse(BaseModel):
+    """Страница результатов полнотекстового поиска."""
+
+    items: list[SearchHit] = Field(..., description="Сообщения по убыванию релевантности")
+    total: int = Field(..., description="Всего найдено")
+    offset: int = Field(..., description="Текущее смещение")
+    limit: int = Field(..., description="Использованный лимит")
+    hasMore: bool = Field(..., description="Есть ли еще элементы")
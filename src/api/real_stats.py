@@ -14,7 +14,7 @@ from src.api.models import (
 )
 from src.api.stats import StatCollector
 from src.models import User, Message
-from src.database import DatabaseManager
+from src.database import DatabaseManager, db_operation
 
 
 class RealStatCollector(StatCollector):
@@ -33,12 +33,16 @@ class RealStatCollector(StatCollector):
         """Получить статистику за период из БД."""
         days = self._get_days_for_period(period)
 
-        session = self.db_manager.create_session()
+        session = self.db_manager.create_read_session()
         try:
-            summary = await self._get_summary_stats(session, days)
-            timeline = await self._get_timeline_stats(session, days)
-            top_users = await self._get_top_users(session)
-            recent_dialogs = await self._get_recent_dialogs(session)
+            with db_operation("stats_summary"):
+                summary = await self._get_summary_stats(session, days)
+            with db_operation("stats_timeline"):
+                timeline = await self._get_timeline_stats(session, days)
+            with db_operation("stats_top_users"):
+                top_users = await self._get_top_users(session)
+            with db_operation("stats_recent_dialogs"):
+                recent_dialogs = await self._get_recent_dialogs(session)
 
             return StatsResponse(
                 summary=summary,
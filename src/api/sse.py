@@ -0,0 +1,126 @@
+"""Server-Sent Events: кадры, закодированные в bytes, и отмена потока при отключении клиента."""
+
+import asyncio
+import contextlib
+import json
+from collections.abc import AsyncGenerator, AsyncIterator
+from typing import Any, NamedTuple, TypeVar
+
+from starlette.requests import Request
+
+try:
+    import orjson
+except ImportError:  # orjson - опциональная зависимость (extra "speedups")
+    orjson = None  # type: ignore[assignment, unused-ignore]
+
+DONE_FRAME = b"data: [DONE]\n\n"
+PING_FRAME = b": ping\n\n"
+
+# Как часто проверять отключение клиента, пока источник ничего не выдает, секунды
+DISCONNECT_POLL_SECONDS = 0.5
+
+T = TypeVar("T")
+_END = object()
+
+
+class _Raised(NamedTuple):
+    """Исключение источника, переданное через буфер потребителю."""
+
+    error: Exception
+
+
+def _dumps(data: Any) -> bytes:
+    """JSON в UTF-8 одной строкой: orjson, если установлен, иначе json."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # Одиночные суррогаты и нестандартные типы: json справится с экранированием
+            pass
+    return json.dumps(data, ensure_ascii=False).encode("utf-8", "backslashreplace")
+
+
+def sse_frame(data: Any, event: str | None = None) -> bytes:
+    """
+    Кадр SSE с JSON в поле data.
+
+    Перевод строки внутри JSON всегда экранирован, поэтому кадр - одна
+    строка data. StreamingResponse отдает bytes без повторного кодирования.
+
+    Args:
+        data: Данные события (сериализуемые в JSON)
+        event: Имя события (None - событие по умолчанию, message)
+
+    Returns:
+        bytes: Кадр, завершенный пустой строкой
+    """
+    if event is None:
+        return b"data: " + _dumps(data) + b"\n\n"
+    return b"event: " + event.encode() + b"\ndata: " + _dumps(data) + b"\n\n"
+
+
+async def cancel_on_disconnect(
+    request: Request,
+    source: AsyncGenerator[T, None],
+    poll_interval: float = DISCONNECT_POLL_SECONDS,
+) -> AsyncIterator[T]:
+    """
+    Выдавать элементы source, пока клиент не отключился.
+
+    source работает в отдельной задаче. Если клиент закрыл соединение,
+    пока источник ждет LLM или БД, задача отменяется: ожидание прерывается
+    сразу, а не после следующей записи в сокет. Если закрыт сам этот
+    генератор (Starlette отменяет ответ при отключении), задача тоже
+    отменяется. Исключение источника передается потребителю.
+
+    Источник не забегает вперед: следующий элемент у него запрашивается,
+    только когда потребитель попросил следующий. Поэтому при отмене
+    источник стоит на последнем выданном потребителю элементе, а все
+    предыдущие потребитель уже обработал (StreamingResponse - отправил).
+
+    Args:
+        request: Запрос, соединение которого проверяется
+        source: Асинхронный генератор с данными ответа
+        poll_interval: Период проверки отключения, секунды
+
+    Yields:
+        Элементы source
+    """
+    demand = asyncio.Event()
+    handoff: asyncio.Queue[Any] = asyncio.Queue(1)
+
+    async def pump() -> None:
+        try:
+            async with contextlib.aclosing(source) as items:
+                while True:
+                    await demand.wait()
+                    demand.clear()
+                    try:
+                        item = await anext(items)
+                    except StopAsyncIteration:
+                        break
+                    await handoff.put(item)
+        except Exception as e:
+            await handoff.put(_Raised(e))
+        else:
+            await handoff.put(_END)
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            demand.set()
+            while True:
+                try:
+                    item = await asyncio.wait_for(handoff.get(), poll_interval)
+                except TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    continue
+                break
+            if item is _END:
+                return
+            if isinstance(item, _Raised):
+                raise item.error
+            yield item
+    finally:
+        task.cancel()
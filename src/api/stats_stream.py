@@ -0,0 +1,193 @@
+"""Живые обновления статистики дашборда (SSE): общий расчет на всех подписчиков."""
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import func, select
+
+from src.api.models import Period
+from src.api.stats import StatCollector
+from src.change_notifier import ChangeNotifier, message_changes
+from src.database import DatabaseManager
+from src.models import Message
+
+# Событий в очереди подписчика; медленный клиент вместо очереди получит новый snapshot
+SUBSCRIBER_QUEUE_SIZE = 8
+
+
+def stats_delta(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
+    """
+    Разница между двумя снимками StatsResponse.
+
+    Returns:
+        dict[str, Any]: summary - только изменившиеся поля, activity_timeline -
+            новые и изменившиеся точки (по date), top_users и recent_dialogs -
+            списки целиком, если изменились. Пустой словарь - изменений нет.
+    """
+    delta: dict[str, Any] = {}
+    summary = {
+        key: value for key, value in new["summary"].items() if old["summary"].get(key) != value
+    }
+    if summary:
+        delta["summary"] = summary
+    old_points = {point["date"]: point for point in old["activity_timeline"]}
+    points = [point for point in new["activity_timeline"] if old_points.get(point["date"]) != point]
+    if points:
+        delta["activity_timeline"] = points
+    for key in ("top_users", "recent_dialogs"):
+        if old[key] != new[key]:
+            delta[key] = new[key]
+    return delta
+
+
+@dataclass
+class _Channel:
+    """Подписчики одного периода и их общий расчет."""
+
+    subscribers: set[asyncio.Queue[tuple[str, dict[str, Any]]]] = field(default_factory=set)
+    snapshot: dict[str, Any] | None = None
+    task: asyncio.Task[None] | None = None
+
+
+class StatsBroadcaster:
+    """
+    Рассылка статистики подписчикам SSE.
+
+    На каждый период работает одна фоновая задача: раз в tick секунд
+    она проверяет, были ли записи (ChangeNotifier этого процесса или
+    максимальный id в messages - запись бота из другого процесса), и
+    только тогда пересчитывает статистику - один раз для всех открытых
+    дашбордов. Подписчик получает snapshot, затем delta (stats_delta).
+    Скользящие окна периода сдвигаются и без записей, поэтому не реже
+    refresh_interval статистика пересчитывается в любом случае. Задача
+    периода останавливается, когда уходит последний подписчик.
+    """
+
+    def __init__(
+        self,
+        collector_factory: Callable[[], StatCollector],
+        db_manager: DatabaseManager | None = None,
+        notifier: ChangeNotifier = message_changes,
+        tick: float = 2.0,
+        refresh_interval: float = 60.0,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        Инициализация.
+
+        Args:
+            collector_factory: Фабрика сборщика статистики
+            db_manager: Менеджер БД для проверки новых сообщений из других
+                процессов (None - только уведомления этого процесса)
+            notifier: Уведомления о записи сообщений
+            tick: Период проверки изменений, секунды
+            refresh_interval: Пересчет без изменений не реже, секунды
+            logger: Логгер (опционально)
+        """
+        self.collector_factory = collector_factory
+        self.db_manager = db_manager
+        self.notifier = notifier
+        self.tick = tick
+        self.refresh_interval = refresh_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._channels: dict[Period, _Channel] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        """Открытых подписок по всем периодам."""
+        return sum(len(channel.subscribers) for channel in self._channels.values())
+
+    @contextlib.asynccontextmanager
+    async def subscribe(
+        self, period: Period
+    ) -> AsyncIterator[asyncio.Queue[tuple[str, dict[str, Any]]]]:
+        """
+        Подписаться на обновления периода.
+
+        Yields:
+            asyncio.Queue: События ("snapshot" | "delta", данные)
+        """
+        queue: asyncio.Queue[tuple[str, dict[str, Any]]] = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        channel = self._channels.setdefault(period, _Channel())
+        channel.subscribers.add(queue)
+        if channel.snapshot is not None:
+            queue.put_nowait(("snapshot", channel.snapshot))
+        if channel.task is None:
+            channel.task = asyncio.create_task(self._run(period, channel))
+        try:
+            yield queue
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers and self._channels.get(period) is channel:
+                del self._channels[period]
+                if channel.task is not None:
+                    channel.task.cancel()
+
+    async def close(self) -> None:
+        """Остановить все фоновые задачи."""
+        tasks = [channel.task for channel in self._channels.values() if channel.task]
+        self._channels.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _watermark(self) -> int | None:
+        """Максимальный id в messages: дешевая проверка новых сообщений по индексу PK."""
+        if self.db_manager is None:
+            return None
+        async with self.db_manager.get_read_session() as session:
+            return await session.scalar(select(func.max(Message.id)))
+
+    async def _compute(self, period: Period) -> dict[str, Any]:
+        stats = await self.collector_factory().get_stats(period)
+        return stats.model_dump(mode="json")
+
+    def _publish(self, channel: _Channel, event: str, data: dict[str, Any]) -> None:
+        for queue in channel.subscribers:
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # Клиент не успевает читать: отбрасываем накопленное и шлем полный снимок
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("snapshot", channel.snapshot or data))
+
+    async def _run(self, period: Period, channel: _Channel) -> None:
+        version, watermark, computed_at = self.notifier.version, None, 0.0
+        while True:
+            if channel.snapshot is not None:
+                await self.notifier.wait(version, self.tick)
+                # Не чаще одного расчета за tick, даже при непрерывной записи
+                await asyncio.sleep(max(0.0, computed_at + self.tick - time.monotonic()))
+            new_version = self.notifier.version
+            try:
+                # Версию и watermark читаем до расчета: запись во время расчета
+                # попадет в следующий шаг
+                new_watermark = await self._watermark()
+                if (
+                    channel.snapshot is not None
+                    and new_version == version
+                    and new_watermark == watermark
+                    and time.monotonic() - computed_at < self.refresh_interval
+                ):
+                    continue
+                snapshot = await self._compute(period)
+            except Exception as e:
+                # Ошибка БД не рвет подписки: повторим на следующем шаге
+                self.logger.warning("Stats stream refresh failed for %s: %s", period.value, e)
+                await asyncio.sleep(self.tick)
+                continue
+            version, watermark, computed_at = new_version, new_watermark, time.monotonic()
+            if channel.snapshot is None:
+                channel.snapshot = snapshot
+                self._publish(channel, "snapshot", snapshot)
+                continue
+            delta = stats_delta(channel.snapshot, snapshot)
+            channel.snapshot = snapshot
+            if delta:
+                self._publish(channel, "delta", delta)
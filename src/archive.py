@@ -0,0 +1,257 @@
+"""Архив старых сообщений: помесячные сжатые JSONL-файлы и чтение из них."""
+
+import gzip
+import io
+import json
+import os
+import re
+from collections.abc import AsyncIterator, Iterable, Iterator, Mapping, Sequence
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Column, MetaData, Table, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import Base
+
+try:
+    import zstandard
+except ImportError:  # zstandard - опциональная зависимость (extra "archive")
+    zstandard = None  # type: ignore[assignment, unused-ignore]
+
+# Таблицы, которые можно архивировать, и поле, по которому строка относится к месяцу
+ARCHIVED_TABLES = ("messages", "chat_messages")
+_DATETIME_COLUMNS = ("created_at",)
+_MONTH_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+def month_of(value: datetime) -> str:
+    """Месяц архива (YYYY-MM) для момента времени."""
+    return value.strftime("%Y-%m")
+
+
+def _check_table(table: str) -> None:
+    if table not in ARCHIVED_TABLES:
+        raise ValueError(f"Table {table} is not archived")
+
+
+def _check_months(months: Iterable[str]) -> list[str]:
+    months = list(months)
+    for month in months:
+        if not _MONTH_PATTERN.match(month):
+            raise ValueError(f"Invalid archive month: {month!r}, expected YYYY-MM")
+    return months
+
+
+class MessageArchive:
+    """
+    Помесячный архив строк messages и chat_messages.
+
+    Каждая таблица хранится в своем каталоге, каждый месяц - в файле
+    <table>/<YYYY-MM>.jsonl.zst (или .jsonl.gz, если zstandard не
+    установлен). Запись дописывает в файл новый сжатый фрейм, поэтому
+    файлы не переписываются целиком. Если загрузка оборвалась после
+    записи в архив, но до удаления из БД, строка попадет в архив дважды:
+    чтение отбрасывает повторы по id.
+    """
+
+    def __init__(self, directory: str | Path, compression: str | None = None) -> None:
+        """
+        Инициализация архива.
+
+        Args:
+            directory: Каталог архива
+            compression: "zstd" или "gzip" (по умолчанию zstd, если установлен zstandard)
+
+        Raises:
+            ValueError: Если выбран zstd, а zstandard не установлен
+        """
+        compression = compression or ("zstd" if zstandard is not None else "gzip")
+        if compression not in ("zstd", "gzip"):
+            raise ValueError(f"Unknown archive compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        self.directory = Path(directory)
+        self.compression = compression
+
+    def _path(self, table: str, month: str) -> Path:
+        extension = "zst" if self.compression == "zstd" else "gz"
+        return self.directory / table / f"{month}.jsonl.{extension}"
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            compressed: bytes = zstandard.ZstdCompressor(level=10).compress(data)
+            return compressed
+        return gzip.compress(data, compresslevel=6)
+
+    def append(self, table: str, rows: Sequence[Mapping[str, Any]]) -> dict[str, int]:
+        """
+        Дописать строки в архив с разбивкой по месяцам created_at.
+
+        Файл синхронизируется с диском до возврата: после этого строки
+        можно удалять из БД.
+
+        Args:
+            table: Имя таблицы (messages или chat_messages)
+            rows: Строки таблицы (словари колонка -> значение)
+
+        Returns:
+            dict[str, int]: Количество записанных строк по месяцам
+        """
+        _check_table(table)
+        by_month: dict[str, list[str]] = {}
+        for row in rows:
+            line = json.dumps(
+                {
+                    key: value.isoformat() if isinstance(value, datetime) else value
+                    for key, value in row.items()
+                },
+                ensure_ascii=False,
+            )
+            by_month.setdefault(month_of(row["created_at"]), []).append(line)
+
+        for month, lines in by_month.items():
+            path = self._path(table, month)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "ab") as f:
+                f.write(self._compress(("\n".join(lines) + "\n").encode()))
+                f.flush()
+                os.fsync(f.fileno())
+        return {month: len(lines) for month, lines in by_month.items()}
+
+    def months(self, table: str) -> list[str]:
+        """Месяцы (YYYY-MM), за которые в архиве есть строки таблицы."""
+        _check_table(table)
+        folder = self.directory / table
+        if not folder.is_dir():
+            return []
+        return sorted({path.name.split(".", 1)[0] for path in folder.glob("*.jsonl.*")})
+
+    def _open(self, path: Path) -> io.TextIOBase:
+        if path.suffix == ".gz":
+            return gzip.open(path, "rt", encoding="utf-8")
+        if zstandard is None:
+            raise ValueError(f"Reading {path.name} requires the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            open(path, "rb"),  # noqa: SIM115 - закрывается вместе с reader
+            read_across_frames=True,
+            closefd=True,
+        )
+        return io.TextIOWrapper(reader, encoding="utf-8")
+
+    def read(self, table: str, months: Iterable[str] | None = None) -> Iterator[dict[str, Any]]:
+        """
+        Прочитать архивные строки таблицы.
+
+        Args:
+            table: Имя таблицы (messages или chat_messages)
+            months: Месяцы YYYY-MM (по умолчанию все)
+
+        Yields:
+            dict[str, Any]: Строка с created_at в виде datetime, по месяцам по возрастанию
+
+        Raises:
+            ValueError: Если месяц задан не в формате YYYY-MM
+        """
+        _check_table(table)
+        selected = self.months(table) if months is None else sorted(_check_months(months))
+        for month in selected:
+            seen: set[Any] = set()
+            for path in sorted((self.directory / table).glob(f"{month}.jsonl.*")):
+                with self._open(path) as f:
+                    for line in f:
+                        row = json.loads(line)
+                        if row["id"] in seen:
+                            continue
+                        seen.add(row["id"])
+                        for column in _DATETIME_COLUMNS:
+                            row[column] = datetime.fromisoformat(row[column])
+                        yield row
+
+
+@asynccontextmanager
+async def include_archived(
+    session: AsyncSession, archive: MessageArchive, months: Iterable[str], batch_size: int = 5000
+) -> AsyncIterator[int]:
+    """
+    Временно подмешать архивные месяцы к messages в рамках сессии.
+
+    Создает временную таблицу archived_messages с архивными строками и
+    временное представление messages (хранимые строки + архивные),
+    которое перекрывает основную таблицу для запросов этой сессии:
+    временные объекты ищутся раньше основных и в SQLite, и в PostgreSQL.
+    Запись разрешается только на время создания временных объектов:
+    внутри блока сессия работает только на чтение (PRAGMA query_only в
+    SQLite, SET TRANSACTION READ ONLY в PostgreSQL). По выходу
+    транзакция откатывается, временные объекты удаляются, а query_only
+    соединения возвращается в исходное значение.
+
+    Args:
+        session: Сессия чтения с правом на временные объекты
+            (DatabaseManager.get_temp_session), не сессия записи
+        archive: Архив сообщений
+        months: Месяцы YYYY-MM для подмешивания
+        batch_size: Строк в одной вставке во временную таблицу
+
+    Yields:
+        int: Количество подмешанных архивных строк
+    """
+    source = Base.metadata.tables["messages"]
+    archived = Table(
+        "archived_messages",
+        MetaData(),
+        *(Column(column.name, column.type) for column in source.columns),
+        prefixes=["TEMPORARY"],
+    )
+    # В SQLite представление разбирается при каждом запросе: без схемы
+    # messages внутри него ссылалось бы на само представление
+    is_sqlite = session.get_bind().dialect.name == "sqlite"
+    main = "main.messages" if is_sqlite else "messages"
+    temp = "temp" if is_sqlite else "pg_temp"
+    columns = ", ".join(column.name for column in source.columns)
+    # Соединение читателя SQLite открыто с query_only=ON: временные объекты - тоже запись
+    query_only = await session.scalar(text("PRAGMA query_only")) if is_sqlite else 0
+    loaded = 0
+    try:
+        if is_sqlite:
+            await session.execute(text("PRAGMA query_only=OFF"))
+        await session.run_sync(lambda sync_session: archived.create(sync_session.connection()))
+        batch: list[dict[str, Any]] = []
+        for row in archive.read("messages", months):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await session.execute(insert(archived), batch)
+                loaded += len(batch)
+                batch = []
+        if batch:
+            await session.execute(insert(archived), batch)
+            loaded += len(batch)
+        await session.execute(
+            text(
+                f"CREATE TEMPORARY VIEW messages AS SELECT {columns} FROM {main} "
+                f"UNION ALL SELECT {columns} FROM archived_messages"
+            )
+        )
+        # Запрос вызывающего кода выполняется только на чтение
+        await session.execute(
+            text("PRAGMA query_only=ON" if is_sqlite else "SET TRANSACTION READ ONLY")
+        )
+        yield loaded
+    finally:
+        try:
+            await session.rollback()
+            if is_sqlite:
+                await session.execute(text("PRAGMA query_only=OFF"))
+            # pysqlite выполняет DDL вне транзакции, поэтому откат не всегда
+            # удаляет временные объекты, а соединение вернется в пул
+            await session.execute(text(f"DROP VIEW IF EXISTS {temp}.messages"))
+            await session.execute(text(f"DROP TABLE IF EXISTS {temp}.archived_messages"))
+            await session.commit()
+            if is_sqlite:
+                await session.execute(text(f"PRAGMA query_only={'ON' if query_only else 'OFF'}"))
+        except BaseException:
+            # Соединение с неизвестным query_only и временными объектами в пул не вернется
+            await session.invalidate()
+            raise
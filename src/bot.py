@@ -1,21 +1,39 @@
 """Telegram бот на базе aiogram."""
 
+import asyncio
+import contextlib
 import logging
-from collections.abc import Awaitable, Callable
+import tempfile
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable
+from datetime import datetime, timedelta
 from functools import wraps
-from typing import TYPE_CHECKING, Optional
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
 
 from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ChatAction
 from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.types import FSInputFile, Message, TelegramObject, Update
 
-from src.messages import BotMessages
+from src.answer_delivery import AnswerSender
+from src.export import ExportFilter, export_filename, export_stream
 from src.llm_client import RateLimitExceededError
+from src.message_coalescer import MessageCoalescingMiddleware
+from src.messages import BotMessages
+from src.metrics import REGISTRY
+from src.send_scheduler import SendScheduler
+from src.shutdown import InFlightTracker
+from src.tracing import AttributeValue, tracer
+from src.user_profile_cache import UserProfileCache
+from src.user_update_queue import UserUpdateQueueMiddleware
 
 if TYPE_CHECKING:
+    from src.archive import MessageArchive
     from src.database import DatabaseManager
     from src.llm_client import LLMClient
+    from src.webhook_server import WebhookServer
 
 
 def log_command(
@@ -40,12 +58,40 @@ def log_command(
             user_id = message.from_user.id
             username = message.from_user.username or "unknown"
             command = message.text or func.__name__
-            self.logger.info(f"Command {command} from user_id={user_id}, username={username}")
+            self.logger.info("Command %s from user_id=%s, username=%s", command, user_id, username)
         await func(self, message)
 
     return wrapper
 
 
+def parse_export_args(text: str) -> tuple[ExportFilter, str]:
+    """
+    Разобрать аргументы команды /export.
+
+    Формат: /export <user_id> [с YYYY-MM-DD] [по YYYY-MM-DD] [csv|ndjson].
+    Дата окончания включается в выгрузку.
+
+    Args:
+        text: Текст команды
+
+    Returns:
+        tuple[ExportFilter, str]: Фильтр выгрузки и формат
+
+    Raises:
+        ValueError: Если аргументы не разобраны
+    """
+    args = text.split()[1:]
+    export_format = "ndjson"
+    if args and args[-1].lower() in ("csv", "ndjson"):
+        export_format = args.pop().lower()
+    if not 1 <= len(args) <= 3:
+        raise ValueError("Expected user_id and up to two dates")
+    dates = [datetime.strptime(value, "%Y-%m-%d") for value in args[1:]]
+    since = dates[0] if dates else None
+    until = dates[1] + timedelta(days=1) if len(dates) > 1 else None
+    return ExportFilter(user_id=int(args[0]), since=since, until=until), export_format
+
+
 class TelegramBot:
     """Telegram бот на базе aiogram."""
 
@@ -57,6 +103,15 @@ class TelegramBot:
         llm_client: Optional["LLMClient"] = None,
         bot_name: str = "AI Assistant",
         db_manager: Optional["DatabaseManager"] = None,
+        max_concurrent_updates: int = 100,
+        send_global_rate: float = 30.0,
+        send_chat_rate: float = 1.0,
+        typing_interval: float = 4.0,
+        coalesce_window: float = 0.0,
+        shutdown_timeout: float = 30.0,
+        api_url: str | None = None,
+        admin_user_ids: tuple[int, ...] = (),
+        archive: Optional["MessageArchive"] = None,
     ) -> None:
         """
         Инициализация бота.
@@ -68,14 +123,43 @@ class TelegramBot:
             llm_client: Клиент для работы с LLM (опционально)
             bot_name: Имя бота для отображения в сообщениях
             db_manager: Менеджер базы данных для сохранения пользователей
+            max_concurrent_updates: Максимум одновременно обрабатываемых обновлений
+            send_global_rate: Лимит исходящих сообщений в секунду на бота
+            send_chat_rate: Лимит исходящих сообщений в секунду на чат
+            typing_interval: Период обновления индикатора "печатает..." в секундах
+            coalesce_window: Пауза, после которой серия сообщений пользователя
+                отправляется в LLM одним запросом, в секундах (0 - без склейки)
+            shutdown_timeout: Сколько ждать обработки принятых обновлений при остановке
+            api_url: Адрес Bot API вместо api.telegram.org (локальный Bot API
+                сервер или заглушка для нагрузочных тестов)
+            admin_user_ids: Telegram ID с доступом к админ-командам (/export)
+            archive: Архив старых сообщений для выгрузок (опционально)
         """
         self.logger = logger
-        self.bot = Bot(token=token)
+        if api_url:
+            session = AiohttpSession(api=TelegramAPIServer.from_base(api_url))
+            self.bot = Bot(token=token, session=session)
+        else:
+            self.bot = Bot(token=token)
         self.dp = Dispatcher()
         self.system_prompt = system_prompt
         self.llm_client = llm_client
         self.bot_name = bot_name
         self.db_manager = db_manager
+        self.admin_user_ids = frozenset(admin_user_ids)
+        self.archive = archive
+        self._user_profile_cache = UserProfileCache()
+        self.coalescer = MessageCoalescingMiddleware(
+            window=coalesce_window, db_manager=db_manager, bot_id=self.bot.id, logger=logger
+        )
+        self.update_queue = UserUpdateQueueMiddleware(max_in_flight=max_concurrent_updates)
+        self.send_scheduler = SendScheduler(
+            logger, global_rate=send_global_rate, chat_rate=send_chat_rate
+        )
+        self.typing_interval = typing_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.in_flight = InFlightTracker()
+        self._register_metrics()
 
         # Регистрируем обработчики
         self._register_handlers()
@@ -85,36 +169,158 @@ class TelegramBot:
         else:
             self.logger.info("TelegramBot initialized without LLM (echo mode)")
 
+    def _register_metrics(self) -> None:
+        """Экспортировать статистику очередей и кешей в /metrics."""
+        REGISTRY.register_stats(
+            "bot_update_queue", "Per-user update queue", self.update_queue.get_stats
+        )
+        REGISTRY.register_stats(
+            "telegram_send", "Outbound Telegram send queue", self.send_scheduler.get_stats
+        )
+        REGISTRY.register_stats(
+            "bot_coalescer", "Update deduplication and message coalescing", self.coalescer.get_stats
+        )
+        REGISTRY.register_stats(
+            "bot",
+            "Bot handlers and caches",
+            lambda: {
+                "handlers_active": self.in_flight.active,
+                "user_profile_cache_size": len(self._user_profile_cache),
+            },
+        )
+
     def _register_handlers(self) -> None:
         """Регистрирует обработчики команд и сообщений."""
+        # Учет обработки для дренажа при остановке
+        self.dp.update.outer_middleware(self._track_update)
+        # Повторы отбрасываются и серии сообщений склеиваются до очереди пользователя
+        self.dp.update.outer_middleware(self.coalescer)
+        # Параллельно между пользователями, по порядку внутри пользователя
+        self.dp.update.outer_middleware(self.update_queue)
         self.dp.message.register(self.cmd_start, Command("start"))
         self.dp.message.register(self.cmd_help, Command("help"))
         self.dp.message.register(self.cmd_status, Command("status"))
         self.dp.message.register(self.cmd_reset, Command("reset"))
         self.dp.message.register(self.cmd_role, Command("role"))
+        self.dp.message.register(self.cmd_export, Command("export"))
         self.dp.message.register(self.handle_message, F.text)
 
+    async def _track_update(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        """
+        Обработать обновление внутри спана bot.update с учетом в in_flight.
+
+        Во время остановки обновление отбрасывается.
+        """
+        if self.in_flight.closing:
+            self.logger.warning("Dropping update: bot is shutting down")
+            return None
+        attributes: dict[str, AttributeValue] = {}
+        if isinstance(event, Update):
+            attributes["telegram.update_id"] = event.update_id
+        if (user := data.get("event_from_user")) is not None:
+            attributes["telegram.user_id"] = user.id
+        async with self.in_flight.track():
+            with tracer.start_as_current_span("bot.update", attributes):
+                return await handler(event, data)
+
     async def _save_user_data(self, message: Message) -> None:
         """
         Сохраняет или обновляет данные пользователя в БД.
 
+        Запись пропускается, если профиль не изменился с последнего сохранения.
+
         Args:
             message: Сообщение от пользователя
         """
         if not message.from_user or not self.db_manager:
             return
 
+        user = message.from_user
+        profile = (user.username, user.first_name, user.last_name, user.language_code)
+        # Профиль не менялся с последнего сохранения - в БД не идем
+        if self._user_profile_cache.is_unchanged(user.id, profile):
+            return
+
         try:
             await self.db_manager.upsert_user(
-                telegram_id=message.from_user.id,
-                username=message.from_user.username,
-                first_name=message.from_user.first_name,
-                last_name=message.from_user.last_name,
-                language_code=message.from_user.language_code,
+                telegram_id=user.id,
+                username=user.username,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                language_code=user.language_code,
             )
+            self._user_profile_cache.remember(user.id, profile)
         except Exception as e:
             # Логируем ошибку, но не прерываем выполнение
-            self.logger.error(f"Failed to save user data: {e}", exc_info=True)
+            self.logger.error("Failed to save user data: %s", e, exc_info=True)
+
+    async def _answer(self, message: Message, text: str) -> None:
+        """
+        Ответить в чат через очередь отправки с учетом лимитов Telegram.
+
+        Args:
+            message: Сообщение, на которое отвечаем
+            text: Текст ответа
+        """
+        await self.send_scheduler.send_message(message.chat.id, lambda: message.answer(text))
+
+    @contextlib.asynccontextmanager
+    async def _keep_typing(self, chat_id: int) -> AsyncIterator[None]:
+        """
+        Показывать индикатор "печатает..." все время выполнения блока.
+
+        Telegram сбрасывает индикатор примерно через 5 секунд, поэтому он
+        обновляется каждые typing_interval секунд, пока блок не завершится
+        (успешно, с ошибкой или отменой).
+
+        Args:
+            chat_id: ID чата
+        """
+
+        def post_typing() -> None:
+            self.send_scheduler.post_chat_action(
+                chat_id,
+                lambda: self.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING),
+            )
+
+        async def refresh() -> None:
+            while True:
+                await asyncio.sleep(self.typing_interval)
+                post_typing()
+
+        post_typing()
+        keepalive = asyncio.create_task(refresh())
+        try:
+            yield
+        finally:
+            keepalive.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await keepalive
+
+    async def _send_answer(self, message: Message, answer: str | AsyncIterable[str]) -> None:
+        """
+        Отправить ответ LLM, разбив его на части по лимиту Telegram (4096 символов).
+
+        Части отправляются по порядку; при потоке фрагментов первая часть
+        уходит, как только набрана.
+
+        Args:
+            message: Сообщение, на которое отвечаем
+            answer: Текст ответа или асинхронный поток его фрагментов
+        """
+        sender = AnswerSender(lambda part: self._answer(message, part))
+        parts = await sender.send_all(answer)
+        if parts > 1:
+            self.logger.info(
+                "Long answer split into %s messages for chat_id=%s",
+                parts,
+                message.chat.id,
+            )
 
     @log_command
     async def cmd_start(self, message: Message) -> None:
@@ -128,7 +334,7 @@ class TelegramBot:
             return
         await self._save_user_data(message)
         username = message.from_user.username or "user"
-        await message.answer(BotMessages.welcome(username, self.bot_name))
+        await self._answer(message, BotMessages.welcome(username, self.bot_name))
 
     @log_command
     async def cmd_help(self, message: Message) -> None:
@@ -140,7 +346,7 @@ class TelegramBot:
         """
         if not message.from_user:
             return
-        await message.answer(BotMessages.help_text())
+        await self._answer(message, BotMessages.help_text())
 
     @log_command
     async def cmd_status(self, message: Message) -> None:
@@ -152,7 +358,7 @@ class TelegramBot:
         """
         if not message.from_user:
             return
-        await message.answer(BotMessages.status())
+        await self._answer(message, BotMessages.status())
 
     @log_command
     async def cmd_reset(self, message: Message) -> None:
@@ -170,9 +376,9 @@ class TelegramBot:
 
         if self.llm_client:
             await self.llm_client.reset_context(user_id)
-            await message.answer(BotMessages.context_reset_success())
+            await self._answer(message, BotMessages.context_reset_success())
         else:
-            await message.answer(BotMessages.llm_not_connected())
+            await self._answer(message, BotMessages.llm_not_connected())
 
     @log_command
     async def cmd_role(self, message: Message) -> None:
@@ -186,7 +392,50 @@ class TelegramBot:
         """
         if not message.from_user:
             return
-        await message.answer(BotMessages.role(self.system_prompt))
+        await self._answer(message, BotMessages.role(self.system_prompt))
+
+    @log_command
+    async def cmd_export(self, message: Message) -> None:
+        """
+        Обработчик команды /export (только для администраторов).
+
+        Выгружает сообщения пользователя за период в сжатый файл и
+        отправляет его документом. Выгрузка пишется во временный файл
+        потоком, поэтому история не загружается в память целиком.
+
+        Args:
+            message: Входящее сообщение от пользователя
+        """
+        if not message.from_user:
+            return
+        if message.from_user.id not in self.admin_user_ids:
+            await self._answer(message, BotMessages.admin_only())
+            return
+        if not self.db_manager:
+            await self._answer(message, BotMessages.export_unavailable())
+            return
+        try:
+            export_filter, export_format = parse_export_args(message.text or "")
+        except ValueError:
+            await self._answer(message, BotMessages.export_usage())
+            return
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / export_filename("messages", export_format, True)
+            with open(path, "wb") as f:
+                async for chunk in export_stream(
+                    self.db_manager, "messages", export_filter, export_format, True, self.archive
+                ):
+                    f.write(chunk)
+            self.logger.info(
+                "Exported messages of user_id=%s, %s bytes",
+                export_filter.user_id,
+                path.stat().st_size,
+            )
+            document = FSInputFile(path)
+            await self.send_scheduler.send_message(
+                message.chat.id, lambda: message.answer_document(document)
+            )
 
     async def handle_message(self, message: Message) -> None:
         """
@@ -200,60 +449,136 @@ class TelegramBot:
         """
         if not message.from_user:
             return
+        # Серия коротких сообщений уходит в LLM одним запросом
+        coalesced = await self.coalescer.collect(message)
+        if coalesced is None:
+            return
         await self._save_user_data(message)
         user_id = message.from_user.id
-        text = message.text or ""
+        text = coalesced
         text_length = len(text)
 
         # Edge case: пустое или очень короткое сообщение
         if text_length < 1:
-            await message.answer(BotMessages.empty_message())
+            await self._answer(message, BotMessages.empty_message())
             return
 
         # Edge case: очень длинное сообщение (больше 4000 символов)
         if text_length > 4000:
-            self.logger.warning(f"Message too long from user_id={user_id}, length={text_length}")
-            await message.answer(BotMessages.message_too_long())
+            self.logger.warning("Message too long from user_id=%s, length=%s", user_id, text_length)
+            await self._answer(message, BotMessages.message_too_long())
             return
 
         text_preview = text[:200]
 
         self.logger.info(
-            f"Message from user_id={user_id}, length={text_length}, text: {text_preview}..."
+            "Message from user_id=%s, length=%s, text: %s...",
+            user_id,
+            text_length,
+            text_preview,
         )
 
-        # Показываем индикатор "печатает..."
-        await self.bot.send_chat_action(chat_id=message.chat.id, action=ChatAction.TYPING)
-
         try:
             if self.llm_client:
-                # Получаем ответ от LLM с учетом контекста
-                response = await self.llm_client.get_response_with_context(
-                    user_id=user_id, user_message=text
-                )
-                self.logger.info(f"Sent LLM response to user_id={user_id}")
+                # Получаем ответ от LLM с учетом контекста, пока виден "печатает..."
+                async with self._keep_typing(message.chat.id):
+                    response = await self.llm_client.get_response_with_context(
+                        user_id=user_id, user_message=text
+                    )
+                self.logger.info("Sent LLM response to user_id=%s", user_id)
             else:
                 # Fallback на echo если LLM не настроен
                 response = BotMessages.echo(text)
-                self.logger.info(f"Sent echo response to user_id={user_id}")
+                self.logger.info("Sent echo response to user_id=%s", user_id)
 
-            await message.answer(response)
+            await self._send_answer(message, response)
 
         except RateLimitExceededError as e:
-            self.logger.warning(f"Rate limit exceeded for user_id={user_id}: {e}")
-            await message.answer(BotMessages.rate_limit_error())
+            self.logger.warning("Rate limit exceeded for user_id=%s: %s", user_id, e)
+            await self._answer(message, BotMessages.rate_limit_error())
         except Exception as e:
             # Обработка ошибок с дружественным сообщением
-            self.logger.error(f"Error processing message: {e}", exc_info=True)
-            await message.answer(BotMessages.processing_error())
+            self.logger.error("Error processing message: %s", e, exc_info=True)
+            await self._answer(message, BotMessages.processing_error())
+
+    def get_send_queue_stats(self) -> dict[str, float]:
+        """
+        Метрики очереди исходящих сообщений.
+
+        Returns:
+            dict: Счетчики и задержки SendScheduler.get_stats()
+        """
+        return self.send_scheduler.get_stats()
+
+    def get_coalescing_stats(self) -> dict[str, int]:
+        """
+        Статистика дедупликации и склейки входящих сообщений.
+
+        Returns:
+            dict: Счетчики MessageCoalescingMiddleware.get_stats()
+        """
+        return self.coalescer.get_stats()
+
+    def get_update_queue_stats(self) -> dict[str, int]:
+        """
+        Статистика очередей обработки обновлений.
+
+        Returns:
+            dict: Счетчики UserUpdateQueueMiddleware.get_stats()
+        """
+        return self.update_queue.get_stats()
+
+    async def shutdown(self) -> bool:
+        """
+        Корректная остановка: дождаться принятых обновлений и закрыть ресурсы.
+
+        Новые обновления отбрасываются, уже начатые обработчики (ответ LLM,
+        сохранение контекста, отправка ответа) получают до shutdown_timeout
+        секунд. После этого закрываются очередь отправки и сессия Bot API.
+
+        Returns:
+            bool: True, если все обновления обработаны до таймаута
+        """
+        self.logger.info(
+            "Shutting down: waiting for %s in-flight updates (timeout %.0fs)",
+            self.in_flight.active,
+            self.shutdown_timeout,
+        )
+        drained = await self.in_flight.drain(self.shutdown_timeout)
+        if not drained:
+            self.logger.warning(
+                "%s updates still running after %.0fs, they will be cancelled",
+                self.in_flight.active,
+                self.shutdown_timeout,
+            )
+        await self.send_scheduler.close()
+        await self.bot.session.close()
+        return drained
 
     async def start(self) -> None:
-        """Запуск бота в режиме polling."""
+        """Запуск бота в режиме polling (SIGINT/SIGTERM останавливают с дренажом)."""
         self.logger.info("Starting bot in polling mode...")
         try:
-            await self.dp.start_polling(self.bot)
+            # Сессию закрывает shutdown() после отправки ответов
+            await self.dp.start_polling(self.bot, close_bot_session=False)
+        except Exception as e:
+            self.logger.error("Bot error: %s", e, exc_info=True)
+            raise
+        finally:
+            await self.shutdown()
+
+    async def start_webhook(self, server: "WebhookServer") -> None:
+        """
+        Запуск бота в режиме webhook.
+
+        Args:
+            server: Webhook-приемник, созданный для self.dp и self.bot
+        """
+        self.logger.info("Starting bot in webhook mode...")
+        try:
+            await server.run_forever()
         except Exception as e:
-            self.logger.error(f"Bot error: {e}", exc_info=True)
+            self.logger.error("Bot error: %s", e, exc_info=True)
             raise
         finally:
-            await self.bot.session.close()
+            await self.shutdown()
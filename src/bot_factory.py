@@ -0,0 +1,92 @@
+"""Сборка Telegram бота с хранилищем контекста и LLM клиентом."""
+
+import logging
+
+from src.archive import MessageArchive
+from src.bot import TelegramBot
+from src.config import Config, ConfigError
+from src.context_storage import DatabaseContextStorage
+from src.database import DatabaseManager
+from src.llm_client import LLMClient
+
+
+def create_bot(
+    config: Config,
+    logger: logging.Logger,
+    system_prompt: str,
+    db_manager: DatabaseManager,
+) -> TelegramBot:
+    """
+    Создать бота с хранилищем контекста в БД и LLM клиентом.
+
+    Если LLM клиент не удалось создать, бот работает в echo режиме.
+
+    Args:
+        config: Конфигурация приложения
+        logger: Логгер для событий
+        system_prompt: Системный промпт
+        db_manager: Менеджер БД (схема уже инициализирована)
+
+    Returns:
+        TelegramBot: Готовый к запуску бот
+    """
+    # Создаем хранилище контекста: сессии открываются на каждую операцию
+    context_storage = DatabaseContextStorage(
+        db_manager=db_manager,
+        max_messages=config.max_context_messages,
+        logger=logger,
+    )
+
+    # Создаем LLM клиент
+    try:
+        llm_client = LLMClient(
+            api_key=config.openrouter_api_key,
+            model=config.openrouter_model,
+            base_url=config.openrouter_base_url,
+            system_prompt=system_prompt,
+            logger=logger,
+            context_storage=context_storage,
+        )
+        logger.info("LLM client initialized successfully")
+    except Exception as e:
+        logger.error("Failed to initialize LLMClient: %s", e, exc_info=True)
+        logger.warning("Bot will run in echo mode without LLM")
+        llm_client = None
+
+    return TelegramBot(
+        token=config.telegram_token,
+        logger=logger,
+        system_prompt=system_prompt,
+        llm_client=llm_client,
+        bot_name=config.bot_name,
+        db_manager=db_manager,
+        max_concurrent_updates=config.max_concurrent_updates,
+        send_global_rate=config.telegram_global_rate,
+        send_chat_rate=config.telegram_chat_rate,
+        coalesce_window=config.message_coalesce_window,
+        shutdown_timeout=config.shutdown_timeout,
+        api_url=config.telegram_api_url,
+        admin_user_ids=config.admin_user_ids,
+        archive=MessageArchive(config.archive_dir, config.archive_compression or None),
+    )
+
+
+def load_system_prompt(config: Config, logger: logging.Logger) -> str:
+    """
+    Загрузить системный промпт из файла с откатом на промпт из конфигурации.
+
+    Args:
+        config: Конфигурация приложения
+        logger: Логгер для событий
+
+    Returns:
+        str: Системный промпт
+    """
+    try:
+        system_prompt = config.load_system_prompt()
+        logger.info("Loaded system prompt from %s", config.system_prompt_file)
+        return system_prompt
+    except ConfigError as e:
+        logger.error("Failed to load system prompt: %s", e)
+        logger.warning("Using default system prompt from config")
+        return config.system_prompt
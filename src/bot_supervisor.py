@@ -0,0 +1,461 @@
+"""Супервизор: распределение обновлений бота по рабочим процессам."""
+
+import asyncio
+import dataclasses
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from multiprocessing.context import SpawnProcess
+from multiprocessing.queues import Queue
+from multiprocessing.sharedctypes import Synchronized
+from pathlib import Path
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import TelegramObject, Update
+
+from src.config import Config
+from src.database import DatabaseManager
+from src.logger import setup_logger_from_config, stop_logging
+from src.metrics import REGISTRY
+from src.metrics_server import MetricsServer
+from src.tracing import configure_tracing, shutdown_tracing
+
+_WORKER_UP = REGISTRY.gauge("bot_worker_up", "Bot worker process is alive", ("worker",))
+_WORKER_HEARTBEAT_AGE = REGISTRY.gauge(
+    "bot_worker_heartbeat_age_seconds", "Seconds since the last worker heartbeat", ("worker",)
+)
+_WORKER_RESTARTS = REGISTRY.gauge(
+    "bot_worker_restarts", "Worker restarts by the supervisor", ("worker",)
+)
+
+# Сигнатура точки входа рабочего процесса:
+# (номер, количество процессов, очередь обновлений, heartbeat)
+WorkerTarget = Callable[[int, int, "Queue[str | None]", "Synchronized[float]"], None]
+
+
+@dataclass
+class _Worker:
+    """Рабочий процесс и его каналы связи."""
+
+    index: int
+    updates: "Queue[str | None]"
+    heartbeat: "Synchronized[float]"
+    process: SpawnProcess | None = None
+    restarts: int = 0
+
+
+def route_key(update: Update) -> int:
+    """
+    Ключ маршрутизации обновления.
+
+    Args:
+        update: Обновление Telegram
+
+    Returns:
+        int: ID пользователя, при его отсутствии - ID чата, иначе update_id
+    """
+    context = UserContextMiddleware.resolve_event_context(update)
+    if context.user is not None:
+        return context.user.id
+    if context.chat is not None:
+        return context.chat.id
+    return update.update_id
+
+
+class BotSupervisor:
+    """
+    Супервизор рабочих процессов бота.
+
+    Принимает обновления (polling или webhook) и отправляет каждое в
+    очередь процесса hash(user_id) % N. Все обновления пользователя
+    попадают в один процесс, где их порядок сохраняет
+    UserUpdateQueueMiddleware, а кеши профилей и склейка сообщений
+    остаются локальными.
+
+    Процессы отправляют heartbeat; мертвый или зависший процесс
+    перезапускается с новой очередью: убитый посреди get() процесс мог
+    оставить старую захваченной или недочитанной. Непрочитанные обновления
+    его пользователей переносятся из старой очереди в новую. При остановке
+    каждый процесс получает маркер конца, дорабатывает очередь и
+    завершается сам.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        logger: logging.Logger,
+        worker_target: WorkerTarget | None = None,
+        heartbeat_timeout: float = 30.0,
+        health_interval: float = 5.0,
+        drain_timeout: float = 30.0,
+    ) -> None:
+        """
+        Инициализация супервизора.
+
+        Args:
+            workers: Количество рабочих процессов
+            logger: Логгер для событий
+            worker_target: Точка входа рабочего процесса (по умолчанию run_worker)
+            heartbeat_timeout: Через сколько секунд без heartbeat процесс считается зависшим
+            health_interval: Период проверки процессов в секундах
+            drain_timeout: Сколько ждать завершения процесса при остановке
+        """
+        self._logger = logger
+        self._target = worker_target or run_worker
+        self._heartbeat_timeout = heartbeat_timeout
+        self._health_interval = health_interval
+        self._drain_timeout = drain_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [
+            _Worker(index, self._context.Queue(), self._context.Value("d", 0.0))
+            for index in range(workers)
+        ]
+        self._stopping = False
+        # dispatch() работает в цикле событий, перезапуск - в потоке monitor()
+        self._queues_lock = threading.Lock()
+
+    @property
+    def workers(self) -> int:
+        """Количество рабочих процессов."""
+        return len(self._workers)
+
+    def start(self) -> None:
+        """Запустить все рабочие процессы."""
+        for worker in self._workers:
+            self._spawn(worker)
+        self._logger.info("Supervisor started %s bot workers", self.workers)
+
+    def _spawn(self, worker: _Worker) -> None:
+        """Запустить процесс для слота worker (при перезапуске - с новой очередью)."""
+        if worker.process is not None:
+            self._replace_queue(worker)
+        # Время на запуск процесса до первого heartbeat
+        worker.heartbeat.value = time.time()
+        worker.process = self._context.Process(
+            target=self._target,
+            args=(worker.index, self.workers, worker.updates, worker.heartbeat),
+            name=f"bot-worker-{worker.index}",
+            daemon=False,
+        )
+        worker.process.start()
+
+    def _replace_queue(self, worker: _Worker) -> None:
+        """Дать слоту новую очередь и перенести в нее непрочитанные обновления."""
+        moved = 0
+        # dispatch() ждет переноса: новые обновления встанут после старых
+        with self._queues_lock:
+            old, worker.updates = worker.updates, self._context.Queue()
+            while True:
+                try:
+                    # Таймаут дает фоновому потоку очереди дописать последние put()
+                    item = old.get(timeout=0.1)
+                except queue.Empty:
+                    # В том числе если чтение захвачено убитым процессом: остаток потерян
+                    break
+                except Exception as e:
+                    self._logger.warning("Bot worker %s queue is corrupted: %s", worker.index, e)
+                    break
+                worker.updates.put(item)
+                moved += 1
+        old.cancel_join_thread()
+        old.close()
+        if moved:
+            self._logger.info("Moved %s pending updates to bot worker %s", moved, worker.index)
+
+    def route(self, update: Update) -> int:
+        """
+        Номер процесса для обновления.
+
+        Args:
+            update: Обновление Telegram
+
+        Returns:
+            int: Индекс рабочего процесса
+        """
+        return hash(route_key(update)) % self.workers
+
+    def dispatch(self, update: Update) -> None:
+        """
+        Отправить обновление в очередь его процесса.
+
+        Args:
+            update: Обновление Telegram
+        """
+        if self._stopping:
+            self._logger.warning("Dropping update %s: supervisor is stopping", update.update_id)
+            return
+        worker = self._workers[self.route(update)]
+        payload = update.model_dump_json(exclude_none=True, by_alias=True)
+        with self._queues_lock:
+            worker.updates.put(payload)
+
+    def create_dispatcher(self) -> Dispatcher:
+        """
+        Создать Dispatcher, который вместо обработки маршрутизирует обновления.
+
+        Подходит и для start_polling, и для WebhookServer.
+
+        Returns:
+            Dispatcher: Dispatcher с маршрутизирующим middleware
+        """
+        dispatcher = Dispatcher()
+
+        async def route_update(
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+        ) -> None:
+            if isinstance(event, Update):
+                self.dispatch(event)
+
+        dispatcher.update.outer_middleware(route_update)
+        return dispatcher
+
+    def check_health(self) -> list[dict[str, Any]]:
+        """
+        Проверить процессы и перезапустить мертвые или зависшие.
+
+        Returns:
+            list[dict]: Состояние процессов (index, pid, alive, heartbeat_age, restarts)
+        """
+        now = time.time()
+        for worker in self._workers:
+            process = worker.process
+            if process is None or self._stopping:
+                continue
+            heartbeat_age = now - worker.heartbeat.value
+            if process.is_alive() and heartbeat_age <= self._heartbeat_timeout:
+                continue
+
+            if process.is_alive():
+                self._logger.error(
+                    "Bot worker %s (pid=%s) missed heartbeat for %.0fs, restarting",
+                    worker.index,
+                    process.pid,
+                    heartbeat_age,
+                )
+                process.kill()
+                process.join(timeout=5)
+            else:
+                self._logger.error(
+                    "Bot worker %s (pid=%s) exited with code %s, restarting",
+                    worker.index,
+                    process.pid,
+                    process.exitcode,
+                )
+            worker.restarts += 1
+            self._spawn(worker)
+        return self.get_health()
+
+    def get_health(self) -> list[dict[str, Any]]:
+        """
+        Состояние рабочих процессов.
+
+        Returns:
+            list[dict]: index, pid, alive, heartbeat_age (секунды) и restarts
+        """
+        now = time.time()
+        health = [
+            {
+                "index": worker.index,
+                "pid": worker.process.pid if worker.process else None,
+                "alive": bool(worker.process and worker.process.is_alive()),
+                "heartbeat_age": now - worker.heartbeat.value,
+                "restarts": worker.restarts,
+            }
+            for worker in self._workers
+        ]
+        for state in health:
+            label = str(state["index"])
+            _WORKER_UP.labels(label).set(1 if state["alive"] else 0)
+            _WORKER_HEARTBEAT_AGE.labels(label).set(state["heartbeat_age"])
+            _WORKER_RESTARTS.labels(label).set(state["restarts"])
+        return health
+
+    async def monitor(self) -> None:
+        """Периодически проверять процессы до отмены задачи."""
+        while True:
+            await asyncio.sleep(self._health_interval)
+            await asyncio.to_thread(self.check_health)
+
+    async def stop(self) -> None:
+        """
+        Остановить процессы с дренажом.
+
+        Новые обновления больше не принимаются, каждый процесс получает
+        маркер конца после уже поставленных обновлений и завершается сам.
+        Процессы, не успевшие за drain_timeout, принудительно останавливаются.
+        """
+        self._stopping = True
+        for worker in self._workers:
+            worker.updates.put(None)
+
+        deadline = time.monotonic() + self._drain_timeout
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            remaining = max(0.0, deadline - time.monotonic())
+            await asyncio.to_thread(worker.process.join, remaining)
+            if worker.process.is_alive():
+                self._logger.warning(
+                    "Bot worker %s did not drain in %.0fs, terminating",
+                    worker.index,
+                    self._drain_timeout,
+                )
+                worker.process.terminate()
+                await asyncio.to_thread(worker.process.join, 5)
+        self._logger.info("All bot workers stopped")
+
+
+def _worker_log_path(log_file_path: str, index: int) -> str:
+    """Отдельный лог-файл для рабочего процесса: bot.log -> bot.worker0.log."""
+    path = Path(log_file_path)
+    return str(path.with_name(f"{path.stem}.worker{index}{path.suffix}"))
+
+
+_IDLE = object()
+
+
+def _next_update(updates: "Queue[str | None]", timeout: float) -> Any:
+    """Прочитать обновление из очереди (_IDLE при таймауте)."""
+    try:
+        return updates.get(timeout=timeout)
+    except queue.Empty:
+        return _IDLE
+
+
+def run_worker(
+    index: int, workers: int, updates: "Queue[str | None]", heartbeat: "Synchronized[float]"
+) -> None:
+    """
+    Точка входа рабочего процесса бота.
+
+    Args:
+        index: Номер процесса
+        workers: Общее количество процессов
+        updates: Очередь обновлений (JSON) от супервизора; None - сигнал остановки
+        heartbeat: Время последнего heartbeat процесса
+    """
+    # Ctrl+C получает вся группа процессов: останавливает только супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_worker(index, workers, updates, heartbeat))
+
+
+async def _serve_worker(
+    index: int, workers: int, updates: "Queue[str | None]", heartbeat: "Synchronized[float]"
+) -> None:
+    """Обрабатывать обновления из очереди до маркера конца или SIGTERM."""
+    from src.bot_factory import create_bot, load_system_prompt
+
+    config = Config.from_env()
+    # Глобальный лимит отправки Telegram общий для бота - делим между процессами
+    config = dataclasses.replace(config, telegram_global_rate=config.telegram_global_rate / workers)
+    logger = setup_logger_from_config(config, _worker_log_path(config.log_file_path, index))
+    # Каждый процесс пишет спаны в свой файл, чтобы строки не перемешивались
+    configure_tracing(
+        config.trace_exporter,
+        _worker_log_path(config.trace_file, index),
+        config.trace_buffer_size,
+    )
+    logger.info("Bot worker %s/%s starting", index, workers)
+
+    db_manager = DatabaseManager(
+        database_url=config.database_url,
+        logger=logger,
+        read_database_url=config.database_read_url,
+    )
+    bot = create_bot(config, logger, load_system_prompt(config, logger), db_manager)
+    metrics_server = None
+    if config.metrics_port:
+        metrics_server = MetricsServer(logger, config.metrics_port + 1 + index, config.metrics_host)
+        await metrics_server.start()
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    tasks: set[asyncio.Task[Any]] = set()
+    try:
+        while not stop.is_set():
+            heartbeat.value = time.time()
+            raw = await loop.run_in_executor(None, _next_update, updates, 1.0)
+            if raw is _IDLE:
+                continue
+            if raw is None:
+                break
+            try:
+                update = Update.model_validate_json(raw, context={"bot": bot.bot})
+            except ValueError as e:
+                logger.error("Bot worker %s got malformed update: %s", index, e)
+                continue
+            task = asyncio.create_task(bot.dp.feed_update(bot.bot, update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    finally:
+        # Ответы на уже принятые обновления дорабатываются до закрытия подключений
+        await bot.shutdown()
+        for task in tasks:
+            task.cancel()
+        if metrics_server:
+            await metrics_server.stop()
+        await db_manager.close()
+        shutdown_tracing()
+        logger.info("Bot worker %s stopped", index)
+        # Процесс завершается через os._exit, atexit не сработает
+        stop_logging()
+
+
+async def run_supervised(config: Config, logger: logging.Logger) -> None:
+    """
+    Запустить бота в режиме супервизора с config.bot_workers процессами.
+
+    Args:
+        config: Конфигурация приложения
+        logger: Логгер для событий
+    """
+    from src.webhook_server import WebhookServer
+
+    supervisor = BotSupervisor(
+        workers=config.bot_workers,
+        logger=logger,
+        drain_timeout=config.worker_drain_timeout,
+    )
+    bot = Bot(token=config.telegram_token)
+    dispatcher = supervisor.create_dispatcher()
+    supervisor.start()
+    monitor = asyncio.create_task(supervisor.monitor())
+    metrics_server = None
+    if config.metrics_port:
+        metrics_server = MetricsServer(logger, config.metrics_port, config.metrics_host)
+        await metrics_server.start()
+    try:
+        if config.bot_mode == "webhook" and config.webhook_url:
+            server = WebhookServer(
+                dispatcher=dispatcher,
+                bot=bot,
+                logger=logger,
+                base_url=config.webhook_url,
+                path=config.webhook_path,
+                secret_token=config.webhook_secret,
+                host=config.webhook_host,
+                port=config.webhook_port,
+                max_in_flight=config.webhook_max_in_flight,
+                drain_timeout=config.shutdown_timeout,
+            )
+            await server.run_forever()
+        else:
+            logger.info("Starting supervisor in polling mode...")
+            await dispatcher.start_polling(bot)
+    finally:
+        monitor.cancel()
+        if metrics_server:
+            await metrics_server.stop()
+        await supervisor.stop()
+        await bot.session.close()
@@ -0,0 +1,47 @@
+"""Уведомления об изменении данных внутри процесса."""
+
+import asyncio
+import contextlib
+
+
+class ChangeNotifier:
+    """
+    Счетчик изменений с ожиданием новой версии.
+
+    Писатели вызывают notify() после фиксации записи, читатели ждут
+    версию новее той, что уже обработали. Пропущенные уведомления не
+    теряются: ожидание сразу возвращается, если версия уже сменилась.
+    Работает в пределах одного процесса (одного event loop).
+    """
+
+    def __init__(self) -> None:
+        """Инициализация с версией 0."""
+        self.version = 0
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        """Отметить изменение и разбудить ожидающих."""
+        self.version += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, version: int, timeout: float) -> int:
+        """
+        Дождаться версии новее version, но не дольше timeout.
+
+        Args:
+            version: Последняя обработанная версия
+            timeout: Максимальное ожидание, секунды
+
+        Returns:
+            int: Текущая версия (равна version, если изменений не было)
+        """
+        if self.version == version:
+            changed = self._changed
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(changed.wait(), timeout)
+        return self.version
+
+
+# Запись в messages (DatabaseContextStorage): живые обновления дашборда
+message_changes = ChangeNotifier()
@@ -18,7 +18,10 @@ class Config:
 
     telegram_token: str
     openrouter_api_key: str
+    telegram_api_url: str | None = None  # None - api.telegram.org
     bot_name: str = "SysTech AI Assistant"
+    admin_user_ids: tuple[int, ...] = ()  # Telegram ID с доступом к админ-командам бота
+    api_admin_token: str | None = None  # Bearer-токен для выгрузки и поиска в API
     openrouter_model: str = "anthropic/claude-3.5-sonnet"
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
     system_prompt: str = "Ты - полезный AI-ассистент. Отвечай кратко и по делу."
@@ -26,7 +29,37 @@ class Config:
     max_context_messages: int = 20
     log_file_path: str = "logs/bot.log"
     log_level: str = "INFO"
+    log_format: str = "text"  # text или json
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_sampling: str = ""  # "text2sql=10,context_storage=20"
     database_url: str = "sqlite+aiosqlite:///./data/messages.db"
+    database_read_url: str | None = None
+    bot_mode: str = "polling"  # polling или webhook
+    webhook_url: str | None = None
+    webhook_path: str = "/telegram/webhook"
+    webhook_secret: str | None = None
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_max_in_flight: int = 100
+    max_concurrent_updates: int = 100
+    telegram_global_rate: float = 30.0
+    telegram_chat_rate: float = 1.0
+    message_coalesce_window: float = 1.0
+    bot_workers: int = 1
+    worker_drain_timeout: float = 30.0
+    shutdown_timeout: float = 25.0
+    metrics_host: str = "0.0.0.0"
+    metrics_port: int = 0  # 0 - без /metrics у бота
+    trace_exporter: str = "memory"  # memory, jsonl или off
+    trace_file: str = "logs/traces.jsonl"
+    trace_buffer_size: int = 5000
+    archive_dir: str = "data/archive"
+    archive_compression: str = ""  # zstd или gzip, пусто - zstd при наличии zstandard
+    retention_max_age_days: int = 0  # 0 - не архивировать по возрасту
+    retention_deleted_grace_days: int = 30  # 0 - не архивировать удаленные
+    retention_batch_size: int = 1000
+    retention_batch_pause: float = 0.05
 
     @classmethod
     def from_env(cls) -> "Config":
@@ -55,11 +88,35 @@ class Config:
         if not openrouter_api_key:
             raise ConfigError("OPENROUTER_API_KEY не найден в .env файле!")
 
+        bot_mode = (os.getenv("BOT_MODE") or cls.bot_mode).lower()
+        if bot_mode not in ("polling", "webhook"):
+            raise ConfigError(f"BOT_MODE должен быть polling или webhook, получено: {bot_mode}")
+
+        webhook_url = os.getenv("WEBHOOK_URL") or cls.webhook_url
+        if bot_mode == "webhook" and not webhook_url:
+            raise ConfigError("WEBHOOK_URL обязателен при BOT_MODE=webhook!")
+        webhook_secret = os.getenv("WEBHOOK_SECRET") or cls.webhook_secret
+        if bot_mode == "webhook" and not webhook_secret:
+            raise ConfigError("WEBHOOK_SECRET обязателен при BOT_MODE=webhook!")
+
+        log_format = (os.getenv("LOG_FORMAT") or cls.log_format).lower()
+        if log_format not in ("text", "json"):
+            raise ConfigError(f"LOG_FORMAT должен быть text или json, получено: {log_format}")
+
+        admin_ids = (os.getenv("ADMIN_USER_IDS") or "").split(",")
+        try:
+            admin_user_ids = tuple(int(value) for value in admin_ids if value.strip())
+        except ValueError:
+            raise ConfigError("ADMIN_USER_IDS: нужен список Telegram ID через запятую") from None
+
         # Создаем immutable конфигурацию
         return cls(
             telegram_token=telegram_token,
             openrouter_api_key=openrouter_api_key,
+            telegram_api_url=os.getenv("TELEGRAM_API_URL") or cls.telegram_api_url,
             bot_name=os.getenv("BOT_NAME") or cls.bot_name,
+            admin_user_ids=admin_user_ids,
+            api_admin_token=os.getenv("API_ADMIN_TOKEN") or cls.api_admin_token,
             openrouter_model=os.getenv("OPENROUTER_MODEL") or cls.openrouter_model,
             openrouter_base_url=os.getenv("OPENROUTER_BASE_URL") or cls.openrouter_base_url,
             system_prompt=os.getenv("SYSTEM_PROMPT") or cls.system_prompt,
@@ -67,7 +124,53 @@ class Config:
             max_context_messages=int(os.getenv("MAX_CONTEXT_MESSAGES") or cls.max_context_messages),
             log_file_path=os.getenv("LOG_FILE_PATH") or cls.log_file_path,
             log_level=os.getenv("LOG_LEVEL") or cls.log_level,
+            log_format=log_format,
+            log_max_bytes=int(os.getenv("LOG_MAX_BYTES") or cls.log_max_bytes),
+            log_backup_count=int(os.getenv("LOG_BACKUP_COUNT") or cls.log_backup_count),
+            log_sampling=os.getenv("LOG_SAMPLING") or cls.log_sampling,
             database_url=os.getenv("DATABASE_URL") or cls.database_url,
+            database_read_url=os.getenv("DATABASE_READ_URL") or cls.database_read_url,
+            bot_mode=bot_mode,
+            webhook_url=webhook_url,
+            webhook_path=os.getenv("WEBHOOK_PATH") or cls.webhook_path,
+            webhook_secret=webhook_secret,
+            webhook_host=os.getenv("WEBHOOK_HOST") or cls.webhook_host,
+            webhook_port=int(os.getenv("WEBHOOK_PORT") or cls.webhook_port),
+            webhook_max_in_flight=int(
+                os.getenv("WEBHOOK_MAX_IN_FLIGHT") or cls.webhook_max_in_flight
+            ),
+            max_concurrent_updates=int(
+                os.getenv("MAX_CONCURRENT_UPDATES") or cls.max_concurrent_updates
+            ),
+            telegram_global_rate=float(
+                os.getenv("TELEGRAM_GLOBAL_RATE") or cls.telegram_global_rate
+            ),
+            telegram_chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE") or cls.telegram_chat_rate),
+            message_coalesce_window=float(
+                os.getenv("MESSAGE_COALESCE_WINDOW") or cls.message_coalesce_window
+            ),
+            bot_workers=int(os.getenv("BOT_WORKERS") or cls.bot_workers),
+            worker_drain_timeout=float(
+                os.getenv("WORKER_DRAIN_TIMEOUT") or cls.worker_drain_timeout
+            ),
+            shutdown_timeout=float(os.getenv("SHUTDOWN_TIMEOUT") or cls.shutdown_timeout),
+            metrics_host=os.getenv("METRICS_HOST") or cls.metrics_host,
+            metrics_port=int(os.getenv("METRICS_PORT") or cls.metrics_port),
+            trace_exporter=os.getenv("TRACE_EXPORTER") or cls.trace_exporter,
+            trace_file=os.getenv("TRACE_FILE") or cls.trace_file,
+            trace_buffer_size=int(os.getenv("TRACE_BUFFER_SIZE") or cls.trace_buffer_size),
+            archive_dir=os.getenv("ARCHIVE_DIR") or cls.archive_dir,
+            archive_compression=os.getenv("ARCHIVE_COMPRESSION") or cls.archive_compression,
+            retention_max_age_days=int(
+                os.getenv("RETENTION_MAX_AGE_DAYS") or cls.retention_max_age_days
+            ),
+            retention_deleted_grace_days=int(
+                os.getenv("RETENTION_DELETED_GRACE_DAYS") or cls.retention_deleted_grace_days
+            ),
+            retention_batch_size=int(os.getenv("RETENTION_BATCH_SIZE") or cls.retention_batch_size),
+            retention_batch_pause=float(
+                os.getenv("RETENTION_BATCH_PAUSE") or cls.retention_batch_pause
+            ),
         )
 
     def load_system_prompt(self) -> str:
@@ -1,11 +1,13 @@
 """Абстракция хранилища контекста диалогов."""
 
 import logging
-from typing import Protocol
+from typing import Any, Protocol, cast
 
 from sqlalchemy import select, update
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import CursorResult
 
+from src.change_notifier import message_changes
+from src.database import DatabaseManager, db_operation
 from src.models import Message
 
 
@@ -92,8 +94,9 @@ class InMemoryContextStorage:
             del self._storage[oldest_user]
             if self._logger:
                 self._logger.warning(
-                    f"Max users limit reached ({self._max_users}). "
-                    f"Removed context for user_id={oldest_user}"
+                    "Max users limit reached (%s). Removed context for user_id=%s",
+                    self._max_users,
+                    oldest_user,
                 )
 
         # Инициализируем список для нового пользователя
@@ -108,7 +111,9 @@ class InMemoryContextStorage:
             self._storage[user_id] = self._storage[user_id][-self._max_messages :]
             if self._logger:
                 self._logger.debug(
-                    f"Context trimmed to {self._max_messages} messages for user_id={user_id}"
+                    "Context trimmed to %s messages for user_id=%s",
+                    self._max_messages,
+                    user_id,
                 )
 
     async def get_context(self, user_id: int) -> list[dict[str, str]]:
@@ -133,10 +138,10 @@ class InMemoryContextStorage:
         if user_id in self._storage:
             del self._storage[user_id]
             if self._logger:
-                self._logger.info(f"Context reset for user_id={user_id}")
+                self._logger.info("Context reset for user_id=%s", user_id)
         else:
             if self._logger:
-                self._logger.info(f"No context to reset for user_id={user_id}")
+                self._logger.info("No context to reset for user_id=%s", user_id)
 
     def get_user_count(self) -> int:
         """
@@ -160,11 +165,18 @@ class DatabaseContextStorage:
 
     Сохраняет историю сообщений в БД с использованием SQLAlchemy.
     Поддерживает soft delete и ограничение по количеству сообщений.
+    Каждая операция открывает короткую сессию: запись через
+    DatabaseManager.get_session, чтение истории через пул читателей
+    (get_read_session). Поэтому обращения разных пользователей идут
+    параллельно, а ошибка одной операции не затрагивает остальные.
     """
 
+    # Строк в одной транзакции reset_context
+    RESET_BATCH_SIZE = 500
+
     def __init__(
         self,
-        session: AsyncSession,
+        db_manager: DatabaseManager,
         max_messages: int = 20,
         logger: logging.Logger | None = None,
     ) -> None:
@@ -172,11 +184,11 @@ class DatabaseContextStorage:
         Инициализация хранилища.
 
         Args:
-            session: Async SQLAlchemy session
+            db_manager: Менеджер БД, из которого берутся сессии
             max_messages: Максимальное количество сообщений на пользователя
             logger: Логгер для событий (опционально)
         """
-        self._session = session
+        self._db_manager = db_manager
         self._max_messages = max_messages
         self._logger = logger
 
@@ -201,12 +213,17 @@ class DatabaseContextStorage:
             created_at=datetime.datetime.now(),
             is_deleted=False,
         )
-        self._session.add(message)
-        await self._session.commit()
+        with db_operation("context_add_message"):
+            async with self._db_manager.get_session() as session:
+                session.add(message)
+        message_changes.notify()
 
         if self._logger:
             self._logger.debug(
-                f"Added message for user_id={user_id}, role={role}, length={len(content)}"
+                "Added message for user_id=%s, role=%s, length=%s",
+                user_id,
+                role,
+                len(content),
             )
 
     async def get_context(self, user_id: int) -> list[dict[str, str]]:
@@ -229,8 +246,10 @@ class DatabaseContextStorage:
             .limit(self._max_messages)
         )
 
-        result = await self._session.execute(stmt)
-        messages = result.scalars().all()
+        with db_operation("context_get_context"):
+            async with self._db_manager.get_read_session() as session:
+                result = await session.execute(stmt)
+                messages = result.scalars().all()
 
         # Разворачиваем, чтобы получить хронологический порядок
         messages_reversed = list(reversed(messages))
@@ -238,7 +257,7 @@ class DatabaseContextStorage:
         context = [{"role": msg.role, "content": msg.content} for msg in messages_reversed]
 
         if self._logger:
-            self._logger.debug(f"Retrieved {len(context)} messages for user_id={user_id}")
+            self._logger.debug("Retrieved %s messages for user_id=%s", len(context), user_id)
 
         return context
 
@@ -246,25 +265,38 @@ class DatabaseContextStorage:
         """
         Очистить контекст диалога для пользователя (soft delete).
 
-        Помечает все активные сообщения пользователя как удаленные.
+        Помечает все активные сообщения пользователя как удаленные
+        пакетами по RESET_BATCH_SIZE строк, каждый в своей транзакции:
+        у пользователя с длинной историей одна большая транзакция надолго
+        заняла бы блокировку записи SQLite, и сообщения других
+        пользователей ждали бы ее завершения.
 
         Args:
             user_id: ID пользователя
         """
+        batch = (
+            select(Message.id)
+            .where(Message.user_id == user_id, Message.is_deleted == False)  # noqa: E712
+            .order_by(Message.id)
+            .limit(self.RESET_BATCH_SIZE)
+            .scalar_subquery()
+        )
         stmt = (
             update(Message)
-            .where(Message.user_id == user_id, Message.is_deleted == False)  # noqa: E712
+            .where(Message.id.in_(batch))
             .values(is_deleted=True)
         )
 
-        await self._session.execute(stmt)
-        await self._session.commit()
-
-        if self._logger:
-            self._logger.info(f"Context reset for user_id={user_id}")
-
-    async def close(self) -> None:
-        """Закрыть сессию БД."""
-        await self._session.close()
+        total = 0
+        while True:
+            with db_operation("context_reset"):
+                async with self._db_manager.get_session() as session:
+                    result = cast(CursorResult[Any], await session.execute(stmt))
+            total += result.rowcount
+            if result.rowcount < self.RESET_BATCH_SIZE:
+                break
+
+        if total:
+            message_changes.notify()
         if self._logger:
-            self._logger.info("Database session closed")
+            self._logger.info("Context reset for user_id=%s, %s messages", user_id, total)
@@ -1,50 +1,199 @@
 """Управление подключением к базе данных."""
 
 import logging
-from collections.abc import AsyncGenerator
-from contextlib import asynccontextmanager
+from collections.abc import AsyncGenerator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import delete, event, or_, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     create_async_engine,
 )
 from sqlalchemy.orm import sessionmaker
 
-from src.models import Base, User
+from src.metrics import DB_QUERY_SECONDS
+from src.models import Base, ProcessedUpdate, User, create_search_index
+from src.tracing import tracer
+
+# Ожидание блокировки SQLite перед ошибкой "database is locked" (мс)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# Поля профиля Telegram, изменение которых требует записи в users
+USER_PROFILE_COLUMNS = ("username", "first_name", "last_name", "language_code")
+
+# Настройки пула для PostgreSQL (asyncpg)
+POSTGRES_POOL_OPTIONS: dict[str, Any] = {
+    "pool_size": 10,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,  # переоткрываем соединения раньше серверных idle-таймаутов
+    "pool_pre_ping": True,  # отбрасываем соединения, закрытые после рестарта/failover
+}
+
+
+def _safe_url(database_url: str) -> str:
+    """URL для логов без пароля."""
+    url = make_url(database_url)
+    return url.render_as_string(hide_password=True) if url.password else database_url
+
+
+@contextmanager
+def db_operation(operation: str) -> Iterator[None]:
+    """
+    Учесть обращение к БД: гистограмма db_query_duration_seconds и спан db.<operation>.
+
+    Args:
+        operation: Место вызова (get_history, save_message, ...)
+    """
+    with (
+        DB_QUERY_SECONDS.labels(operation).time(),
+        tracer.start_as_current_span(f"db.{operation}", {"db.operation": operation}),
+    ):
+        yield
+
+
+def _set_sqlite_writer_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    """Включает WAL, чтобы читатели не блокировали писателя и наоборот."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _set_sqlite_reader_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    """Переводит соединение читателя в режим query_only."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
 
 
 class DatabaseManager:
     """
     Управляет подключением к базе данных и сессиями.
 
-    Предоставляет асинхронный движок и фабрику сессий для работы с БД.
+    Поддерживает SQLite (aiosqlite) и PostgreSQL (asyncpg).
+    Предоставляет раздельные движки и фабрики сессий для записи и чтения:
+    - writer: для SQLite одно сериализованное соединение (WAL),
+      для PostgreSQL настроенный пул (POSTGRES_POOL_OPTIONS),
+    - reader: пул соединений только для чтения (query_only для SQLite,
+      либо отдельная реплика через read_database_url).
+
+    Тяжелые аналитические запросы (дашборд, Text2SQL, история) идут через
+    reader и не конкурируют с короткими вставками сообщений.
     """
 
-    def __init__(self, database_url: str, logger: logging.Logger) -> None:
+    def __init__(
+        self,
+        database_url: str,
+        logger: logging.Logger,
+        read_database_url: str | None = None,
+        read_pool_size: int = 5,
+    ) -> None:
         """
         Инициализация менеджера БД.
 
         Args:
             database_url: URL для подключения к базе данных.
             logger: Логгер для событий.
+            read_database_url: URL реплики для чтения (опционально).
+                По умолчанию читатели подключаются к database_url.
+            read_pool_size: Размер пула соединений для чтения.
         """
-        self._engine = create_async_engine(database_url, echo=False)
+        self._logger = logger
+        self._is_sqlite = make_url(database_url).get_backend_name() == "sqlite"
+
+        self._engine = self._create_writer_engine(database_url)
         self._async_session_factory = sessionmaker(  # type: ignore[call-overload]
             self._engine, expire_on_commit=False, class_=AsyncSession
         )
-        self._logger = logger
-        self._logger.info(f"DatabaseManager initialized for URL: {database_url}")
+
+        self._read_engine = self._create_read_engine(
+            database_url, read_database_url, read_pool_size
+        )
+        self._read_session_factory = sessionmaker(  # type: ignore[call-overload]
+            self._read_engine, expire_on_commit=False, class_=AsyncSession
+        )
+
+        self._logger.info("DatabaseManager initialized for URL: %s", _safe_url(database_url))
+        if read_database_url:
+            self._logger.info("DatabaseManager read replica URL: %s", _safe_url(read_database_url))
+
+    @property
+    def dialect_name(self) -> str:
+        """Имя диалекта SQLAlchemy ('sqlite', 'postgresql')."""
+        return str(self._engine.dialect.name)
+
+    @staticmethod
+    def _is_sqlite_memory(database_url: str) -> bool:
+        """Проверяет, что URL указывает на SQLite в памяти."""
+        url = make_url(database_url)
+        return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+    def _create_writer_engine(self, database_url: str) -> AsyncEngine:
+        """
+        Создает движок для записи.
+
+        Для файловой SQLite пул ограничен одним соединением: запись в SQLite
+        все равно сериализуется, а очередь в пуле дешевле, чем ретраи
+        на "database is locked".
+        """
+        if not self._is_sqlite:
+            return create_async_engine(database_url, echo=False, **POSTGRES_POOL_OPTIONS)
+
+        if self._is_sqlite_memory(database_url):
+            return create_async_engine(database_url, echo=False)
+
+        engine = create_async_engine(database_url, echo=False, pool_size=1, max_overflow=0)
+        event.listen(engine.sync_engine, "connect", _set_sqlite_writer_pragmas)
+        return engine
+
+    def _create_read_engine(
+        self, database_url: str, read_database_url: str | None, read_pool_size: int
+    ) -> AsyncEngine:
+        """
+        Создает движок для чтения.
+
+        SQLite в памяти существует только внутри одного соединения,
+        поэтому в этом случае читатели используют движок записи.
+        """
+        if read_database_url:
+            return create_async_engine(
+                read_database_url,
+                echo=False,
+                **{**POSTGRES_POOL_OPTIONS, "pool_size": read_pool_size},
+            )
+
+        if not self._is_sqlite:
+            return self._engine
+
+        if self._is_sqlite_memory(database_url):
+            return self._engine
+
+        engine = create_async_engine(
+            database_url, echo=False, pool_size=read_pool_size, max_overflow=0
+        )
+        event.listen(engine.sync_engine, "connect", _set_sqlite_reader_pragmas)
+        return engine
 
     async def init_db(self) -> None:
         """
         Инициализирует базу данных, создавая все таблицы.
 
-        Используется для создания схемы БД, если она еще не существует.
-        В production рекомендуется использовать Alembic для миграций.
+        Используется для создания схемы БД, если она еще не существует,
+        включая полнотекстовый индекс SQLite (FTS5). В production
+        рекомендуется использовать Alembic для миграций.
         """
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(create_search_index)
         self._logger.info("Database schema initialized (if not already present)")
 
     def create_session(self) -> AsyncSession:
@@ -57,6 +206,16 @@ class DatabaseManager:
         session: AsyncSession = self._async_session_factory()
         return session
 
+    def create_read_session(self) -> AsyncSession:
+        """
+        Создает новую асинхронную сессию БД только для чтения.
+
+        Returns:
+            AsyncSession: Новая сессия поверх пула читателей
+        """
+        session: AsyncSession = self._read_session_factory()
+        return session
+
     @asynccontextmanager
     async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
         """
@@ -75,8 +234,44 @@ class DatabaseManager:
                 await session.close()
                 self._logger.debug("Database session closed")
 
+    @asynccontextmanager
+    async def get_read_session(self) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Предоставляет асинхронную сессию БД только для чтения.
+
+        Сессия не коммитится: по выходу соединение возвращается в пул читателей.
+        """
+        async with self._read_session_factory() as session:
+            try:
+                yield session
+            finally:
+                await session.close()
+                self._logger.debug("Database read session closed")
+
+    @asynccontextmanager
+    async def get_temp_session(self) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Предоставляет сессию чтения, в которой можно создавать временные объекты.
+
+        Для SQLite сессия берется из пула читателей, а не занимает
+        единственное соединение записи; query_only на время создания
+        временных объектов снимает и затем возвращает вызывающий код
+        (см. include_archived). В PostgreSQL временные таблицы нельзя
+        создать на реплике, поэтому сессия идет в основную БД через ее пул.
+        Сессия не коммитится.
+        """
+        factory = self._read_session_factory if self._is_sqlite else self._async_session_factory
+        async with factory() as session:
+            try:
+                yield session
+            finally:
+                await session.close()
+                self._logger.debug("Database temp session closed")
+
     async def close(self) -> None:
-        """Закрывает соединение с базой данных."""
+        """Закрывает соединения с базой данных."""
+        if self._read_engine is not self._engine:
+            await self._read_engine.dispose()
         await self._engine.dispose()
         self._logger.info("Database connection pool disposed")
 
@@ -87,10 +282,15 @@ class DatabaseManager:
         first_name: str | None = None,
         last_name: str | None = None,
         language_code: str | None = None,
-    ) -> User:
+    ) -> User | None:
         """
         Создает нового пользователя или обновляет существующего (upsert).
 
+        Выполняется одним запросом INSERT ... ON CONFLICT(telegram_id) DO UPDATE,
+        причем обновление происходит только если хотя бы одно поле профиля
+        изменилось. Новая запись отличается от обновленной по created_at == updated_at:
+        оба поля задаются одним и тем же моментом только при вставке.
+
         Args:
             telegram_id: Telegram ID пользователя
             username: Username пользователя
@@ -99,33 +299,89 @@ class DatabaseManager:
             language_code: Код языка пользователя
 
         Returns:
-            User: Созданный или обновленный объект пользователя
-        """
-        async with self.get_session() as session:
-            # Ищем существующего пользователя
-            stmt = select(User).where(User.telegram_id == telegram_id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
-
-            if user:
-                # Обновляем существующего пользователя
-                user.username = username
-                user.first_name = first_name
-                user.last_name = last_name
-                user.language_code = language_code
-                self._logger.debug(f"Updated user: telegram_id={telegram_id}")
-            else:
-                # Создаем нового пользователя
-                user = User(
-                    telegram_id=telegram_id,
-                    username=username,
-                    first_name=first_name,
-                    last_name=last_name,
-                    language_code=language_code,
+            User | None: Созданный или обновленный пользователь,
+                None если профиль не изменился
+        """
+        now = datetime.now()
+        insert = postgresql_insert if self.dialect_name == "postgresql" else sqlite_insert
+        insert_stmt = insert(User).values(
+            telegram_id=telegram_id,
+            username=username,
+            first_name=first_name,
+            last_name=last_name,
+            language_code=language_code,
+            created_at=now,
+            updated_at=now,
+        )
+        changed = or_(
+            *(
+                getattr(User, column).is_distinct_from(insert_stmt.excluded[column])
+                for column in USER_PROFILE_COLUMNS
+            )
+        )
+        stmt = insert_stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                **{column: insert_stmt.excluded[column] for column in USER_PROFILE_COLUMNS},
+                "updated_at": insert_stmt.excluded.updated_at,
+            },
+            where=changed,
+        ).returning(User)
+
+        with db_operation("upsert_user"):
+            async with self.get_session() as session:
+                result = await session.scalars(
+                    stmt, execution_options={"populate_existing": True}
                 )
-                session.add(user)
-                self._logger.info(f"Created new user: telegram_id={telegram_id}")
+                user = result.one_or_none()
+
+        if user is None:
+            self._logger.debug("User profile unchanged: telegram_id=%s", telegram_id)
+        elif user.created_at == user.updated_at:
+            self._logger.info("Created new user: telegram_id=%s", telegram_id)
+        else:
+            self._logger.debug("Updated user: telegram_id=%s", telegram_id)
+        return user
+
+    async def get_processed_updates(self, bot_id: int, limit: int) -> list[int]:
+        """
+        Получить последние обработанные update_id бота.
+
+        Args:
+            bot_id: ID бота
+            limit: Сколько последних update_id вернуть
 
-            await session.commit()
-            await session.refresh(user)
-            return user
+        Returns:
+            list[int]: update_id по убыванию
+        """
+        stmt = (
+            select(ProcessedUpdate.update_id)
+            .where(ProcessedUpdate.bot_id == bot_id)
+            .order_by(ProcessedUpdate.update_id.desc())
+            .limit(limit)
+        )
+        with db_operation("get_processed_updates"):
+            async with self.get_read_session() as session:
+                return list((await session.scalars(stmt)).all())
+
+    async def mark_update_processed(self, bot_id: int, update_id: int, keep: int) -> None:
+        """
+        Запомнить обработанное обновление и забыть слишком старые.
+
+        update_id в Telegram возрастают, поэтому хранятся только записи
+        не старше keep номеров от нового: таблица остается маленькой.
+
+        Args:
+            bot_id: ID бота
+            update_id: update_id обработанного обновления
+            keep: Сколько последних update_id хранить
+        """
+        insert = postgresql_insert if self.dialect_name == "postgresql" else sqlite_insert
+        stmt = insert(ProcessedUpdate).values(bot_id=bot_id, update_id=update_id)
+        prune = delete(ProcessedUpdate).where(
+            ProcessedUpdate.bot_id == bot_id, ProcessedUpdate.update_id <= update_id - keep
+        )
+        with db_operation("mark_update_processed"):
+            async with self.get_session() as session:
+                await session.execute(stmt.on_conflict_do_nothing())
+                await session.execute(prune)
@@ -0,0 +1,261 @@
+"""Потоковая выгрузка истории сообщений в NDJSON или CSV."""
+
+import asyncio
+import csv
+import io
+import json
+import zlib
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Select, select
+
+from src.archive import MessageArchive, month_of
+from src.database import DatabaseManager, db_operation
+from src.models import ChatMessage, ChatSession, Message
+
+EXPORT_TABLES = ("messages", "chat_messages")
+EXPORT_FORMATS = ("ndjson", "csv")
+# Размер куска ответа: мелкие куски дороже отдавать, крупные - держать в памяти
+CHUNK_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class ExportFilter:
+    """Что выгружать: пользователь, сессия веб-чата и/или диапазон дат [since, until)."""
+
+    user_id: int | None = None
+    session_id: str | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+
+
+def validate_export(table: str, export_filter: ExportFilter, export_format: str) -> None:
+    """
+    Проверить параметры выгрузки до начала потока.
+
+    Raises:
+        ValueError: Если параметры некорректны или выгрузка не ограничена
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format: {export_format}")
+    if export_filter == ExportFilter():
+        raise ValueError("Specify user_id, session_id or a date range")
+    if export_filter.session_id is not None and table != "chat_messages":
+        raise ValueError("session_id applies to chat_messages only")
+    if export_filter.since and export_filter.until and export_filter.since >= export_filter.until:
+        raise ValueError("since must be earlier than until")
+
+
+def export_columns(table: str) -> list[str]:
+    """Колонки выгрузки (в порядке колонок таблицы)."""
+    model = Message if table == "messages" else ChatMessage
+    return [column.name for column in model.__table__.columns]
+
+
+def _query(table: str, export_filter: ExportFilter) -> Select[Any]:
+    """Запрос строк таблицы по фильтру в хронологическом порядке."""
+    model = Message if table == "messages" else ChatMessage
+    query = select(*model.__table__.columns)
+    if export_filter.user_id is not None:
+        if model is Message:
+            query = query.where(Message.user_id == export_filter.user_id)
+        else:
+            sessions = select(ChatSession.id).where(ChatSession.user_id == export_filter.user_id)
+            query = query.where(ChatMessage.user_session_id.in_(sessions))
+    if export_filter.session_id is not None:
+        query = query.where(ChatMessage.user_session_id == export_filter.session_id)
+    if export_filter.since is not None:
+        query = query.where(model.created_at >= export_filter.since)
+    if export_filter.until is not None:
+        query = query.where(model.created_at < export_filter.until)
+    return query.order_by(model.created_at, model.id)
+
+
+async def _archived_rows(
+    db_manager: DatabaseManager,
+    archive: MessageArchive,
+    table: str,
+    export_filter: ExportFilter,
+    batch_size: int,
+) -> AsyncIterator[dict[str, Any]]:
+    """Архивные строки по фильтру; файлы читаются в потоке, пакетами."""
+    months = [
+        month
+        for month in archive.months(table)
+        if (export_filter.since is None or month >= month_of(export_filter.since))
+        and (export_filter.until is None or month <= month_of(export_filter.until))
+    ]
+    session_ids: set[str] | None = None
+    if table == "chat_messages" and export_filter.user_id is not None:
+        # Сессии не архивируются: принадлежность сообщения пользователю берем из БД
+        async with db_manager.get_read_session() as session:
+            result = await session.execute(
+                select(ChatSession.id).where(ChatSession.user_id == export_filter.user_id)
+            )
+            session_ids = set(result.scalars())
+
+    def matches(row: dict[str, Any]) -> bool:
+        if export_filter.user_id is not None:
+            if session_ids is not None:
+                if row["user_session_id"] not in session_ids:
+                    return False
+            elif row["user_id"] != export_filter.user_id:
+                return False
+        if (
+            export_filter.session_id is not None
+            and row["user_session_id"] != export_filter.session_id
+        ):
+            return False
+        if export_filter.since is not None and row["created_at"] < export_filter.since:
+            return False
+        return export_filter.until is None or row["created_at"] < export_filter.until
+
+    rows = archive.read(table, months)
+
+    def next_batch(source: Iterator[dict[str, Any]]) -> list[dict[str, Any]]:
+        batch = []
+        for row in source:
+            if matches(row):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    break
+        return batch
+
+    while batch := await asyncio.to_thread(next_batch, rows):
+        for row in batch:
+            yield row
+
+
+async def iter_export_rows(
+    db_manager: DatabaseManager,
+    table: str,
+    export_filter: ExportFilter,
+    archive: MessageArchive | None = None,
+    batch_size: int = 1000,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Строки выгрузки: сначала архивные (если передан archive), затем из БД.
+
+    Курсор БД читается пакетами по batch_size (yield_per), поэтому память
+    не зависит от объема выгрузки.
+
+    Args:
+        db_manager: Менеджер базы данных
+        table: messages или chat_messages
+        export_filter: Фильтр строк
+        archive: Архив для старых месяцев (опционально)
+        batch_size: Строк в одном пакете чтения
+
+    Yields:
+        dict[str, Any]: Строка таблицы
+    """
+    if archive is not None:
+        async for row in _archived_rows(db_manager, archive, table, export_filter, batch_size):
+            yield row
+
+    query = _query(table, export_filter).execution_options(yield_per=batch_size)
+    async with db_manager.get_read_session() as session:
+        with db_operation("export"):
+            result = await session.stream(query)
+        async for row in result.mappings():
+            yield dict(row)
+
+
+def _naive(value: datetime | None) -> datetime | None:
+    """Время с часовым поясом -> локальное без пояса, как хранится в БД."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def _jsonable(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def encode_ndjson(rows: AsyncIterator[dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Строки -> NDJSON, кусками около CHUNK_BYTES."""
+    buffer: list[bytes] = []
+    size = 0
+    async for row in rows:
+        line = json.dumps({key: _jsonable(value) for key, value in row.items()}, ensure_ascii=False)
+        data = line.encode() + b"\n"
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def encode_csv(
+    rows: AsyncIterator[dict[str, Any]], columns: list[str]
+) -> AsyncIterator[bytes]:
+    """Строки -> CSV с заголовком, кусками около CHUNK_BYTES."""
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    async for row in rows:
+        writer.writerow([_jsonable(row[column]) for column in columns])
+        if text.tell() >= CHUNK_BYTES:
+            yield text.getvalue().encode()
+            text.seek(0)
+            text.truncate()
+    if text.tell():
+        yield text.getvalue().encode()
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Сжать поток кусков в один gzip-файл."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 - формат gzip
+    async for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(
+    db_manager: DatabaseManager,
+    table: str,
+    export_filter: ExportFilter,
+    export_format: str = "ndjson",
+    compress: bool = False,
+    archive: MessageArchive | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Поток байтов выгрузки для StreamingResponse или записи в файл.
+
+    Args:
+        db_manager: Менеджер базы данных
+        table: messages или chat_messages
+        export_filter: Фильтр строк
+        export_format: ndjson или csv
+        compress: Сжать gzip
+        archive: Архив для старых месяцев (опционально)
+
+    Returns:
+        AsyncIterator[bytes]: Куски выгрузки
+
+    Raises:
+        ValueError: Если параметры некорректны (см. validate_export)
+    """
+    export_filter = replace(
+        export_filter, since=_naive(export_filter.since), until=_naive(export_filter.until)
+    )
+    validate_export(table, export_filter, export_format)
+    rows = iter_export_rows(db_manager, table, export_filter, archive)
+    if export_format == "csv":
+        chunks = encode_csv(rows, export_columns(table))
+    else:
+        chunks = encode_ndjson(rows)
+    return gzip_stream(chunks) if compress else chunks
+
+
+def export_filename(table: str, export_format: str, compress: bool) -> str:
+    """Имя файла выгрузки, например messages.ndjson.gz."""
+    return f"{table}.{export_format}" + (".gz" if compress else "")
@@ -2,10 +2,13 @@
 
 import asyncio
 import logging
+import time
 
 from openai import AsyncOpenAI, RateLimitError
 
 from src.context_storage import ContextStorage
+from src.metrics import LLM_REQUEST_SECONDS, LLM_REQUESTS
+from src.tracing import tracer
 
 
 class RateLimitExceededError(Exception):
@@ -59,15 +62,18 @@ class LLMClient:
         self.max_retries = 5
         self.base_delay = 1.0  # seconds
 
-        self.logger.info(f"LLMClient initialized with model: {model}")
+        self.logger.info("LLMClient initialized with model: %s", model)
 
-    async def _api_call_with_retry(self, messages: list, max_retries: int = None) -> str:
+    async def _api_call_with_retry(
+        self, messages: list, max_retries: int = None, task: str = "chat"
+    ) -> str:
         """
-        Выполнить API запрос с retry при rate limit (429).
+        Выполнить API запрос с retry при rate limit (429) и учетом в метриках.
 
         Args:
             messages: Список сообщений для API
             max_retries: Максимальное количество повторов
+            task: Назначение запроса для метрик (dialog, text2sql, interpretation, ...)
 
         Returns:
             str: Ответ от LLM
@@ -76,6 +82,31 @@ class LLMClient:
             RateLimitExceededError: При превышении лимита (429)
             Exception: При других ошибках (не 429)
         """
+        started = time.perf_counter()
+        status = "error"
+        with tracer.start_as_current_span(
+            "llm.request",
+            {"llm.model": self.model, "llm.task": task, "llm.messages": len(messages)},
+        ) as span:
+            try:
+                answer = await self._request_with_retry(messages, max_retries)
+                status = "ok"
+                span.set_attribute("llm.response_length", len(answer))
+                return answer
+            except RateLimitExceededError:
+                status = "rate_limited"
+                raise
+            finally:
+                span.set_attribute("llm.status", status)
+                LLM_REQUEST_SECONDS.labels(self.model, task).observe(
+                    time.perf_counter() - started
+                )
+                LLM_REQUESTS.labels(self.model, task, status).inc()
+
+    async def _request_with_retry(
+        self, messages: list[dict[str, str]], max_retries: int | None
+    ) -> str:
+        """Запрос к API с повторами при 429 (см. _api_call_with_retry)."""
         if max_retries is None:
             max_retries = self.max_retries
 
@@ -121,9 +152,11 @@ class LLMClient:
                     if attempt < max_retries:
                         delay = self.base_delay * (2 ** attempt)  # Exponential backoff
                         self.logger.warning(
-                            f"Rate limit hit (429). "
-                            f"Retry {attempt + 1}/{max_retries} after {delay}s. "
-                            f"Error: {str(retry_error)[:200]}"
+                            "Rate limit hit (429). Retry %s/%s after %ss. Error: %s",
+                            attempt + 1,
+                            max_retries,
+                            delay,
+                            str(retry_error)[:200],
                         )
                         await asyncio.sleep(delay)
                     else:
@@ -137,10 +170,10 @@ class LLMClient:
         except RateLimitExceededError:
             raise
         except Exception as e:
-            self.logger.error(f"Error calling LLM API: {e}", exc_info=True)
+            self.logger.error("Error calling LLM API: %s", e, exc_info=True)
             raise
 
-    async def get_response(self, user_message: str) -> str:
+    async def get_response(self, user_message: str, task: str = "completion") -> str:
         """
         Получить ответ от LLM на одиночное сообщение.
 
@@ -149,6 +182,7 @@ class LLMClient:
 
         Args:
             user_message: Сообщение пользователя
+            task: Назначение запроса для метрик
 
         Returns:
             str: Ответ от LLM
@@ -165,18 +199,20 @@ class LLMClient:
             ]
 
             self.logger.info(
-                f"Sending request to LLM: model={self.model}, message_length={len(user_message)}"
+                "Sending request to LLM: model=%s, message_length=%s",
+                self.model,
+                len(user_message),
             )
 
-            answer = await self._api_call_with_retry(messages)
-            self.logger.info(f"Received response from LLM: length={len(answer)}")
+            answer = await self._api_call_with_retry(messages, task=task)
+            self.logger.info("Received response from LLM: length=%s", len(answer))
             return answer
 
         except RateLimitExceededError as e:
-            self.logger.error(f"Rate limit in get_response: {e}")
+            self.logger.error("Rate limit in get_response: %s", e)
             raise
         except Exception as e:
-            self.logger.error(f"Error in get_response: {e}", exc_info=True)
+            self.logger.error("Error in get_response: %s", e, exc_info=True)
             raise
 
     async def get_response_with_context(self, user_id: int, user_message: str) -> str:
@@ -212,22 +248,30 @@ class LLMClient:
             ]
 
             self.logger.info(
-                f"Sending request to LLM with context: user_id={user_id}, "
-                f"model={self.model}, context_length={len(context)}"
+                "Sending request to LLM with context: user_id=%s, model=%s, context_length=%s",
+                user_id,
+                self.model,
+                len(context),
             )
 
-            answer = await self._api_call_with_retry(messages)
+            answer = await self._api_call_with_retry(messages, task="dialog")
             await self.context_storage.add_message(user_id, "assistant", answer)
 
-            self.logger.info(f"Received response from LLM: user_id={user_id}, length={len(answer)}")
+            self.logger.info(
+                "Received response from LLM: user_id=%s, length=%s",
+                user_id,
+                len(answer),
+            )
             return answer
 
         except RateLimitExceededError as e:
-            self.logger.error(f"Rate limit in get_response_with_context: {e}")
+            self.logger.error("Rate limit in get_response_with_context: %s", e)
             raise
         except Exception as e:
             self.logger.error(
-                f"Error calling LLM API with context for user_id={user_id}: {e}",
+                "Error calling LLM API with context for user_id=%s: %s",
+                user_id,
+                e,
                 exc_info=True,
             )
             raise
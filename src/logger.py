@@ -1,19 +1,167 @@
 """Настройка логирования для приложения."""
 
+import atexit
+import copy
+import json
 import logging
+import queue
+import threading
+from collections.abc import Mapping
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
+from src.config import Config
+from src.tracing import TraceContextFilter
 
-def setup_logger(log_file: str, log_level: str = "INFO") -> logging.Logger:
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s"
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+
+# Фоновый поток, который пишет записи из очереди в файл и консоль
+_listener: QueueListener | None = None
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+class _QueueHandler(QueueHandler):
+    """QueueHandler, который подставляет аргументы, но не форматирует запись целиком."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Подготовить запись к передаче в другой поток.
+
+        Аргументы подставляются сразу (объекты могут измениться позже),
+        а время, уровень и остальная разметка форматируются уже в
+        фоновом потоке. Traceback сохраняется в exc_text, чтобы
+        JsonFormatter мог вынести его в отдельное поле.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _TRACEBACK_FORMATTER.formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной JSON-строкой (для сборщиков логов)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Сериализовать запись."""
+        data = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "span_id": getattr(record, "span_id", "-"),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только каждую N-ю запись от шумных источников.
+
+    Правило задается для имени модуля (context_storage, text2sql) или
+    логгера. Сэмплируются только DEBUG и INFO: предупреждения и ошибки
+    проходят всегда.
+    """
+
+    def __init__(self, rules: Mapping[str, int]) -> None:
+        """
+        Инициализация фильтра.
+
+        Args:
+            rules: {модуль или логгер: N} - оставлять 1 запись из N
+        """
+        super().__init__()
+        self._rules = {key: every for key, every in rules.items() if every > 1}
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Решить, пропускать ли запись."""
+        if record.levelno >= logging.WARNING or not self._rules:
+            return True
+        key = record.module if record.module in self._rules else record.name
+        every = self._rules.get(key)
+        if every is None:
+            return True
+        with self._lock:
+            seen = self._counters.get(key, 0)
+            self._counters[key] = seen + 1
+        return seen % every == 0
+
+
+def parse_sampling(spec: str) -> dict[str, int]:
+    """
+    Разобрать правила сэмплирования из строки вида "text2sql=10,context_storage=20".
+
+    Args:
+        spec: Правила через запятую
+
+    Returns:
+        dict[str, int]: {модуль или логгер: N}
+
+    Raises:
+        ValueError: Если правило записано неверно
+    """
+    rules = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        key, sep, every = item.partition("=")
+        if not sep or not key.strip() or not every.strip().isdigit() or int(every) < 1:
+            raise ValueError(f"Invalid log sampling rule: {item.strip()!r}")
+        rules[key.strip()] = int(every)
+    return rules
+
+
+def stop_logging() -> None:
+    """Дописать записи из очереди и остановить фоновый поток логирования."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def setup_logger(
+    log_file: str,
+    log_level: str = "INFO",
+    *,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    backup_count: int = 5,
+    json_format: bool = False,
+    sampling: Mapping[str, int] | None = None,
+) -> logging.Logger:
     """
     Настраивает логирование в файл и консоль.
 
-    Создает логгер с выводом в файл и консоль. Автоматически создает
-    директорию для лог-файла, если она не существует.
+    Логгер кладет записи в очередь, а файл и консоль пишет фоновый
+    поток QueueListener, поэтому медленный диск не блокирует event loop.
+    Файл ротируется по размеру. Автоматически создает директорию для
+    лог-файла, если она не существует. В каждую запись добавляется
+    trace_id текущего запроса ("-" вне трассы).
 
     Args:
         log_file: Путь к файлу логов
         log_level: Уровень логирования (INFO, WARNING, ERROR и т.д.)
+        max_bytes: Размер файла, после которого он ротируется (0 - без ротации)
+        backup_count: Сколько ротированных файлов хранить
+        json_format: Писать записи JSON-строками вместо текста
+        sampling: Правила сэмплирования DEBUG/INFO, см. SamplingFilter
 
     Returns:
         logging.Logger: Настроенный логгер
@@ -23,26 +171,67 @@ def setup_logger(log_file: str, log_level: str = "INFO") -> logging.Logger:
     log_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Настраиваем форматтер
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+    if json_format:
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT, datefmt="%Y-%m-%d %H:%M:%S")
 
     # Настраиваем логгер
     logger = logging.getLogger("systech_bot")
     logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
 
     # Очищаем существующие обработчики (если есть)
+    stop_logging()
     logger.handlers.clear()
 
     # Обработчик для файла
-    file_handler = logging.FileHandler(log_file, encoding="utf-8")
+    file_handler = RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
 
     # Обработчик для консоли
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+
+    # trace_id и сэмплирование считаются в потоке вызова: контекст
+    # трассы живет в ContextVar, а отброшенные записи не попадают в очередь
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))
+    queue_handler.addFilter(TraceContextFilter())
+    logger.addHandler(queue_handler)
+
+    global _listener
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
 
     return logger
+
+
+def setup_logger_from_config(config: Config, log_file: str | None = None) -> logging.Logger:
+    """
+    Настроить логирование по параметрам LOG_* из конфигурации.
+
+    Args:
+        config: Конфигурация приложения
+        log_file: Путь к файлу логов вместо config.log_file_path
+
+    Returns:
+        logging.Logger: Настроенный логгер
+
+    Raises:
+        ValueError: Если LOG_SAMPLING записан неверно
+    """
+    return setup_logger(
+        log_file or config.log_file_path,
+        config.log_level,
+        max_bytes=config.log_max_bytes,
+        backup_count=config.log_backup_count,
+        json_format=config.log_format == "json",
+        sampling=parse_sampling(config.log_sampling),
+    )
+
+
+atexit.register(stop_logging)
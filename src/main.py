@@ -3,12 +3,14 @@
 import asyncio
 import sys
 
-from src.bot import TelegramBot
+from src.bot_factory import create_bot, load_system_prompt
+from src.bot_supervisor import run_supervised
 from src.config import Config, ConfigError
-from src.context_storage import DatabaseContextStorage
 from src.database import DatabaseManager
-from src.llm_client import LLMClient
-from src.logger import setup_logger
+from src.logger import setup_logger_from_config, stop_logging
+from src.metrics_server import MetricsServer
+from src.tracing import configure_tracing, shutdown_tracing
+from src.webhook_server import WebhookServer
 
 
 async def main() -> None:
@@ -22,77 +24,81 @@ async def main() -> None:
         sys.exit(1)
 
     # Настраиваем логгер
-    logger = setup_logger(config.log_file_path, config.log_level)
+    logger = setup_logger_from_config(config)
+    configure_tracing(config.trace_exporter, config.trace_file, config.trace_buffer_size)
     logger.info("=" * 50)
     logger.info("Starting systech-aidd-test application")
     logger.info("=" * 50)
 
-    # Загружаем системный промпт из файла
-    try:
-        system_prompt = config.load_system_prompt()
-        logger.info(f"Loaded system prompt from {config.system_prompt_file}")
-    except ConfigError as e:
-        logger.error(f"Failed to load system prompt: {e}")
-        logger.warning("Using default system prompt from config")
-        system_prompt = config.system_prompt
-
     # Инициализируем DatabaseManager
-    db_manager = DatabaseManager(database_url=config.database_url, logger=logger)
+    db_manager = DatabaseManager(
+        database_url=config.database_url,
+        logger=logger,
+        read_database_url=config.database_read_url,
+    )
 
     try:
         await db_manager.init_db()
         logger.info("Database initialized successfully")
     except Exception as e:
-        logger.error(f"Failed to initialize database: {e}", exc_info=True)
+        logger.error("Failed to initialize database: %s", e, exc_info=True)
         logger.warning("Exiting due to database initialization failure")
         sys.exit(1)
 
-    # Создаем session для хранилища контекста
-    db_session = db_manager.create_session()
+    if config.bot_workers > 1:
+        # Схема создана выше; рабочие процессы открывают свои подключения
+        await db_manager.close()
+        try:
+            await run_supervised(config, logger)
+        except Exception as e:
+            logger.error("Critical error: %s", e, exc_info=True)
+            sys.exit(1)
+        finally:
+            logger.info("Application stopped")
+        return
 
-    # Создаем хранилище контекста
-    context_storage = DatabaseContextStorage(
-        session=db_session,
-        max_messages=config.max_context_messages,
-        logger=logger,
-    )
+    system_prompt = load_system_prompt(config, logger)
 
-    # Создаем LLM клиент
-    try:
-        llm_client = LLMClient(
-            api_key=config.openrouter_api_key,
-            model=config.openrouter_model,
-            base_url=config.openrouter_base_url,
-            system_prompt=system_prompt,
-            logger=logger,
-            context_storage=context_storage,
-        )
-        logger.info("LLM client initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize LLMClient: {e}", exc_info=True)
-        logger.warning("Bot will run in echo mode without LLM")
-        llm_client = None
+    metrics_server = (
+        MetricsServer(logger, config.metrics_port, config.metrics_host)
+        if config.metrics_port
+        else None
+    )
 
     # Создаем и запускаем бота
     try:
-        bot = TelegramBot(
-            token=config.telegram_token,
-            logger=logger,
-            system_prompt=system_prompt,
-            llm_client=llm_client,
-            bot_name=config.bot_name,
-            db_manager=db_manager,
-        )
-        await bot.start()
+        bot = create_bot(config, logger, system_prompt, db_manager)
+        if metrics_server:
+            await metrics_server.start()
+        if config.bot_mode == "webhook" and config.webhook_url:
+            webhook_server = WebhookServer(
+                dispatcher=bot.dp,
+                bot=bot.bot,
+                logger=logger,
+                base_url=config.webhook_url,
+                path=config.webhook_path,
+                secret_token=config.webhook_secret,
+                host=config.webhook_host,
+                port=config.webhook_port,
+                max_in_flight=config.webhook_max_in_flight,
+                drain_timeout=config.shutdown_timeout,
+            )
+            await bot.start_webhook(webhook_server)
+        else:
+            await bot.start()
     except KeyboardInterrupt:
         logger.info("Received stop signal (Ctrl+C)")
     except Exception as e:
-        logger.error(f"Critical error: {e}", exc_info=True)
+        logger.error("Critical error: %s", e, exc_info=True)
         sys.exit(1)
     finally:
+        if metrics_server:
+            await metrics_server.stop()
         # Закрываем соединение с БД
         await db_manager.close()
+        shutdown_tracing()
         logger.info("Application stopped")
+        stop_logging()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,323 @@
+"""
+Массовые операции над историей сообщений небольшими транзакциями.
+
+Операции можно запускать при работающем боте:
+    python -m src.maintenance restore --user-id 123456
+    python -m src.maintenance reset --user-id 123456 --until 2026-01-01
+    python -m src.maintenance purge --since 2025-01-01 --until 2025-02-01 --checkpoint purge.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, cast
+
+from sqlalchemy import Delete, Update, delete, func, select, update
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.sql.elements import ColumnElement
+
+from src.config import Config
+from src.database import DatabaseManager, db_operation
+from src.logger import setup_logger_from_config, stop_logging
+from src.models import Message
+
+OPERATIONS = ("restore", "reset", "purge")
+
+
+@dataclass(frozen=True)
+class BulkFilter:
+    """Какие сообщения затрагивает операция: пользователь и/или диапазон дат [since, until)."""
+
+    user_id: int | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+
+
+@dataclass
+class BulkProgress:
+    """Состояние операции; по last_id операцию можно продолжить после остановки."""
+
+    operation: str
+    filter: BulkFilter
+    total: int = 0  # Строк под условием на момент старта
+    processed: int = 0
+    last_id: int = 0
+    batches: int = 0
+    elapsed: float = field(default=0.0, compare=False)
+
+    @property
+    def rate(self) -> float:
+        """Строк в секунду."""
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _condition(operation: str, bulk_filter: BulkFilter) -> list[ColumnElement[bool]]:
+    """Условия отбора строк для операции (объединяются через AND)."""
+    conditions: list[ColumnElement[bool]] = []
+    if operation == "restore":
+        conditions.append(Message.is_deleted == True)  # noqa: E712
+    elif operation == "reset":
+        # Литерал в условии нужен, чтобы SQLite выбрал частичные индексы активных строк
+        conditions.append(Message.is_deleted == False)  # noqa: E712
+    if bulk_filter.user_id is not None:
+        conditions.append(Message.user_id == bulk_filter.user_id)
+    if bulk_filter.since is not None:
+        conditions.append(Message.created_at >= bulk_filter.since)
+    if bulk_filter.until is not None:
+        conditions.append(Message.created_at < bulk_filter.until)
+    return conditions
+
+
+class BulkMaintenance:
+    """
+    Восстановление, сброс контекста и удаление сообщений пакетами.
+
+    Строки обходятся по возрастанию id (без OFFSET): пакет id выбирается
+    на соединении чтения, затем изменяется отдельной короткой транзакцией
+    с повторной проверкой условия. Блокировка записи SQLite держится
+    только на время одного пакета, между пакетами выдерживается пауза,
+    поэтому запись бота не ждет долго. После каждого пакета состояние
+    сохраняется в checkpoint-файл (если задан): повторный запуск с тем
+    же файлом продолжает с последнего обработанного id.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        logger: logging.Logger,
+        batch_size: int = 1000,
+        batch_pause: float = 0.05,
+        on_progress: Callable[[BulkProgress], None] | None = None,
+    ) -> None:
+        """
+        Инициализация.
+
+        Args:
+            db_manager: Менеджер базы данных
+            logger: Логгер
+            batch_size: Строк в одной транзакции
+            batch_pause: Пауза между пакетами, секунды
+            on_progress: Вызывается после каждого пакета (опционально)
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+        self.db_manager = db_manager
+        self.logger = logger
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.on_progress = on_progress
+
+    async def count(self, operation: str, bulk_filter: BulkFilter, after_id: int = 0) -> int:
+        """Сколько строк подпадает под операцию (для --dry-run и прогресса)."""
+        async with self.db_manager.get_read_session() as session:
+            total = await session.scalar(
+                select(func.count())
+                .select_from(Message)
+                .where(Message.id > after_id, *_condition(operation, bulk_filter))
+            )
+        return total or 0
+
+    async def _apply(self, operation: str, bulk_filter: BulkFilter, ids: list[int]) -> int:
+        """Изменить пакет строк одной транзакцией; возвращает число затронутых строк."""
+        conditions = [Message.id.in_(ids), *_condition(operation, bulk_filter)]
+        statement: Delete | Update
+        if operation == "purge":
+            statement = delete(Message).where(*conditions)
+        else:
+            statement = (
+                update(Message)
+                .where(*conditions)
+                .values(is_deleted=operation == "reset")
+                .execution_options(synchronize_session=False)
+            )
+        with db_operation(f"maintenance_{operation}"):
+            async with self.db_manager.get_session() as session:
+                # DML возвращает CursorResult: у него есть rowcount
+                result = cast(CursorResult[Any], await session.execute(statement))
+        return result.rowcount
+
+    async def run(
+        self,
+        operation: str,
+        bulk_filter: BulkFilter,
+        checkpoint: Path | None = None,
+        dry_run: bool = False,
+    ) -> BulkProgress:
+        """
+        Выполнить операцию.
+
+        Args:
+            operation: restore (снять soft delete), reset (пометить удаленными)
+                или purge (удалить строки из БД)
+            bulk_filter: Какие строки затрагивать
+            checkpoint: Файл состояния для продолжения после остановки
+                (опционально, удаляется после завершения)
+            dry_run: Только посчитать строки, ничего не менять
+
+        Returns:
+            BulkProgress: Итоговое состояние
+
+        Raises:
+            ValueError: Неизвестная операция, purge/reset без фильтра или
+                checkpoint от другой операции
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {operation}")
+        if operation != "restore" and bulk_filter == BulkFilter():
+            raise ValueError(f"{operation} requires user_id or a date range")
+
+        progress = BulkProgress(operation, bulk_filter)
+        if checkpoint is not None and checkpoint.exists():
+            progress = _load_checkpoint(checkpoint, operation, bulk_filter)
+            self.logger.info(
+                "Resuming %s after id=%s (%s rows done)",
+                operation,
+                progress.last_id,
+                progress.processed,
+            )
+        progress.total = progress.processed + await self.count(
+            operation, bulk_filter, progress.last_id
+        )
+        if dry_run:
+            return progress
+
+        started = time.perf_counter() - progress.elapsed
+        condition = _condition(operation, bulk_filter)
+        while True:
+            async with self.db_manager.get_read_session() as session:
+                result = await session.execute(
+                    select(Message.id)
+                    .where(Message.id > progress.last_id, *condition)
+                    .order_by(Message.id)
+                    .limit(self.batch_size)
+                )
+                ids = list(result.scalars())
+            if not ids:
+                break
+            progress.processed += await self._apply(operation, bulk_filter, ids)
+            progress.last_id = ids[-1]
+            progress.batches += 1
+            progress.elapsed = time.perf_counter() - started
+            if checkpoint is not None:
+                _save_checkpoint(checkpoint, progress)
+            self._report(progress)
+            if self.batch_pause > 0:
+                await asyncio.sleep(self.batch_pause)
+
+        progress.elapsed = time.perf_counter() - started
+        if checkpoint is not None:
+            # Операция завершена: следующий запуск с тем же файлом начнется заново
+            checkpoint.unlink(missing_ok=True)
+        self.logger.info(
+            "Bulk %s done: %s rows in %s batches, %.1fs",
+            operation,
+            progress.processed,
+            progress.batches,
+            progress.elapsed,
+        )
+        return progress
+
+    def _report(self, progress: BulkProgress) -> None:
+        if self.on_progress is not None:
+            self.on_progress(progress)
+        # В лог - примерно каждые 10% и последний пакет
+        step = max(1, progress.total // (self.batch_size * 10))
+        if progress.batches % step == 0 or progress.processed >= progress.total:
+            self.logger.info(
+                "Bulk %s: %s/%s rows, last id=%s, %.0f rows/s",
+                progress.operation,
+                progress.processed,
+                progress.total,
+                progress.last_id,
+                progress.rate,
+            )
+
+
+def _save_checkpoint(path: Path, progress: BulkProgress) -> None:
+    state = asdict(progress)
+    state["filter"] = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in state["filter"].items()
+    }
+    temporary = path.with_suffix(path.suffix + ".tmp")
+    temporary.write_text(json.dumps(state))
+    temporary.replace(path)
+
+
+def _load_checkpoint(path: Path, operation: str, bulk_filter: BulkFilter) -> BulkProgress:
+    state = json.loads(path.read_text())
+    saved_filter = BulkFilter(
+        user_id=state["filter"]["user_id"],
+        since=_parse_datetime(state["filter"]["since"]),
+        until=_parse_datetime(state["filter"]["until"]),
+    )
+    if state["operation"] != operation or saved_filter != bulk_filter:
+        raise ValueError(f"Checkpoint {path} belongs to another operation or filter")
+    return BulkProgress(
+        operation,
+        bulk_filter,
+        processed=state["processed"],
+        last_id=state["last_id"],
+        batches=state["batches"],
+        elapsed=state["elapsed"],
+    )
+
+
+def _parse_datetime(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+async def _main(args: argparse.Namespace) -> None:
+    config = Config.from_env()
+    logger = setup_logger_from_config(config)
+    db_manager = DatabaseManager(config.database_url, logger)
+    try:
+        bulk_filter = BulkFilter(
+            user_id=args.user_id,
+            since=_parse_datetime(args.since),
+            until=_parse_datetime(args.until),
+        )
+        maintenance = BulkMaintenance(db_manager, logger, args.batch_size, args.pause)
+        progress = await maintenance.run(
+            args.operation,
+            bulk_filter,
+            checkpoint=Path(args.checkpoint) if args.checkpoint else None,
+            dry_run=args.dry_run,
+        )
+        if args.dry_run:
+            print(f"Would {args.operation}: {progress.total - progress.processed} messages")
+        else:
+            print(f"{args.operation}: {progress.processed} messages in {progress.elapsed:.1f}s")
+    finally:
+        await db_manager.close()
+        stop_logging()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Точка входа: python -m src.maintenance."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "operation",
+        choices=OPERATIONS,
+        help="restore - вернуть удаленные, reset - сбросить контекст, purge - удалить из БД",
+    )
+    parser.add_argument("--user-id", type=int, help="Только сообщения пользователя")
+    parser.add_argument("--since", help="Начало периода, YYYY-MM-DD[THH:MM] (включительно)")
+    parser.add_argument("--until", help="Конец периода, YYYY-MM-DD[THH:MM] (не включительно)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Строк в транзакции")
+    parser.add_argument("--pause", type=float, default=0.05, help="Пауза между пакетами, с")
+    parser.add_argument("--checkpoint", help="Файл состояния для продолжения после остановки")
+    parser.add_argument("--dry-run", action="store_true", help="Только посчитать строки")
+    asyncio.run(_main(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Склейка серий сообщений пользователя и подавление повторно доставленных обновлений."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject, Update
+
+if TYPE_CHECKING:
+    from src.database import DatabaseManager
+
+
+@dataclass
+class _Arrival:
+    """Поступившее обновление пользователя, ожидающее обработки."""
+
+    message_id: int | None
+    text: str | None  # None - обновление, которое нельзя склеивать (команда, медиа)
+    consumed: bool = False
+
+
+class MessageCoalescingMiddleware(BaseMiddleware):
+    """
+    Дедупликация обновлений и склейка коротких серий сообщений.
+
+    Регистрируется на dp.update до UserUpdateQueueMiddleware и видит
+    обновления в момент поступления, еще до очереди пользователя:
+
+    - обновления с уже виденным update_id или (chat_id, message_id)
+      отбрасываются: это повторная доставка (повтор webhook после
+      таймаута, повторный getUpdates после сетевой ошибки). Если передан
+      db_manager, обработанные update_id сохраняются в БД (processed_updates),
+      и при первом обновлении после рестарта последние seen_size из них
+      загружаются в память: повторы обновлений, обработанных до рестарта,
+      тоже отбрасываются. Обновление, обработка которого не завершилась
+      (процесс упал или был отменен), не сохраняется и будет обработано
+      при повторной доставке;
+    - текстовые сообщения запоминаются, чтобы обработчик первого из них
+      мог через collect() дождаться паузы в серии (debounce) и забрать
+      текст последующих сообщений в один запрос к LLM. Обработчики
+      склеенных сообщений получают None и ничего не делают.
+
+    Команды и нетекстовые сообщения завершают серию: в склейку попадают
+    только сообщения, пришедшие до них, поэтому порядок обработки
+    сохраняется.
+    """
+
+    def __init__(
+        self,
+        window: float = 1.0,
+        max_wait: float = 5.0,
+        max_chars: int = 4000,
+        seen_size: int = 10_000,
+        db_manager: "DatabaseManager | None" = None,
+        bot_id: int = 0,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        Инициализация.
+
+        Args:
+            window: Пауза без новых сообщений, после которой серия считается
+                завершенной, в секундах (0 - без склейки)
+            max_wait: Максимальное ожидание завершения серии в секундах
+            max_chars: Максимальная длина склеенного текста
+            seen_size: Сколько последних update_id/message_id помнить
+            db_manager: Менеджер БД для сохранения обработанных update_id
+                между рестартами (None - только в памяти процесса)
+            bot_id: ID бота, к которому относятся сохраненные update_id
+            logger: Логгер (опционально)
+        """
+        self._window = window
+        self._max_wait = max_wait
+        self._max_chars = max_chars
+        self._seen_size = seen_size
+        self._db_manager = db_manager
+        self._bot_id = bot_id
+        self.logger = logger or logging.getLogger(__name__)
+        self._restored = db_manager is None
+        self._restore_lock = asyncio.Lock()
+        self._seen_updates: OrderedDict[int, None] = OrderedDict()
+        self._seen_messages: OrderedDict[tuple[int, int], None] = OrderedDict()
+        self._arrivals: dict[int, deque[_Arrival]] = {}
+        self._arrived: dict[int, asyncio.Event] = {}
+
+        self.received = 0
+        self.duplicates = 0
+        self.merged = 0
+        self.batches = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        """
+        Отбросить повтор или запомнить поступление, передать обновление дальше
+        и сохранить его update_id после обработки.
+
+        Args:
+            handler: Следующий обработчик в цепочке middleware
+            event: Входящее обновление
+            data: Контекстные данные aiogram
+
+        Returns:
+            Any: Результат обработчика (None для отброшенных повторов)
+        """
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        self.received += 1
+        if not self._restored:
+            await self._restore_seen()
+        if self._is_duplicate(event):
+            self.duplicates += 1
+            return None
+        user = data.get("event_from_user")
+        # При window=0 серии не собираются: collect вернет текст как есть
+        if user is not None and self._window > 0:
+            self._register(user.id, event.message)
+        result = await handler(event, data)
+        await self._save_processed(event.update_id)
+        return result
+
+    async def _restore_seen(self) -> None:
+        """Загрузить update_id, обработанные до рестарта (один раз)."""
+        async with self._restore_lock:
+            if self._restored or self._db_manager is None:
+                return
+            try:
+                update_ids = await self._db_manager.get_processed_updates(
+                    self._bot_id, self._seen_size
+                )
+            except Exception as e:
+                self.logger.warning("Failed to load processed update IDs: %s", e)
+                update_ids = []
+            # Самые старые - в начало LRU, чтобы вытеснялись первыми
+            for update_id in reversed(update_ids):
+                _remember(self._seen_updates, update_id, self._seen_size)
+            self._restored = True
+
+    async def _save_processed(self, update_id: int) -> None:
+        """Сохранить update_id обработанного обновления в БД."""
+        if self._db_manager is None:
+            return
+        try:
+            await self._db_manager.mark_update_processed(self._bot_id, update_id, self._seen_size)
+        except Exception as e:
+            self.logger.warning("Failed to save processed update %s: %s", update_id, e)
+
+    def _is_duplicate(self, update: Update) -> bool:
+        """Проверить и запомнить update_id и (chat_id, message_id)."""
+        duplicate = _remember(self._seen_updates, update.update_id, self._seen_size)
+        if update.message is not None:
+            key = (update.message.chat.id, update.message.message_id)
+            duplicate = _remember(self._seen_messages, key, self._seen_size) or duplicate
+        return duplicate
+
+    def _register(self, user_id: int, message: Message | None) -> None:
+        """Запомнить поступление обновления от пользователя."""
+        if message is not None and _is_mergeable(message):
+            arrival = _Arrival(message.message_id, message.text)
+        elif user_id in self._arrivals:
+            # Граница серии нужна, только пока есть ожидающие сообщения
+            arrival = _Arrival(message.message_id if message else None, None)
+        else:
+            return
+
+        self._arrivals.setdefault(user_id, deque()).append(arrival)
+        if event := self._arrived.get(user_id):
+            event.set()
+
+    async def collect(self, message: Message) -> str | None:
+        """
+        Получить текст для ответа на сообщение с учетом склейки серии.
+
+        Для первого сообщения серии ждет паузы в window секунд (но не дольше
+        max_wait) и возвращает тексты серии через перевод строки. При
+        window=0 возвращает текст сообщения без склейки.
+
+        Args:
+            message: Обрабатываемое сообщение
+
+        Returns:
+            str | None: Текст для LLM или None, если сообщение уже вошло
+                в предыдущую серию
+        """
+        if message.from_user is None:
+            return message.text or ""
+        user_id = message.from_user.id
+        arrivals = self._arrivals.get(user_id)
+        leader = _find(arrivals, message.message_id) if arrivals else None
+        if arrivals is None or leader is None:
+            # Сообщение не проходило через middleware (например, прямой вызов)
+            return message.text or ""
+
+        # Все, что раньше лидера, уже обработано (обработчики пользователя идут по порядку)
+        while arrivals[0] is not leader:
+            arrivals.popleft()
+        if leader.consumed:
+            arrivals.popleft()
+            self._cleanup(user_id)
+            return None
+
+        await self._wait_for_pause(user_id, arrivals)
+
+        arrivals.popleft()
+        texts = [leader.text or ""]
+        length = len(texts[0])
+        for arrival in arrivals:
+            if arrival.text is None or length + 1 + len(arrival.text) > self._max_chars:
+                break
+            arrival.consumed = True
+            texts.append(arrival.text)
+            length += 1 + len(arrival.text)
+
+        if len(texts) > 1:
+            self.batches += 1
+            self.merged += len(texts) - 1
+        self._cleanup(user_id)
+        return "\n".join(texts)
+
+    async def _wait_for_pause(self, user_id: int, arrivals: deque[_Arrival]) -> None:
+        """Ждать, пока пользователь не сделает паузу или серия не прервется."""
+        event = self._arrived.setdefault(user_id, asyncio.Event())
+        deadline = time.monotonic() + self._max_wait
+        try:
+            while not _series_closed(arrivals, self._max_chars):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), min(self._window, remaining))
+                except TimeoutError:
+                    return
+        finally:
+            self._arrived.pop(user_id, None)
+
+    def _cleanup(self, user_id: int) -> None:
+        """Убрать отработавшие границы серий и пустую очередь пользователя."""
+        arrivals = self._arrivals.get(user_id)
+        if arrivals is None:
+            return
+        while arrivals and arrivals[0].text is None:
+            arrivals.popleft()
+        if not arrivals:
+            del self._arrivals[user_id]
+
+    @property
+    def llm_calls_saved(self) -> int:
+        """Сколько запросов к LLM сэкономлено (повторы и склеенные сообщения)."""
+        return self.duplicates + self.merged
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Статистика дедупликации и склейки.
+
+        Returns:
+            dict: received, duplicates, merged, batches и llm_calls_saved
+        """
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "merged": self.merged,
+            "batches": self.batches,
+            "llm_calls_saved": self.llm_calls_saved,
+        }
+
+
+def _remember(seen: OrderedDict[Any, None], key: Any, max_size: int) -> bool:
+    """Запомнить ключ в LRU; вернуть True, если он уже был."""
+    if key in seen:
+        seen.move_to_end(key)
+        return True
+    seen[key] = None
+    if len(seen) > max_size:
+        seen.popitem(last=False)
+    return False
+
+
+def _is_mergeable(message: Message) -> bool:
+    """Можно ли склеивать сообщение с соседними (обычный текст, не команда)."""
+    return bool(message.text and not message.text.startswith("/"))
+
+
+def _find(arrivals: deque[_Arrival], message_id: int) -> _Arrival | None:
+    """Найти поступление по message_id."""
+    for arrival in arrivals:
+        if arrival.message_id == message_id and arrival.text is not None:
+            return arrival
+    return None
+
+
+def _series_closed(arrivals: deque[_Arrival], max_chars: int) -> bool:
+    """Серия завершена: пришла граница или набран максимум текста."""
+    length = -1
+    for arrival in arrivals:
+        if arrival.text is None:
+            return True
+        length += 1 + len(arrival.text)
+        if length >= max_chars:
+            return True
+    return False
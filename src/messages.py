@@ -133,6 +133,39 @@ class BotMessages:
             "Почему так происходит: Бесплатный план ограничен примерно 30-50 запросами в день. Перейдите на платный план для неограниченного использования."
         )
 
+    @staticmethod
+    def admin_only() -> str:
+        """
+        Сообщение для команды, доступной только администраторам.
+
+        Returns:
+            str: Отказ в доступе
+        """
+        return "⛔ Команда доступна только администраторам."
+
+    @staticmethod
+    def export_usage() -> str:
+        """
+        Подсказка по формату команды /export.
+
+        Returns:
+            str: Описание аргументов команды
+        """
+        return (
+            "Использование: /export <user_id> [с YYYY-MM-DD] [по YYYY-MM-DD] [csv]\n"
+            "Пример: /export 123456 2026-01-01 2026-01-31 csv"
+        )
+
+    @staticmethod
+    def export_unavailable() -> str:
+        """
+        Сообщение о недоступности выгрузки (бот запущен без БД).
+
+        Returns:
+            str: Сообщение об ошибке
+        """
+        return "⚠️ Выгрузка недоступна: база данных не подключена."
+
     @staticmethod
     def echo(text: str) -> str:
         """
@@ -0,0 +1,380 @@
+"""Метрики в текстовом формате Prometheus: общий реестр для бота и API."""
+
+import bisect
+import math
+import time
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы бакетов в секундах: от быстрых запросов к БД до долгих ответов LLM
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)  # fmt: skip
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    """Метки в виде {name="value",...} (пустая строка без меток)."""
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """Значение сэмпла (целые без дробной части)."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Базовая метрика с метками.
+
+    Значения для каждого набора меток хранятся в отдельном дочернем
+    объекте; labels() кеширует его, поэтому на горячем пути остаются
+    только поиск в словаре и сложение.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        """
+        Инициализация метрики.
+
+        Args:
+            name: Имя метрики
+            documentation: Описание для строки HELP
+            labelnames: Имена меток
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], Any] = {}
+
+    def labels(self, *values: str) -> Any:
+        """
+        Значение метрики для набора меток.
+
+        Args:
+            *values: Значения меток в порядке labelnames
+
+        Returns:
+            Дочерний объект с методами inc/set/observe
+
+        Raises:
+            ValueError: Если количество значений не совпадает с labelnames
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def _samples(
+        self, labels: dict[str, str], child: Any
+    ) -> Iterator[tuple[str, dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        """Строки экспозиции метрики (HELP, TYPE и сэмплы)."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, values, strict=True))
+            for name, sample_labels, value in self._samples(labels, child):
+                lines.append(f"{name}{_format_labels(sample_labels)} {_format_value(value)}")
+        return lines
+
+
+class _CounterValue:
+    """Значение счетчика для одного набора меток."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Увеличить счетчик."""
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Увеличить счетчик без меток."""
+        self.labels().inc(amount)
+
+    def _samples(
+        self, labels: dict[str, str], child: _CounterValue
+    ) -> Iterator[tuple[str, dict[str, str], float]]:
+        yield f"{self.name}_total", labels, child.value
+
+
+class _GaugeValue:
+    """Значение gauge для одного набора меток."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        """Установить значение."""
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Увеличить значение."""
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Уменьшить значение."""
+        self.value -= amount
+
+
+class Gauge(_Metric):
+    """Текущее значение (глубина очереди, число соединений)."""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeValue:
+        return _GaugeValue()
+
+    def set(self, value: float) -> None:
+        """Установить значение gauge без меток."""
+        self.labels().set(value)
+
+    def _samples(
+        self, labels: dict[str, str], child: _GaugeValue
+    ) -> Iterator[tuple[str, dict[str, str], float]]:
+        yield self.name, labels, child.value
+
+
+class _HistogramValue:
+    """Бакеты, сумма и количество наблюдений для одного набора меток."""
+
+    __slots__ = ("bounds", "count", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # Последний элемент - наблюдения больше верхней границы (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Добавить наблюдение."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Измерить длительность блока в секундах (и при исключении тоже)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    """Распределение значений (задержки) по кумулятивным бакетам."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        """
+        Инициализация гистограммы.
+
+        Args:
+            name: Имя метрики
+            documentation: Описание для строки HELP
+            labelnames: Имена меток
+            buckets: Верхние границы бакетов
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Добавить наблюдение без меток."""
+        self.labels().observe(value)
+
+    def time(self) -> Any:
+        """Измерить длительность блока (метрика без меток)."""
+        return self.labels().time()
+
+    def _samples(
+        self, labels: dict[str, str], child: _HistogramValue
+    ) -> Iterator[tuple[str, dict[str, str], float]]:
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), child.counts, strict=True):
+            cumulative += count
+            yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+        yield f"{self.name}_sum", labels, child.sum
+        yield f"{self.name}_count", labels, child.count
+
+
+_M = TypeVar("_M", bound=_Metric)
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса.
+
+    Помимо обычных метрик принимает источники статистики: функции,
+    возвращающие словарь счетчиков (get_stats() очередей, кешей и
+    планировщиков). Они опрашиваются только при чтении /metrics и не
+    добавляют работы на горячем пути.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация пустого реестра."""
+        self._metrics: dict[str, _Metric] = {}
+        self._sources: dict[str, tuple[str, Callable[[], Mapping[str, float]]]] = {}
+
+    def _register(self, metric: _M) -> _M:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Metric {metric.name} is already registered differently")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        """Создать (или получить уже созданный) счетчик."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        """Создать (или получить уже созданный) gauge."""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Создать (или получить уже созданную) гистограмму."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_stats(
+        self, prefix: str, documentation: str, get_stats: Callable[[], Mapping[str, float]]
+    ) -> None:
+        """
+        Экспортировать словарь статистики как набор gauge prefix_<ключ>.
+
+        Повторная регистрация с тем же prefix заменяет источник
+        (например, при пересоздании бота).
+
+        Args:
+            prefix: Префикс имен метрик
+            documentation: Описание источника для HELP
+            get_stats: Функция, возвращающая {ключ: число}
+        """
+        self._sources[prefix] = (documentation, get_stats)
+
+    def unregister_stats(self, prefix: str) -> None:
+        """
+        Убрать источник статистики.
+
+        Args:
+            prefix: Префикс, переданный в register_stats
+        """
+        self._sources.pop(prefix, None)
+
+    def render(self) -> str:
+        """
+        Все метрики в текстовом формате Prometheus.
+
+        Returns:
+            str: Тело ответа /metrics
+        """
+        lines: list[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for prefix, (documentation, get_stats) in list(self._sources.items()):
+            for key, value in get_stats().items():
+                name = f"{prefix}_{key}"
+                lines.append(f"# HELP {name} {documentation}: {key}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Общий реестр процесса: его отдают /metrics API и side-порт бота
+REGISTRY = MetricsRegistry()
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "llm_request_duration_seconds",
+    "LLM API call latency including rate-limit retries",
+    ("model", "task"),
+)
+LLM_REQUESTS = REGISTRY.counter(
+    "llm_requests", "LLM API calls by outcome", ("model", "task", "status")
+)
+CHAT_FIRST_CHUNK_SECONDS = REGISTRY.histogram(
+    "chat_time_to_first_chunk_seconds",
+    "Time from receiving a web chat message to its first streamed chunk",
+    ("mode",),
+)
+CHAT_CANCELLED = REGISTRY.counter(
+    "chat_cancelled_requests",
+    "Web chat requests cancelled before completion (client disconnected)",
+    ("mode", "stage"),
+)
+TEXT2SQL_GENERATION_SECONDS = REGISTRY.histogram(
+    "text2sql_generation_seconds", "Text-to-SQL generation time (cache misses only)"
+)
+TEXT2SQL_EXECUTION_SECONDS = REGISTRY.histogram(
+    "text2sql_execution_seconds", "Generated SQL execution time"
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "db_query_duration_seconds", "Database call latency by call site", ("operation",)
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests", "Cache lookups by result (hit/miss)", ("cache", "result")
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """
+    Учесть обращение к кешу.
+
+    Args:
+        cache: Имя кеша
+        hit: True - попадание, False - промах
+    """
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
@@ -0,0 +1,73 @@
+"""HTTP side-порт с /metrics и /debug/traces для процессов бота."""
+
+import logging
+
+from aiohttp import web
+
+from src.metrics import CONTENT_TYPE, REGISTRY, MetricsRegistry
+from src.tracing import get_recent_traces
+
+
+class MetricsServer:
+    """
+    Минимальный aiohttp-сервер, отдающий GET /metrics и GET /debug/traces.
+
+    Бот в режиме polling не слушает HTTP, а в режиме webhook порт
+    открыт наружу для Telegram, поэтому метрики отдаются на отдельном
+    порту, доступном только сборщику.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        port: int,
+        host: str = "0.0.0.0",
+        registry: MetricsRegistry = REGISTRY,
+    ) -> None:
+        """
+        Инициализация сервера.
+
+        Args:
+            logger: Логгер для событий
+            port: Порт для прослушивания
+            host: Адрес для прослушивания
+            registry: Реестр метрик
+        """
+        self._logger = logger
+        self._host = host
+        self._port = port
+        self._registry = registry
+        self._runner: web.AppRunner | None = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """Отдать метрики в текстовом формате Prometheus."""
+        return web.Response(
+            body=self._registry.render().encode(), headers={"Content-Type": CONTENT_TYPE}
+        )
+
+    async def handle_traces(self, request: web.Request) -> web.Response:
+        """Отдать последние трассы (параметры limit и trace_id)."""
+        try:
+            limit = int(request.query.get("limit", "20"))
+        except ValueError:
+            return web.json_response({"detail": "limit must be an integer"}, status=400)
+        traces = get_recent_traces(limit, request.query.get("trace_id"))
+        if traces is None:
+            return web.json_response({"detail": "In-memory trace exporter is disabled"}, status=404)
+        return web.json_response(traces)
+
+    async def start(self) -> None:
+        """Начать прием запросов."""
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_get("/debug/traces", self.handle_traces)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        self._logger.info("Metrics available at http://%s:%s/metrics", self._host, self._port)
+
+    async def stop(self) -> None:
+        """Остановить сервер."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -3,9 +3,13 @@
 from datetime import datetime
 from typing import Any
 
-from sqlalchemy import Boolean, Integer, String, Text, func
+from sqlalchemy import BigInteger, Boolean, Connection, Index, Integer, String, Text, func, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
+# Telegram ID не помещаются в 32-битный INTEGER PostgreSQL.
+# В SQLite остается INTEGER (он и так 64-битный), схема не меняется.
+TelegramId = BigInteger().with_variant(Integer(), "sqlite")
+
 
 class Base(DeclarativeBase):
     """Базовый класс для всех моделей."""
@@ -29,7 +33,7 @@ class User(Base):
 
     __tablename__ = "users"
 
-    telegram_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    telegram_id: Mapped[int] = mapped_column(TelegramId, primary_key=True, autoincrement=False)
     username: Mapped[str | None] = mapped_column(String(32), nullable=True, index=True)
     first_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     last_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
@@ -91,7 +95,7 @@ class Message(Base):
     __tablename__ = "messages"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(TelegramId, nullable=False, index=True)
     role: Mapped[str] = mapped_column(String(20), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     length: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -99,7 +103,7 @@ class Message(Base):
         nullable=False, server_default=func.current_timestamp()
     )
     is_deleted: Mapped[bool] = mapped_column(
-        Boolean, nullable=False, default=False, server_default="0", index=True
+        Boolean, nullable=False, default=False, server_default="0"
     )
 
     def __init__(self, **kwargs: Any) -> None:
@@ -145,6 +149,30 @@ class Message(Base):
         }
 
 
+# Частичные индексы по активным (не удаленным) сообщениям, см. миграцию c3f1d8e5a7b2.
+# Условие записано как в запросах (is_deleted == False): SQLite применяет
+# частичный индекс, только если WHERE запроса явно содержит его условие.
+_ACTIVE_MESSAGES = Message.is_deleted == False  # noqa: E712
+
+# История пользователя: DatabaseContextStorage.get_context
+Index(
+    "ix_messages_active_user_recent",
+    Message.user_id,
+    Message.created_at.desc(),
+    Message.id.desc(),
+    sqlite_where=_ACTIVE_MESSAGES,
+    postgresql_where=_ACTIVE_MESSAGES,
+)
+# Выборки за период: RealStatCollector
+Index(
+    "ix_messages_active_created_role",
+    Message.created_at,
+    Message.role,
+    sqlite_where=_ACTIVE_MESSAGES,
+    postgresql_where=_ACTIVE_MESSAGES,
+)
+
+
 class ChatSession(Base):
     """
     Модель для хранения сессий чата.
@@ -159,7 +187,7 @@ class ChatSession(Base):
     __tablename__ = "chat_sessions"
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
-    user_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(TelegramId, nullable=False, index=True)
     mode: Mapped[str] = mapped_column(String(20), nullable=False, default="normal")
     created_at: Mapped[datetime] = mapped_column(
         nullable=False, server_default=func.current_timestamp()
@@ -230,3 +258,94 @@ class ChatMessage(Base):
             "sql_query": self.sql_query,
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
+
+
+class ProcessedUpdate(Base):
+    """
+    Обработанное обновление Telegram.
+
+    Бот помнит последние обработанные update_id, чтобы после рестарта
+    отбросить обновления, которые Telegram доставит повторно (offset
+    подтверждается только следующим getUpdates, webhook повторяется после
+    таймаута). Старые записи удаляются при добавлении новых.
+
+    Attributes:
+        bot_id: ID бота (число до двоеточия в токене)
+        update_id: update_id обработанного обновления
+    """
+
+    __tablename__ = "processed_updates"
+
+    bot_id: Mapped[int] = mapped_column(TelegramId, primary_key=True, autoincrement=False)
+    update_id: Mapped[int] = mapped_column(TelegramId, primary_key=True, autoincrement=False)
+
+
+# Полнотекстовый поиск по content, см. src/search.py и миграцию e8b3f61c2d94.
+# PostgreSQL: GIN-индексы по tsvector. SQLite: внешние (content=) таблицы
+# FTS5 <table>_fts, которые синхронизируются триггерами и не хранят копию
+# текста. Строки FTS связаны с таблицей по rowid: у messages это id, у
+# chat_messages - неявный rowid (id там строковый). Полный VACUUM может
+# перенумеровать неявные rowid, поэтому после него индекс chat_messages
+# перестраивается (create_search_index с rebuild=True).
+SEARCH_TABLES = {"messages": "id", "chat_messages": "rowid"}
+
+for _model in (Message, ChatMessage):
+    Index(
+        f"ix_{_model.__tablename__}_content_search",
+        func.to_tsvector(text("'simple'"), _model.__table__.c.content),
+        postgresql_using="gin",
+    ).ddl_if(dialect="postgresql")
+
+
+def sqlite_search_triggers(table: str) -> list[str]:
+    """Триггеры, синхронизирующие <table>_fts с таблицей (SQLite)."""
+    fts, rowid = f"{table}_fts", SEARCH_TABLES[table]
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.{rowid}, old.content);"
+    )
+    insert_new = f"INSERT INTO {fts}(rowid, content) VALUES (new.{rowid}, new.content);"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        # Только UPDATE OF content: soft delete (is_deleted) индекс не трогает
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF content ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def create_search_index(connection: Connection, rebuild: bool = False) -> None:
+    """
+    Создать таблицы FTS5 и триггеры (SQLite) и заполнить новые таблицы.
+
+    Для run_sync после create_all; на PostgreSQL индексы создает create_all.
+
+    Args:
+        connection: Соединение SQLAlchemy
+        rebuild: Пересобрать и существующие таблицы FTS5 (после массовой
+            загрузки без триггеров или полного VACUUM)
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    for table, rowid in SEARCH_TABLES.items():
+        fts = f"{table}_fts"
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).scalar()
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(content, "
+            f"content='{table}', content_rowid='{rowid}', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        for trigger in sqlite_search_triggers(table):
+            connection.exec_driver_sql(trigger)
+        if rebuild or not exists:
+            connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_search_triggers(connection: Connection) -> None:
+    """Снять триггеры FTS5 на время массовой загрузки (SQLite), см. create_search_index."""
+    if connection.dialect.name != "sqlite":
+        return
+    for table in SEARCH_TABLES:
+        for suffix in ("ai", "ad", "au"):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
@@ -0,0 +1,290 @@
+"""
+Хранение истории: перенос старых и удаленных сообщений в архив.
+
+Запускается по расписанию (cron, systemd timer) отдельным процессом:
+    python -m src.retention
+    python -m src.retention --dry-run
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, delete, func, or_, select, text, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+from src.archive import MessageArchive
+from src.config import Config
+from src.database import DatabaseManager
+from src.logger import setup_logger_from_config, stop_logging
+from src.models import ChatMessage, Message, create_search_index
+
+# Страниц SQLite, освобождаемых за один шаг incremental_vacuum
+VACUUM_PAGES_PER_STEP = 2000
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Правила переноса строк в архив."""
+
+    max_age_days: int = 0  # Архивировать строки старше N дней (0 - не архивировать)
+    deleted_grace_days: int = 30  # Удаленные (soft delete) - старше N дней (0 - не трогать)
+    batch_size: int = 1000  # Строк в одной транзакции удаления
+    batch_pause: float = 0.05  # Пауза между пакетами, секунды: запись бота не ждет долго
+
+
+class RetentionJob:
+    """
+    Перенос строк messages и chat_messages в MessageArchive.
+
+    Строки выбираются пакетами по ключу (без OFFSET), каждый пакет сначала
+    записывается в архив (с fsync), затем удаляется из БД отдельной
+    короткой транзакцией. Блокировка записи SQLite держится только на
+    время одного пакета, поэтому задачу можно запускать при работающем
+    боте. Для удаленных сообщений отсчет ведется от created_at: момент
+    удаления не хранится.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        archive: MessageArchive,
+        policy: RetentionPolicy,
+        logger: logging.Logger,
+    ) -> None:
+        """
+        Инициализация задачи.
+
+        Args:
+            db_manager: Менеджер базы данных
+            archive: Архив, куда переносятся строки
+            policy: Правила переноса
+            logger: Логгер
+        """
+        self.db_manager = db_manager
+        self.archive = archive
+        self.policy = policy
+        self.logger = logger
+
+    def _messages_condition(self, now: datetime) -> ColumnElement[bool] | None:
+        """Условие отбора messages по политике (None - отбирать нечего)."""
+        conditions = []
+        if self.policy.max_age_days > 0:
+            conditions.append(Message.created_at < now - timedelta(days=self.policy.max_age_days))
+        if self.policy.deleted_grace_days > 0:
+            cutoff = now - timedelta(days=self.policy.deleted_grace_days)
+            conditions.append(
+                and_(Message.is_deleted == True, Message.created_at < cutoff)  # noqa: E712
+            )
+        return or_(*conditions) if conditions else None
+
+    async def _count(self, now: datetime) -> dict[str, int]:
+        """Сколько строк подпадает под политику (для --dry-run)."""
+        counts = {"messages": 0, "chat_messages": 0}
+        async with self.db_manager.get_read_session() as session:
+            condition = self._messages_condition(now)
+            if condition is not None:
+                counts["messages"] = (
+                    await session.scalar(select(func.count()).select_from(Message).where(condition))
+                    or 0
+                )
+            if self.policy.max_age_days > 0:
+                cutoff = now - timedelta(days=self.policy.max_age_days)
+                counts["chat_messages"] = (
+                    await session.scalar(
+                        select(func.count())
+                        .select_from(ChatMessage)
+                        .where(ChatMessage.created_at < cutoff)
+                    )
+                    or 0
+                )
+        return counts
+
+    async def _archive_batch(self, table: str, rows: list[dict[str, Any]], ids: list[Any]) -> None:
+        """Записать пакет в архив, затем удалить его из БД."""
+        self.archive.append(table, rows)
+        model = Message if table == "messages" else ChatMessage
+        async with self.db_manager.get_session() as session:
+            await session.execute(delete(model).where(model.id.in_(ids)))
+        if self.policy.batch_pause > 0:
+            await asyncio.sleep(self.policy.batch_pause)
+
+    async def _archive_messages(self, now: datetime) -> int:
+        condition = self._messages_condition(now)
+        if condition is None:
+            return 0
+        columns = list(Message.__table__.columns)
+        last_id, total = 0, 0
+        while True:
+            async with self.db_manager.get_read_session() as session:
+                result = await session.execute(
+                    select(*columns)
+                    .where(Message.id > last_id, condition)
+                    .order_by(Message.id)
+                    .limit(self.policy.batch_size)
+                )
+                rows = [dict(row) for row in result.mappings()]
+            if not rows:
+                return total
+            last_id = rows[-1]["id"]
+            await self._archive_batch("messages", rows, [row["id"] for row in rows])
+            total += len(rows)
+
+    async def _archive_chat_messages(self, now: datetime) -> int:
+        if self.policy.max_age_days <= 0:
+            return 0
+        cutoff = now - timedelta(days=self.policy.max_age_days)
+        columns = list(ChatMessage.__table__.columns)
+        # id - UUID, поэтому ключ пакета (created_at, id)
+        key = tuple_(ChatMessage.created_at, ChatMessage.id)
+        last: tuple[datetime, str] | None = None
+        total = 0
+        while True:
+            query = select(*columns).where(ChatMessage.created_at < cutoff)
+            if last is not None:
+                query = query.where(key > tuple_(*last))
+            async with self.db_manager.get_read_session() as session:
+                result = await session.execute(
+                    query.order_by(ChatMessage.created_at, ChatMessage.id).limit(
+                        self.policy.batch_size
+                    )
+                )
+                rows = [dict(row) for row in result.mappings()]
+            if not rows:
+                return total
+            last = (rows[-1]["created_at"], rows[-1]["id"])
+            await self._archive_batch("chat_messages", rows, [row["id"] for row in rows])
+            total += len(rows)
+
+    async def vacuum(self) -> None:
+        """
+        Вернуть освобожденное место.
+
+        SQLite: incremental_vacuum небольшими шагами, если база переведена
+        в auto_vacuum=INCREMENTAL (см. enable_incremental_vacuum), иначе
+        освобожденные страницы просто переиспользуются. PostgreSQL:
+        VACUUM (ANALYZE) затронутых таблиц.
+        """
+        if self.db_manager.dialect_name == "sqlite":
+            async with self.db_manager.get_session() as session:
+                mode = await session.scalar(text("PRAGMA auto_vacuum"))
+                free_pages = await session.scalar(text("PRAGMA freelist_count"))
+            if mode != 2:
+                self.logger.info(
+                    "SQLite auto_vacuum is not INCREMENTAL, %s free pages will be reused",
+                    free_pages,
+                )
+                return
+            while free_pages:
+                async with self.db_manager.get_session() as session:
+                    await session.execute(
+                        text(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})")
+                    )
+                    remaining = await session.scalar(text("PRAGMA freelist_count"))
+                if remaining >= free_pages:
+                    break
+                free_pages = remaining
+                await asyncio.sleep(self.policy.batch_pause)
+            return
+
+        async with self.db_manager.get_session() as session:
+            connection = await session.connection(
+                execution_options={"isolation_level": "AUTOCOMMIT"}
+            )
+            await connection.execute(text("VACUUM (ANALYZE) messages, chat_messages"))
+
+    async def run(self, now: datetime | None = None, dry_run: bool = False) -> dict[str, int]:
+        """
+        Перенести в архив строки, подпадающие под политику.
+
+        Args:
+            now: Текущий момент (по умолчанию datetime.now())
+            dry_run: Только посчитать строки, ничего не менять
+
+        Returns:
+            dict[str, int]: Количество перенесенных (или найденных) строк по таблицам
+        """
+        now = now or datetime.now()
+        if dry_run:
+            return await self._count(now)
+
+        started = time.perf_counter()
+        archived = {
+            "messages": await self._archive_messages(now),
+            "chat_messages": await self._archive_chat_messages(now),
+        }
+        if any(archived.values()):
+            await self.vacuum()
+        self.logger.info(
+            "Retention archived %s messages and %s chat messages in %.1fs",
+            archived["messages"],
+            archived["chat_messages"],
+            time.perf_counter() - started,
+        )
+        return archived
+
+
+async def enable_incremental_vacuum(db_manager: DatabaseManager) -> None:
+    """
+    Перевести SQLite в auto_vacuum=INCREMENTAL.
+
+    Требует полного VACUUM (перезапись файла, база заблокирована на все
+    время), поэтому выполняется один раз вручную, а не в каждом запуске.
+    """
+    async with db_manager.get_session() as session:
+        connection = await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+        await connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        await connection.exec_driver_sql("VACUUM")
+        # VACUUM перенумеровывает неявные rowid (chat_messages), на них ссылается FTS5
+        await connection.run_sync(create_search_index, True)
+
+
+def policy_from_config(config: Config) -> RetentionPolicy:
+    """Собрать RetentionPolicy из конфигурации."""
+    return RetentionPolicy(
+        max_age_days=config.retention_max_age_days,
+        deleted_grace_days=config.retention_deleted_grace_days,
+        batch_size=config.retention_batch_size,
+        batch_pause=config.retention_batch_pause,
+    )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    config = Config.from_env()
+    logger = setup_logger_from_config(config)
+    db_manager = DatabaseManager(config.database_url, logger)
+    try:
+        if args.enable_incremental_vacuum:
+            await enable_incremental_vacuum(db_manager)
+            logger.info("SQLite switched to auto_vacuum=INCREMENTAL")
+            return
+        archive = MessageArchive(config.archive_dir, config.archive_compression or None)
+        job = RetentionJob(db_manager, archive, policy_from_config(config), logger)
+        result = await job.run(dry_run=args.dry_run)
+        action = "Would archive" if args.dry_run else "Archived"
+        print(f"{action}: messages={result['messages']}, chat_messages={result['chat_messages']}")
+    finally:
+        await db_manager.close()
+        stop_logging()
+
+
+def main() -> None:
+    """Точка входа: python -m src.retention."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Только посчитать строки")
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="Один раз перевести SQLite в auto_vacuum=INCREMENTAL (полный VACUUM)",
+    )
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
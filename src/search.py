@@ -0,0 +1,162 @@
+"""Полнотекстовый поиск по истории: FTS5 (SQLite) или tsvector (PostgreSQL)."""
+
+import html
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import DateTime, text
+
+from src.database import DatabaseManager, db_operation
+from src.models import SEARCH_TABLES
+
+# Границы совпадения во фрагменте: символы из области частного использования
+# не встречаются в тексте, поэтому фрагмент можно безопасно экранировать
+_MARK_START, _MARK_END = "\ue000", "\ue001"
+SNIPPET_TOKENS = 16
+
+
+@dataclass(frozen=True)
+class SearchPage:
+    """Страница результатов поиска."""
+
+    items: list[dict[str, Any]]
+    total: int
+
+
+def fts5_query(query: str) -> str:
+    """
+    Запрос пользователя -> выражение MATCH для FTS5.
+
+    Каждое слово берется в кавычки, поэтому операторы и спецсимволы FTS5
+    не ломают запрос; слова объединяются через AND. Слово с * на конце
+    ищется как префикс: погод* найдет "погода" и "погоду".
+
+    Raises:
+        ValueError: Если в запросе нет слов
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*") and len(word) > 1
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    if not terms:
+        raise ValueError("Empty search query")
+    return " ".join(terms)
+
+
+def highlight(snippet: str) -> str:
+    """Фрагмент с маркерами -> HTML: текст экранирован, совпадения в <mark>."""
+    return html.escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def _sqlite_sql(table: str, user_id: int | None) -> tuple[str, str]:
+    fts, rowid = f"{table}_fts", SEARCH_TABLES[table]
+    if table == "messages":
+        source = (
+            f"FROM {fts} JOIN messages t ON t.{rowid} = {fts}.rowid "
+            f"WHERE {fts} MATCH :query AND t.is_deleted = 0"
+        )
+        columns = "t.id, t.user_id, NULL AS session_id"
+        if user_id is not None:
+            source += " AND t.user_id = :user_id"
+    else:
+        source = (
+            f"FROM {fts} JOIN chat_messages t ON t.{rowid} = {fts}.rowid "
+            "LEFT JOIN chat_sessions s ON s.id = t.user_session_id "
+            f"WHERE {fts} MATCH :query"
+        )
+        columns = "t.id, s.user_id, t.user_session_id AS session_id"
+        if user_id is not None:
+            source += " AND s.user_id = :user_id"
+    # rank FTS5 - bm25: чем меньше, тем релевантнее; наружу отдаем score = -rank
+    rows = (
+        f"SELECT {columns}, t.role, t.created_at, "
+        f"snippet({fts}, 0, '{_MARK_START}', '{_MARK_END}', '…', {SNIPPET_TOKENS}) AS snippet, "
+        f"-{fts}.rank AS score {source} ORDER BY {fts}.rank LIMIT :limit OFFSET :offset"
+    )
+    return rows, f"SELECT COUNT(*) {source}"
+
+
+def _postgres_sql(table: str, user_id: int | None) -> tuple[str, str]:
+    vector = "to_tsvector('simple', t.content)"
+    if table == "messages":
+        source = (
+            "FROM messages t, plainto_tsquery('simple', :query) q "
+            f"WHERE {vector} @@ q AND t.is_deleted = false"
+        )
+        columns = "t.id, t.user_id, NULL AS session_id"
+        if user_id is not None:
+            source += " AND t.user_id = :user_id"
+    else:
+        source = (
+            "FROM chat_messages t LEFT JOIN chat_sessions s ON s.id = t.user_session_id, "
+            f"plainto_tsquery('simple', :query) q WHERE {vector} @@ q"
+        )
+        columns = "t.id, s.user_id, t.user_session_id AS session_id"
+        if user_id is not None:
+            source += " AND s.user_id = :user_id"
+    options = f"StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords={SNIPPET_TOKENS}, MinWords=5"
+    rows = (
+        f"SELECT {columns}, t.role, t.created_at, "
+        f"ts_headline('simple', t.content, q, '{options}') AS snippet, "
+        f"ts_rank({vector}, q) AS score {source} "
+        "ORDER BY score DESC, t.created_at DESC LIMIT :limit OFFSET :offset"
+    )
+    return rows, f"SELECT COUNT(*) {source}"
+
+
+async def search_messages(
+    db_manager: DatabaseManager,
+    query: str,
+    table: str = "messages",
+    user_id: int | None = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> SearchPage:
+    """
+    Найти сообщения по словам, от более релевантных к менее.
+
+    Удаленные (soft delete) сообщения бота не ищутся. Архивные месяцы
+    (src.archive) в индексе не участвуют.
+
+    Args:
+        db_manager: Менеджер базы данных
+        query: Слова для поиска (все должны встретиться в сообщении)
+        table: messages (бот) или chat_messages (веб-чат)
+        user_id: Искать только у этого пользователя (опционально)
+        limit: Размер страницы
+        offset: Смещение страницы
+
+    Returns:
+        SearchPage: Найденные сообщения (id, user_id, session_id, role,
+            created_at, snippet с <mark>, score) и общее количество
+
+    Raises:
+        ValueError: Неизвестная таблица или пустой запрос
+    """
+    if table not in SEARCH_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    if db_manager.dialect_name == "postgresql":
+        if not query.replace("*", "").strip():
+            raise ValueError("Empty search query")
+        rows_sql, count_sql = _postgres_sql(table, user_id)
+        params: dict[str, Any] = {"query": query.replace("*", " ")}
+    else:
+        rows_sql, count_sql = _sqlite_sql(table, user_id)
+        params = {"query": fts5_query(query)}
+    if user_id is not None:
+        params["user_id"] = user_id
+
+    with db_operation("search"):
+        async with db_manager.get_read_session() as session:
+            result = await session.execute(
+                text(rows_sql).columns(created_at=DateTime),
+                {**params, "limit": limit, "offset": offset},
+            )
+            rows = [dict(row) for row in result.mappings()]
+            total = await session.scalar(text(count_sql), params)
+
+    for row in rows:
+        row["snippet"] = highlight(row["snippet"] or "")
+    return SearchPage(items=rows, total=total or 0)
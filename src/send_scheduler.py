@@ -0,0 +1,350 @@
+"""Планировщик исходящих запросов к Telegram с учетом лимитов отправки."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from enum import IntEnum
+from typing import Any, TypeVar
+
+from aiogram.exceptions import TelegramRetryAfter
+
+T = TypeVar("T")
+
+
+class SendPriority(IntEnum):
+    """Приоритет исходящего запроса (меньше - раньше)."""
+
+    MESSAGE = 0
+    CHAT_ACTION = 1
+
+
+class TokenBucket:
+    """
+    Token bucket для ограничения частоты запросов.
+
+    Токены пополняются со скоростью rate в секунду до capacity.
+    pause() запрещает выдачу токенов до указанного момента
+    (используется для retry_after от Telegram).
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Инициализация bucket.
+
+        Args:
+            rate: Скорость пополнения, токенов в секунду
+            capacity: Максимальный запас токенов (размер всплеска)
+        """
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def try_acquire(self) -> float:
+        """
+        Попытаться взять токен.
+
+        Returns:
+            float: 0.0 если токен взят, иначе сколько секунд ждать до следующей попытки
+        """
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    def pause(self, seconds: float) -> None:
+        """
+        Не выдавать токены указанное время.
+
+        Args:
+            seconds: Длительность паузы в секундах
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        # Пополнение начинается после паузы, а не накапливается за ее время
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+    @property
+    def is_idle(self) -> bool:
+        """Bucket полон и не на паузе (его можно удалить без потери состояния)."""
+        now = time.monotonic()
+        refilled = self._tokens + (now - self._updated) * self._rate
+        return now >= self._paused_until and refilled >= self._capacity
+
+
+class SendScheduler:
+    """
+    Очередь исходящих запросов к Telegram Bot API.
+
+    Соблюдает глобальный лимит (около 30 сообщений в секунду на бота) и
+    лимит на чат (около 1 сообщения в секунду) с помощью token bucket.
+    Глобальные токены выдаются по приоритету: индикаторы набора текста
+    получают токен только когда нет ожидающих ответов, поэтому никогда
+    не задерживают их. Сообщения одного чата отправляются по порядку.
+
+    При TelegramRetryAfter чат ставится на паузу на retry_after секунд и
+    сообщение отправляется повторно; индикаторы набора просто отбрасываются.
+    Если за flood_window секунд retry_after получили flood_chats разных
+    чатов, это глобальный лимит бота: на паузу ставится и глобальный
+    bucket, чтобы остальные чаты не продолжали получать 429.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 1.0,
+        max_retries: int = 3,
+        chat_action_timeout: float = 5.0,
+        latency_window: int = 1000,
+        flood_chats: int = 3,
+        flood_window: float = 1.0,
+    ) -> None:
+        """
+        Инициализация планировщика.
+
+        Args:
+            logger: Логгер для событий
+            global_rate: Лимит запросов в секунду на бота
+            chat_rate: Лимит сообщений в секунду на чат
+            chat_burst: Допустимый всплеск сообщений в чат
+            max_retries: Максимум повторов сообщения после retry_after
+            chat_action_timeout: Сколько индикатор набора может ждать очереди
+            latency_window: Количество последних замеров задержки для метрик
+            flood_chats: Сколько чатов с retry_after означает глобальный лимит
+            flood_window: Окно подсчета чатов с retry_after, секунды
+        """
+        self._logger = logger
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        self._chat_depths: dict[int, int] = {}
+        self._max_retries = max_retries
+        self._chat_action_timeout = chat_action_timeout
+        self._flood_chats = flood_chats
+        self._flood_window = flood_window
+        self._recent_floods: dict[int, float] = {}
+
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self._grant_task: asyncio.Task[None] | None = None
+        self._background: set[asyncio.Task[Any]] = set()
+
+        self._latencies: dict[SendPriority, deque[float]] = {
+            priority: deque(maxlen=latency_window) for priority in SendPriority
+        }
+        self._sent = 0
+        self._retried = 0
+        self._dropped_chat_actions = 0
+        self._global_pauses = 0
+
+    async def send_message(self, chat_id: int, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Отправить сообщение в чат с учетом лимитов.
+
+        Args:
+            chat_id: ID чата (ключ лимита на чат)
+            call: Фабрика корутины запроса, например lambda: message.answer(text)
+
+        Returns:
+            T: Результат запроса
+
+        Raises:
+            TelegramRetryAfter: Если лимит повторов исчерпан
+        """
+        enqueued_at = time.monotonic()
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self._chat_depths[chat_id] = self._chat_depths.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                return await self._send_with_retry(chat_id, call, enqueued_at)
+        finally:
+            self._chat_depths[chat_id] -= 1
+            if not self._chat_depths[chat_id]:
+                del self._chat_depths[chat_id]
+                del self._chat_locks[chat_id]
+                bucket = self._chat_buckets.get(chat_id)
+                if bucket is not None and bucket.is_idle:
+                    del self._chat_buckets[chat_id]
+
+    async def _send_with_retry(
+        self, chat_id: int, call: Callable[[], Awaitable[T]], enqueued_at: float
+    ) -> T:
+        """Отправить сообщение, повторяя после retry_after."""
+        attempt = 0
+        while True:
+            await self._acquire_chat(chat_id)
+            await self._acquire_global(SendPriority.MESSAGE)
+            if attempt == 0:
+                self._record_latency(SendPriority.MESSAGE, enqueued_at)
+            try:
+                result = await call()
+            except TelegramRetryAfter as e:
+                if attempt >= self._max_retries:
+                    raise
+                attempt += 1
+                self._retried += 1
+                self._chat_bucket(chat_id).pause(e.retry_after)
+                self._record_flood(chat_id, e.retry_after)
+                self._logger.warning(
+                    "Telegram flood control for chat_id=%s, retry in %ss (attempt %s)",
+                    chat_id,
+                    e.retry_after,
+                    attempt,
+                )
+                continue
+            self._sent += 1
+            return result
+
+    def post_chat_action(self, chat_id: int, call: Callable[[], Awaitable[Any]]) -> None:
+        """
+        Поставить индикатор (например, "печатает...") в очередь без ожидания.
+
+        Индикатор отправляется в фоне с низшим приоритетом и отбрасывается,
+        если не дождался очереди за chat_action_timeout или Telegram
+        ответил retry_after.
+
+        Args:
+            chat_id: ID чата
+            call: Фабрика корутины запроса, например lambda: bot.send_chat_action(...)
+        """
+        task = asyncio.create_task(self._send_chat_action(chat_id, call))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _send_chat_action(self, chat_id: int, call: Callable[[], Awaitable[Any]]) -> None:
+        """Отправить индикатор с низшим приоритетом (best effort)."""
+        enqueued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                self._acquire_global(SendPriority.CHAT_ACTION), self._chat_action_timeout
+            )
+        except TimeoutError:
+            self._dropped_chat_actions += 1
+            return
+
+        self._record_latency(SendPriority.CHAT_ACTION, enqueued_at)
+        try:
+            await call()
+            self._sent += 1
+        except TelegramRetryAfter as e:
+            self._dropped_chat_actions += 1
+            self._record_flood(chat_id, e.retry_after)
+        except Exception as e:
+            self._logger.warning("Failed to send chat action to chat_id=%s: %s", chat_id, e)
+
+    def _record_flood(self, chat_id: int, retry_after: float) -> None:
+        """Учесть retry_after чата; при массовом 429 поставить на паузу глобальный bucket."""
+        now = time.monotonic()
+        self._recent_floods[chat_id] = now
+        self._recent_floods = {
+            chat: at for chat, at in self._recent_floods.items() if now - at <= self._flood_window
+        }
+        if len(self._recent_floods) < self._flood_chats:
+            return
+        self._recent_floods.clear()
+        self._global.pause(retry_after)
+        self._global_pauses += 1
+        self._logger.warning(
+            "Telegram flood control in several chats, pausing all sends for %ss", retry_after
+        )
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        """Получить bucket чата."""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    async def _acquire_chat(self, chat_id: int) -> None:
+        """Дождаться токена чата."""
+        bucket = self._chat_bucket(chat_id)
+        while wait := bucket.try_acquire():
+            await asyncio.sleep(wait)
+
+    async def _acquire_global(self, priority: SendPriority) -> None:
+        """Дождаться глобального токена в порядке приоритета."""
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._grant_task is None or self._grant_task.done():
+            self._grant_task = asyncio.create_task(self._grant_tokens())
+        await future
+
+    async def _grant_tokens(self) -> None:
+        """Выдавать глобальные токены ожидающим, начиная с высшего приоритета."""
+        while self._waiters:
+            # Отмененные ожидания (таймаут индикатора) токен не получают
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                break
+            if wait := self._global.try_acquire():
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            future.set_result(None)
+
+    def _record_latency(self, priority: SendPriority, enqueued_at: float) -> None:
+        """Записать время ожидания в очереди."""
+        self._latencies[priority].append(time.monotonic() - enqueued_at)
+
+    @property
+    def pending(self) -> int:
+        """Количество запросов, ожидающих глобального токена."""
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def get_stats(self) -> dict[str, float]:
+        """
+        Метрики очереди отправки.
+
+        Returns:
+            dict: Счетчики sent, retried, dropped_chat_actions, global_pauses, pending и
+                задержки в очереди (p50/p95/max, мс) для сообщений и индикаторов
+        """
+        stats: dict[str, float] = {
+            "sent": self._sent,
+            "retried": self._retried,
+            "dropped_chat_actions": self._dropped_chat_actions,
+            "global_pauses": self._global_pauses,
+            "pending": self.pending,
+        }
+        for priority, samples in self._latencies.items():
+            name = priority.name.lower()
+            ordered = sorted(samples)
+            stats[f"{name}_latency_p50_ms"] = _percentile(ordered, 0.50) * 1000
+            stats[f"{name}_latency_p95_ms"] = _percentile(ordered, 0.95) * 1000
+            stats[f"{name}_latency_max_ms"] = (ordered[-1] if ordered else 0.0) * 1000
+        return stats
+
+    async def close(self) -> None:
+        """Отменить ожидающие индикаторы и остановить выдачу токенов."""
+        for task in self._background:
+            task.cancel()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self._grant_task and not self._grant_task.done():
+            self._grant_task.cancel()
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    """Процентиль по отсортированной выборке (0.0 для пустой)."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
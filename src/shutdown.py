@@ -0,0 +1,80 @@
+"""Учет выполняющихся операций для корректной остановки (graceful shutdown)."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+
+class ShuttingDownError(RuntimeError):
+    """Операция отклонена: сервис останавливается."""
+
+
+class InFlightTracker:
+    """
+    Счетчик выполняющихся операций с дренажом при остановке.
+
+    Каждая операция (обработка обновления бота, запрос к чату API)
+    выполняется внутри track(). После begin_shutdown() новые операции
+    отклоняются с ShuttingDownError, а drain() ждет завершения уже
+    начатых: ответ LLM и записи в БД успевают выполниться до закрытия
+    подключений.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация счетчика."""
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closing = False
+
+    @property
+    def active(self) -> int:
+        """Количество выполняющихся операций."""
+        return self._active
+
+    @property
+    def closing(self) -> bool:
+        """Остановка начата, новые операции не принимаются."""
+        return self._closing
+
+    @asynccontextmanager
+    async def track(self) -> AsyncIterator[None]:
+        """
+        Выполнить операцию с учетом в счетчике.
+
+        Raises:
+            ShuttingDownError: Если остановка уже начата
+        """
+        if self._closing:
+            raise ShuttingDownError("Service is shutting down")
+        self._active += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._active -= 1
+            if not self._active:
+                self._idle.set()
+
+    def begin_shutdown(self) -> None:
+        """Перестать принимать новые операции."""
+        self._closing = True
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Начать остановку и дождаться завершения выполняющихся операций.
+
+        Args:
+            timeout: Максимальное ожидание в секундах
+
+        Returns:
+            bool: True, если все операции завершились до таймаута
+        """
+        # Задачи, созданные прямо перед остановкой, успевают войти в track()
+        await asyncio.sleep(0)
+        self.begin_shutdown()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
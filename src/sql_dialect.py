@@ -0,0 +1,292 @@
+"""SQL диалекты для Text2SQL: подсказки для LLM и пост-обработка запросов."""
+
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+
+SQLITE_DATE_EXAMPLES = """
+    -- SQLite Date Functions for Queries:
+    -- Current week (ISO week starting Monday):
+    --   WHERE strftime('%W', created_at) = strftime('%W', 'now')
+    --     AND strftime('%Y', created_at) = strftime('%Y', 'now')
+    -- Current month:
+    --   WHERE strftime('%Y-%m', created_at) = strftime('%Y-%m', 'now')
+    -- Last 7 days:
+    --   WHERE created_at >= datetime('now', '-7 days')
+    -- Today:
+    --   WHERE date(created_at) = date('now')
+    -- Specific week range:
+    --   WHERE date(created_at) >= date('now', 'start of week')
+    --     AND date(created_at) < date('now', 'start of week', '+7 days')
+    """
+
+SQLITE_FUNCTIONS = """- strftime(format, timestring): Format datetime (e.g., '%Y-%m-%d', '%W' for week)
+- datetime('now'): Current datetime
+- date('now'): Current date
+- date(timestamp, 'start of week'): Start of week
+- COUNT(*): Count rows
+- SUM(), AVG(), MIN(), MAX(): Aggregation functions"""  # noqa: E501
+
+SQLITE_RULES = """1. Use ONLY SQLite functions - no MySQL functions like YEARWEEK(), CURDATE(), etc.
+2. Use strftime() for date comparisons and formatting
+3. Use 'now' for current timestamp, not CURDATE() or NOW()
+4. For week filtering: use strftime('%W', date) = strftime('%W', 'now') AND strftime('%Y', date) = strftime('%Y', 'now')
+5. For date filtering: use date(timestamp) for comparisons"""  # noqa: E501
+
+POSTGRES_DATE_EXAMPLES = """
+    -- PostgreSQL Date Functions for Queries:
+    -- Current week (ISO week starting Monday):
+    --   WHERE date_trunc('week', created_at) = date_trunc('week', now())
+    -- Current month:
+    --   WHERE date_trunc('month', created_at) = date_trunc('month', now())
+    -- Last 7 days:
+    --   WHERE created_at >= now() - INTERVAL '7 days'
+    -- Today:
+    --   WHERE created_at::date = CURRENT_DATE
+    -- Group by day:
+    --   SELECT created_at::date AS day, COUNT(*) FROM messages GROUP BY day
+    """
+
+POSTGRES_FUNCTIONS = """- date_trunc(field, timestamp): Truncate to 'day', 'week', 'month', 'year'
+- EXTRACT(field FROM timestamp): Extract YEAR, MONTH, DAY, WEEK, DOW, HOUR
+- to_char(timestamp, format): Format datetime (e.g., 'YYYY-MM-DD')
+- now(): Current datetime; CURRENT_DATE: Current date
+- INTERVAL '7 days': Time interval literal
+- COUNT(*): Count rows
+- SUM(), AVG(), MIN(), MAX(): Aggregation functions"""
+
+POSTGRES_RULES = """1. Use ONLY PostgreSQL functions - no SQLite strftime()/datetime('now') or MySQL CURDATE()
+2. Use date_trunc() and INTERVAL arithmetic for date ranges
+3. Use now() or CURRENT_DATE for the current time
+4. For week filtering: use date_trunc('week', date) = date_trunc('week', now())
+5. Boolean columns are real booleans: use is_deleted = FALSE, not is_deleted = 0"""  # noqa: E501
+
+
+SQLITE_SEARCH = """
+    -- Full-text search index (FTS5) over messages.content, rowid = messages.id
+    CREATE VIRTUAL TABLE messages_fts USING fts5(content);
+    -- To find messages by words use MATCH, never content LIKE '%...%' (full scan):
+    --   SELECT m.user_id, COUNT(*) AS messages
+    --   FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+    --   WHERE messages_fts MATCH '"погода"' AND m.is_deleted = 0
+    --   GROUP BY m.user_id
+    -- MATCH syntax: '"word1" "word2"' - both words, '"word1" OR "word2"' - any,
+    -- '"погод"*' - prefix (all word forms), '"exact phrase"'. Case-insensitive.
+    -- ORDER BY messages_fts.rank sorts by relevance."""
+
+POSTGRES_SEARCH = """
+    -- Full-text search: GIN index on to_tsvector('simple', content) of messages.
+    -- To find messages by words use the indexed expression, never content LIKE '%...%':
+    --   SELECT user_id, COUNT(*) AS messages FROM messages
+    --   WHERE to_tsvector('simple', content) @@ plainto_tsquery('simple', 'погода')
+    --     AND is_deleted = FALSE
+    --   GROUP BY user_id
+    -- Prefix search: to_tsquery('simple', 'погод:*')."""
+
+
+def _convert_mysql_to_sqlite(sql: str) -> str:
+    """
+    Convert MySQL specific functions to SQLite equivalents.
+
+    This is a safety measure in case the LLM generates MySQL SQL despite instructions.
+
+    Args:
+        sql: SQL query that may contain MySQL functions
+
+    Returns:
+        SQL query with MySQL functions converted to SQLite equivalents
+    """
+    # Replace CURDATE() with date('now')
+    sql = re.sub(r"\bCURDATE\(\)", "date('now')", sql, flags=re.IGNORECASE)
+
+    # Replace NOW() with datetime('now')
+    sql = re.sub(r"\bNOW\(\)", "datetime('now')", sql, flags=re.IGNORECASE)
+
+    # Replace YEARWEEK(..., 1) with strftime('%W', ...) AND strftime('%Y', ...)
+    # This is a simplified conversion - may need context-specific fixes
+    sql = re.sub(
+        r"YEARWEEK\s*\(\s*([^,]+)\s*,\s*\d+\s*\)",
+        r"(strftime('%W', \1) || strftime('%Y', \1))",
+        sql,
+        flags=re.IGNORECASE,
+    )
+
+    # Replace YEAR(...) with strftime('%Y', ...)
+    sql = re.sub(r"\bYEAR\s*\(\s*([^)]+)\s*\)", r"strftime('%Y', \1)", sql, flags=re.IGNORECASE)
+
+    # Replace MONTH(...) with strftime('%m', ...)
+    sql = re.sub(r"\bMONTH\s*\(\s*([^)]+)\s*\)", r"strftime('%m', \1)", sql, flags=re.IGNORECASE)
+
+    # Replace DAY(...) with strftime('%d', ...)
+    sql = re.sub(r"\bDAY\s*\(\s*([^)]+)\s*\)", r"strftime('%d', \1)", sql, flags=re.IGNORECASE)
+
+    # Replace WEEK(...) with strftime('%W', ...)
+    sql = re.sub(
+        r"\bWEEK\s*\(\s*([^,)]+)(?:\s*,\s*\d+)?\s*\)",
+        r"strftime('%W', \1)",
+        sql,
+        flags=re.IGNORECASE,
+    )
+
+    return sql
+
+
+def _convert_to_postgres(sql: str) -> str:
+    """
+    Convert MySQL and SQLite specific functions to PostgreSQL equivalents.
+
+    Covers the functions the LLM most often leaks from other dialects.
+
+    Args:
+        sql: SQL query that may contain MySQL/SQLite functions
+
+    Returns:
+        SQL query with functions converted to PostgreSQL equivalents
+    """
+    # MySQL: CURDATE() -> CURRENT_DATE
+    sql = re.sub(r"\bCURDATE\(\)", "CURRENT_DATE", sql, flags=re.IGNORECASE)
+
+    # MySQL: YEARWEEK(x, n) -> to_char(x, 'IYYYIW')
+    sql = re.sub(
+        r"YEARWEEK\s*\(\s*([^,]+)\s*,\s*\d+\s*\)",
+        r"to_char(\1, 'IYYYIW')",
+        sql,
+        flags=re.IGNORECASE,
+    )
+
+    # MySQL: YEAR(x)/MONTH(x)/DAY(x)/WEEK(x) -> EXTRACT(... FROM x)
+    for func_name in ("YEAR", "MONTH", "DAY"):
+        sql = re.sub(
+            rf"\b{func_name}\s*\(\s*([^)]+)\s*\)",
+            rf"EXTRACT({func_name} FROM \1)",
+            sql,
+            flags=re.IGNORECASE,
+        )
+    sql = re.sub(
+        r"\bWEEK\s*\(\s*([^,)]+)(?:\s*,\s*\d+)?\s*\)",
+        r"EXTRACT(WEEK FROM \1)",
+        sql,
+        flags=re.IGNORECASE,
+    )
+
+    # SQLite: datetime('now', '-7 days') -> now() - INTERVAL '7 days'
+    sql = re.sub(
+        r"(?:datetime|date)\s*\(\s*'now'\s*,\s*'-\s*(\d+)\s+(\w+)'\s*\)",
+        r"now() - INTERVAL '\1 \2'",
+        sql,
+        flags=re.IGNORECASE,
+    )
+
+    # SQLite: datetime('now') -> now(), date('now') -> CURRENT_DATE
+    sql = re.sub(r"\bdatetime\s*\(\s*'now'\s*\)", "now()", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bdate\s*\(\s*'now'\s*\)", "CURRENT_DATE", sql, flags=re.IGNORECASE)
+
+    # SQLite: strftime('%Y-%m', x) -> to_char(x, 'YYYY-MM')
+    def _strftime_to_char(match: re.Match[str]) -> str:
+        pg_format = (
+            match.group(1)
+            .replace("%Y", "YYYY")
+            .replace("%m", "MM")
+            .replace("%d", "DD")
+            .replace("%W", "IW")
+            .replace("%H", "HH24")
+        )
+        return f"to_char({match.group(2)}, '{pg_format}')"
+
+    sql = re.sub(
+        r"\bstrftime\s*\(\s*'([^']*)'\s*,\s*([^)]+?)\s*\)",
+        _strftime_to_char,
+        sql,
+        flags=re.IGNORECASE,
+    )
+
+    return sql
+
+
+@dataclass(frozen=True)
+class SqlDialect:
+    """
+    Описание SQL диалекта для генерации запросов LLM.
+
+    Attributes:
+        name: Имя диалекта SQLAlchemy ('sqlite', 'postgresql')
+        title: Человекочитаемое название СУБД для промпта
+        date_examples: Примеры работы с датами
+        functions_reference: Справка по ключевым функциям
+        rules: Правила генерации запросов
+        normalize: Пост-обработка SQL (замена функций чужих диалектов)
+        full_text_search: Как искать по тексту сообщений (дополняет схему БД)
+    """
+
+    name: str
+    title: str
+    date_examples: str
+    functions_reference: str
+    rules: str
+    normalize: Callable[[str], str]
+    full_text_search: str = ""
+
+    def build_system_prompt(self, schema: str) -> str:
+        """
+        Сформировать системный промпт для генерации SQL в этом диалекте.
+
+        Args:
+            schema: Описание схемы БД
+
+        Returns:
+            str: Промпт для LLM
+        """
+        return f"""You are a SQL expert for {self.title} database. Convert the natural language question to a {self.title} query.
+
+IMPORTANT: This is a {self.title} database, NOT MySQL. Use {self.title} functions only.
+
+Database schema:
+{schema}
+{self.full_text_search}
+
+{self.title} Date Functions Reference:
+{self.date_examples}
+
+Key {self.title} Functions:
+{self.functions_reference}
+
+RULES:
+{self.rules}
+
+Return ONLY the SQL query, nothing else. Do not include markdown formatting."""  # noqa: E501
+
+
+SQLITE_DIALECT = SqlDialect(
+    name="sqlite",
+    title="SQLite",
+    date_examples=SQLITE_DATE_EXAMPLES,
+    functions_reference=SQLITE_FUNCTIONS,
+    rules=SQLITE_RULES,
+    normalize=_convert_mysql_to_sqlite,
+    full_text_search=SQLITE_SEARCH,
+)
+
+POSTGRES_DIALECT = SqlDialect(
+    name="postgresql",
+    title="PostgreSQL",
+    date_examples=POSTGRES_DATE_EXAMPLES,
+    functions_reference=POSTGRES_FUNCTIONS,
+    rules=POSTGRES_RULES,
+    normalize=_convert_to_postgres,
+    full_text_search=POSTGRES_SEARCH,
+)
+
+_DIALECTS = {dialect.name: dialect for dialect in (SQLITE_DIALECT, POSTGRES_DIALECT)}
+
+
+def get_sql_dialect(name: str) -> SqlDialect:
+    """
+    Получить описание диалекта по имени диалекта SQLAlchemy.
+
+    Args:
+        name: Имя диалекта ('sqlite', 'postgresql')
+
+    Returns:
+        SqlDialect: Описание диалекта (SQLite для неизвестных имен)
+    """
+    return _DIALECTS.get(name, SQLITE_DIALECT)
@@ -3,17 +3,56 @@
 import asyncio
 import hashlib
 import logging
+import re
 import time
-from typing import TYPE_CHECKING, Optional, Tuple
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any, Optional, Tuple
 
 import sqlparse
+from sqlalchemy import text
 from src.api.models import TextToSqlResponse
+from src.archive import MessageArchive, include_archived
+from src.metrics import TEXT2SQL_EXECUTION_SECONDS, TEXT2SQL_GENERATION_SECONDS, record_cache
+from src.tracing import tracer
+from src.sql_dialect import SqlDialect, get_sql_dialect
 
 if TYPE_CHECKING:
+    from sqlalchemy.engine import Row
+    from sqlalchemy.ext.asyncio import AsyncSession
+
     from src.llm_client import LLMClient
     from src.database import DatabaseManager
 
 
+async def _execute_interruptible(
+    session: "AsyncSession", sql: str, timeout: float
+) -> Sequence["Row[Any]"]:
+    """
+    Выполнить запрос с таймаутом; при таймауте или отмене прервать его в БД.
+
+    Запрос выполняется в отдельной задаче: ожидание отменяется сразу, а
+    запрос прерывается до того, как соединение вернется в пул. asyncpg
+    при отмене задачи сам отправляет серверу отмену запроса; aiosqlite
+    выполняет запрос в своем потоке, и его останавливает sqlite3 interrupt().
+
+    Returns:
+        Sequence[Row]: Строки результата
+    """
+    connection = await session.connection()
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+    execution = asyncio.ensure_future(session.execute(text(sql)))
+    try:
+        result = await asyncio.wait_for(asyncio.shield(execution), timeout=timeout)
+    except (asyncio.CancelledError, TimeoutError):
+        if connection.dialect.name == "sqlite" and driver_connection is not None:
+            await driver_connection.interrupt()
+        else:
+            execution.cancel()
+        await asyncio.gather(execution, return_exceptions=True)
+        raise
+    return result.fetchall()
+
+
 class Text2SqlConverter:
     """Конвертор для преобразования вопросов на естественном языке в SQL запросы."""
 
@@ -41,23 +80,9 @@ class Text2SqlConverter:
         is_deleted BOOLEAN DEFAULT FALSE,
         FOREIGN KEY (user_id) REFERENCES users(telegram_id)
     );
-    """
 
-    # SQLite specific date function examples for the LLM
-    SQLITE_DATE_EXAMPLES = """
-    -- SQLite Date Functions for Queries:
-    -- Current week (ISO week starting Monday):
-    --   WHERE strftime('%W', created_at) = strftime('%W', 'now')
-    --     AND strftime('%Y', created_at) = strftime('%Y', 'now')
-    -- Current month:
-    --   WHERE strftime('%Y-%m', created_at) = strftime('%Y-%m', 'now')
-    -- Last 7 days:
-    --   WHERE created_at >= datetime('now', '-7 days')
-    -- Today:
-    --   WHERE date(created_at) = date('now')
-    -- Specific week range:
-    --   WHERE date(created_at) >= date('now', 'start of week')
-    --     AND date(created_at) < date('now', 'start of week', '+7 days')
+    -- Поиск сообщений по словам - через полнотекстовый индекс (MATCH в SQLite),
+    -- см. раздел full-text search ниже
     """
 
     def __init__(
@@ -66,6 +91,8 @@ class Text2SqlConverter:
         db_manager: "DatabaseManager",
         logger: logging.Logger,
         cache_ttl: int = 3600,
+        dialect: SqlDialect | None = None,
+        archive: MessageArchive | None = None,
     ) -> None:
         """
         Инициализация конвертора.
@@ -75,10 +102,15 @@ class Text2SqlConverter:
             db_manager: Менеджер базы данных
             logger: Логгер
             cache_ttl: Time-to-live для кеша в секундах (по умолчанию 1 час)
+            dialect: SQL диалект для промпта и пост-обработки
+                (по умолчанию определяется по db_manager.dialect_name)
+            archive: Архив сообщений для запросов по архивным месяцам (опционально)
         """
         self.llm_client = llm_client
         self.db_manager = db_manager
         self.logger = logger
+        self.dialect = dialect or get_sql_dialect(getattr(db_manager, "dialect_name", "sqlite"))
+        self.archive = archive
         self.cache: dict[str, Tuple[str, float]] = {}  # {question_hash: (sql, timestamp)}
         self.cache_ttl = cache_ttl
         self.schema_cache: Optional[str] = None
@@ -93,7 +125,10 @@ class Text2SqlConverter:
         }
         self.forbidden_keywords = {"DROP", "DELETE", "UPDATE", "INSERT", "ALTER", "TRUNCATE", "EXEC", "EXECUTE"}
 
-        self.logger.info("Text2SqlConverter initialized with caching and security features")
+        self.logger.info(
+            "Text2SqlConverter initialized with caching and security features (dialect=%s)",
+            self.dialect.name,
+        )
 
     def _hash_question(self, question: str) -> str:
         """Хешировать вопрос для использования в кеше."""
@@ -105,19 +140,21 @@ class Text2SqlConverter:
         if question_hash in self.cache:
             sql, timestamp = self.cache[question_hash]
             if time.time() - timestamp < self.cache_ttl:
-                self.logger.info(f"Cache hit for question: {question[:50]}...")
+                self.logger.info("Cache hit for question: %s...", question[:50])
+                record_cache("text2sql", hit=True)
                 return sql
             else:
                 # Кеш истек
                 del self.cache[question_hash]
-                self.logger.info(f"Cache expired for question: {question[:50]}...")
+                self.logger.info("Cache expired for question: %s...", question[:50])
+        record_cache("text2sql", hit=False)
         return None
 
     def _cache_sql(self, question: str, sql: str) -> None:
         """Кешировать SQL запрос."""
         question_hash = self._hash_question(question)
         self.cache[question_hash] = (sql, time.time())
-        self.logger.info(f"Cached SQL for question: {question[:50]}...")
+        self.logger.info("Cached SQL for question: %s...", question[:50])
 
     def _validate_sql(self, sql: str) -> Tuple[bool, Optional[str]]:
         """
@@ -135,9 +172,9 @@ class Text2SqlConverter:
             # Get keywords from SQL
             sql_upper = sql.upper()
 
-            # Check forbidden keywords
+            # Check forbidden keywords (whole words: is_deleted is a column, not DELETE)
             for forbidden in self.forbidden_keywords:
-                if forbidden in sql_upper:
+                if re.search(rf"\b{forbidden}\b", sql_upper):
                     return False, f"Forbidden operation: {forbidden}"
 
             # Check if SELECT is present
@@ -152,49 +189,6 @@ class Text2SqlConverter:
         except Exception as e:
             return False, f"SQL validation error: {str(e)}"
 
-    def _convert_mysql_to_sqlite(self, sql: str) -> str:
-        """
-        Convert MySQL specific functions to SQLite equivalents.
-
-        This is a safety measure in case the LLM generates MySQL SQL despite instructions.
-
-        Args:
-            sql: SQL query that may contain MySQL functions
-
-        Returns:
-            SQL query with MySQL functions converted to SQLite equivalents
-        """
-        import re
-
-        # Replace CURDATE() with date('now')
-        sql = re.sub(r'\bCURDATE\(\)', "date('now')", sql, flags=re.IGNORECASE)
-
-        # Replace NOW() with datetime('now')
-        sql = re.sub(r'\bNOW\(\)', "datetime('now')", sql, flags=re.IGNORECASE)
-
-        # Replace YEARWEEK(..., 1) with strftime('%W', ...) AND strftime('%Y', ...)
-        # This is a simplified conversion - may need context-specific fixes
-        sql = re.sub(
-            r'YEARWEEK\s*\(\s*([^,]+)\s*,\s*\d+\s*\)',
-            r"(strftime('%W', \1) || strftime('%Y', \1))",
-            sql,
-            flags=re.IGNORECASE
-        )
-
-        # Replace YEAR(...) with strftime('%Y', ...)
-        sql = re.sub(r'\bYEAR\s*\(\s*([^)]+)\s*\)', r"strftime('%Y', \1)", sql, flags=re.IGNORECASE)
-
-        # Replace MONTH(...) with strftime('%m', ...)
-        sql = re.sub(r'\bMONTH\s*\(\s*([^)]+)\s*\)', r"strftime('%m', \1)", sql, flags=re.IGNORECASE)
-
-        # Replace DAY(...) with strftime('%d', ...)
-        sql = re.sub(r'\bDAY\s*\(\s*([^)]+)\s*\)', r"strftime('%d', \1)", sql, flags=re.IGNORECASE)
-
-        # Replace WEEK(...) with strftime('%W', ...)
-        sql = re.sub(r'\bWEEK\s*\(\s*([^,)]+)(?:\s*,\s*\d+)?\s*\)', r"strftime('%W', \1)", sql, flags=re.IGNORECASE)
-
-        return sql
-
     async def convert(
         self,
         question: str,
@@ -212,6 +206,15 @@ class Text2SqlConverter:
         Returns:
             TextToSqlResponse с SQL запросом и объяснением
         """
+        with tracer.start_as_current_span("text2sql.convert") as span:
+            response = await self._convert(question, max_retries)
+            span.set_attributes(
+                {"text2sql.cached": response.is_cached, "text2sql.ok": bool(response.sql)}
+            )
+            return response
+
+    async def _convert(self, question: str, max_retries: int) -> TextToSqlResponse:
+        """Генерация SQL с кешем и повторами (см. convert)."""
         # Check cache first
         cached_sql = self._check_cache(question)
         if cached_sql:
@@ -224,39 +227,18 @@ class Text2SqlConverter:
         # Try to generate SQL with retries
         for attempt in range(max_retries):
             try:
-                system_prompt = f"""You are a SQL expert for SQLite database. Convert the natural language question to a SQLite query.
-
-IMPORTANT: This is an SQLite database, NOT MySQL. Use SQLite functions only.
-
-Database schema:
-{self.DB_SCHEMA}
-
-SQLite Date Functions Reference:
-{self.SQLITE_DATE_EXAMPLES}
-
-Key SQLite Functions:
-- strftime(format, timestring): Format datetime (e.g., '%Y-%m-%d', '%W' for week)
-- datetime('now'): Current datetime
-- date('now'): Current date
-- date(timestamp, 'start of week'): Start of week
-- COUNT(*): Count rows
-- SUM(), AVG(), MIN(), MAX(): Aggregation functions
-
-RULES:
-1. Use ONLY SQLite functions - no MySQL functions like YEARWEEK(), CURDATE(), etc.
-2. Use strftime() for date comparisons and formatting
-3. Use 'now' for current timestamp, not CURDATE() or NOW()
-4. For week filtering: use strftime('%W', date) = strftime('%W', 'now') AND strftime('%Y', date) = strftime('%Y', 'now')
-5. For date filtering: use date(timestamp) for comparisons
-
-Return ONLY the SQL query, nothing else. Do not include markdown formatting."""
-
-                response = await asyncio.wait_for(
-                    self.llm_client.get_response(
-                        f"{system_prompt}\n\nQuestion: {question}"
-                    ),
-                    timeout=15.0  # Increased from 5s to 15s for SQL generation
-                )
+                system_prompt = self.dialect.build_system_prompt(self.DB_SCHEMA)
+
+                with (
+                    TEXT2SQL_GENERATION_SECONDS.time(),
+                    tracer.start_as_current_span("text2sql.generate", {"attempt": attempt + 1}),
+                ):
+                    response = await asyncio.wait_for(
+                        self.llm_client.get_response(
+                            f"{system_prompt}\n\nQuestion: {question}", task="text2sql"
+                        ),
+                        timeout=15.0  # Increased from 5s to 15s for SQL generation
+                    )
 
                 # Extract SQL from response (remove markdown if present)
                 sql = response.strip()
@@ -266,14 +248,14 @@ Return ONLY the SQL query, nothing else. Do not include markdown formatting."""
                     sql = sql[:-3]
                 sql = sql.strip()
 
-                # Convert MySQL functions to SQLite equivalents (safety measure)
-                sql = self._convert_mysql_to_sqlite(sql)
-                self.logger.debug(f"Converted SQL (if needed): {sql[:100]}...")
+                # Convert foreign-dialect functions to the target dialect (safety measure)
+                sql = self.dialect.normalize(sql)
+                self.logger.debug("Converted SQL (if needed): %s...", sql[:100])
 
                 # Validate SQL
                 is_valid, error = self._validate_sql(sql)
                 if not is_valid:
-                    self.logger.warning(f"SQL validation failed: {error}")
+                    self.logger.warning("SQL validation failed: %s", error)
                     if attempt < max_retries - 1:
                         continue
                     return TextToSqlResponse(
@@ -293,12 +275,12 @@ Return ONLY the SQL query, nothing else. Do not include markdown formatting."""
                 )
 
             except asyncio.TimeoutError:
-                self.logger.warning(f"LLM timeout on attempt {attempt + 1}")
+                self.logger.warning("LLM timeout on attempt %s", attempt + 1)
                 if attempt < max_retries - 1:
                     await asyncio.sleep(0.5 * (attempt + 1))  # Exponential backoff
                     continue
             except Exception as e:
-                self.logger.error(f"Error generating SQL on attempt {attempt + 1}: {e}")
+                self.logger.error("Error generating SQL on attempt %s: %s", attempt + 1, e)
                 if attempt < max_retries - 1:
                     await asyncio.sleep(0.5 * (attempt + 1))
                     continue
@@ -314,7 +296,8 @@ Return ONLY the SQL query, nothing else. Do not include markdown formatting."""
         self,
         sql: str,
         max_rows: int = 1000,
-        timeout: float = 5.0
+        timeout: float = 5.0,
+        archive_months: Sequence[str] | None = None,
     ) -> str:
         """
         Выполняет SQL запрос и форматирует результаты.
@@ -323,19 +306,26 @@ Return ONLY the SQL query, nothing else. Do not include markdown formatting."""
             sql: SQL запрос для выполнения
             max_rows: Максимальное количество строк для возврата (по умолчанию 1000)
             timeout: Таймаут для выполнения запроса в секундах (по умолчанию 5.0)
+            archive_months: Архивные месяцы YYYY-MM, которые нужно подмешать
+                к таблице messages (требует archive в конструкторе)
 
         Returns:
             Отформатированные результаты как строка
         """
         try:
-            session = self.db_manager.create_session()
-            from sqlalchemy import text
-
-            result = await asyncio.wait_for(
-                session.execute(text(sql)),
-                timeout=timeout
-            )
-            rows = result.fetchall()
+            # Аналитика идет через пул читателей и не блокирует запись
+            with (
+                TEXT2SQL_EXECUTION_SECONDS.time(),
+                tracer.start_as_current_span("text2sql.execute") as span,
+            ):
+                if archive_months and self.archive is not None:
+                    rows = await self._execute_with_archive(
+                        sql, timeout, self.archive, archive_months
+                    )
+                else:
+                    async with self.db_manager.get_read_session() as session:
+                        rows = await _execute_interruptible(session, sql, timeout)
+                span.set_attribute("db.rows", len(rows))
 
             if not rows:
                 return "Результаты не найдены"
@@ -346,17 +336,36 @@ Return ONLY the SQL query, nothing else. Do not include markdown formatting."""
 
             # Форматируем результаты в таблицу
             formatted = self._format_table(rows)
-            self.logger.info(f"SQL query executed successfully, {len(rows)} rows returned")
+            self.logger.info("SQL query executed successfully, %s rows returned", len(rows))
 
             return formatted
 
         except asyncio.TimeoutError:
-            self.logger.error(f"SQL query execution timed out after {timeout} seconds")
+            self.logger.error("SQL query execution timed out after %s seconds", timeout)
             return f"Запрос выполнен не полностью из-за таймаута ({timeout} сек)"
         except Exception as e:
-            self.logger.error(f"Error executing SQL query: {e}")
+            self.logger.error("Error executing SQL query: %s", e)
             return f"Ошибка при выполнении запроса: {str(e)}"
 
+    async def _execute_with_archive(
+        self, sql: str, timeout: float, archive: MessageArchive, archive_months: Sequence[str]
+    ) -> Sequence["Row[Any]"]:
+        """
+        Выполнить запрос по messages вместе с архивными месяцами.
+
+        Архивные строки подмешиваются через временные объекты на отдельной
+        сессии чтения (get_temp_session): соединение записи не занимается,
+        а сам запрос выполняется в режиме только чтения.
+        """
+        async with (
+            self.db_manager.get_temp_session() as session,
+            include_archived(session, archive, archive_months) as archived,
+        ):
+            self.logger.info(
+                "Including %s archived messages from %s", archived, ", ".join(archive_months)
+            )
+            return await _execute_interruptible(session, sql, timeout)
+
     def _extract_sql(self, response: str) -> str:
         """Извлекает SQL запрос из ответа LLM."""
         # Ищем SQL в markdown блоке
@@ -382,7 +391,7 @@ Return ONLY the SQL query, nothing else. Do not include markdown formatting."""
             return response[start:].strip()
         return "SQL запрос для анализа данных"
 
-    def _format_table(self, rows: list) -> str:
+    def _format_table(self, rows: Sequence[Any]) -> str:
         """Форматирует результаты в таблицу."""
         if not rows:
             return "Нет результатов"
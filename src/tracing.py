@@ -0,0 +1,352 @@
+"""Легковесная трассировка запросов с локальным экспортом спанов."""
+
+import json
+import logging
+import queue
+import secrets
+import threading
+import time
+import traceback
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+AttributeValue = str | int | float | bool
+
+
+@dataclass
+class Span:
+    """
+    Интервал работы внутри трассы.
+
+    Набор методов повторяет API OpenTelemetry (set_attribute,
+    record_exception, set_status), поэтому инструментированный код можно
+    перевести на SDK OpenTelemetry без изменений в местах вызова.
+    """
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict[str, AttributeValue] = field(default_factory=dict)
+    events: list[dict[str, Any]] = field(default_factory=list)
+    status: str = "UNSET"
+    status_description: str | None = None
+
+    def set_attribute(self, key: str, value: AttributeValue) -> None:
+        """Установить атрибут спана."""
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict[str, AttributeValue]) -> None:
+        """Установить несколько атрибутов."""
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: dict[str, AttributeValue] | None = None) -> None:
+        """Отметить событие внутри спана (например, первый chunk ответа)."""
+        self.events.append(
+            {"name": name, "time_unix_nano": time.time_ns(), "attributes": attributes or {}}
+        )
+
+    def record_exception(self, exception: BaseException) -> None:
+        """Записать исключение как событие спана."""
+        self.add_event(
+            "exception",
+            {
+                "exception.type": type(exception).__name__,
+                "exception.message": str(exception)[:500],
+                "exception.stacktrace": "".join(traceback.format_exception(exception, limit=5))[
+                    -2000:
+                ],
+            },
+        )
+
+    def set_status(self, status: str, description: str | None = None) -> None:
+        """Установить статус: OK или ERROR."""
+        self.status = status
+        self.status_description = description
+
+    @property
+    def duration_ms(self) -> float | None:
+        """Длительность в миллисекундах (None, пока спан не завершен)."""
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict[str, Any]:
+        """Спан в JSON-совместимом виде (имена полей как в OTLP JSON)."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": {"code": self.status, "description": self.status_description},
+        }
+
+
+class SpanExporter(Protocol):
+    """Приемник завершенных спанов."""
+
+    def export(self, span: Span) -> None:
+        """Принять завершенный спан."""
+        ...
+
+    def shutdown(self) -> None:
+        """Сбросить буферы и освободить ресурсы."""
+        ...
+
+
+class RingBufferExporter:
+    """Последние N спанов в памяти процесса (для debug-эндпоинта)."""
+
+    def __init__(self, max_spans: int = 5000) -> None:
+        """
+        Инициализация буфера.
+
+        Args:
+            max_spans: Сколько последних спанов хранить
+        """
+        self._spans: deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        """Добавить спан, вытеснив самый старый при переполнении."""
+        self._spans.append(span)
+
+    def shutdown(self) -> None:
+        """Буфер в памяти сбрасывать не нужно."""
+
+    def get_traces(self, limit: int = 20, trace_id: str | None = None) -> list[dict[str, Any]]:
+        """
+        Последние трассы со спанами.
+
+        Args:
+            limit: Максимальное количество трасс
+            trace_id: Вернуть только эту трассу
+
+        Returns:
+            list[dict]: trace_id, root (имя корневого спана), duration_ms и
+                spans в порядке начала; самые новые трассы первыми
+        """
+        traces: dict[str, list[Span]] = {}
+        for span in reversed(self._spans):
+            if trace_id is not None and span.trace_id != trace_id:
+                continue
+            if span.trace_id not in traces:
+                if len(traces) >= limit:
+                    continue
+                traces[span.trace_id] = []
+            traces[span.trace_id].append(span)
+
+        result = []
+        for current_id, spans in traces.items():
+            spans.sort(key=lambda span: span.start_ns)
+            root = next((span for span in spans if span.parent_id is None), spans[0])
+            result.append(
+                {
+                    "trace_id": current_id,
+                    "root": root.name,
+                    "duration_ms": root.duration_ms,
+                    "spans": [span.to_dict() for span in spans],
+                }
+            )
+        return result
+
+
+class JsonlFileExporter:
+    """
+    Запись спанов в JSONL-файл (одна строка - один спан).
+
+    export() только кладет спан в очередь: сериализацию и запись в файл
+    выполняет фоновый поток, как QueueListener у логгера, поэтому
+    медленный диск не блокирует event loop. Поток сбрасывает буфер на
+    диск, когда очередь опустела или набралось flush_every спанов.
+    """
+
+    def __init__(self, path: str, flush_every: int = 50) -> None:
+        """
+        Инициализация экспортера.
+
+        Args:
+            path: Путь к JSONL-файлу (директория создается автоматически)
+            flush_every: Сбрасывать буфер на диск не реже чем каждые N спанов
+        """
+        file_path = Path(path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = file_path.open("a", encoding="utf-8")
+        self._flush_every = flush_every
+        self._queue: queue.SimpleQueue[Span | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        """Поставить спан в очередь на запись."""
+        self._queue.put(span)
+
+    def _write_loop(self) -> None:
+        """Писать спаны из очереди до маркера конца (None)."""
+        unflushed = 0
+        while (span := self._queue.get()) is not None:
+            self._file.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+            unflushed += 1
+            if unflushed >= self._flush_every or self._queue.empty():
+                self._file.flush()
+                unflushed = 0
+        self._file.flush()
+
+    def shutdown(self) -> None:
+        """Дописать спаны из очереди и закрыть файл."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if not self._file.closed:
+            self._file.close()
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Создает спаны и передает завершенные в экспортер.
+
+    Текущий спан хранится в ContextVar: вложенные вызовы в той же задаче
+    asyncio (и в задачах, созданных из нее) автоматически становятся
+    дочерними спанами одной трассы.
+    """
+
+    def __init__(self, exporter: SpanExporter | None = None) -> None:
+        """
+        Инициализация трассировщика.
+
+        Args:
+            exporter: Приемник спанов (None - трассировка выключена)
+        """
+        self.exporter = exporter
+
+    @contextmanager
+    def start_as_current_span(
+        self, name: str, attributes: dict[str, AttributeValue] | None = None
+    ) -> Iterator[Span]:
+        """
+        Выполнить блок внутри нового спана.
+
+        Исключение из блока записывается в спан (статус ERROR) и
+        пробрасывается дальше.
+
+        Args:
+            name: Имя операции, например "text2sql.convert"
+            attributes: Начальные атрибуты
+
+        Yields:
+            Span: Созданный спан
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            attributes=dict(attributes or {}),
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            span.set_status("ERROR", f"{type(e).__name__}: {e}"[:200])
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Асинхронный генератор закрыт из другого контекста
+                _current_span.set(parent)
+            if self.exporter is not None:
+                self.exporter.export(span)
+
+
+def get_current_span() -> Span | None:
+    """Текущий спан задачи (None вне трассы)."""
+    return _current_span.get()
+
+
+def current_trace_id() -> str | None:
+    """ID текущей трассы (None вне трассы)."""
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+class TraceContextFilter(logging.Filter):
+    """Добавляет в запись лога trace_id и span_id текущего спана ("-" вне трассы)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Дополнить запись и пропустить ее дальше."""
+        span = _current_span.get()
+        record.trace_id = span.trace_id if span else "-"
+        record.span_id = span.span_id if span else "-"
+        return True
+
+
+# Трассировщик процесса; экспортер задает configure_tracing()
+tracer = Tracer(RingBufferExporter())
+
+
+def configure_tracing(
+    exporter: str = "memory", path: str | None = None, buffer_size: int = 5000
+) -> None:
+    """
+    Настроить экспорт спанов процесса.
+
+    Args:
+        exporter: memory (кольцевой буфер), jsonl (файл) или off
+        path: Путь к JSONL-файлу для exporter=jsonl
+        buffer_size: Размер кольцевого буфера для exporter=memory
+
+    Raises:
+        ValueError: Неизвестный тип экспортера или jsonl без пути
+    """
+    if tracer.exporter is not None:
+        tracer.exporter.shutdown()
+    if exporter == "memory":
+        tracer.exporter = RingBufferExporter(buffer_size)
+    elif exporter == "jsonl":
+        if not path:
+            raise ValueError("TRACE_FILE is required for the jsonl trace exporter")
+        tracer.exporter = JsonlFileExporter(path)
+    elif exporter == "off":
+        tracer.exporter = None
+    else:
+        raise ValueError(f"Unknown trace exporter: {exporter!r}")
+
+
+def shutdown_tracing() -> None:
+    """Сбросить экспортер спанов на диск (при остановке процесса)."""
+    if tracer.exporter is not None:
+        tracer.exporter.shutdown()
+
+
+def get_recent_traces(limit: int = 20, trace_id: str | None = None) -> list[dict[str, Any]] | None:
+    """
+    Последние трассы из кольцевого буфера.
+
+    Args:
+        limit: Максимальное количество трасс
+        trace_id: Вернуть только эту трассу
+
+    Returns:
+        list[dict] | None: Трассы или None, если экспорт идет не в память
+    """
+    if isinstance(tracer.exporter, RingBufferExporter):
+        return tracer.exporter.get_traces(limit, trace_id)
+    return None
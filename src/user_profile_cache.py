@@ -0,0 +1,81 @@
+"""LRU-кеш профилей пользователей Telegram для пропуска лишних записей в БД."""
+
+from collections import OrderedDict
+
+from src.metrics import record_cache
+
+
+class UserProfileCache:
+    """
+    LRU-кеш хешей профилей пользователей.
+
+    Профиль Telegram (username, имя, фамилия, язык) меняется редко, а
+    сохраняется на каждое сообщение. Кеш хранит хеш последнего сохраненного
+    профиля и позволяет не обращаться к БД, пока профиль не изменился.
+    Кеш локален для процесса: после рестарта первая запись снова идет в БД.
+    """
+
+    def __init__(self, max_size: int = 10_000) -> None:
+        """
+        Инициализация кеша.
+
+        Args:
+            max_size: Максимальное количество пользователей в кеше
+        """
+        self._profiles: OrderedDict[int, int] = OrderedDict()
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _hash_profile(profile: tuple[str | None, ...]) -> int:
+        """Хеш профиля (стабилен в пределах процесса)."""
+        return hash(profile)
+
+    def is_unchanged(self, telegram_id: int, profile: tuple[str | None, ...]) -> bool:
+        """
+        Проверить, совпадает ли профиль с последним сохраненным.
+
+        Args:
+            telegram_id: Telegram ID пользователя
+            profile: Поля профиля в фиксированном порядке
+
+        Returns:
+            bool: True если профиль уже сохранен и не изменился
+        """
+        cached_hash = self._profiles.get(telegram_id)
+        if cached_hash is not None and cached_hash == self._hash_profile(profile):
+            self._profiles.move_to_end(telegram_id)
+            self.hits += 1
+            record_cache("user_profile", hit=True)
+            return True
+
+        self.misses += 1
+        record_cache("user_profile", hit=False)
+        return False
+
+    def remember(self, telegram_id: int, profile: tuple[str | None, ...]) -> None:
+        """
+        Запомнить сохраненный в БД профиль.
+
+        Args:
+            telegram_id: Telegram ID пользователя
+            profile: Поля профиля в фиксированном порядке
+        """
+        self._profiles[telegram_id] = self._hash_profile(profile)
+        self._profiles.move_to_end(telegram_id)
+        if len(self._profiles) > self._max_size:
+            self._profiles.popitem(last=False)
+
+    def forget(self, telegram_id: int) -> None:
+        """
+        Удалить пользователя из кеша (следующее сохранение пойдет в БД).
+
+        Args:
+            telegram_id: Telegram ID пользователя
+        """
+        self._profiles.pop(telegram_id, None)
+
+    def __len__(self) -> int:
+        """Количество пользователей в кеше."""
+        return len(self._profiles)
@@ -0,0 +1,128 @@
+"""Middleware для параллельной обработки обновлений с порядком внутри пользователя."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class UserUpdateQueueMiddleware(BaseMiddleware):
+    """
+    Очередь обработки обновлений с ключом по from_user.id.
+
+    Обновления разных пользователей обрабатываются параллельно, обновления
+    одного пользователя - строго по очереди в порядке поступления: контекст
+    диалога дописывается последовательно и ответы не перемешиваются.
+    Общее количество одновременно работающих обработчиков ограничено
+    max_in_flight. Ожидающие своей очереди обновления слот не занимают,
+    поэтому длинная очередь одного пользователя не блокирует остальных.
+
+    Регистрируется как outer middleware на dp.update: asyncio.Lock выдает
+    блокировку в порядке вызова acquire(), а до этой точки aiogram не
+    переключает задачи, поэтому порядок совпадает с порядком обновлений.
+    """
+
+    def __init__(self, max_in_flight: int = 100) -> None:
+        """
+        Инициализация очереди.
+
+        Args:
+            max_in_flight: Максимум одновременно работающих обработчиков
+        """
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._user_locks: dict[int, asyncio.Lock] = {}
+        # Обновления пользователя в очереди, включая обрабатываемое
+        self._user_depths: dict[int, int] = {}
+        self._in_flight = 0
+        self._peak_pending = 0
+        self._processed = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        """
+        Выполнить обработчик в очереди пользователя.
+
+        Args:
+            handler: Следующий обработчик в цепочке middleware
+            event: Входящее обновление
+            data: Контекстные данные aiogram
+
+        Returns:
+            Any: Результат обработчика
+        """
+        user = data.get("event_from_user")
+        if user is None:
+            return await self._run(handler, event, data)
+
+        user_id = user.id
+        lock = self._user_locks.setdefault(user_id, asyncio.Lock())
+        self._user_depths[user_id] = self._user_depths.get(user_id, 0) + 1
+        self._peak_pending = max(self._peak_pending, self.pending)
+        try:
+            async with lock:
+                return await self._run(handler, event, data)
+        finally:
+            self._user_depths[user_id] -= 1
+            if not self._user_depths[user_id]:
+                del self._user_depths[user_id]
+                del self._user_locks[user_id]
+
+    async def _run(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        """Выполнить обработчик, заняв глобальный слот."""
+        async with self._slots:
+            self._in_flight += 1
+            try:
+                return await handler(event, data)
+            finally:
+                self._in_flight -= 1
+                self._processed += 1
+
+    @property
+    def in_flight(self) -> int:
+        """Количество работающих обработчиков."""
+        return self._in_flight
+
+    @property
+    def pending(self) -> int:
+        """Количество обновлений пользователей в очередях, включая обрабатываемые."""
+        return sum(self._user_depths.values())
+
+    def queue_depth(self, user_id: int) -> int:
+        """
+        Глубина очереди пользователя.
+
+        Args:
+            user_id: Telegram ID пользователя
+
+        Returns:
+            int: Количество обновлений пользователя в очереди, включая обрабатываемое
+        """
+        return self._user_depths.get(user_id, 0)
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Статистика очередей.
+
+        Returns:
+            dict: in_flight, pending, active_users, max_user_depth,
+                peak_pending и processed
+        """
+        return {
+            "in_flight": self._in_flight,
+            "pending": self.pending,
+            "active_users": len(self._user_depths),
+            "max_user_depth": max(self._user_depths.values(), default=0),
+            "peak_pending": self._peak_pending,
+            "processed": self._processed,
+        }
@@ -0,0 +1,190 @@
+"""HTTP-приемник webhook-обновлений Telegram на aiohttp."""
+
+import asyncio
+import hmac
+import logging
+import signal
+from contextlib import suppress
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Легковесный webhook-приемник для aiogram Dispatcher.
+
+    Принимает POST от Telegram, проверяет секретный токен, отвечает 200
+    сразу после разбора обновления и обрабатывает его в фоне. Количество
+    одновременно обрабатываемых обновлений ограничено max_in_flight:
+    при заполнении новые запросы ждут свободный слот, создавая
+    backpressure для Telegram вместо неограниченного роста задач.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        logger: logging.Logger,
+        base_url: str,
+        path: str = "/telegram/webhook",
+        secret_token: str | None = None,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        max_in_flight: int = 100,
+        drain_timeout: float = 30.0,
+    ) -> None:
+        """
+        Инициализация приемника.
+
+        Args:
+            dispatcher: aiogram Dispatcher с зарегистрированными обработчиками
+            bot: aiogram Bot для обработки обновлений
+            logger: Логгер для событий
+            base_url: Публичный URL, по которому Telegram доступен приемник
+            path: Путь webhook-эндпоинта
+            secret_token: Секрет для заголовка X-Telegram-Bot-Api-Secret-Token
+            host: Адрес для прослушивания
+            port: Порт для прослушивания
+            max_in_flight: Максимум одновременно обрабатываемых обновлений
+            drain_timeout: Сколько ждать обработки принятых обновлений при остановке
+        """
+        self._dispatcher = dispatcher
+        self._bot = bot
+        self._logger = logger
+        self._webhook_url = base_url.rstrip("/") + path
+        self._path = path
+        self._secret_token = secret_token
+        self._host = host
+        self._port = port
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._drain_timeout = drain_timeout
+        self._tasks: set[asyncio.Task[Any]] = set()
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def in_flight(self) -> int:
+        """Количество обновлений в обработке."""
+        return len(self._tasks)
+
+    def create_app(self) -> web.Application:
+        """
+        Создать aiohttp приложение с webhook-эндпоинтом.
+
+        Returns:
+            web.Application: Приложение для запуска или тестов
+        """
+        app = web.Application()
+        app.router.add_post(self._path, self.handle_update)
+        return app
+
+    def _is_authorized(self, request: web.Request) -> bool:
+        """Проверить секретный токен запроса."""
+        if not self._secret_token:
+            return True
+        received = request.headers.get(SECRET_TOKEN_HEADER, "")
+        return hmac.compare_digest(received, self._secret_token)
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """
+        Обработчик POST-запроса с обновлением Telegram.
+
+        Args:
+            request: HTTP запрос от Telegram
+
+        Returns:
+            web.Response: 200 при приеме, 401 при неверном токене,
+                400 при некорректном теле запроса
+        """
+        if not self._is_authorized(request):
+            self._logger.warning("Rejected webhook request from %s: bad secret", request.remote)
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self._bot})
+        except ValueError as e:
+            self._logger.warning("Rejected malformed webhook update: %s", e)
+            return web.Response(status=400)
+
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response(status=200)
+
+    async def _process_update(self, update: Update) -> None:
+        """Передать обновление в Dispatcher и освободить слот."""
+        try:
+            await self._dispatcher.feed_update(self._bot, update)
+        except Exception as e:
+            self._logger.error("Error processing update %s: %s", update.update_id, e, exc_info=True)
+        finally:
+            self._slots.release()
+
+    async def start(self) -> None:
+        """Запустить HTTP-сервер и зарегистрировать webhook в Telegram."""
+        await self._dispatcher.emit_startup(bot=self._bot)
+
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+
+        await self._bot.set_webhook(
+            url=self._webhook_url,
+            secret_token=self._secret_token,
+            allowed_updates=self._dispatcher.resolve_used_update_types(),
+        )
+        self._logger.info(
+            "Webhook server listening on %s:%s%s, webhook URL: %s",
+            self._host,
+            self._port,
+            self._path,
+            self._webhook_url,
+        )
+
+    async def stop(self) -> None:
+        """
+        Остановить HTTP-сервер и дождаться обработки принятых обновлений.
+
+        Webhook в Telegram не удаляется: обновления, пришедшие во время
+        рестарта, Telegram доставит повторно. Обновления, не обработанные
+        за drain_timeout, остаются выполняться у вызывающего кода.
+        """
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._tasks:
+            self._logger.info("Waiting for %s webhook updates in processing", len(self._tasks))
+            _, pending = await asyncio.wait(self._tasks, timeout=self._drain_timeout)
+            if pending:
+                self._logger.warning(
+                    "%s webhook updates not processed in %.0fs",
+                    len(pending),
+                    self._drain_timeout,
+                )
+        await self._dispatcher.emit_shutdown(bot=self._bot)
+        self._logger.info("Webhook server stopped")
+
+    async def run_forever(self) -> None:
+        """Запустить сервер и работать до SIGINT/SIGTERM или отмены задачи."""
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        signals = (signal.SIGINT, signal.SIGTERM)
+        for sig in signals:
+            # На Windows обработчики сигналов в цикле событий недоступны
+            with suppress(NotImplementedError, RuntimeError):
+                loop.add_signal_handler(sig, stop.set)
+        await self.start()
+        try:
+            await stop.wait()
+            self._logger.info("Received stop signal, shutting down webhook server")
+        finally:
+            for sig in signals:
+                with suppress(NotImplementedError, RuntimeError):
+                    loop.remove_signal_handler(sig)
+            await self.stop()
@@ -1,10 +1,14 @@
 """Shared pytest fixtures for all tests."""
 
 import logging
+import os
+import shutil
+import socket
+import subprocess
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from aiogram.types import Message, User
+from aiogram.types import Message, Update, User
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -14,6 +18,29 @@ from src.llm_client import LLMClient
 from src.models import Base
 
 
+def make_update_data(
+    update_id: int, user_id: int = 12345, text: str = "hi", message_id: int | None = None
+) -> dict:
+    """Build a synthetic Telegram text-message update as raw JSON data."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id if message_id is None else message_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def make_update(
+    update_id: int, user_id: int = 12345, text: str = "hi", message_id: int | None = None
+) -> Update:
+    """Build a synthetic Telegram text-message update."""
+    return Update.model_validate(make_update_data(update_id, user_id, text, message_id))
+
+
 @pytest.fixture
 def mock_logger():
     """Create a mock logger for testing."""
@@ -97,13 +124,18 @@ async def db_session(db_engine):
 
 
 @pytest.fixture
-async def database_context_storage(db_session, mock_logger):
+async def context_db(tmp_path, mock_logger):
+    """File SQLite DatabaseManager with the schema: separate writer and reader pools."""
+    manager = DatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'context.db'}", mock_logger)
+    await manager.init_db()
+    yield manager
+    await manager.close()
+
+
+@pytest.fixture
+async def database_context_storage(context_db, mock_logger):
     """Create a DatabaseContextStorage instance for testing."""
-    storage = DatabaseContextStorage(
-        session=db_session, max_messages=20, logger=mock_logger
-    )
-    yield storage
-    await storage.close()
+    return DatabaseContextStorage(db_manager=context_db, max_messages=20, logger=mock_logger)
 
 
 @pytest.fixture
@@ -113,3 +145,57 @@ def database_manager(mock_logger):
         database_url="sqlite+aiosqlite:///:memory:", logger=mock_logger
     )
     return manager
+
+
+# PostgreSQL harness for backend benchmarks
+
+
+def _free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    """
+    Provide a PostgreSQL URL for backend tests.
+
+    Uses TEST_POSTGRES_URL if set, otherwise starts a throwaway local
+    PostgreSQL cluster with initdb/pg_ctl. Skips if neither is available.
+    """
+    pytest.importorskip("asyncpg")
+
+    external_url = os.getenv("TEST_POSTGRES_URL")
+    if external_url:
+        yield external_url
+        return
+
+    initdb = shutil.which("initdb")
+    pg_ctl = shutil.which("pg_ctl")
+    if not initdb or not pg_ctl:
+        pytest.skip("PostgreSQL binaries (initdb, pg_ctl) not found")
+
+    data_dir = tmp_path_factory.mktemp("pgdata")
+    port = _free_port()
+    try:
+        subprocess.run(
+            [initdb, "-D", str(data_dir), "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+            check=True,
+            capture_output=True,
+        )
+        subprocess.run(
+            [
+                pg_ctl, "-D", str(data_dir), "-l", str(data_dir / "server.log"),
+                "-o", f"-p {port} -h 127.0.0.1 -k {data_dir}", "-w", "start",
+            ],
+            check=True,
+            capture_output=True,
+        )
+    except subprocess.CalledProcessError as e:
+        pytest.skip(f"Could not start local PostgreSQL: {e.stderr.decode()[:200]}")
+
+    yield f"postgresql+asyncpg://postgres@127.0.0.1:{port}/postgres"
+
+    subprocess.run([pg_ctl, "-D", str(data_dir), "-m", "fast", "stop"], capture_output=True)
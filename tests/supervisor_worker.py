@@ -0,0 +1,26 @@
+"""Lightweight worker target for BotSupervisor tests (no aiogram import in children)."""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+
+def recording_worker(index, workers, updates, heartbeat) -> None:
+    """Worker process that appends "user_id update_id" lines to its own file."""
+    out = Path(os.environ["SUPERVISOR_TEST_OUT"])
+    crash_marker = out / f"crashed{index}"
+    if os.environ.get("SUPERVISOR_TEST_CRASH") and not crash_marker.exists():
+        crash_marker.touch()
+        sys.exit(3)
+
+    with open(out / f"worker{index}.txt", "a", encoding="utf-8") as f:
+        while True:
+            heartbeat.value = time.time()
+            raw = updates.get()
+            if raw is None:
+                return
+            update = json.loads(raw)
+            f.write(f"{update['message']['from']['id']} {update['update_id']}\n")
+            f.flush()
@@ -0,0 +1,150 @@
+"""Tests for long-answer splitting and chunked delivery."""
+
+import asyncio
+
+import pytest
+
+from src.answer_delivery import (
+    TELEGRAM_MESSAGE_LIMIT,
+    AnswerSender,
+    AnswerSplitter,
+    split_message,
+)
+
+
+def _normalize(text: str) -> str:
+    """Drop fences and whitespace to compare content across parts."""
+    return "".join(text.replace("```python", "").replace("```", "").split())
+
+
+def test_short_message_is_single_part():
+    """Test that text under the limit is sent as is."""
+    assert split_message("Hello!") == ["Hello!"]
+
+
+def test_empty_message_has_no_parts():
+    """Test that blank text produces no parts."""
+    assert split_message("  \n\n ") == []
+
+
+def test_splits_on_paragraph_boundary():
+    """Test that paragraphs are kept whole when they fit."""
+    first = "First paragraph. " * 10
+    second = "Second paragraph. " * 10
+    text = f"{first.strip()}\n\n{second.strip()}"
+
+    parts = split_message(text, limit=200)
+
+    assert parts == [first.strip(), second.strip()]
+
+
+def test_splits_long_paragraph_on_sentence_boundary():
+    """Test that a paragraph longer than the limit is cut between sentences."""
+    text = " ".join(f"Sentence number {i} is here." for i in range(20))
+
+    parts = split_message(text, limit=100)
+
+    assert all(len(part) <= 100 for part in parts)
+    assert all(part.endswith(".") for part in parts)
+    assert _normalize("".join(parts)) == _normalize(text)
+
+
+def test_hard_cut_without_boundaries():
+    """Test that text without whitespace is cut at the limit."""
+    parts = split_message("x" * 250, limit=100)
+
+    assert [len(part) for part in parts] == [96, 96, 58]
+
+
+def test_code_block_is_reopened_in_next_part():
+    """Test that a split inside a code fence keeps both parts well-formed."""
+    code = "\n".join(f"value_{i} = {i}" for i in range(40))
+    text = f"Here is the code:\n\n```python\n{code}\n```\n\nDone."
+
+    parts = split_message(text, limit=200)
+
+    assert len(parts) > 2
+    assert all(len(part) <= 200 for part in parts)
+    assert all(part.count("```") % 2 == 0 for part in parts)
+    assert parts[1].startswith("```python\n")
+    assert parts[2].startswith("```python\n")
+    assert parts[-1].endswith("Done.")
+    assert _normalize("".join(parts)) == _normalize(text)
+
+
+def test_default_limit_is_telegram_cap():
+    """Test that parts fit Telegram's 4096-character limit by default."""
+    text = "\n\n".join("Paragraph text goes on. " * 30 for _ in range(20))
+
+    parts = split_message(text)
+
+    assert len(parts) > 1
+    assert all(len(part) <= TELEGRAM_MESSAGE_LIMIT for part in parts)
+
+
+def test_incremental_feed_matches_one_shot():
+    """Test that streaming fragments produce the same parts as the whole text."""
+    code = "\n".join(f"line_{i} = 'text'" for i in range(30))
+    text = ("Intro sentence. " * 20) + f"\n\n```python\n{code}\n```\n\n" + ("Outro. " * 40)
+    splitter = AnswerSplitter(limit=150)
+
+    streamed = []
+    for start in range(0, len(text), 7):
+        streamed.extend(splitter.feed(text[start : start + 7]))
+    streamed.extend(splitter.finish())
+
+    assert streamed == split_message(text, limit=150)
+
+
+@pytest.mark.asyncio
+async def test_sender_sends_parts_in_order():
+    """Test that parts are delivered sequentially in order."""
+    sent = []
+
+    async def send(part: str) -> None:
+        await asyncio.sleep(0.001)
+        sent.append(part)
+
+    text = "\n\n".join(f"Paragraph {i}. " * 5 for i in range(10))
+    parts = await AnswerSender(send, limit=120).send_all(text)
+
+    assert sent == split_message(text, limit=120)
+    assert parts == len(sent)
+
+
+@pytest.mark.asyncio
+async def test_sender_sends_first_part_before_stream_ends():
+    """Test that the first part goes out while the stream is still producing."""
+    sent = []
+    first_sent = asyncio.Event()
+
+    async def send(part: str) -> None:
+        sent.append(part)
+        first_sent.set()
+
+    async def stream():
+        yield "First paragraph is complete. " * 5 + "\n\n"
+        yield "Second paragraph starts and is long enough. " * 3
+        await asyncio.wait_for(first_sent.wait(), timeout=1.0)
+        yield "The end."
+
+    parts = await AnswerSender(send, limit=160).send_all(stream())
+
+    assert parts == len(sent) >= 2
+    assert sent[-1].endswith("The end.")
+
+
+@pytest.mark.asyncio
+async def test_sender_propagates_send_error():
+    """Test that a failed part stops delivery and raises."""
+    sent = []
+
+    async def send(part: str) -> None:
+        if sent:
+            raise RuntimeError("send failed")
+        sent.append(part)
+
+    with pytest.raises(RuntimeError, match="send failed"):
+        await AnswerSender(send, limit=50).send_all("word " * 60)
+
+    assert len(sent) == 1
@@ -0,0 +1,139 @@
+"""Tests for the load-testing harness in bench/: fakes, load generator and report comparison."""
+
+import asyncio
+import logging
+
+import openai
+import pytest
+
+from bench.fake_openai import FakeLLMSettings, FakeOpenAI
+from bench.fake_telegram import FakeTelegramAPI
+from bench.loadgen import RequestResult, bot_sender, percentile, run_open_loop, summarize
+from bench.run import compare
+from src.bot import TelegramBot
+
+
+def test_percentile_interpolates():
+    """Test percentile with linear interpolation between ranks."""
+    values = [0.4, 0.1, 0.3, 0.2]
+
+    assert percentile(values, 0) == pytest.approx(0.1)
+    assert percentile(values, 50) == pytest.approx(0.25)
+    assert percentile(values, 100) == pytest.approx(0.4)
+
+
+def test_summarize_reports_latency_and_errors():
+    """Test the machine-readable summary of a run."""
+    results = [RequestResult(0.1 * (i + 1), first_chunk=0.05) for i in range(9)]
+    results.append(RequestResult(5.0, error="timeout"))
+
+    summary = summarize("api_chat", results, elapsed=2.0, target_rps=5)
+
+    assert summary["requests"] == 10
+    assert summary["succeeded"] == 9
+    assert summary["error_rate"] == 0.1
+    assert summary["errors"] == {"timeout": 1}
+    assert summary["throughput_rps"] == 4.5
+    assert summary["latency_ms"]["p50"] == 500.0
+    assert summary["latency_ms"]["max"] == 900.0
+    assert summary["ttft_ms"]["p99"] == 50.0
+
+
+@pytest.mark.asyncio
+async def test_open_loop_keeps_rate_while_requests_are_slow():
+    """Test that slow responses do not reduce the request rate."""
+    started = []
+
+    async def send(index: int) -> RequestResult:
+        started.append(asyncio.get_running_loop().time())
+        await asyncio.sleep(0.3)
+        return RequestResult(0.3)
+
+    results, elapsed = await run_open_loop(send, rps=50, duration=0.2)
+
+    assert len(results) == 10
+    assert started[-1] - started[0] < 0.25
+    assert elapsed < 0.6
+
+
+@pytest.mark.asyncio
+async def test_fake_openai_serves_openai_client():
+    """Test the fake server with the real OpenAI client: plain, streaming and 429."""
+    server = FakeOpenAI(FakeLLMSettings(latency=0.0, jitter=0.0, token_rate=0, reply_tokens=5))
+    url = await server.start()
+    client = openai.AsyncOpenAI(api_key="bench", base_url=url, max_retries=0)
+    try:
+        messages = [{"role": "user", "content": "hi"}]
+        response = await client.chat.completions.create(model="m", messages=messages)
+        assert len(response.choices[0].message.content.split()) == 5
+
+        stream = await client.chat.completions.create(model="m", messages=messages, stream=True)
+        streamed = "".join([chunk.choices[0].delta.content or "" async for chunk in stream])
+        assert len(streamed.split()) == 5
+
+        server.settings.rate_limit_ratio = 1.0
+        with pytest.raises(openai.RateLimitError):
+            await client.chat.completions.create(model="m", messages=messages)
+    finally:
+        await client.close()
+        await server.stop()
+
+    assert server.requests == 3
+    assert server.rate_limited == 1
+
+
+class EchoLLM:
+    """LLM-заглушка бота с небольшой задержкой."""
+
+    async def get_response_with_context(self, user_id: int, user_message: str) -> str:
+        await asyncio.sleep(0.05)
+        return f"reply: {user_message}"
+
+
+@pytest.mark.asyncio
+async def test_bot_scenario_against_fake_telegram():
+    """Test that the bot scenario measures replies of a real polling bot."""
+    telegram = FakeTelegramAPI()
+    url = await telegram.start()
+    bot = TelegramBot(
+        token="123456:BENCH",
+        logger=logging.getLogger("test_bench"),
+        llm_client=EchoLLM(),
+        send_global_rate=1000.0,
+        api_url=url,
+    )
+    polling = asyncio.create_task(bot.start())
+    try:
+        while telegram.polls == 0:
+            await asyncio.sleep(0.01)
+        results, elapsed = await run_open_loop(bot_sender(telegram, timeout=5), 20, 0.5)
+    finally:
+        await bot.dp.stop_polling()
+        await asyncio.wait_for(polling, timeout=10)
+        await telegram.stop()
+
+    summary = summarize("bot", results, elapsed, 20)
+    assert summary["requests"] == 10
+    assert summary["error_rate"] == 0
+    assert summary["latency_ms"]["p50"] >= 50
+
+
+def test_compare_flags_regressions():
+    """Test regression detection against a baseline report."""
+
+    def report(p95: float, throughput: float, error_rate: float) -> dict:
+        scenario = {
+            "scenario": "api_chat",
+            "latency_ms": {"p95": p95},
+            "ttft_ms": {"p95": None},
+            "throughput_rps": throughput,
+            "error_rate": error_rate,
+        }
+        return {"scenarios": [scenario]}
+
+    baseline = report(p95=100.0, throughput=10.0, error_rate=0.0)
+
+    assert compare(report(105.0, 9.5, 0.005), baseline, tolerance=0.1) == []
+    regressions = compare(report(150.0, 5.0, 0.05), baseline, tolerance=0.1)
+    assert len(regressions) == 3
+    assert regressions[0] == "api_chat: latency_ms p95 100.0 -> 150.0"
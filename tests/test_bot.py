@@ -1,10 +1,12 @@
 """Tests for TelegramBot module."""
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from src.bot import TelegramBot
+from src.send_scheduler import SendScheduler
 
 
 @pytest.fixture
@@ -231,7 +233,7 @@ async def test_start_polling_success(bot, mock_logger):
             await bot.start()
 
             # Assert
-            mock_poll.assert_called_once_with(bot.bot)
+            mock_poll.assert_called_once_with(bot.bot, close_bot_session=False)
             mock_session.close.assert_called_once()
             mock_logger.info.assert_called()
 
@@ -379,6 +381,36 @@ async def test_save_user_data_handles_exception(bot_with_db_manager, mock_messag
     assert "Failed to save user data" in call_args
 
 
+@pytest.mark.asyncio
+async def test_save_user_data_skips_unchanged_profile(bot_with_db_manager, mock_message):
+    """Test repeated messages with the same profile hit the DB only once."""
+    await bot_with_db_manager._save_user_data(mock_message)
+    await bot_with_db_manager._save_user_data(mock_message)
+
+    bot_with_db_manager.db_manager.upsert_user.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_save_user_data_writes_changed_profile(bot_with_db_manager, mock_message):
+    """Test a changed profile is written again."""
+    await bot_with_db_manager._save_user_data(mock_message)
+    mock_message.from_user.username = "renamed_user"
+    await bot_with_db_manager._save_user_data(mock_message)
+
+    assert bot_with_db_manager.db_manager.upsert_user.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_save_user_data_retries_after_failure(bot_with_db_manager, mock_message):
+    """Test a failed write is not cached and is retried on the next message."""
+    bot_with_db_manager.db_manager.upsert_user.side_effect = [Exception("DB error"), None]
+
+    await bot_with_db_manager._save_user_data(mock_message)
+    await bot_with_db_manager._save_user_data(mock_message)
+
+    assert bot_with_db_manager.db_manager.upsert_user.call_count == 2
+
+
 @pytest.mark.asyncio
 async def test_cmd_start_saves_user_data(bot_with_db_manager, mock_message):
     """Test /start command saves user data."""
@@ -400,3 +432,91 @@ async def test_handle_message_saves_user_data(bot_with_db_manager, mock_message)
         bot_with_db_manager.db_manager.upsert_user.assert_called_once()
         # And send response
         mock_message.answer.assert_called_once()
+
+
+def test_update_queue_registered(mock_logger):
+    """Test that the per-user update queue is installed on the dispatcher."""
+    with patch("src.bot.Bot"), patch("src.bot.Dispatcher"):
+        bot = TelegramBot(token="test_token", logger=mock_logger, max_concurrent_updates=7)
+
+    bot.dp.update.outer_middleware.assert_any_call(bot.update_queue)
+    assert bot.get_update_queue_stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_handle_message_goes_through_send_scheduler(bot_with_llm, mock_message):
+    """Test that the answer and the typing action are sent via the send scheduler."""
+    with patch.object(bot_with_llm.bot, "send_chat_action", new=AsyncMock()) as typing:
+        await bot_with_llm.handle_message(mock_message)
+        await asyncio.sleep(0.01)
+        await bot_with_llm.send_scheduler.close()
+
+    mock_message.answer.assert_called_once_with("LLM response")
+    typing.assert_called_once()
+    assert bot_with_llm.get_send_queue_stats()["sent"] == 2
+
+
+@pytest.mark.asyncio
+async def test_handle_message_splits_long_answer(bot_with_llm, mock_message, mock_llm_client):
+    """Test that an answer over 4096 characters is sent as several messages in order."""
+    paragraphs = [f"Paragraph {i}. " + "x" * 1500 for i in range(4)]
+    mock_llm_client.get_response_with_context.return_value = "\n\n".join(paragraphs)
+    bot_with_llm.send_scheduler = SendScheduler(bot_with_llm.logger, chat_rate=100)
+
+    with patch.object(bot_with_llm.bot, "send_chat_action", new=AsyncMock()):
+        await bot_with_llm.handle_message(mock_message)
+
+    sent = [call.args[0] for call in mock_message.answer.call_args_list]
+    assert len(sent) == 2
+    assert all(len(part) <= 4096 for part in sent)
+    assert sent[0].startswith("Paragraph 0.")
+    assert sent[1].startswith("Paragraph 2.")
+
+
+@pytest.mark.asyncio
+async def test_typing_keepalive_refreshes_until_response(
+    bot_with_llm, mock_message, mock_llm_client
+):
+    """Test that typing is refreshed during a slow LLM call and stops afterwards."""
+
+    async def slow_response(**kwargs):
+        await asyncio.sleep(0.25)
+        return "LLM response"
+
+    mock_llm_client.get_response_with_context.side_effect = slow_response
+    bot_with_llm.typing_interval = 0.05
+
+    with patch.object(bot_with_llm.bot, "send_chat_action", new=AsyncMock()) as typing:
+        await bot_with_llm.handle_message(mock_message)
+        await asyncio.sleep(0.01)
+        calls_at_answer = typing.await_count
+        await asyncio.sleep(0.15)
+
+        assert calls_at_answer >= 4
+        assert typing.await_count == calls_at_answer
+    mock_message.answer.assert_called_once_with("LLM response")
+
+
+@pytest.mark.asyncio
+async def test_typing_keepalive_stops_on_error(bot_with_llm, mock_message, mock_llm_client):
+    """Test that the keepalive task is stopped when the LLM call fails."""
+    mock_llm_client.get_response_with_context.side_effect = Exception("API Error")
+    bot_with_llm.typing_interval = 0.01
+
+    with patch.object(bot_with_llm.bot, "send_chat_action", new=AsyncMock()) as typing:
+        await bot_with_llm.handle_message(mock_message)
+        await asyncio.sleep(0.01)
+        calls_after_error = typing.await_count
+        await asyncio.sleep(0.05)
+
+        assert typing.await_count == calls_after_error <= 1
+
+
+def test_coalescer_registered_before_update_queue(mock_logger):
+    """Test that deduplication sees updates before the per-user queue."""
+    with patch("src.bot.Bot"), patch("src.bot.Dispatcher"):
+        bot = TelegramBot(token="test_token", logger=mock_logger, coalesce_window=0.5)
+
+    registered = [call.args[0] for call in bot.dp.update.outer_middleware.call_args_list]
+    assert registered == [bot._track_update, bot.coalescer, bot.update_queue]
+    assert bot.get_coalescing_stats()["llm_calls_saved"] == 0
@@ -0,0 +1,120 @@
+"""Tests for BotSupervisor."""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from src.bot_supervisor import BotSupervisor, route_key
+from tests.conftest import make_update
+from tests.supervisor_worker import recording_worker
+
+
+def read_results(out: Path, workers: int) -> dict[int, list[tuple[int, int]]]:
+    """Handled (user_id, update_id) pairs per worker."""
+    results = {}
+    for index in range(workers):
+        path = out / f"worker{index}.txt"
+        lines = path.read_text(encoding="utf-8").split() if path.exists() else []
+        pairs = zip(lines[::2], lines[1::2], strict=True)
+        results[index] = [(int(user), int(update)) for user, update in pairs]
+    return results
+
+
+def test_route_key_prefers_user_then_chat():
+    """Test that updates are keyed by the sender."""
+    assert route_key(make_update(1, 42)) == 42
+
+
+def test_route_is_stable_per_user(mock_logger):
+    """Test that a user's updates always go to the same worker."""
+    supervisor = BotSupervisor(workers=4, logger=mock_logger)
+
+    routes = {user: supervisor.route(make_update(user * 10, user)) for user in range(40)}
+
+    assert all(supervisor.route(make_update(99, user)) == routes[user] for user in range(40))
+    assert set(routes.values()) == {0, 1, 2, 3}
+
+
+@pytest.mark.asyncio
+async def test_updates_are_partitioned_and_drained(mock_logger, tmp_path, monkeypatch):
+    """Test that workers get all updates, per-user in order, and drain on stop."""
+    monkeypatch.setenv("SUPERVISOR_TEST_OUT", str(tmp_path))
+    supervisor = BotSupervisor(workers=2, logger=mock_logger, worker_target=recording_worker)
+    supervisor.start()
+
+    for update_id in range(1, 41):
+        supervisor.dispatch(make_update(update_id, user_id=update_id % 5))
+    await supervisor.stop()
+
+    results = read_results(tmp_path, 2)
+    handled = [pair for pairs in results.values() for pair in pairs]
+    assert len(handled) == 40
+    for index, pairs in results.items():
+        assert all(supervisor.route(make_update(0, user)) == index for user, _ in pairs)
+        for user in {user for user, _ in pairs}:
+            user_updates = [update for u, update in pairs if u == user]
+            assert user_updates == sorted(user_updates)
+
+
+@pytest.mark.asyncio
+async def test_dead_worker_is_restarted(mock_logger, tmp_path, monkeypatch):
+    """Test that a crashed worker is restarted and processes its queue."""
+    monkeypatch.setenv("SUPERVISOR_TEST_OUT", str(tmp_path))
+    monkeypatch.setenv("SUPERVISOR_TEST_CRASH", "1")
+    supervisor = BotSupervisor(workers=1, logger=mock_logger, worker_target=recording_worker)
+    supervisor.start()
+    supervisor.dispatch(make_update(1, user_id=7))
+
+    deadline = time.monotonic() + 30
+    while not (tmp_path / "crashed0").exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    supervisor._workers[0].process.join(timeout=10)
+    health = supervisor.check_health()
+    await supervisor.stop()
+
+    assert health[0]["restarts"] == 1
+    assert read_results(tmp_path, 1)[0] == [(7, 1)]
+    mock_logger.error.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_worker_killed_in_get_is_restarted_with_fresh_queue(
+    mock_logger, tmp_path, monkeypatch
+):
+    """Test that updates reach a worker restarted after being killed while blocked in get()."""
+    monkeypatch.setenv("SUPERVISOR_TEST_OUT", str(tmp_path))
+    supervisor = BotSupervisor(
+        workers=1, logger=mock_logger, worker_target=recording_worker, drain_timeout=5
+    )
+    supervisor.start()
+    supervisor.dispatch(make_update(1, user_id=7))
+
+    deadline = time.monotonic() + 30
+    while not read_results(tmp_path, 1)[0] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    # Процесс ждет следующего обновления в get() и держит блокировку чтения очереди
+    time.sleep(0.2)
+    supervisor._workers[0].process.kill()
+    supervisor._workers[0].process.join(timeout=10)
+    health = supervisor.check_health()
+    supervisor.dispatch(make_update(2, user_id=7))
+    await supervisor.stop()
+
+    assert health[0]["restarts"] == 1
+    assert read_results(tmp_path, 1)[0] == [(7, 1), (7, 2)]
+    mock_logger.warning.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_after_stop_is_dropped(mock_logger, tmp_path, monkeypatch):
+    """Test that no updates are accepted once draining started."""
+    monkeypatch.setenv("SUPERVISOR_TEST_OUT", str(tmp_path))
+    supervisor = BotSupervisor(workers=1, logger=mock_logger, worker_target=recording_worker)
+    supervisor.start()
+    await supervisor.stop()
+
+    supervisor.dispatch(make_update(1, user_id=7))
+
+    assert read_results(tmp_path, 1)[0] == []
+    mock_logger.warning.assert_called_once()
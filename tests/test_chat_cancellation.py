@@ -0,0 +1,128 @@
+"""Tests for cancelling web chat work when the client disconnects."""
+
+import asyncio
+import logging
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.api.chat_service import ChatService
+from src.api.models import ChatMode, MessageRole
+from src.api.sse import cancel_on_disconnect
+from src.database import DatabaseManager
+from src.metrics import CHAT_CANCELLED
+from src.text2sql import Text2SqlConverter
+
+SLOW_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+    "SELECT count(*) FROM c"
+)
+
+
+@pytest.fixture
+def chat_service():
+    """ChatService с записью сохраненных сообщений и подменяемым LLM."""
+    service = ChatService(AsyncMock(), AsyncMock(), logging.getLogger("t"), chunk_size=5)
+    service.saved = []
+
+    async def save_message(message) -> None:
+        service.saved.append(message)
+
+    service.save_message = save_message
+    service.get_history = AsyncMock(return_value=[])
+    return service
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_llm_wait_without_retries(chat_service):
+    """Test that a disconnect while waiting for the LLM stops it and skips retries."""
+    llm_calls = 0
+
+    async def slow_llm(messages: list[dict]) -> str:
+        nonlocal llm_calls
+        llm_calls += 1
+        await asyncio.sleep(10)
+        return "never"
+
+    chat_service._call_llm_with_messages = slow_llm
+    request = MagicMock(is_disconnected=AsyncMock(side_effect=[False, True]))
+    waiting = CHAT_CANCELLED.labels("normal", "waiting")
+    before = waiting.value
+
+    started = time.monotonic()
+    stream = cancel_on_disconnect(
+        request, chat_service.process_message("hi", "s1"), poll_interval=0.05
+    )
+    assert [chunk async for chunk in stream] == []
+    while chat_service.in_flight.active:
+        await asyncio.sleep(0.01)
+
+    assert time.monotonic() - started < 1
+    assert llm_calls == 1
+    assert [message.role for message in chat_service.saved] == [MessageRole.USER.value]
+    assert waiting.value == before + 1
+
+
+@pytest.mark.asyncio
+async def test_closing_stream_saves_acknowledged_part(chat_service):
+    """Test that the assistant message holds the chunks the consumer asked to continue past."""
+    chat_service._call_llm_with_messages = AsyncMock(return_value="Один, два. Три, четыре.")
+    streaming = CHAT_CANCELLED.labels("normal", "streaming")
+    before = streaming.value
+
+    stream = chat_service.process_message("hi", "s1", ChatMode.NORMAL)
+    delivered = [await anext(stream), await anext(stream), await anext(stream)]
+    await stream.aclose()
+
+    assert delivered == ["Один,", " два.", " Три,"]
+    # Третий chunk выдан, но продолжения никто не запросил - он мог не дойти
+    assistant = chat_service.saved[-1]
+    assert (assistant.role, assistant.content) == (MessageRole.ASSISTANT.value, "Один, два.")
+    assert streaming.value == before + 1
+    assert chat_service.in_flight.active == 0
+
+
+@pytest.mark.asyncio
+async def test_partial_answer_excludes_unsent_chunks(chat_service):
+    """Test that chunks not sent to a disconnected client are not saved, with no read-ahead."""
+    chat_service._call_llm_with_messages = AsyncMock(return_value="Один, два. Три, четыре.")
+    request = MagicMock(is_disconnected=AsyncMock(return_value=False))
+    sent = []
+
+    async def send(chunk: str) -> None:
+        # Как StreamingResponse: клиент отключился на втором кадре
+        if sent:
+            raise OSError("client disconnected")
+        sent.append(chunk)
+
+    stream = cancel_on_disconnect(request, chat_service.process_message("hi", "s1"))
+    with pytest.raises(OSError):
+        async for chunk in stream:
+            await send(chunk)
+    await stream.aclose()
+    while chat_service.in_flight.active:
+        await asyncio.sleep(0.01)
+
+    assert sent == ["Один,"]
+    assistant = chat_service.saved[-1]
+    assert (assistant.role, assistant.content) == (MessageRole.ASSISTANT.value, "Один,")
+
+
+@pytest.mark.asyncio
+async def test_cancel_interrupts_sqlite_query(tmp_path):
+    """Test that cancelling a running Text-to-SQL query interrupts it in SQLite."""
+    db = DatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", logging.getLogger("t"))
+    await db.init_db()
+    converter = Text2SqlConverter(MagicMock(), db, logging.getLogger("t"))
+
+    task = asyncio.create_task(converter.execute_and_format(SLOW_SQL, timeout=60))
+    await asyncio.sleep(0.2)
+    started = time.monotonic()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert time.monotonic() - started < 1
+    assert await converter.execute_and_format("SELECT 1 AS x") == "| x |\n| --- |\n| 1 |"
+    await db.close()
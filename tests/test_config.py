@@ -198,3 +198,82 @@ def test_config_from_env_with_system_prompt_file(monkeypatch):
 
         # Assert
         assert config.system_prompt_file == "custom/path/prompt.txt"
+
+
+def test_config_bot_mode_defaults_to_polling(monkeypatch):
+    """Test that the bot uses polling unless configured otherwise."""
+    with patch("src.config.load_dotenv"):
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "test_bot_token")
+        monkeypatch.setenv("OPENROUTER_API_KEY", "test_api_key")
+        monkeypatch.delenv("BOT_MODE", raising=False)
+
+        config = Config.from_env()
+
+        assert config.bot_mode == "polling"
+
+
+def test_config_webhook_mode(monkeypatch):
+    """Test loading webhook settings from env."""
+    with patch("src.config.load_dotenv"):
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "test_bot_token")
+        monkeypatch.setenv("OPENROUTER_API_KEY", "test_api_key")
+        monkeypatch.setenv("BOT_MODE", "webhook")
+        monkeypatch.setenv("WEBHOOK_URL", "https://bot.example.com")
+        monkeypatch.setenv("WEBHOOK_SECRET", "secret")
+        monkeypatch.setenv("WEBHOOK_PORT", "9000")
+        monkeypatch.setenv("WEBHOOK_MAX_IN_FLIGHT", "10")
+
+        config = Config.from_env()
+
+        assert config.bot_mode == "webhook"
+        assert config.webhook_url == "https://bot.example.com"
+        assert config.webhook_secret == "secret"
+        assert config.webhook_port == 9000
+        assert config.webhook_max_in_flight == 10
+
+
+def test_config_webhook_mode_requires_url(monkeypatch):
+    """Test that webhook mode without WEBHOOK_URL raises ConfigError."""
+    with patch("src.config.load_dotenv"):
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "test_bot_token")
+        monkeypatch.setenv("OPENROUTER_API_KEY", "test_api_key")
+        monkeypatch.setenv("BOT_MODE", "webhook")
+        monkeypatch.delenv("WEBHOOK_URL", raising=False)
+
+        with pytest.raises(ConfigError, match="WEBHOOK_URL"):
+            Config.from_env()
+
+
+def test_config_webhook_mode_requires_secret(monkeypatch):
+    """Test that webhook mode without WEBHOOK_SECRET raises ConfigError."""
+    with patch("src.config.load_dotenv"):
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "test_bot_token")
+        monkeypatch.setenv("OPENROUTER_API_KEY", "test_api_key")
+        monkeypatch.setenv("BOT_MODE", "webhook")
+        monkeypatch.setenv("WEBHOOK_URL", "https://bot.example.com")
+        monkeypatch.delenv("WEBHOOK_SECRET", raising=False)
+
+        with pytest.raises(ConfigError, match="WEBHOOK_SECRET"):
+            Config.from_env()
+
+
+def test_config_invalid_bot_mode(monkeypatch):
+    """Test that an unknown BOT_MODE raises ConfigError."""
+    with patch("src.config.load_dotenv"):
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "test_bot_token")
+        monkeypatch.setenv("OPENROUTER_API_KEY", "test_api_key")
+        monkeypatch.setenv("BOT_MODE", "carrier-pigeon")
+
+        with pytest.raises(ConfigError, match="BOT_MODE"):
+            Config.from_env()
+
+
+def test_config_rejects_unknown_log_format(monkeypatch):
+    """Test that LOG_FORMAT accepts only text or json."""
+    with patch("src.config.load_dotenv"):
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "test_bot_token")
+        monkeypatch.setenv("OPENROUTER_API_KEY", "test_api_key")
+        monkeypatch.setenv("LOG_FORMAT", "xml")
+
+        with pytest.raises(ConfigError, match="LOG_FORMAT"):
+            Config.from_env()
@@ -173,7 +173,7 @@ async def test_multiple_users_isolated_contexts(context_storage):
 class TestDatabaseContextStorage:
     """Tests for DatabaseContextStorage class."""
 
-    async def test_add_message_saves_to_database(self, database_context_storage, db_session):
+    async def test_add_message_saves_to_database(self, database_context_storage, context_db):
         """Test that add_message saves to database."""
         from sqlalchemy import select
 
@@ -183,8 +183,8 @@ class TestDatabaseContextStorage:
 
         # Query database directly
         stmt = select(Message).where(Message.user_id == 12345)
-        result = await db_session.execute(stmt)
-        messages = result.scalars().all()
+        async with context_db.get_read_session() as session:
+            messages = (await session.execute(stmt)).scalars().all()
 
         assert len(messages) == 1
         assert messages[0].role == "user"
@@ -192,7 +192,7 @@ class TestDatabaseContextStorage:
         assert messages[0].length == len("Hello database")
         assert messages[0].is_deleted is False
 
-    async def test_add_message_calculates_length(self, database_context_storage, db_session):
+    async def test_add_message_calculates_length(self, database_context_storage, context_db):
         """Test that length is calculated correctly."""
         from sqlalchemy import select
 
@@ -202,8 +202,8 @@ class TestDatabaseContextStorage:
         await database_context_storage.add_message(12345, "user", content)
 
         stmt = select(Message).where(Message.user_id == 12345)
-        result = await db_session.execute(stmt)
-        message = result.scalar_one()
+        async with context_db.get_read_session() as session:
+            message = (await session.execute(stmt)).scalar_one()
 
         assert message.length == len(content)
 
@@ -220,9 +220,9 @@ class TestDatabaseContextStorage:
         assert context[1] == {"role": "assistant", "content": "Second"}
         assert context[2] == {"role": "user", "content": "Third"}
 
-    async def test_get_context_limits_to_max_messages(self, db_session, mock_logger):
+    async def test_get_context_limits_to_max_messages(self, context_db, mock_logger):
         """Test that get_context respects max_messages limit."""
-        storage = DatabaseContextStorage(session=db_session, max_messages=3, logger=mock_logger)
+        storage = DatabaseContextStorage(context_db, max_messages=3, logger=mock_logger)
 
         # Add 5 messages
         for i in range(5):
@@ -241,7 +241,7 @@ class TestDatabaseContextStorage:
         context = await database_context_storage.get_context(99999)
         assert context == []
 
-    async def test_reset_context_soft_delete(self, database_context_storage, db_session):
+    async def test_reset_context_soft_delete(self, database_context_storage, context_db):
         """Test that reset_context performs soft delete."""
         from sqlalchemy import select
 
@@ -256,8 +256,8 @@ class TestDatabaseContextStorage:
 
         # Messages should still exist in database but marked as deleted
         stmt = select(Message).where(Message.user_id == 12345)
-        result = await db_session.execute(stmt)
-        messages = result.scalars().all()
+        async with context_db.get_read_session() as session:
+            messages = (await session.execute(stmt)).scalars().all()
 
         assert len(messages) == 2
         assert all(msg.is_deleted is True for msg in messages)
@@ -266,12 +266,8 @@ class TestDatabaseContextStorage:
         context = await database_context_storage.get_context(12345)
         assert context == []
 
-    async def test_reset_context_only_affects_target_user(self, database_context_storage, db_session):
+    async def test_reset_context_only_affects_target_user(self, database_context_storage):
         """Test that reset_context only deletes messages for the target user."""
-        from sqlalchemy import select
-
-        from src.models import Message
-
         # Add messages for two users
         await database_context_storage.add_message(12345, "user", "User 1 message")
         await database_context_storage.add_message(67890, "user", "User 2 message")
@@ -288,7 +284,27 @@ class TestDatabaseContextStorage:
         assert len(context_2) == 1
         assert context_2[0]["content"] == "User 2 message"
 
-    async def test_get_context_excludes_deleted_messages(self, database_context_storage, db_session):
+    async def test_reset_context_in_batches(self, database_context_storage, context_db):
+        """Test that reset_context soft-deletes a long history in several transactions."""
+        from sqlalchemy import func, select
+
+        from src.models import Message
+
+        database_context_storage.RESET_BATCH_SIZE = 3
+        for i in range(7):
+            await database_context_storage.add_message(12345, "user", f"Message {i}")
+        await database_context_storage.add_message(67890, "user", "Other user")
+
+        await database_context_storage.reset_context(12345)
+
+        stmt = select(func.count()).where(Message.is_deleted == False)  # noqa: E712
+        async with context_db.get_read_session() as session:
+            assert await session.scalar(stmt) == 1
+        assert await database_context_storage.get_context(12345) == []
+
+    async def test_get_context_excludes_deleted_messages(
+        self, database_context_storage, context_db
+    ):
         """Test that get_context excludes soft-deleted messages."""
         from sqlalchemy import update
 
@@ -306,8 +322,8 @@ class TestDatabaseContextStorage:
             .where(Message.content == "Message 2")
             .values(is_deleted=True)
         )
-        await db_session.execute(stmt)
-        await db_session.commit()
+        async with context_db.get_session() as session:
+            await session.execute(stmt)
 
         # get_context should exclude deleted message
         context = await database_context_storage.get_context(12345)
@@ -315,11 +331,6 @@ class TestDatabaseContextStorage:
         assert context[0]["content"] == "Message 1"
         assert context[1]["content"] == "Message 3"
 
-    async def test_close_closes_session(self, database_context_storage):
-        """Test that close() closes the database session."""
-        # Should not raise any exceptions
-        await database_context_storage.close()
-
     async def test_context_storage_protocol_compliance_database(self, database_context_storage):
         """Test that DatabaseContextStorage implements ContextStorage protocol."""
         from src.context_storage import ContextStorage
@@ -333,3 +344,33 @@ class TestDatabaseContextStorage:
         assert callable(database_context_storage.add_message)
         assert callable(database_context_storage.get_context)
         assert callable(database_context_storage.reset_context)
+
+    async def test_concurrent_users_run_in_parallel(self, database_context_storage):
+        """Test that parallel operations for different users each get their own session."""
+        import asyncio
+
+        await asyncio.gather(
+            *(
+                database_context_storage.add_message(user_id, "user", f"Hello from {user_id}")
+                for user_id in range(1, 11)
+            )
+        )
+        contexts = await asyncio.gather(
+            *(database_context_storage.get_context(user_id) for user_id in range(1, 11))
+        )
+
+        assert [context[0]["content"] for context in contexts] == [
+            f"Hello from {user_id}" for user_id in range(1, 11)
+        ]
+
+    async def test_failed_write_does_not_affect_other_users(self, database_context_storage):
+        """Test that a failed commit is rolled back and later operations still work."""
+        from sqlalchemy.exc import IntegrityError
+
+        with pytest.raises(IntegrityError):
+            await database_context_storage.add_message(1, None, "no role")
+
+        await database_context_storage.add_message(2, "user", "Still works")
+        assert await database_context_storage.get_context(2) == [
+            {"role": "user", "content": "Still works"}
+        ]
@@ -307,3 +307,110 @@ class TestDatabaseManager:
 
         # Cleanup
         await manager.close()
+
+    async def test_memory_database_shares_engine_for_reads(self, mock_logger):
+        """In-memory SQLite readers must reuse the writer engine to see the same data."""
+        manager = DatabaseManager(
+            database_url="sqlite+aiosqlite:///:memory:", logger=mock_logger
+        )
+
+        assert manager._read_engine is manager._engine
+
+        await manager.close()
+
+    async def test_file_database_uses_separate_read_engine(self, mock_logger, tmp_path):
+        """File SQLite uses a single-connection writer and a separate reader pool."""
+        from sqlalchemy import select
+
+        from src.models import Message
+
+        manager = DatabaseManager(
+            database_url=f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
+            logger=mock_logger,
+            read_pool_size=3,
+        )
+        await manager.init_db()
+
+        assert manager._read_engine is not manager._engine
+        assert manager._engine.pool.size() == 1
+        assert manager._read_engine.pool.size() == 3
+
+        async with manager.get_session() as session:
+            session.add(Message(user_id=12345, role="user", content="Test", length=4))
+
+        async with manager.get_read_session() as session:
+            result = await session.execute(select(Message).where(Message.user_id == 12345))
+            assert result.scalar_one().content == "Test"
+
+        await manager.close()
+
+    async def test_read_session_is_query_only(self, mock_logger, tmp_path):
+        """Reader connections reject writes on SQLite."""
+        from sqlalchemy.exc import OperationalError
+
+        from src.models import Message
+
+        manager = DatabaseManager(
+            database_url=f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
+            logger=mock_logger,
+        )
+        await manager.init_db()
+
+        with pytest.raises(OperationalError, match="readonly"):
+            async with manager.get_read_session() as session:
+                session.add(Message(user_id=12345, role="user", content="Test", length=4))
+                await session.flush()
+
+        await manager.close()
+
+    async def test_read_database_url(self, mock_logger, tmp_path):
+        """A dedicated read URL gets its own engine."""
+        manager = DatabaseManager(
+            database_url=f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}",
+            logger=mock_logger,
+            read_database_url=f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}",
+        )
+
+        assert str(manager._read_engine.url).endswith("replica.db")
+        assert isinstance(manager.create_read_session(), AsyncSession)
+
+        await manager.close()
+
+    async def test_upsert_user_unchanged_returns_none(self, mock_logger):
+        """Test that an unchanged profile is not rewritten."""
+        from sqlalchemy import select
+
+        from src.models import User
+
+        manager = DatabaseManager(
+            database_url="sqlite+aiosqlite:///:memory:", logger=mock_logger
+        )
+        await manager.init_db()
+
+        created = await manager.upsert_user(telegram_id=12345, username="same")
+        unchanged = await manager.upsert_user(telegram_id=12345, username="same")
+
+        assert created is not None
+        assert unchanged is None
+
+        async with manager.get_session() as session:
+            result = await session.execute(select(User).where(User.telegram_id == 12345))
+            stored = result.scalar_one()
+            assert stored.updated_at == created.updated_at
+
+        await manager.close()
+
+    async def test_upsert_user_keeps_created_at_on_update(self, mock_logger):
+        """Test that an update changes updated_at but keeps created_at."""
+        manager = DatabaseManager(
+            database_url="sqlite+aiosqlite:///:memory:", logger=mock_logger
+        )
+        await manager.init_db()
+
+        created = await manager.upsert_user(telegram_id=12345, username="old")
+        updated = await manager.upsert_user(telegram_id=12345, username="new")
+
+        assert updated.created_at == created.created_at
+        assert updated.updated_at > created.updated_at
+
+        await manager.close()
@@ -0,0 +1,103 @@
+"""Tests for the synthetic dataset generator in bench/dataset.py."""
+
+import logging
+import sqlite3
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from bench.dataset import DatasetGenerator, DatasetSpec, generate_dataset
+from src.api.models import Period
+from src.api.real_stats import RealStatCollector
+from src.context_storage import DatabaseContextStorage
+from src.database import DatabaseManager
+
+SPEC = DatasetSpec(
+    users=200,
+    messages=20_000,
+    chat_sessions=50,
+    chat_messages=1_000,
+    days=14,
+    end=datetime(2025, 3, 1),
+    deleted_ratio=0.1,
+    seed=7,
+)
+
+
+def test_generator_is_reproducible():
+    """Test that the same seed produces identical rows and another seed does not."""
+    first = DatasetGenerator(SPEC)
+    second = DatasetGenerator(SPEC)
+    other = DatasetGenerator(DatasetSpec(**{**SPEC.__dict__, "seed": 8}))
+
+    assert list(first.users()) == list(second.users())
+    assert list(first.messages()) == list(second.messages())
+    assert list(first.chat()) == list(second.chat())
+    assert list(first.messages())[:10] != list(other.messages())[:10]
+
+
+def test_messages_follow_activity_shape():
+    """Test diurnal rhythm, power-law activity, soft deletes and reply order."""
+    messages = list(DatasetGenerator(SPEC).messages())
+    questions = [row for row in messages if row[1] == "user"]
+
+    assert len(messages) == SPEC.messages
+    assert all(
+        SPEC.end - timedelta(days=SPEC.days) <= row[4] < SPEC.end + timedelta(hours=1)
+        for row in messages
+    )
+    assert all(
+        answer[4] > question[4]
+        for question, answer in zip(messages[::2], messages[1::2], strict=True)
+    )
+
+    hours = Counter(row[4].hour for row in questions)
+    assert hours[20] > 5 * hours[3]
+
+    per_user = Counter(row[0] for row in questions).most_common()
+    top_share = sum(count for _, count in per_user[: SPEC.users // 10]) / len(questions)
+    assert top_share > 0.5
+
+    deleted = sum(row[5] for row in questions) / len(questions)
+    assert deleted == pytest.approx(SPEC.deleted_ratio, abs=0.02)
+
+    user_lengths = sorted(row[3] for row in questions)
+    answer_lengths = sorted(row[3] for row in messages if row[1] == "assistant")
+    assert user_lengths[len(user_lengths) // 2] < answer_lengths[len(answer_lengths) // 2]
+
+
+@pytest.mark.asyncio
+async def test_generate_dataset_loads_sqlite(tmp_path):
+    """Test a load into SQLite that the application reads back."""
+    path = tmp_path / "scale.db"
+    url = f"sqlite+aiosqlite:///{path}"
+
+    loaded = await generate_dataset(url, SPEC, batch_size=3_000)
+
+    assert loaded == {"users": 200, "messages": 20_000, "chat_messages": 1_000, "chat_sessions": 50}
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone() == (20_000,)
+        indexes = {
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        }
+        assert "ix_messages_user_id" in indexes
+
+    with pytest.raises(RuntimeError, match="not empty"):
+        await generate_dataset(url, SPEC)
+    assert (await generate_dataset(url, SPEC, truncate=True))["messages"] == 20_000
+
+    db = DatabaseManager(url, logging.getLogger("test_dataset"))
+    try:
+        (user_id,) = (
+            sqlite3.connect(path)
+            .execute("SELECT user_id FROM messages GROUP BY user_id ORDER BY COUNT(*) DESC")
+            .fetchone()
+        )
+        context = await DatabaseContextStorage(db, max_messages=20).get_context(user_id)
+        assert len(context) == 20
+
+        stats = await RealStatCollector(db).get_stats(Period.MONTH)
+        assert stats.top_users[0].user_id == user_id
+    finally:
+        await db.close()
@@ -0,0 +1,121 @@
+"""Benchmarks for hot database paths on SQLite and PostgreSQL."""
+
+import datetime
+import time
+
+import pytest
+from sqlalchemy import insert
+
+from src.api.models import Period
+from src.api.real_stats import RealStatCollector
+from src.context_storage import DatabaseContextStorage
+from src.database import DatabaseManager
+from src.models import Base, Message
+
+MESSAGES_PER_USER = 200
+USERS = 10
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+async def backend_manager(request, tmp_path, mock_logger):
+    """DatabaseManager with a fresh schema on each supported backend."""
+    if request.param == "sqlite":
+        url = f"sqlite+aiosqlite:///{tmp_path / 'bench.db'}"
+    else:
+        url = request.getfixturevalue("postgres_url")
+
+    manager = DatabaseManager(database_url=url, logger=mock_logger)
+    async with manager._engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield manager
+
+    async with manager._engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await manager.close()
+
+
+async def _seed_messages(manager: DatabaseManager) -> None:
+    """Bulk-insert USERS * MESSAGES_PER_USER messages spread over the last days."""
+    now = datetime.datetime.now()
+    rows = [
+        {
+            "user_id": 5_000_000_000 + user,  # Telegram IDs beyond 32 bits
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"message {i}",
+            "length": len(f"message {i}"),
+            "created_at": now - datetime.timedelta(minutes=i * 10),
+            "is_deleted": False,
+        }
+        for user in range(USERS)
+        for i in range(MESSAGES_PER_USER)
+    ]
+    async with manager.get_session() as session:
+        await session.execute(insert(Message), rows)
+
+
+def _report(backend: str, name: str, elapsed: float, operations: int) -> None:
+    """Print benchmark timing (visible with pytest -s)."""
+    print(
+        f"[{backend}] {name}: {elapsed * 1000:.1f} ms total, "
+        f"{elapsed / operations * 1000:.3f} ms/op ({operations} ops)"
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_benchmark_add_message_and_get_context(backend_manager, mock_logger):
+    """Measure per-message write and context read latency."""
+    backend = backend_manager.dialect_name
+    storage = DatabaseContextStorage(backend_manager, max_messages=20, logger=mock_logger)
+    user_id = 5_000_000_001
+
+    start = time.perf_counter()
+    for i in range(MESSAGES_PER_USER):
+        await storage.add_message(user_id, "user", f"message {i}")
+    _report(backend, "add_message", time.perf_counter() - start, MESSAGES_PER_USER)
+
+    start = time.perf_counter()
+    for _ in range(MESSAGES_PER_USER):
+        context = await storage.get_context(user_id)
+    _report(backend, "get_context", time.perf_counter() - start, MESSAGES_PER_USER)
+
+    assert len(context) == 20
+    assert context[-1]["content"] == f"message {MESSAGES_PER_USER - 1}"
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_benchmark_stats_collection(backend_manager):
+    """Measure dashboard statistics computation over seeded messages."""
+    backend = backend_manager.dialect_name
+    await _seed_messages(backend_manager)
+    collector = RealStatCollector(backend_manager)
+
+    runs = 5
+    start = time.perf_counter()
+    for _ in range(runs):
+        stats = await collector.get_stats(Period.MONTH)
+    _report(backend, "get_stats(month)", time.perf_counter() - start, runs)
+
+    assert stats.summary.active_users == USERS
+    assert len(stats.activity_timeline) == 30
+    assert stats.top_users[0].user_id >= 5_000_000_000
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_benchmark_upsert_user(backend_manager):
+    """Measure repeated profile upserts for the same Telegram user."""
+    backend = backend_manager.dialect_name
+    runs = 100
+
+    start = time.perf_counter()
+    for i in range(runs):
+        user = await backend_manager.upsert_user(
+            telegram_id=5_000_000_001, username=f"user_{i % 2}", first_name="Bench"
+        )
+    _report(backend, "upsert_user", time.perf_counter() - start, runs)
+
+    assert user.telegram_id == 5_000_000_001
@@ -0,0 +1,180 @@
+"""Tests for streaming history export: encoders, API endpoint and the /export bot command."""
+
+import csv
+import gzip
+import io
+import json
+import logging
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import auth, chat
+from src.archive import MessageArchive
+from src.bot import TelegramBot, parse_export_args
+from src.database import DatabaseManager
+from src.export import ExportFilter, export_stream
+from src.models import ChatMessage, ChatSession, Message
+
+START = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture
+async def db(tmp_path):
+    manager = DatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", logging.getLogger("t"))
+    await manager.init_db()
+    async with manager.get_session() as session:
+        for day in range(10):
+            for user_id in (1, 2):
+                session.add(
+                    Message(
+                        user_id=user_id,
+                        role="user",
+                        content=f'день {day}, "кавычки"',
+                        length=10,
+                        created_at=START + timedelta(days=day),
+                    )
+                )
+        session.add(ChatSession(id="s1", user_id=1, mode="normal"))
+        session.add(
+            ChatMessage(
+                id="m1",
+                user_session_id="s1",
+                content="привет",
+                role="user",
+                mode="normal",
+                created_at=START,
+            )
+        )
+    yield manager
+    await manager.close()
+
+
+async def _collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_export_formats_and_filters(db, tmp_path):
+    """Test NDJSON/CSV/gzip output, filters and archived rows going first."""
+    ndjson = await _collect(export_stream(db, "messages", ExportFilter(user_id=1)))
+    rows = [json.loads(line) for line in ndjson.decode().splitlines()]
+    assert len(rows) == 10
+    assert {row["user_id"] for row in rows} == {1}
+    assert rows[0]["created_at"] == START.isoformat()
+
+    period = ExportFilter(since=START + timedelta(days=2), until=START + timedelta(days=4))
+    data = await _collect(export_stream(db, "messages", period, "csv", compress=True))
+    table = list(csv.reader(io.StringIO(gzip.decompress(data).decode())))
+    assert table[0][:3] == ["id", "user_id", "role"]
+    assert len(table) == 1 + 4
+    assert table[1][3] == 'день 2, "кавычки"'
+
+    chat_rows = await _collect(export_stream(db, "chat_messages", ExportFilter(user_id=1)))
+    assert json.loads(chat_rows)["id"] == "m1"
+
+    archive = MessageArchive(tmp_path / "archive", compression="gzip")
+    old = {
+        "id": 1000,
+        "user_id": 1,
+        "role": "user",
+        "content": "старое",
+        "length": 6,
+        "created_at": datetime(2025, 12, 1),
+        "is_deleted": False,
+    }
+    archive.append("messages", [old, {**old, "id": 1001, "user_id": 2}])
+    data = await _collect(export_stream(db, "messages", ExportFilter(user_id=1), archive=archive))
+    ids = [json.loads(line)["id"] for line in data.decode().splitlines()]
+    assert ids[0] == 1000
+    assert len(ids) == 11
+
+    with pytest.raises(ValueError, match="Specify"):
+        export_stream(db, "messages", ExportFilter())
+    with pytest.raises(ValueError, match="chat_messages only"):
+        export_stream(db, "messages", ExportFilter(session_id="s1"))
+
+
+def test_export_endpoint(db, monkeypatch):
+    """Test that the endpoint streams an attachment and rejects unbounded exports."""
+    app = FastAPI()
+    app.include_router(chat.router)
+    service = SimpleNamespace(db_manager=db, archive=None)
+    app.dependency_overrides[chat.get_chat_service] = lambda: service
+    monkeypatch.setattr(auth, "_admin_token", "secret")
+    client = TestClient(app, headers={"Authorization": "Bearer secret"})
+
+    response = client.get("/api/chat/export", params={"user_id": 2, "format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="messages.csv"' in response.headers["content-disposition"]
+    assert len(response.text.splitlines()) == 11
+
+    response = client.get(
+        "/api/chat/export", params={"session_id": "s1", "gzip": True, "table": "chat_messages"}
+    )
+    assert response.headers["content-type"] == "application/gzip"
+    assert json.loads(gzip.decompress(response.content))["content"] == "привет"
+
+    assert client.get("/api/chat/export").status_code == 400
+
+
+def test_export_endpoint_requires_admin_token(db, monkeypatch):
+    """Test that the history export is closed without a configured and matching token."""
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.dependency_overrides[chat.get_chat_service] = lambda: SimpleNamespace(
+        db_manager=db, archive=None
+    )
+    client = TestClient(app)
+    params = {"user_id": 2}
+
+    monkeypatch.setattr(auth, "_admin_token", None)
+    assert client.get("/api/chat/export", params=params).status_code == 403
+
+    monkeypatch.setattr(auth, "_admin_token", "secret")
+    assert client.get("/api/chat/export", params=params).status_code == 401
+    wrong = client.get("/api/chat/export", params=params, headers={"Authorization": "Bearer x"})
+    assert wrong.status_code == 401
+    assert wrong.headers["www-authenticate"] == "Bearer"
+    allowed = client.get(
+        "/api/chat/export", params=params, headers={"Authorization": "Bearer secret"}
+    )
+    assert allowed.status_code == 200
+
+
+def test_parse_export_args():
+    """Test /export argument parsing with an inclusive end date."""
+    export_filter, export_format = parse_export_args("/export 42 2026-03-01 2026-03-02 csv")
+    assert export_filter == ExportFilter(
+        user_id=42, since=datetime(2026, 3, 1), until=datetime(2026, 3, 3)
+    )
+    assert export_format == "csv"
+    assert parse_export_args("/export 42")[1] == "ndjson"
+    for text in ("/export", "/export abc", "/export 42 01.03.2026"):
+        with pytest.raises(ValueError):
+            parse_export_args(text)
+
+
+@pytest.mark.asyncio
+async def test_cmd_export_admin_only(db, mock_logger, mock_message):
+    """Test that /export answers non-admins with a refusal and sends admins a document."""
+    with patch("src.bot.Bot"), patch("src.bot.Dispatcher"):
+        bot = TelegramBot(
+            token="test_token", logger=mock_logger, db_manager=db, admin_user_ids=(777,)
+        )
+    mock_message.text = "/export 1"
+    mock_message.answer_document = AsyncMock()
+
+    await bot.cmd_export(mock_message)
+    assert "администратор" in mock_message.answer.call_args[0][0]
+    mock_message.answer_document.assert_not_called()
+
+    mock_message.from_user.id = 777
+    await bot.cmd_export(mock_message)
+    document = mock_message.answer_document.call_args[0][0]
+    assert document.filename == "messages.ndjson.gz"
@@ -0,0 +1,151 @@
+"""Tests for Idempotency-Key handling of POST /api/chat/message."""
+
+import asyncio
+import logging
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api import chat, main
+from src.api.chat_service import ChatService
+from src.api.idempotency import IdempotencyKeyReusedError, IdempotentStreams
+from src.api.models import MessageRole
+
+
+class CountingSource:
+    """Источник chunks с паузами; считает запуски."""
+
+    def __init__(self, chunks: list[str], pause: float = 0.02) -> None:
+        self.chunks = chunks
+        self.pause = pause
+        self.calls = 0
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            for chunk in self.chunks:
+                await asyncio.sleep(self.pause)
+                yield chunk
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+async def _read(stream) -> list[str]:
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_and_late_duplicates_share_one_run():
+    """Test fan-out to concurrent duplicates and replay after completion."""
+    streams = IdempotentStreams()
+    source = CountingSource(["a", "b", "c"])
+
+    first, replayed_first = streams.open("s1", "k", ("hi", "normal"), source)
+    first_task = asyncio.create_task(_read(first))
+    await asyncio.sleep(0.03)  # первый chunk уже выдан
+    second, replayed_second = streams.open("s1", "k", ("hi", "normal"), source)
+
+    assert await asyncio.gather(first_task, _read(second)) == [["a", "b", "c"]] * 2
+    assert (replayed_first, replayed_second) == (False, True)
+
+    late, replayed = streams.open("s1", "k", ("hi", "normal"), source)
+    assert (await _read(late), replayed) == (["a", "b", "c"], True)
+    assert source.calls == 1
+
+    # Тот же ключ в другой сессии - отдельный запрос
+    other, _ = streams.open("s2", "k", ("hi", "normal"), source)
+    await _read(other)
+    assert source.calls == 2
+
+    with pytest.raises(IdempotencyKeyReusedError):
+        streams.open("s1", "k", ("other message", "normal"), source)
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded_and_failures_are_not_stored(monkeypatch):
+    """Test eviction by size and TTL, and that a failed run can be retried."""
+    streams = IdempotentStreams(max_entries=2, ttl=60)
+    source = CountingSource(["x"], pause=0)
+    for key in ("k1", "k2", "k3"):
+        await _read(streams.open("s", key, "m", source)[0])
+    assert len(streams) == 2
+    assert streams.open("s", "k1", "m", source)[1] is False  # вытеснен
+    await asyncio.sleep(0)
+
+    clock = 1000.0
+    monkeypatch.setattr("src.api.idempotency.time.monotonic", lambda: clock)
+    await _read(streams.open("s", "ttl", "m", source)[0])
+    clock += 61
+    assert streams.open("s", "ttl", "m", source)[1] is False
+
+    async def failing():
+        yield "partial"
+        raise RuntimeError("db is down")
+
+    stream, _ = streams.open("s", "fail", "m", failing)
+    with pytest.raises(RuntimeError):
+        await _read(stream)
+    assert streams.open("s", "fail", "m", source)[1] is False
+
+
+@pytest.mark.asyncio
+async def test_abandoned_run_is_cancelled_after_grace():
+    """Test that a retry within the grace period reattaches and an abandoned run is cancelled."""
+    streams = IdempotentStreams(orphan_grace=0.05)
+    source = CountingSource(["a", "b", "c", "d"], pause=0.04)
+
+    stream, _ = streams.open("s", "k", "m", source)
+    assert await anext(stream) == "a"
+    await stream.aclose()
+    retry, replayed = streams.open("s", "k", "m", source)
+    assert replayed is True
+    assert await _read(retry) == ["a", "b", "c", "d"]
+    assert (source.calls, source.cancelled) == (1, False)
+
+    stream, _ = streams.open("s", "k2", "m", source)
+    assert await anext(stream) == "a"
+    await stream.aclose()
+    await asyncio.sleep(0.15)
+    assert source.cancelled is True
+    assert streams.open("s", "k2", "m", source)[1] is False  # отмененный ответ не хранится
+
+
+def test_endpoint_deduplicates_by_header(monkeypatch):
+    """Test that one key costs one LLM call and one user row, with a replay header."""
+    service = ChatService(AsyncMock(), AsyncMock(), logging.getLogger("t"))
+    service.saved = []
+
+    async def save_message(message) -> None:
+        service.saved.append(message)
+
+    service.save_message = save_message
+    service.get_history = AsyncMock(return_value=[])
+    service._call_llm_with_messages = AsyncMock(return_value="Ответ.")
+    monkeypatch.setattr(chat, "_idempotent_streams", IdempotentStreams())
+    main.app.dependency_overrides[chat.get_chat_service] = lambda: service
+    client = TestClient(main.app)
+    params = {"message": "Привет", "session_id": "s1"}
+    try:
+        first = client.post("/api/chat/message", params=params, headers={"Idempotency-Key": "k"})
+        second = client.post("/api/chat/message", params=params, headers={"Idempotency-Key": "k"})
+        reused = client.post(
+            "/api/chat/message",
+            params={**params, "message": "Другое"},
+            headers={"Idempotency-Key": "k"},
+        )
+        plain = client.post("/api/chat/message", params=params)
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert first.text == second.text
+    assert '"content":"Ответ."' in first.text
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert reused.status_code == 422
+    assert plain.status_code == 200
+    assert service._call_llm_with_messages.await_count == 2  # ключ + запрос без ключа
+    roles = [message.role for message in service.saved]
+    assert roles.count(MessageRole.USER.value) == 2
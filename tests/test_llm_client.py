@@ -80,7 +80,7 @@ async def test_reset_context(llm_client, context_storage, mock_logger):
 
     context = await context_storage.get_context(user_id)
     assert context == []
-    mock_logger.info.assert_called_with(f"Context reset for user_id={user_id}")
+    mock_logger.info.assert_called_with("Context reset for user_id=%s", user_id)
 
 
 @pytest.mark.asyncio
@@ -1,10 +1,14 @@
 """Tests for logger module."""
 
+import json
 import logging
 import os
 from pathlib import Path
 
-from src.logger import setup_logger
+import pytest
+
+from src.logger import SamplingFilter, _QueueHandler, parse_sampling, setup_logger, stop_logging
+from src.tracing import tracer
 
 
 def test_setup_logger_creates_logger():
@@ -46,3 +50,92 @@ def test_setup_logger_with_invalid_level():
     # Should default to INFO
     assert logger.level == logging.INFO
 
+
+
+def test_setup_logger_writes_through_background_queue(tmp_path):
+    """Test that the logger only enqueues records and the listener writes them."""
+    log_path = tmp_path / "bot.log"
+    logger = setup_logger(str(log_path), "INFO")
+
+    assert [type(handler) for handler in logger.handlers] == [_QueueHandler]
+    with tracer.start_as_current_span("request") as span:
+        logger.info("User %s said %r", 42, "hi")
+    stop_logging()
+
+    line = log_path.read_text(encoding="utf-8").strip()
+    assert line.endswith(f"[{span.trace_id}] User 42 said 'hi'")
+
+
+def test_suppressed_levels_do_not_format_arguments(tmp_path):
+    """Test that lazy arguments are not rendered for filtered-out levels."""
+    rendered = []
+
+    class Expensive:
+        def __str__(self) -> str:
+            rendered.append(True)
+            return "expensive"
+
+    logger = setup_logger(str(tmp_path / "bot.log"), "INFO")
+    logger.debug("Value: %s", Expensive())
+    stop_logging()
+
+    assert rendered == []
+
+
+def test_log_file_rotates_by_size(tmp_path):
+    """Test size-based rotation of the log file."""
+    log_path = tmp_path / "bot.log"
+    logger = setup_logger(str(log_path), "INFO", max_bytes=500, backup_count=2)
+
+    for i in range(50):
+        logger.info("Line %s %s", i, "x" * 40)
+    stop_logging()
+
+    assert (tmp_path / "bot.log.1").exists()
+    assert (tmp_path / "bot.log.2").exists()
+    assert not (tmp_path / "bot.log.3").exists()
+    assert log_path.stat().st_size <= 500
+
+
+def test_json_format_includes_trace_and_exception(tmp_path):
+    """Test structured JSON output."""
+    log_path = tmp_path / "bot.log"
+    logger = setup_logger(str(log_path), "INFO", json_format=True)
+
+    with tracer.start_as_current_span("request") as span:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.error("Failed for user_id=%s", 7, exc_info=True)
+    stop_logging()
+
+    record = json.loads(log_path.read_text(encoding="utf-8"))
+    assert record["level"] == "ERROR"
+    assert record["message"] == "Failed for user_id=7"
+    assert record["trace_id"] == span.trace_id
+    assert "ValueError: boom" in record["exception"]
+
+
+def test_sampling_keeps_every_nth_info_but_all_warnings():
+    """Test per-module sampling of high-volume lines."""
+    sampling = SamplingFilter({"context_storage": 5})
+
+    def record(module: str, level: int) -> logging.LogRecord:
+        return logging.LogRecord("systech_bot", level, f"/src/{module}.py", 1, "m", None, None)
+
+    kept = [sampling.filter(record("context_storage", logging.DEBUG)) for _ in range(20)]
+    assert kept.count(True) == 4
+    assert sampling.filter(record("context_storage", logging.WARNING))
+    assert all(sampling.filter(record("text2sql", logging.DEBUG)) for _ in range(5))
+
+
+def test_parse_sampling():
+    """Test parsing of LOG_SAMPLING rules."""
+    assert parse_sampling("") == {}
+    assert parse_sampling("text2sql=10, context_storage=20") == {
+        "text2sql": 10,
+        "context_storage": 20,
+    }
+    for bad in ("text2sql", "text2sql=0", "=5", "text2sql=often"):
+        with pytest.raises(ValueError):
+            parse_sampling(bad)
@@ -0,0 +1,102 @@
+"""Tests for chunked bulk maintenance operations."""
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from src.database import DatabaseManager
+from src.maintenance import BulkFilter, BulkMaintenance
+from src.models import Message
+
+START = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+async def db(tmp_path):
+    manager = DatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", logging.getLogger("t"))
+    await manager.init_db()
+    async with manager.get_session() as session:
+        for day in range(20):
+            for user_id in (1, 2):
+                session.add(
+                    Message(
+                        user_id=user_id,
+                        role="user",
+                        content=f"day {day}",
+                        length=6,
+                        created_at=START + timedelta(days=day),
+                        is_deleted=day % 2 == 1,
+                    )
+                )
+    yield manager
+    await manager.close()
+
+
+async def _count(db: DatabaseManager, *conditions) -> int:
+    async with db.get_session() as session:
+        return await session.scalar(select(func.count()).select_from(Message).where(*conditions))
+
+
+@pytest.mark.asyncio
+async def test_restore_reset_purge_in_batches(db):
+    """Test that each operation touches only matching rows, batch by batch."""
+    reports = []
+    maintenance = BulkMaintenance(
+        db,
+        logging.getLogger("t"),
+        batch_size=3,
+        batch_pause=0,
+        on_progress=lambda progress: reports.append(progress.processed),
+    )
+
+    dry = await maintenance.run("restore", BulkFilter(user_id=1), dry_run=True)
+    assert (dry.total, dry.processed) == (10, 0)
+
+    progress = await maintenance.run("restore", BulkFilter(user_id=1))
+    assert (progress.processed, progress.batches) == (10, 4)
+    assert reports == [3, 6, 9, 10]
+    assert await _count(db, Message.is_deleted == True) == 10  # noqa: E712
+
+    until = START + timedelta(days=5)
+    progress = await maintenance.run("reset", BulkFilter(user_id=1, until=until))
+    assert progress.processed == 5
+    assert await _count(db, Message.user_id == 1, Message.is_deleted == True) == 5  # noqa: E712
+
+    progress = await maintenance.run("purge", BulkFilter(since=START + timedelta(days=15)))
+    assert progress.processed == 10
+    assert await _count(db) == 30
+
+    with pytest.raises(ValueError, match="requires"):
+        await maintenance.run("purge", BulkFilter())
+
+
+@pytest.mark.asyncio
+async def test_resume_from_checkpoint(db, tmp_path):
+    """Test that an interrupted run continues after the last committed id."""
+    checkpoint = tmp_path / "restore.json"
+
+    def interrupt(progress):
+        if progress.batches == 2:
+            raise KeyboardInterrupt
+
+    maintenance = BulkMaintenance(
+        db, logging.getLogger("t"), batch_size=4, batch_pause=0, on_progress=interrupt
+    )
+    with pytest.raises(KeyboardInterrupt):
+        await maintenance.run("restore", BulkFilter(user_id=2), checkpoint=checkpoint)
+    state = json.loads(checkpoint.read_text())
+    assert state["processed"] == 8
+
+    with pytest.raises(ValueError, match="another operation"):
+        await BulkMaintenance(db, logging.getLogger("t")).run(
+            "restore", BulkFilter(user_id=1), checkpoint=checkpoint
+        )
+
+    resumed = BulkMaintenance(db, logging.getLogger("t"), batch_size=4, batch_pause=0)
+    progress = await resumed.run("restore", BulkFilter(user_id=2), checkpoint=checkpoint)
+    assert (progress.total, progress.processed, progress.batches) == (10, 10, 3)
+    assert not checkpoint.exists()
+    assert await _count(db, Message.user_id == 2, Message.is_deleted == True) == 0  # noqa: E712
@@ -0,0 +1,261 @@
+"""Tests for MessageCoalescingMiddleware."""
+
+import asyncio
+import json
+import os
+import random
+
+import pytest
+from aiogram import Bot, Dispatcher, F
+from aiogram.filters import Command
+from aiogram.types import Message, Update
+
+from src.message_coalescer import MessageCoalescingMiddleware
+from src.user_update_queue import UserUpdateQueueMiddleware
+from tests.conftest import make_update
+
+
+def build_dispatcher(coalescer: MessageCoalescingMiddleware, llm_delay: float = 0) -> Dispatcher:
+    """Dispatcher wired like TelegramBot, recording LLM requests and commands."""
+    dp = Dispatcher()
+    dp.update.outer_middleware(coalescer)
+    dp.update.outer_middleware(UserUpdateQueueMiddleware())
+    dp["llm_calls"] = []
+
+    @dp.message(Command("reset"))
+    async def reset(message: Message, llm_calls: list) -> None:
+        llm_calls.append((message.from_user.id, "/reset"))
+
+    @dp.message(F.text)
+    async def answer(message: Message, llm_calls: list) -> None:
+        text = await coalescer.collect(message)
+        if text is not None:
+            llm_calls.append((message.from_user.id, text))
+            await asyncio.sleep(llm_delay)
+
+    return dp
+
+
+@pytest.fixture
+async def bot():
+    """Bot instance that never reaches the network."""
+    bot = Bot(token="42:TEST")
+    yield bot
+    await bot.session.close()
+
+
+async def replay(dp: Dispatcher, bot: Bot, trace: list[tuple[float, Update]]) -> None:
+    """Feed updates as concurrent tasks at their trace offsets (seconds)."""
+    tasks = []
+    start = asyncio.get_running_loop().time()
+    for offset, update in trace:
+        delay = start + offset - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(dp.feed_update(bot, update)))
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_burst_is_merged_into_one_request(bot):
+    """Test that rapid messages from one user become a single LLM request."""
+    coalescer = MessageCoalescingMiddleware(window=0.05)
+    dp = build_dispatcher(coalescer)
+
+    await replay(
+        dp,
+        bot,
+        [
+            (0.00, make_update(1, 7, "hi")),
+            (0.01, make_update(2, 7, "can you")),
+            (0.02, make_update(3, 7, "explain X")),
+        ],
+    )
+
+    assert dp["llm_calls"] == [(7, "hi\ncan you\nexplain X")]
+    assert coalescer.get_stats()["merged"] == 2
+    assert coalescer.llm_calls_saved == 2
+
+
+@pytest.mark.asyncio
+async def test_pause_longer_than_window_starts_new_request(bot):
+    """Test that messages separated by a pause are answered separately."""
+    coalescer = MessageCoalescingMiddleware(window=0.03)
+    dp = build_dispatcher(coalescer)
+
+    await replay(dp, bot, [(0.0, make_update(1, 7, "first")), (0.1, make_update(2, 7, "second"))])
+
+    assert dp["llm_calls"] == [(7, "first"), (7, "second")]
+    assert coalescer.llm_calls_saved == 0
+
+
+@pytest.mark.asyncio
+async def test_users_are_not_merged_together(bot):
+    """Test that bursts are coalesced per user."""
+    coalescer = MessageCoalescingMiddleware(window=0.05)
+    dp = build_dispatcher(coalescer)
+
+    await replay(
+        dp,
+        bot,
+        [
+            (0.00, make_update(1, 7, "a1")),
+            (0.00, make_update(2, 8, "b1")),
+            (0.01, make_update(3, 7, "a2")),
+            (0.01, make_update(4, 8, "b2")),
+        ],
+    )
+
+    assert sorted(dp["llm_calls"]) == [(7, "a1\na2"), (8, "b1\nb2")]
+
+
+@pytest.mark.asyncio
+async def test_command_ends_the_series_and_keeps_order(bot):
+    """Test that a command is not merged and later messages stay after it."""
+    coalescer = MessageCoalescingMiddleware(window=0.05)
+    dp = build_dispatcher(coalescer)
+
+    await replay(
+        dp,
+        bot,
+        [
+            (0.00, make_update(1, 7, "before")),
+            (0.01, make_update(2, 7, "/reset")),
+            (0.02, make_update(3, 7, "after")),
+        ],
+    )
+
+    assert dp["llm_calls"] == [(7, "before"), (7, "/reset"), (7, "after")]
+
+
+@pytest.mark.asyncio
+async def test_max_chars_limits_merged_text(bot):
+    """Test that merging stops before the text grows past max_chars."""
+    coalescer = MessageCoalescingMiddleware(window=0.05, max_chars=10)
+    dp = build_dispatcher(coalescer)
+
+    await replay(
+        dp,
+        bot,
+        [(0.00, make_update(1, 7, "12345")), (0.01, make_update(2, 7, "67890"))],
+    )
+
+    assert dp["llm_calls"] == [(7, "12345"), (7, "67890")]
+
+
+@pytest.mark.asyncio
+async def test_zero_window_disables_merging(bot):
+    """Test that window=0 answers each message, even ones queued behind a slow answer."""
+    coalescer = MessageCoalescingMiddleware(window=0)
+    dp = build_dispatcher(coalescer, llm_delay=0.05)
+
+    await replay(dp, bot, [(0.0, make_update(i, 7, f"m{i}")) for i in range(1, 5)])
+
+    assert dp["llm_calls"] == [(7, "m1"), (7, "m2"), (7, "m3"), (7, "m4")]
+    assert coalescer.get_stats()["merged"] == 0
+
+
+@pytest.mark.asyncio
+async def test_redelivered_updates_are_dropped(bot):
+    """Test that the same update_id or message_id is handled once."""
+    coalescer = MessageCoalescingMiddleware(window=0)
+    dp = build_dispatcher(coalescer)
+
+    await dp.feed_update(bot, make_update(1, 7, "hello"))
+    await dp.feed_update(bot, make_update(1, 7, "hello"))
+    await dp.feed_update(bot, make_update(2, 7, "hello", message_id=1))
+
+    assert dp["llm_calls"] == [(7, "hello")]
+    assert coalescer.get_stats()["duplicates"] == 2
+
+
+@pytest.mark.asyncio
+async def test_redelivery_after_restart_is_dropped(bot, context_db):
+    """Test that update IDs processed before a restart are kept in the database."""
+    before = MessageCoalescingMiddleware(window=0, seen_size=3, db_manager=context_db, bot_id=42)
+    dp = build_dispatcher(before)
+    for update_id in range(1, 5):
+        await dp.feed_update(bot, make_update(update_id, 7, f"m{update_id}"))
+    assert await context_db.get_processed_updates(42, 10) == [4, 3, 2]  # старые удалены
+
+    after = MessageCoalescingMiddleware(window=0, seen_size=3, db_manager=context_db, bot_id=42)
+    dp = build_dispatcher(after)
+    await dp.feed_update(bot, make_update(4, 7, "m4"))
+    await dp.feed_update(bot, make_update(5, 7, "m5"))
+
+    assert dp["llm_calls"] == [(7, "m5")]
+    assert after.get_stats()["duplicates"] == 1
+
+    other_bot = MessageCoalescingMiddleware(window=0, db_manager=context_db, bot_id=43)
+    dp = build_dispatcher(other_bot)
+    await dp.feed_update(bot, make_update(4, 7, "m4"))
+    assert dp["llm_calls"] == [(7, "m4")]
+
+
+@pytest.mark.asyncio
+async def test_collect_without_middleware_returns_text():
+    """Test that messages not seen by the middleware are passed through."""
+    coalescer = MessageCoalescingMiddleware(window=1.0)
+    message = make_update(1, 7, "direct").message
+
+    assert await coalescer.collect(message) == "direct"
+
+
+def synthetic_trace(seed: int = 42, users: int = 40, sessions: int = 200) -> list[dict]:
+    """Chat-like trace: bursts of 1-4 messages and ~3% redeliveries."""
+    rng = random.Random(seed)
+    trace = []
+    update_id = 0
+    for _ in range(sessions):
+        user_id = rng.randrange(users)
+        at = rng.uniform(0, 60)
+        for _ in range(rng.choices([1, 2, 3, 4], weights=[55, 25, 13, 7])[0]):
+            update_id += 1
+            event = {"update_id": update_id, "user_id": user_id, "ts": at, "text": "msg"}
+            trace.append(event)
+            if rng.random() < 0.03:
+                trace.append({**event, "ts": at + rng.uniform(1, 5)})
+            at += rng.uniform(0.3, 2.5)
+    return sorted(trace, key=lambda event: event["ts"])
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_llm_calls_saved_on_replayed_trace(bot):
+    """
+    Replay a message trace and report how many LLM calls coalescing saves.
+
+    COALESCE_TRACE points to a JSONL trace with update_id, user_id, ts
+    (seconds) and text per line; a seeded synthetic trace is used otherwise.
+    COALESCE_WINDOW sets the debounce window, COALESCE_SPEEDUP compresses time.
+    """
+    path = os.getenv("COALESCE_TRACE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f if line.strip()]
+    else:
+        events = synthetic_trace()
+    window = float(os.getenv("COALESCE_WINDOW", "1.0"))
+    speedup = float(os.getenv("COALESCE_SPEEDUP", "100"))
+
+    coalescer = MessageCoalescingMiddleware(window=window / speedup, max_wait=5.0 / speedup)
+    dp = build_dispatcher(coalescer)
+    first_ts = events[0]["ts"]
+    trace = [
+        (
+            (event["ts"] - first_ts) / speedup,
+            make_update(event["update_id"], event["user_id"], event["text"]),
+        )
+        for event in events
+    ]
+
+    await replay(dp, bot, trace)
+
+    stats = coalescer.get_stats()
+    print(
+        f"coalescing replay: {stats['received']} updates -> {len(dp['llm_calls'])} LLM calls, "
+        f"saved {stats['llm_calls_saved']} "
+        f"({stats['llm_calls_saved'] / stats['received']:.0%}; "
+        f"{stats['duplicates']} duplicates, {stats['merged']} merged)"
+    )
+    assert len(dp["llm_calls"]) + stats["llm_calls_saved"] == stats["received"]
@@ -0,0 +1,174 @@
+"""Tests for the Prometheus metrics registry and /metrics endpoints."""
+
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import aiohttp
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.metrics import REGISTRY, MetricsRegistry
+from src.metrics_server import MetricsServer
+from src.user_profile_cache import UserProfileCache
+
+
+def _sample(text: str, prefix: str) -> float:
+    """Значение сэмпла, строка которого начинается с prefix."""
+    for line in text.splitlines():
+        if line.startswith(prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{prefix} not found in:\n{text}")
+
+
+def test_counter_and_gauge_render():
+    """Test text exposition of counters and gauges with labels."""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests", "Requests", ("method",))
+    depth = registry.gauge("queue_depth", "Queue depth")
+
+    requests.labels("get").inc()
+    requests.labels("get").inc(2)
+    requests.labels('we"ird').inc()
+    depth.set(7)
+
+    text = registry.render()
+    assert "# TYPE requests counter" in text
+    assert 'requests_total{method="get"} 3' in text
+    assert 'requests_total{method="we\\"ird"} 1' in text
+    assert "# TYPE queue_depth gauge" in text
+    assert "queue_depth 7" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test that histogram buckets are cumulative and upper bounds are inclusive."""
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("op",), buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.labels("read").observe(value)
+
+    text = registry.render()
+    assert _sample(text, 'latency_seconds_bucket{op="read",le="0.1"}') == 2
+    assert _sample(text, 'latency_seconds_bucket{op="read",le="1"}') == 3
+    assert _sample(text, 'latency_seconds_bucket{op="read",le="+Inf"}') == 4
+    assert _sample(text, 'latency_seconds_count{op="read"}') == 4
+    assert _sample(text, 'latency_seconds_sum{op="read"}') == pytest.approx(3.65)
+
+
+def test_histogram_time_records_on_error():
+    """Test that time() observes the duration even when the block raises."""
+    registry = MetricsRegistry()
+    latency = registry.histogram("op_seconds", "Op")
+
+    with pytest.raises(RuntimeError), latency.time():
+        raise RuntimeError("boom")
+
+    assert _sample(registry.render(), "op_seconds_count") == 1
+
+
+def test_registry_returns_existing_metric_and_rejects_conflicts():
+    """Test idempotent registration and conflicting redefinition."""
+    registry = MetricsRegistry()
+    first = registry.counter("events", "Events", ("kind",))
+
+    assert registry.counter("events", "Events", ("kind",)) is first
+    with pytest.raises(ValueError):
+        registry.gauge("events", "Events", ("kind",))
+    with pytest.raises(ValueError):
+        first.labels("a", "b")
+
+
+def test_register_stats_exports_and_replaces_source():
+    """Test that stats sources are polled at render time and can be replaced."""
+    registry = MetricsRegistry()
+    stats = {"pending": 3, "sent": 10}
+    registry.register_stats("send", "Send queue", lambda: stats)
+
+    stats["pending"] = 5
+    text = registry.render()
+    assert "send_pending 5" in text
+    assert "send_sent 10" in text
+
+    registry.register_stats("send", "Send queue", lambda: {"pending": 1})
+    assert "send_sent" not in registry.render()
+    registry.unregister_stats("send")
+    assert "send_pending" not in registry.render()
+
+
+def test_observe_overhead_is_negligible():
+    """Test that recording a labeled observation stays in the microsecond range."""
+    registry = MetricsRegistry()
+    latency = registry.histogram("hot_seconds", "Hot path", ("op",))
+
+    iterations = 100_000
+    started = time.perf_counter()
+    for _ in range(iterations):
+        latency.labels("get_history").observe(0.003)
+    per_call = (time.perf_counter() - started) / iterations
+
+    assert per_call < 20e-6
+
+
+@pytest.mark.asyncio
+async def test_llm_latency_recorded_per_model_and_task(llm_client):
+    """Test that LLM calls are timed with model and task labels."""
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = "answer"
+    llm_client.client.chat.completions.create = AsyncMock(return_value=response)
+    prefix = 'llm_request_duration_seconds_count{model="test_model",task="text2sql"}'
+    before = _sample(REGISTRY.render(), prefix) if prefix in REGISTRY.render() else 0
+
+    await llm_client.get_response("question", task="text2sql")
+
+    text = REGISTRY.render()
+    assert _sample(text, prefix) == before + 1
+    assert 'llm_requests_total{model="test_model",task="text2sql",status="ok"}' in text
+
+
+def test_user_profile_cache_hits_recorded():
+    """Test that cache lookups are counted as hits and misses."""
+    hit = 'cache_requests_total{cache="user_profile",result="hit"}'
+    text = REGISTRY.render()
+    before = _sample(text, hit) if hit in text else 0
+    cache = UserProfileCache()
+
+    assert not cache.is_unchanged(1, ("alice",))
+    cache.remember(1, ("alice",))
+    assert cache.is_unchanged(1, ("alice",))
+
+    assert _sample(REGISTRY.render(), hit) == before + 1
+
+
+def test_api_metrics_endpoint():
+    """Test that the FastAPI app exposes the shared registry."""
+    client = TestClient(app)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE llm_request_duration_seconds histogram" in response.text
+    assert "# TYPE db_query_duration_seconds histogram" in response.text
+
+
+@pytest.mark.asyncio
+async def test_metrics_server_serves_registry(mock_logger):
+    """Test the bot side port."""
+    registry = MetricsRegistry()
+    registry.gauge("bot_test_gauge", "Test").set(3)
+    server = MetricsServer(mock_logger, port=0, host="127.0.0.1", registry=registry)
+    await server.start()
+    try:
+        host, port = server._runner.addresses[0][:2]
+        async with (
+            aiohttp.ClientSession() as session,
+            session.get(f"http://{host}:{port}/metrics") as response,
+        ):
+            body = await response.text()
+    finally:
+        await server.stop()
+
+    assert response.status == 200
+    assert "bot_test_gauge 3" in body
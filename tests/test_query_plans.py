@@ -0,0 +1,95 @@
+"""Query plan regression tests for the hot queries on the messages table."""
+
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from src.api.models import Period
+from src.api.real_stats import RealStatCollector
+from src.context_storage import DatabaseContextStorage
+from src.database import DatabaseManager
+from src.models import Message
+
+
+@pytest.fixture
+async def seeded_db():
+    """In-memory SQLite with the model schema and a few messages (no ANALYZE stats)."""
+    db = DatabaseManager("sqlite+aiosqlite:///:memory:", logging.getLogger("test_query_plans"))
+    await db.init_db()
+    now = datetime.now()
+    async with db.get_session() as session:
+        for i in range(200):
+            session.add(
+                Message(
+                    user_id=i % 10,
+                    role="user" if i % 2 == 0 else "assistant",
+                    content=f"message {i}",
+                    length=10,
+                    created_at=now - timedelta(hours=i),
+                    is_deleted=i % 7 == 0,
+                )
+            )
+    yield db
+    await db.close()
+
+
+async def _capture_plans(db: DatabaseManager, run) -> dict[str, list[str]]:
+    """Run the code, then EXPLAIN QUERY PLAN every SELECT on messages it issued."""
+    statements: dict[str, tuple] = {}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT") and "FROM messages" in statement:
+            statements.setdefault(statement, parameters)
+
+    engine = db._engine.sync_engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        await run()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    plans = {}
+    async with db._engine.connect() as conn:
+        for statement, parameters in statements.items():
+            result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plans[statement] = [row[3] for row in result]
+    return plans
+
+
+def _assert_no_table_scan(plans: dict[str, list[str]], index: str) -> None:
+    assert plans
+    for statement, plan in plans.items():
+        assert not any(step == "SCAN messages" for step in plan), (statement, plan)
+        assert any(f"USING INDEX {index}" in step for step in plan), (statement, plan)
+
+
+@pytest.mark.asyncio
+async def test_get_context_uses_partial_index(seeded_db):
+    """Test that history lookup searches the index and skips the sort."""
+    storage = DatabaseContextStorage(seeded_db, max_messages=20)
+
+    plans = await _capture_plans(seeded_db, lambda: storage.get_context(3))
+
+    _assert_no_table_scan(plans, "ix_messages_active_user_recent")
+    for plan in plans.values():
+        assert not any("TEMP B-TREE FOR ORDER BY" in step for step in plan), plan
+
+
+@pytest.mark.asyncio
+async def test_period_stats_use_partial_index(seeded_db):
+    """Test that every period-filtered stats query searches by created_at."""
+    collector = RealStatCollector(seeded_db)
+
+    plans = await _capture_plans(seeded_db, lambda: collector.get_stats(Period.WEEK))
+
+    period_plans = {sql: plan for sql, plan in plans.items() if "created_at >=" in sql}
+    assert len(period_plans) >= 4
+    _assert_no_table_scan(period_plans, "ix_messages_active_created_role")
+    # Топ пользователей и последние диалоги агрегируют всю историю:
+    # полный проход неизбежен, но по частичному индексу, а не по таблице
+    _assert_no_table_scan(
+        {sql: plan for sql, plan in plans.items() if sql not in period_plans},
+        "ix_messages_active_user_recent",
+    )
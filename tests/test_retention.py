@@ -0,0 +1,156 @@
+"""Tests for message archival: MessageArchive, RetentionJob and archived-month queries."""
+
+import asyncio
+import gzip
+import logging
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import func, select, text
+
+from src.archive import MessageArchive
+from src.database import DatabaseManager
+from src.models import ChatMessage, Message
+from src.retention import RetentionJob, RetentionPolicy
+from src.text2sql import Text2SqlConverter
+
+NOW = datetime(2026, 6, 15, 12, 0)
+
+
+def _row(id: int, created_at: datetime, **overrides) -> dict:
+    row = {
+        "id": id,
+        "user_id": 1,
+        "role": "user",
+        "content": f"сообщение {id}",
+        "length": 10,
+        "created_at": created_at,
+        "is_deleted": False,
+    }
+    return {**row, **overrides}
+
+
+def test_archive_roundtrip_by_month(tmp_path):
+    """Test that rows are split by month, appended as frames and read back once."""
+    archive = MessageArchive(tmp_path, compression="gzip")
+    january = [_row(1, datetime(2026, 1, 5)), _row(2, datetime(2026, 1, 31, 23, 59))]
+
+    assert archive.append("messages", [*january, _row(3, datetime(2026, 2, 1))]) == {
+        "2026-01": 2,
+        "2026-02": 1,
+    }
+    # Повтор пакета после сбоя между записью в архив и удалением из БД
+    archive.append("messages", january)
+
+    assert archive.months("messages") == ["2026-01", "2026-02"]
+    assert archive.months("chat_messages") == []
+    assert list(archive.read("messages", ["2026-01"])) == january
+    assert [row["id"] for row in archive.read("messages")] == [1, 2, 3]
+    with gzip.open(tmp_path / "messages" / "2026-01.jsonl.gz", "rt") as f:
+        assert len(f.readlines()) == 4
+    with pytest.raises(ValueError, match="YYYY-MM"):
+        list(archive.read("messages", ["2026-1"]))
+
+
+@pytest.fixture
+async def db(tmp_path):
+    manager = DatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", logging.getLogger("t"))
+    await manager.init_db()
+    async with manager.get_session() as session:
+        for day in range(0, 200, 10):
+            for is_deleted in (False, True):
+                session.add(
+                    Message(
+                        user_id=1,
+                        role="user",
+                        content=f"day {day}",
+                        length=6,
+                        created_at=NOW - timedelta(days=day),
+                        is_deleted=is_deleted,
+                    )
+                )
+            session.add(
+                ChatMessage(
+                    id=f"chat-{day}",
+                    user_session_id="s1",
+                    content=f"day {day}",
+                    role="user",
+                    mode="normal",
+                    created_at=NOW - timedelta(days=day),
+                )
+            )
+    yield manager
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_retention_moves_old_and_deleted_rows(db, tmp_path):
+    """Test that old rows and soft-deleted rows past the grace period leave the hot tables."""
+    archive = MessageArchive(tmp_path / "archive", compression="gzip")
+    policy = RetentionPolicy(max_age_days=90, deleted_grace_days=30, batch_size=3, batch_pause=0)
+    job = RetentionJob(db, archive, policy, logging.getLogger("t"))
+
+    assert await job.run(now=NOW, dry_run=True) == {"messages": 26, "chat_messages": 10}
+    assert await job.run(now=NOW) == {"messages": 26, "chat_messages": 10}
+
+    async with db.get_session() as session:
+        kept = (await session.execute(select(Message.created_at, Message.is_deleted))).all()
+        chat_kept = await session.scalar(select(func.count()).select_from(ChatMessage))
+    assert len(kept) == 14
+    assert all(NOW - created_at <= timedelta(days=90) for created_at, _ in kept)
+    assert all(NOW - created_at <= timedelta(days=30) for created_at, deleted in kept if deleted)
+    assert chat_kept == 10
+
+    archived = list(archive.read("messages"))
+    assert len(archived) == 26
+    assert len({row["id"] for row in archived}) == 26
+    assert len(list(archive.read("chat_messages"))) == 10
+    assert await job.run(now=NOW) == {"messages": 0, "chat_messages": 0}
+
+
+@pytest.mark.asyncio
+async def test_text2sql_queries_archived_months(db, tmp_path):
+    """Test that archived months are visible to Text2SQL only when requested."""
+    archive = MessageArchive(tmp_path / "archive", compression="gzip")
+    policy = RetentionPolicy(max_age_days=90, deleted_grace_days=0, batch_pause=0)
+    await RetentionJob(db, archive, policy, logging.getLogger("t")).run(now=NOW)
+    converter = Text2SqlConverter(MagicMock(), db, MagicMock(), archive=archive)
+    sql = "SELECT COUNT(*) AS total FROM messages"
+
+    assert await converter.execute_and_format(sql) == "| total |\n| --- |\n| 20 |"
+    result = await converter.execute_and_format(sql, archive_months=archive.months("messages"))
+    assert result == "| total |\n| --- |\n| 40 |"
+
+    # Архивные строки не попадают в основную таблицу, соединение записи не затронуто
+    async with db.get_session() as session:
+        assert await session.scalar(text("SELECT COUNT(*) FROM messages")) == 20
+        temp = await session.scalar(text("SELECT COUNT(*) FROM sqlite_temp_master"))
+    assert temp == 0
+
+
+@pytest.mark.asyncio
+async def test_archived_query_is_read_only_and_leaves_writer_free(db, tmp_path):
+    """Test that archived-month queries run on a reader connection in query-only mode."""
+    archive = MessageArchive(tmp_path / "archive", compression="gzip")
+    policy = RetentionPolicy(max_age_days=90, deleted_grace_days=0, batch_pause=0)
+    await RetentionJob(db, archive, policy, logging.getLogger("t")).run(now=NOW)
+    converter = Text2SqlConverter(MagicMock(), db, MagicMock(), archive=archive)
+    months = archive.months("messages")
+
+    # Единственное соединение записи занято - запрос по архиву его не ждет
+    async with db.get_session() as writer:
+        await writer.execute(text("SELECT 1"))
+        result = await asyncio.wait_for(
+            converter.execute_and_format(
+                "SELECT COUNT(*) AS n FROM messages", archive_months=months
+            ),
+            timeout=5,
+        )
+    assert result == "| n |\n| --- |\n| 40 |"
+
+    deleted = await converter.execute_and_format("DELETE FROM main.messages", archive_months=months)
+    assert "readonly" in deleted
+    async with db.get_read_session() as session:
+        assert await session.scalar(text("PRAGMA query_only")) == 1
+        assert await session.scalar(text("SELECT COUNT(*) FROM messages")) == 20
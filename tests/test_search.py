@@ -0,0 +1,129 @@
+"""Tests for full-text search: FTS5 sync triggers, ranked search and GET /api/search."""
+
+import logging
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, update
+
+from src.api import auth, main
+from src.database import DatabaseManager
+from src.models import ChatMessage, ChatSession, Message
+from src.search import fts5_query, search_messages
+from src.text2sql import Text2SqlConverter
+
+TEXTS = [
+    (1, "Какая погода завтра в Москве?"),
+    (1, "Погода хорошая, погода отличная"),
+    (2, "Напиши скрипт <script>alert(1)</script> про погоду"),
+    (2, "Расскажи анекдот"),
+]
+
+
+@pytest.fixture
+async def db(tmp_path):
+    manager = DatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", logging.getLogger("t"))
+    await manager.init_db()
+    async with manager.get_session() as session:
+        for user_id, content in TEXTS:
+            session.add(
+                Message(
+                    user_id=user_id,
+                    role="user",
+                    content=content,
+                    length=len(content),
+                    created_at=datetime(2026, 1, 1),
+                )
+            )
+        session.add(ChatSession(id="s1", user_id=7, mode="admin"))
+        session.add(
+            ChatMessage(
+                id="c1", user_session_id="s1", content="Покажи погоду", role="user", mode="admin"
+            )
+        )
+    yield manager
+    await manager.close()
+
+
+def test_fts5_query_quotes_terms():
+    """Test that user input cannot inject FTS5 syntax."""
+    assert fts5_query('погода OR "x') == '"погода" "OR" """x"'
+    assert fts5_query("погод* завтра") == '"погод"* "завтра"'
+    with pytest.raises(ValueError):
+        fts5_query(" * ")
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_filters_and_highlights(db):
+    """Test ranking, user filter, pagination, prefix search and snippet escaping."""
+    page = await search_messages(db, "погода")
+    assert page.total == 2
+    assert [item["id"] for item in page.items] == [2, 1]  # два вхождения - выше
+    assert "<mark>Погода</mark>" in page.items[0]["snippet"]
+    assert page.items[0]["created_at"] == datetime(2026, 1, 1)
+
+    page = await search_messages(db, "погод*", user_id=2)
+    assert [item["id"] for item in page.items] == [3]
+    assert "&lt;script&gt;" in page.items[0]["snippet"]
+
+    page = await search_messages(db, "погод*", limit=1, offset=1)
+    assert (page.total, len(page.items)) == (3, 1)
+
+    chat = await search_messages(db, "погоду", table="chat_messages", user_id=7)
+    assert chat.items[0]["session_id"] == "s1"
+
+
+@pytest.mark.asyncio
+async def test_triggers_keep_index_in_sync(db):
+    """Test that edits and deletes reach the index and soft-deleted rows are hidden."""
+    async with db.get_session() as session:
+        await session.execute(update(Message).where(Message.id == 4).values(content="Погода"))
+        await session.execute(update(Message).where(Message.id == 1).values(is_deleted=True))
+        await session.execute(delete(Message).where(Message.id == 2))
+
+    page = await search_messages(db, "погода")
+    assert [item["id"] for item in page.items] == [4]
+    assert (await search_messages(db, "анекдот")).total == 0
+
+
+@pytest.mark.asyncio
+async def test_text2sql_match_example_runs(db):
+    """Test that the MATCH query documented for Text2SQL is valid on the schema."""
+    converter = Text2SqlConverter(MagicMock(), db, MagicMock())
+    sql = (
+        "SELECT m.user_id, COUNT(*) AS messages "
+        "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+        "WHERE messages_fts MATCH '\"погод\"*' AND m.is_deleted = 0 GROUP BY m.user_id"
+    )
+    assert converter._validate_sql(sql) == (True, None)
+    result = await converter.execute_and_format(sql)
+    assert result == "| user_id | messages |\n| --- | --- |\n| 1 | 2 |\n| 2 | 1 |"
+
+
+def test_search_endpoint(db, monkeypatch):
+    """Test the paginated response shape and 400 on a query without words."""
+    monkeypatch.setattr(main, "_db_manager", db)
+    monkeypatch.setattr(auth, "_admin_token", "secret")
+    client = TestClient(main.app, headers={"Authorization": "Bearer secret"})
+
+    response = client.get("/api/search", params={"q": "погода", "limit": 1})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["hasMore"], body["limit"]) == (2, True, 1)
+    assert body["items"][0]["id"] == "2"
+    assert body["items"][0]["score"] > 0
+
+    assert client.get("/api/search", params={"q": "***"}).status_code == 400
+
+
+def test_search_endpoint_requires_admin_token(db, monkeypatch):
+    """Test that search over all users' messages is closed without the admin token."""
+    monkeypatch.setattr(main, "_db_manager", db)
+    client = TestClient(main.app)
+
+    monkeypatch.setattr(auth, "_admin_token", None)
+    assert client.get("/api/search", params={"q": "погода"}).status_code == 403
+    monkeypatch.setattr(auth, "_admin_token", "secret")
+    assert client.get("/api/search", params={"q": "погода"}).status_code == 401
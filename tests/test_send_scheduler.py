@@ -0,0 +1,195 @@
+"""Tests for SendScheduler and TokenBucket."""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from src.send_scheduler import SendScheduler, TokenBucket
+
+
+def retry_after(seconds: int = 0) -> TelegramRetryAfter:
+    """Build a flood-control error as raised by aiogram."""
+    return TelegramRetryAfter(
+        method=SendMessage(chat_id=1, text="x"), message="Too Many Requests", retry_after=seconds
+    )
+
+
+def test_token_bucket_allows_burst_then_limits():
+    """Test that the bucket gives capacity tokens and then asks to wait."""
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    assert 0 < bucket.try_acquire() <= 0.1
+
+
+def test_token_bucket_pause():
+    """Test that a paused bucket refuses tokens until the pause ends."""
+    bucket = TokenBucket(rate=100, capacity=5)
+
+    bucket.pause(0.5)
+
+    assert bucket.try_acquire() > 0.4
+    assert not bucket.is_idle
+
+
+def test_token_bucket_does_not_refill_during_pause(monkeypatch):
+    """Test that a pause ending does not release a full burst at once."""
+    clock = 1000.0
+    monkeypatch.setattr("src.send_scheduler.time.monotonic", lambda: clock)
+    bucket = TokenBucket(rate=4, capacity=30)
+
+    bucket.pause(1.0)
+    clock = 1001.0
+    assert bucket.try_acquire() == 0.25
+
+    clock = 1001.25  # с конца паузы накопился ровно один токен
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() > 0
+
+
+@pytest.mark.asyncio
+async def test_global_rate_is_enforced(mock_logger):
+    """Test that sends across chats respect the global budget."""
+    scheduler = SendScheduler(mock_logger, global_rate=20, chat_rate=100)
+    call = AsyncMock(return_value="ok")
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(scheduler.send_message(chat, call) for chat in range(30)))
+    elapsed = time.perf_counter() - start
+    await scheduler.close()
+
+    # 20 from the initial burst, then 10 more at 20/s
+    assert results == ["ok"] * 30
+    assert elapsed >= 0.45
+
+
+@pytest.mark.asyncio
+async def test_chat_rate_is_enforced_in_order(mock_logger):
+    """Test that one chat is limited to chat_rate and keeps submission order."""
+    scheduler = SendScheduler(mock_logger, global_rate=100, chat_rate=10)
+    sent: list[int] = []
+
+    def send(i: int):
+        async def call() -> None:
+            sent.append(i)
+
+        return call
+
+    start = time.perf_counter()
+    await asyncio.gather(*(scheduler.send_message(1, send(i)) for i in range(4)))
+    elapsed = time.perf_counter() - start
+    await scheduler.close()
+
+    assert sent == [0, 1, 2, 3]
+    assert elapsed >= 0.28
+
+
+@pytest.mark.asyncio
+async def test_chat_actions_yield_to_messages(mock_logger):
+    """Test that queued messages get global tokens before chat actions."""
+    scheduler = SendScheduler(mock_logger, global_rate=10, chat_rate=100)
+    order: list[str] = []
+
+    def record(name: str):
+        async def call() -> None:
+            order.append(name)
+
+        return call
+
+    # Drain the initial burst so everything below has to queue
+    await asyncio.gather(*(scheduler.send_message(chat, AsyncMock()) for chat in range(10)))
+    scheduler.post_chat_action(100, record("typing"))
+    await asyncio.sleep(0)
+    await asyncio.gather(*(scheduler.send_message(chat, record(f"msg{chat}")) for chat in range(3)))
+    await asyncio.sleep(0.15)
+    await scheduler.close()
+
+    assert order == ["msg0", "msg1", "msg2", "typing"]
+
+
+@pytest.mark.asyncio
+async def test_stale_chat_action_is_dropped(mock_logger):
+    """Test that a chat action waiting longer than its timeout is dropped."""
+    scheduler = SendScheduler(mock_logger, global_rate=1, chat_action_timeout=0.05)
+    typing = AsyncMock()
+
+    await scheduler.send_message(1, AsyncMock())
+    scheduler.post_chat_action(1, typing)
+    await asyncio.sleep(0.1)
+
+    typing.assert_not_called()
+    assert scheduler.get_stats()["dropped_chat_actions"] == 1
+    assert scheduler.pending == 0
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honoured(mock_logger):
+    """Test that a flood-control error pauses the chat and retries the send."""
+    scheduler = SendScheduler(mock_logger, global_rate=100, chat_rate=100)
+    call = AsyncMock(side_effect=[retry_after(), "ok"])
+
+    result = await scheduler.send_message(1, call)
+    await scheduler.close()
+
+    assert result == "ok"
+    assert call.await_count == 2
+    assert scheduler.get_stats()["retried"] == 1
+    assert scheduler.get_stats()["global_pauses"] == 0
+    mock_logger.warning.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_retry_after_gives_up_after_max_retries(mock_logger):
+    """Test that the error is raised once retries are exhausted."""
+    scheduler = SendScheduler(mock_logger, global_rate=100, chat_rate=100, max_retries=1)
+    call = AsyncMock(side_effect=retry_after())
+
+    with pytest.raises(TelegramRetryAfter):
+        await scheduler.send_message(1, call)
+    await scheduler.close()
+
+    assert call.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_after_in_several_chats_pauses_all_sends(mock_logger):
+    """Test that flood control in several chats pauses the global bucket too."""
+    scheduler = SendScheduler(mock_logger, global_rate=100, chat_rate=100, flood_chats=2)
+    flooded = [
+        asyncio.create_task(
+            scheduler.send_message(chat, AsyncMock(side_effect=[retry_after(1), "ok"]))
+        )
+        for chat in (1, 2)
+    ]
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    assert await scheduler.send_message(3, AsyncMock(return_value="ok")) == "ok"
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*flooded)
+    await scheduler.close()
+
+    assert elapsed >= 0.8
+    assert scheduler.get_stats()["global_pauses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_latency_metrics(mock_logger):
+    """Test that queue latency is reported per priority."""
+    scheduler = SendScheduler(mock_logger, global_rate=10, chat_rate=100)
+
+    await asyncio.gather(*(scheduler.send_message(chat, AsyncMock()) for chat in range(12)))
+    scheduler.post_chat_action(1, AsyncMock())
+    await asyncio.sleep(0.15)
+    stats = scheduler.get_stats()
+    await scheduler.close()
+
+    assert stats["sent"] == 13
+    assert stats["message_latency_p50_ms"] < 50
+    assert stats["message_latency_max_ms"] >= 150
+    assert stats["chat_action_latency_max_ms"] > 0
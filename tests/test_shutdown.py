@@ -0,0 +1,277 @@
+"""Tests for graceful shutdown: InFlightTracker, bot drain on SIGTERM, ChatService drain."""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from fastapi import HTTPException
+
+from src.api.chat import chat_message
+from src.api.chat_service import ChatService
+from src.api.models import ChatMode, MessageRole
+from src.bot import TelegramBot
+from src.shutdown import InFlightTracker, ShuttingDownError
+
+# Tests for InFlightTracker
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_active_operations():
+    """Test that drain returns only after running operations finish."""
+    tracker = InFlightTracker()
+    finished = []
+
+    async def operation(index: int) -> None:
+        async with tracker.track():
+            await asyncio.sleep(0.05 * index)
+            finished.append(index)
+
+    tasks = [asyncio.create_task(operation(i)) for i in range(1, 4)]
+    await asyncio.sleep(0)
+    assert tracker.active == 3
+
+    assert await tracker.drain(timeout=1.0) is True
+    assert finished == [1, 2, 3]
+    assert tracker.active == 0
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_drain_counts_tasks_created_just_before():
+    """Test that tasks scheduled right before drain are still awaited."""
+    tracker = InFlightTracker()
+    finished = []
+
+    async def operation() -> None:
+        async with tracker.track():
+            await asyncio.sleep(0.02)
+            finished.append(True)
+
+    task = asyncio.create_task(operation())
+    assert await tracker.drain(timeout=1.0) is True
+    assert finished == [True]
+    await task
+
+
+@pytest.mark.asyncio
+async def test_track_rejected_after_shutdown():
+    """Test that new operations are rejected once shutdown has begun."""
+    tracker = InFlightTracker()
+    tracker.begin_shutdown()
+
+    assert tracker.closing
+    with pytest.raises(ShuttingDownError):
+        async with tracker.track():
+            pass
+
+
+@pytest.mark.asyncio
+async def test_drain_timeout():
+    """Test that drain gives up after the deadline and reports it."""
+    tracker = InFlightTracker()
+    release = asyncio.Event()
+
+    async def stuck() -> None:
+        async with tracker.track():
+            await release.wait()
+
+    task = asyncio.create_task(stuck())
+    started = time.monotonic()
+    assert await tracker.drain(timeout=0.05) is False
+    assert time.monotonic() - started < 0.5
+    assert tracker.active == 1
+
+    release.set()
+    await task
+    assert tracker.active == 0
+
+
+# Bot: SIGTERM under load
+
+
+class FakeTelegramAPI:
+    """Минимальный Bot API: отдает пачку обновлений и записывает отправленные сообщения."""
+
+    def __init__(self, updates: list[dict]) -> None:
+        self._updates = updates
+        self.sent: list[dict] = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+        if method == "getme":
+            result = {"id": 42, "is_bot": True, "first_name": "Test", "username": "test_bot"}
+        elif method == "getupdates":
+            offset = int(params.get("offset") or 0)
+            result = [u for u in self._updates if u["update_id"] >= offset]
+            if not result:
+                await asyncio.sleep(0.05)
+        elif method == "sendmessage":
+            self.sent.append(params)
+            result = {
+                "message_id": len(self.sent),
+                "date": int(time.time()),
+                "chat": {"id": int(params["chat_id"]), "type": "private"},
+                "text": params["text"],
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+class SlowLLM:
+    """LLM-заглушка: отвечает с задержкой и сохраняет ответ в контекст."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.started = 0
+        self.saved: list[int] = []
+
+    async def get_response_with_context(self, user_id: int, user_message: str) -> str:
+        self.started += 1
+        await asyncio.sleep(self.delay)
+        self.saved.append(user_id)
+        return f"reply: {user_message}"
+
+
+def _message_update(update_id: int, user_id: int) -> dict:
+    """Обновление с текстовым сообщением пользователя."""
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": user,
+            "text": f"question {update_id}",
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_sigterm_under_load_loses_nothing():
+    """Test that SIGTERM during LLM calls still delivers every answer before exit."""
+    updates = [_message_update(i + 1, 1000 + i) for i in range(20)]
+    api = FakeTelegramAPI(updates)
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    llm = SlowLLM(delay=0.3)
+    bot = TelegramBot(
+        token="42:TEST",
+        logger=logging.getLogger("test_shutdown"),
+        llm_client=llm,
+        send_chat_rate=100.0,
+        send_global_rate=1000.0,
+        shutdown_timeout=5.0,
+    )
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"))
+    bot.bot = Bot(token="42:TEST", session=session)
+
+    try:
+        polling = asyncio.create_task(bot.start())
+        deadline = time.monotonic() + 5
+        while llm.started < len(updates) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        assert llm.started == len(updates)
+        assert not llm.saved
+
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(polling, timeout=10)
+    finally:
+        await runner.cleanup()
+
+    assert sorted(llm.saved) == [1000 + i for i in range(20)]
+    replied = sorted(int(params["chat_id"]) for params in api.sent)
+    assert replied == [1000 + i for i in range(20)]
+    assert all(params["text"].startswith("reply: question") for params in api.sent)
+    assert bot.in_flight.active == 0
+
+
+@pytest.mark.asyncio
+async def test_bot_drops_updates_after_shutdown(mock_logger):
+    """Test that updates arriving during shutdown are not processed."""
+    with patch("src.bot.Bot"), patch("src.bot.Dispatcher"):
+        bot = TelegramBot(token="test_token", logger=mock_logger)
+    bot.bot.session.close = AsyncMock()
+    handler = AsyncMock()
+
+    assert await bot.shutdown() is True
+    assert await bot._track_update(handler, MagicMock(), {}) is None
+
+    handler.assert_not_called()
+    bot.bot.session.close.assert_awaited_once()
+
+
+# API: ChatService drain
+
+
+@pytest.fixture
+def chat_service(mock_logger):
+    """ChatService с медленным LLM и записью сохраненных сообщений."""
+    service = ChatService(llm_client=AsyncMock(), db_manager=AsyncMock(), logger=mock_logger)
+    service.saved = []
+
+    async def save_message(message) -> None:
+        service.saved.append(message)
+
+    async def slow_llm(messages: list[dict]) -> str:
+        await asyncio.sleep(0.2)
+        return "assistant answer"
+
+    service.save_message = save_message
+    service.get_history = AsyncMock(return_value=[])
+    service._call_llm_with_messages = slow_llm
+    return service
+
+
+@pytest.mark.asyncio
+async def test_chat_service_shutdown_drains_messages(chat_service):
+    """Test that shutdown waits for LLM answers and their DB writes."""
+
+    async def consume(session_id: str) -> str:
+        chunks = []
+        async for chunk in chat_service.process_message("hi", session_id, ChatMode.NORMAL):
+            chunks.append(chunk)
+        return "".join(chunks)
+
+    tasks = [asyncio.create_task(consume(f"s{i}")) for i in range(5)]
+    await asyncio.sleep(0.05)
+    assert chat_service.in_flight.active == 5
+
+    assert await chat_service.shutdown(timeout=2.0) is True
+
+    assert [task.result() for task in tasks] == ["assistant answer"] * 5
+    roles = [message.role for message in chat_service.saved]
+    assert roles.count(MessageRole.USER.value) == 5
+    assert roles.count(MessageRole.ASSISTANT.value) == 5
+
+    with pytest.raises(ShuttingDownError):
+        await anext(chat_service.process_message("late", "s9", ChatMode.NORMAL))
+
+
+@pytest.mark.asyncio
+async def test_chat_endpoint_rejects_during_shutdown(chat_service):
+    """Test that the chat endpoint answers 503 once shutdown has begun."""
+    chat_service.in_flight.begin_shutdown()
+
+    with pytest.raises(HTTPException) as exc_info:
+        await chat_message(MagicMock(), "hi", "s1", ChatMode.NORMAL, chat_service)
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "5"}
+    assert exc_info.value.detail == "Server is shutting down"
@@ -0,0 +1,73 @@
+"""Tests for SQL dialect layer used by Text2SQL."""
+
+from unittest.mock import MagicMock
+
+from src.sql_dialect import POSTGRES_DIALECT, SQLITE_DIALECT, get_sql_dialect
+from src.text2sql import Text2SqlConverter
+
+
+def test_get_sql_dialect_by_name():
+    """Test dialect lookup by SQLAlchemy dialect name."""
+    assert get_sql_dialect("sqlite") is SQLITE_DIALECT
+    assert get_sql_dialect("postgresql") is POSTGRES_DIALECT
+
+
+def test_get_sql_dialect_unknown_falls_back_to_sqlite():
+    """Test that unknown dialects fall back to SQLite."""
+    assert get_sql_dialect("mssql") is SQLITE_DIALECT
+
+
+def test_sqlite_normalize_converts_mysql_functions():
+    """Test MySQL to SQLite conversion."""
+    sql = "SELECT COUNT(*) FROM messages WHERE YEAR(created_at) = 2025 AND created_at < NOW()"
+
+    result = SQLITE_DIALECT.normalize(sql)
+
+    assert "strftime('%Y', created_at)" in result
+    assert "datetime('now')" in result
+
+
+def test_postgres_normalize_converts_sqlite_functions():
+    """Test SQLite to PostgreSQL conversion."""
+    sql = (
+        "SELECT strftime('%Y-%m', created_at) AS month, COUNT(*) FROM messages "
+        "WHERE created_at >= datetime('now', '-7 days') AND date(created_at) = date('now') "
+        "GROUP BY month"
+    )
+
+    result = POSTGRES_DIALECT.normalize(sql)
+
+    assert "to_char(created_at, 'YYYY-MM')" in result
+    assert "now() - INTERVAL '7 days'" in result
+    assert "CURRENT_DATE" in result
+    assert "'now'" not in result
+
+
+def test_postgres_normalize_converts_mysql_functions():
+    """Test MySQL to PostgreSQL conversion."""
+    sql = "SELECT COUNT(*) FROM messages WHERE MONTH(created_at) = 5 AND created_at < CURDATE()"
+
+    result = POSTGRES_DIALECT.normalize(sql)
+
+    assert "EXTRACT(MONTH FROM created_at)" in result
+    assert "CURRENT_DATE" in result
+
+
+def test_build_system_prompt_mentions_dialect():
+    """Test that the prompt is built for the target dialect."""
+    prompt = POSTGRES_DIALECT.build_system_prompt("CREATE TABLE messages (id INT);")
+
+    assert "This is a PostgreSQL database" in prompt
+    assert "CREATE TABLE messages" in prompt
+    assert "date_trunc" in prompt
+    assert "strftime(format" not in prompt
+
+
+def test_text2sql_picks_dialect_from_db_manager():
+    """Test that Text2SqlConverter uses the database dialect."""
+    db_manager = MagicMock()
+    db_manager.dialect_name = "postgresql"
+
+    converter = Text2SqlConverter(MagicMock(), db_manager, MagicMock())
+
+    assert converter.dialect is POSTGRES_DIALECT
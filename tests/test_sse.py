@@ -0,0 +1,56 @@
+"""Tests for streaming preparation: chunk boundaries and pre-encoded SSE frames."""
+
+import json
+import logging
+import random
+from unittest.mock import MagicMock
+
+import pytest
+
+from bench.streaming import legacy_chunks, make_answer, run
+from src.api import sse
+from src.api.chat_service import ChatService
+
+
+def _service(chunk_size: int) -> ChatService:
+    return ChatService(MagicMock(), MagicMock(), logging.getLogger("t"), chunk_size)
+
+
+@pytest.mark.parametrize("chunk_size", [0, 1, 5, 50])
+def test_chunks_match_legacy_boundaries(chunk_size):
+    """Test that the regex chunker splits exactly where the per-character one did."""
+    rnd = random.Random(chunk_size)
+    texts = ["", "   ", "Привет.", "a, b.   ", "x" * 120, make_answer(3000, seed=chunk_size)]
+    texts += ["".join(rnd.choices("ab .,!?;\n", k=rnd.randint(1, 200))) for _ in range(200)]
+    service = _service(chunk_size)
+
+    for text in texts:
+        assert service._optimize_streaming_chunks(text) == legacy_chunks(text, chunk_size)
+
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_sse_frame_is_single_data_line(backend, monkeypatch):
+    """Test frame layout and escaping with orjson and with the json fallback."""
+    if backend == "json":
+        monkeypatch.setattr(sse, "orjson", None)
+    elif sse.orjson is None:
+        pytest.skip("orjson is not installed")
+    content = 'строка 1\nстрока 2 "кавычки" \ud800'
+
+    frame = sse.sse_frame({"content": content})
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    assert frame.count(b"\n") == 2
+    assert json.loads(frame[len(b"data: ") :]) == {"content": content}
+
+    event, data = sse.sse_frame({"total": 1}, "delta").decode().split("\n")[:2]
+    assert event == "event: delta"
+    assert json.loads(data.removeprefix("data: ")) == {"total": 1}
+
+
+def test_streaming_benchmark_smoke():
+    """Test that the micro-benchmark runs and reports both implementations."""
+    result = run(size=2000, repeat=1)
+
+    assert result["answer_chars"] == 2000
+    assert set(result["chunking_ms"]) == {"legacy", "current", "speedup"}
+    assert set(result["framing_ms"]) == {"legacy", "current", "speedup"}
@@ -0,0 +1,115 @@
+"""Tests for live dashboard updates: shared stats computation and GET /stats/stream."""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.api import main
+from src.api.models import Period, StatsResponse, SummaryStats, TimelinePoint
+from src.api.stats_stream import StatsBroadcaster, stats_delta
+from src.change_notifier import ChangeNotifier
+
+
+class CountingCollector:
+    """Collector whose today's count is set by the test; counts computations."""
+
+    def __init__(self) -> None:
+        self.today = 1
+        self.calls = 0
+
+    async def get_stats(self, period: Period) -> StatsResponse:
+        self.calls += 1
+        summary = dict.fromkeys(SummaryStats.model_fields, 0)
+        return StatsResponse(
+            summary=SummaryStats(**{**summary, "total_messages": 10 + self.today}),
+            activity_timeline=[
+                TimelinePoint(date="2026-10-18", user_messages=10, bot_messages=0, total=10),
+                TimelinePoint(
+                    date="2026-10-19", user_messages=self.today, bot_messages=0, total=self.today
+                ),
+            ],
+            top_users=[],
+            recent_dialogs=[],
+        )
+
+
+def test_stats_delta_keeps_only_changes():
+    """Test that the delta carries changed summary fields and timeline points only."""
+    old = {
+        "summary": {"a": 1, "b": 2},
+        "activity_timeline": [{"date": "d1", "total": 1}, {"date": "d2", "total": 2}],
+        "top_users": [{"user_id": 1}],
+        "recent_dialogs": [],
+    }
+    new = {
+        **old,
+        "summary": {"a": 1, "b": 3},
+        "activity_timeline": [{"date": "d2", "total": 2}, {"date": "d3", "total": 1}],
+    }
+
+    assert stats_delta(old, old) == {}
+    assert stats_delta(old, new) == {
+        "summary": {"b": 3},
+        "activity_timeline": [{"date": "d3", "total": 1}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_subscribers_share_one_computation():
+    """Test one computation per change for all subscribers and a stop after the last one."""
+    collector = CountingCollector()
+    notifier = ChangeNotifier()
+    broadcaster = StatsBroadcaster(
+        lambda: collector, notifier=notifier, tick=0.01, refresh_interval=60
+    )
+
+    async with broadcaster.subscribe(Period.WEEK) as first:
+        event, snapshot = await asyncio.wait_for(first.get(), 1)
+        assert event == "snapshot"
+        assert snapshot["summary"]["total_messages"] == 11
+
+        async with broadcaster.subscribe(Period.WEEK) as second:
+            assert (await second.get())[0] == "snapshot"  # из кеша, без расчета
+            assert collector.calls == 1
+
+            await asyncio.sleep(0.05)
+            assert collector.calls == 1  # без записей не пересчитывается
+
+            collector.today = 2
+            notifier.notify()
+            for queue in (first, second):
+                event, delta = await asyncio.wait_for(queue.get(), 1)
+                assert event == "delta"
+                assert delta == {
+                    "summary": {"total_messages": 12},
+                    "activity_timeline": [
+                        {"date": "2026-10-19", "user_messages": 2, "bot_messages": 0, "total": 2}
+                    ],
+                }
+            assert collector.calls == 2
+            assert broadcaster.subscriber_count == 2
+
+    assert broadcaster.subscriber_count == 0
+    assert broadcaster._channels == {}
+
+
+@pytest.mark.asyncio
+async def test_stats_stream_endpoint_formats_sse(monkeypatch):
+    """Test that the endpoint streams the snapshot as an SSE event."""
+    broadcaster = StatsBroadcaster(CountingCollector, tick=0.01)
+    monkeypatch.setattr(main, "_stats_broadcaster", broadcaster)
+    request = MagicMock(is_disconnected=AsyncMock(return_value=False))
+
+    response = await main.stats_stream(request, Period.DAY)
+    assert response.media_type == "text/event-stream"
+    body = response.body_iterator
+    chunk = await asyncio.wait_for(body.__anext__(), 1)
+    await body.aclose()
+    await broadcaster.close()
+
+    event, data = chunk.decode().split("\n")[:2]
+    assert event == "event: snapshot"
+    assert json.loads(data.removeprefix("data: "))["summary"]["total_messages"] == 11
+    assert broadcaster.subscriber_count == 0
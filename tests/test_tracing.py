@@ -0,0 +1,241 @@
+"""Tests for request tracing: spans, exporters, log correlation and the debug endpoints."""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import aiohttp
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api import auth
+from src.api.chat_service import ChatService
+from src.api.main import app
+from src.api.models import ChatMode
+from src.metrics_server import MetricsServer
+from src.tracing import (
+    JsonlFileExporter,
+    RingBufferExporter,
+    TraceContextFilter,
+    Tracer,
+    configure_tracing,
+    current_trace_id,
+    tracer,
+)
+
+
+@pytest.fixture
+def memory_tracing():
+    """Свежий кольцевой буфер у трассировщика процесса на время теста."""
+    previous = tracer.exporter
+    configure_tracing("memory", buffer_size=100)
+    yield tracer.exporter
+    tracer.exporter = previous
+
+
+def test_nested_spans_share_trace():
+    """Test that nested spans form one trace with parent links."""
+    exporter = RingBufferExporter()
+    local = Tracer(exporter)
+
+    with local.start_as_current_span("root", {"k": 1}) as root:
+        with local.start_as_current_span("child") as child:
+            assert current_trace_id() == root.trace_id
+        with local.start_as_current_span("sibling"):
+            pass
+    assert current_trace_id() is None
+
+    (trace,) = exporter.get_traces()
+    assert trace["root"] == "root"
+    assert [span["name"] for span in trace["spans"]] == ["root", "child", "sibling"]
+    assert child.trace_id == root.trace_id
+    assert child.parent_id == root.span_id
+    assert root.parent_id is None
+    assert trace["spans"][0]["attributes"] == {"k": 1}
+    assert trace["duration_ms"] >= 0
+
+
+def test_exception_marks_span_as_error():
+    """Test that an exception is recorded on the span and re-raised."""
+    exporter = RingBufferExporter()
+    local = Tracer(exporter)
+
+    with pytest.raises(ValueError), local.start_as_current_span("failing"):
+        raise ValueError("bad input")
+
+    span = exporter.get_traces()[0]["spans"][0]
+    assert span["status"]["code"] == "ERROR"
+    assert span["events"][0]["name"] == "exception"
+    assert span["events"][0]["attributes"]["exception.type"] == "ValueError"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tasks_get_separate_traces():
+    """Test that spans in concurrent tasks do not leak into each other's traces."""
+    exporter = RingBufferExporter()
+    local = Tracer(exporter)
+
+    async def request(index: int) -> str:
+        with local.start_as_current_span("request", {"index": index}) as span:
+            await asyncio.sleep(0.01)
+            with local.start_as_current_span("db"):
+                await asyncio.sleep(0.01)
+            return span.trace_id
+
+    trace_ids = await asyncio.gather(*(request(i) for i in range(5)))
+
+    assert len(set(trace_ids)) == 5
+    traces = exporter.get_traces(limit=10)
+    assert len(traces) == 5
+    assert all(len(trace["spans"]) == 2 for trace in traces)
+
+
+def test_ring_buffer_limits_and_filters():
+    """Test eviction of old spans, the trace limit and the trace_id filter."""
+    exporter = RingBufferExporter(max_spans=4)
+    local = Tracer(exporter)
+
+    ids = []
+    for _ in range(6):
+        with local.start_as_current_span("request") as span:
+            ids.append(span.trace_id)
+
+    traces = exporter.get_traces(limit=10)
+    assert [trace["trace_id"] for trace in traces] == ids[:1:-1]
+    assert len(exporter.get_traces(limit=2)) == 2
+    assert exporter.get_traces(trace_id=ids[-1])[0]["trace_id"] == ids[-1]
+    assert exporter.get_traces(trace_id=ids[0]) == []
+
+
+def test_jsonl_exporter_writes_one_span_per_line(tmp_path):
+    """Test that the file exporter writes JSON lines and flushes on shutdown."""
+    path = tmp_path / "traces" / "spans.jsonl"
+    exporter = JsonlFileExporter(str(path), flush_every=100)
+    local = Tracer(exporter)
+
+    with local.start_as_current_span("root"), local.start_as_current_span("child"):
+        pass
+    exporter.shutdown()
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["child", "root"]
+    assert spans[0]["parent_span_id"] == spans[1]["span_id"]
+    assert spans[0]["trace_id"] == spans[1]["trace_id"]
+
+
+def test_jsonl_exporter_writes_off_the_calling_thread(tmp_path, monkeypatch):
+    """Test that export() only enqueues and a background thread writes and flushes."""
+    path = tmp_path / "spans.jsonl"
+    exporter = JsonlFileExporter(str(path), flush_every=100)
+    writers = []
+    write = exporter._file.write
+    monkeypatch.setattr(
+        exporter._file, "write", lambda line: writers.append(threading.get_ident()) or write(line)
+    )
+
+    with Tracer(exporter).start_as_current_span("root"):
+        pass
+    deadline = time.monotonic() + 5
+    while not path.read_text() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert json.loads(path.read_text())["name"] == "root"  # сброшен без shutdown
+    assert writers and threading.get_ident() not in writers
+    exporter.shutdown()
+
+
+def test_configure_tracing_rejects_bad_settings(memory_tracing):
+    """Test validation of the exporter settings."""
+    with pytest.raises(ValueError):
+        configure_tracing("zipkin")
+    with pytest.raises(ValueError):
+        configure_tracing("jsonl", path=None)
+
+    configure_tracing("off")
+    assert tracer.exporter is None
+
+
+def test_log_records_carry_trace_id(caplog):
+    """Test that log lines emitted inside a span include its trace id."""
+    local = Tracer(RingBufferExporter())
+    logger = logging.getLogger("test_tracing")
+    caplog.handler.addFilter(TraceContextFilter())
+
+    with caplog.at_level(logging.INFO, logger="test_tracing"):
+        logger.info("outside")
+        with local.start_as_current_span("request") as span:
+            logger.info("inside")
+
+    outside, inside = caplog.records
+    assert outside.trace_id == "-"
+    assert inside.trace_id == span.trace_id
+    assert inside.span_id == span.span_id
+
+
+@pytest.mark.asyncio
+async def test_chat_message_trace_covers_pipeline(memory_tracing, database_manager, llm_client):
+    """Test that one web chat message yields a trace with DB and LLM child spans."""
+    await database_manager.init_db()
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = "traced answer"
+    llm_client.client.chat.completions.create = AsyncMock(return_value=response)
+    service = ChatService(llm_client, database_manager, logger=MagicMock())
+
+    chunks = [chunk async for chunk in service.process_message("hi", "s1", ChatMode.NORMAL)]
+    await database_manager.close()
+
+    assert "".join(chunks) == "traced answer"
+    (trace,) = memory_tracing.get_traces()
+    names = [span["name"] for span in trace["spans"]]
+    assert trace["root"] == "chat.process_message"
+    assert names.count("db.save_message") == 2
+    assert "db.get_history" in names
+    assert "llm.request" in names
+    root = trace["spans"][0]
+    assert all(span["trace_id"] == trace["trace_id"] for span in trace["spans"])
+    assert all(span["parent_span_id"] == root["span_id"] for span in trace["spans"][1:])
+    assert [event["name"] for event in root["events"]] == ["first_chunk"]
+    llm_span = next(span for span in trace["spans"] if span["name"] == "llm.request")
+    assert llm_span["attributes"]["llm.task"] == "web_chat"
+    assert llm_span["attributes"]["llm.status"] == "ok"
+
+
+def test_api_debug_traces_endpoint(memory_tracing, monkeypatch):
+    """Test the API debug endpoint, its admin token and 404 when traces are not kept in memory."""
+    with tracer.start_as_current_span("request") as span:
+        pass
+    monkeypatch.setattr(auth, "_admin_token", "secret")
+    assert TestClient(app).get("/debug/traces").status_code == 401
+    client = TestClient(app, headers={"Authorization": "Bearer secret"})
+
+    response = client.get("/debug/traces", params={"trace_id": span.trace_id})
+    assert response.status_code == 200
+    assert response.json()[0]["spans"][0]["name"] == "request"
+
+    configure_tracing("off")
+    assert client.get("/debug/traces").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_metrics_server_debug_traces(memory_tracing, mock_logger):
+    """Test that the bot side port serves recent traces."""
+    with tracer.start_as_current_span("bot.update"):
+        pass
+    server = MetricsServer(mock_logger, port=0, host="127.0.0.1")
+    await server.start()
+    try:
+        host, port = server._runner.addresses[0][:2]
+        async with (
+            aiohttp.ClientSession() as session,
+            session.get(f"http://{host}:{port}/debug/traces?limit=1") as response,
+        ):
+            traces = await response.json()
+    finally:
+        await server.stop()
+
+    assert response.status == 200
+    assert traces[0]["root"] == "bot.update"
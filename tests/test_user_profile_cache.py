@@ -0,0 +1,53 @@
+"""Tests for UserProfileCache."""
+
+from src.user_profile_cache import UserProfileCache
+
+PROFILE = ("test_user", "Test", "User", "en")
+
+
+def test_unknown_user_is_not_unchanged():
+    """Test that an unseen user requires a DB write."""
+    cache = UserProfileCache()
+
+    assert cache.is_unchanged(12345, PROFILE) is False
+    assert cache.misses == 1
+
+
+def test_remembered_profile_is_unchanged():
+    """Test that a remembered profile is reported as unchanged."""
+    cache = UserProfileCache()
+    cache.remember(12345, PROFILE)
+
+    assert cache.is_unchanged(12345, PROFILE) is True
+    assert cache.hits == 1
+
+
+def test_changed_profile_is_detected():
+    """Test that any changed field requires a DB write."""
+    cache = UserProfileCache()
+    cache.remember(12345, PROFILE)
+
+    assert cache.is_unchanged(12345, ("test_user", "Test", "User", "ru")) is False
+    assert cache.is_unchanged(12345, ("test_user", "Test", None, "en")) is False
+
+
+def test_lru_eviction():
+    """Test that the least recently used user is evicted first."""
+    cache = UserProfileCache(max_size=2)
+    cache.remember(1, PROFILE)
+    cache.remember(2, PROFILE)
+    cache.is_unchanged(1, PROFILE)  # user 1 becomes most recent
+    cache.remember(3, PROFILE)
+
+    assert len(cache) == 2
+    assert cache.is_unchanged(1, PROFILE) is True
+    assert cache.is_unchanged(2, PROFILE) is False
+
+
+def test_forget():
+    """Test that a forgotten user requires a DB write again."""
+    cache = UserProfileCache()
+    cache.remember(12345, PROFILE)
+    cache.forget(12345)
+
+    assert cache.is_unchanged(12345, PROFILE) is False
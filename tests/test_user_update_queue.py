@@ -0,0 +1,136 @@
+"""Tests for UserUpdateQueueMiddleware."""
+
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message, Update
+
+from src.user_update_queue import UserUpdateQueueMiddleware
+from tests.conftest import make_update
+
+
+@pytest.fixture
+def queue():
+    """Middleware with a small global cap."""
+    return UserUpdateQueueMiddleware(max_in_flight=4)
+
+
+@pytest.fixture
+def dispatcher(queue):
+    """Dispatcher that records handler start/end and concurrency; message text is the delay."""
+    dp = Dispatcher()
+    dp.update.outer_middleware(queue)
+    dp["events"] = []
+    dp["running"] = {"now": 0, "peak": 0}
+
+    @dp.message()
+    async def record(message: Message, events: list, running: dict) -> None:
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        events.append(("start", message.from_user.id, message.message_id))
+        await asyncio.sleep(float(message.text))
+        events.append(("end", message.from_user.id, message.message_id))
+        running["now"] -= 1
+
+    return dp
+
+
+@pytest.fixture
+async def bot():
+    """Bot instance that never reaches the network."""
+    bot = Bot(token="42:TEST")
+    yield bot
+    await bot.session.close()
+
+
+async def feed_concurrently(dispatcher: Dispatcher, bot: Bot, updates: list[Update]) -> None:
+    """Feed updates as separate tasks, the way polling and webhook do."""
+    tasks = [asyncio.create_task(dispatcher.feed_update(bot, update)) for update in updates]
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_same_user_updates_are_serialized_in_order(dispatcher, bot):
+    """Test that one user's updates run one at a time in arrival order."""
+    # Earlier updates are slower: without ordering they would finish last
+    updates = [make_update(i, user_id=1, text=str(0.05 - i * 0.01)) for i in range(5)]
+
+    await feed_concurrently(dispatcher, bot, updates)
+
+    events = dispatcher["events"]
+    assert [message_id for kind, _, message_id in events if kind == "end"] == [0, 1, 2, 3, 4]
+    assert dispatcher["running"]["peak"] == 1
+
+
+@pytest.mark.asyncio
+async def test_different_users_run_in_parallel(dispatcher, bot):
+    """Test that updates of different users overlap in time."""
+    updates = [make_update(i, user_id=i, text="0.1") for i in range(3)]
+
+    start = time.perf_counter()
+    await feed_concurrently(dispatcher, bot, updates)
+    elapsed = time.perf_counter() - start
+
+    assert dispatcher["running"]["peak"] == 3
+    assert elapsed < 0.25
+
+
+@pytest.mark.asyncio
+async def test_global_cap_limits_in_flight_handlers(dispatcher, bot):
+    """Test that no more than max_in_flight handlers run at once."""
+    updates = [make_update(i, user_id=i, text="0.02") for i in range(10)]
+
+    await feed_concurrently(dispatcher, bot, updates)
+
+    assert dispatcher["running"]["peak"] == 4
+    assert len([event for event in dispatcher["events"] if event[0] == "end"]) == 10
+
+
+@pytest.mark.asyncio
+async def test_queue_depth_stats(dispatcher, bot, queue):
+    """Test that queue depth is reported while updates wait and reset afterwards."""
+    updates = [make_update(i, user_id=7, text="0.05") for i in range(3)]
+    updates.append(make_update(3, user_id=8, text="0.05"))
+
+    feeding = asyncio.ensure_future(feed_concurrently(dispatcher, bot, updates))
+    await asyncio.sleep(0.01)
+
+    assert queue.queue_depth(7) == 3
+    stats = queue.get_stats()
+    assert stats["in_flight"] == 2
+    assert stats["pending"] == 4
+    assert stats["active_users"] == 2
+    assert stats["max_user_depth"] == 3
+
+    await feeding
+
+    stats = queue.get_stats()
+    assert stats["pending"] == 0
+    assert stats["active_users"] == 0
+    assert stats["peak_pending"] == 4
+    assert stats["processed"] == 4
+    assert queue.queue_depth(7) == 0
+
+
+@pytest.mark.asyncio
+async def test_handler_error_releases_queue(bot):
+    """Test that a failing handler does not block the user's next update."""
+    queue = UserUpdateQueueMiddleware(max_in_flight=1)
+    dp = Dispatcher()
+    dp.update.outer_middleware(queue)
+    handled = []
+
+    @dp.message()
+    async def fail_first(message: Message) -> None:
+        if message.message_id == 0:
+            raise RuntimeError("boom")
+        handled.append(message.message_id)
+
+    with pytest.raises(RuntimeError):
+        await dp.feed_update(bot, make_update(0, user_id=1))
+    await dp.feed_update(bot, make_update(1, user_id=1))
+
+    assert handled == [1]
+    assert queue.get_stats()["pending"] == 0
@@ -0,0 +1,178 @@
+"""Tests for WebhookServer."""
+
+import asyncio
+import os
+import statistics
+import time
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.webhook_server import SECRET_TOKEN_HEADER, WebhookServer
+from tests.conftest import make_update_data
+
+SECRET = "test-secret"
+
+
+@pytest.fixture
+def dispatcher():
+    """Dispatcher recording handled updates with a configurable handler delay."""
+    dp = Dispatcher()
+    dp["handled"] = []
+    dp["delay"] = 0.0
+
+    @dp.message()
+    async def record(message: Message, handled: list, delay: float) -> None:
+        await asyncio.sleep(delay)
+        handled.append((message.message_id, time.perf_counter()))
+
+    return dp
+
+
+@pytest.fixture
+async def make_client(dispatcher, mock_logger):
+    """Factory creating a TestClient around a WebhookServer."""
+    bot = Bot(token="42:TEST")
+    clients = []
+
+    async def factory(**kwargs):
+        server = WebhookServer(
+            dispatcher=dispatcher,
+            bot=bot,
+            logger=mock_logger,
+            base_url="https://example.com",
+            secret_token=SECRET,
+            **kwargs,
+        )
+        client = TestClient(TestServer(server.create_app()))
+        await client.start_server()
+        clients.append(client)
+        return server, client
+
+    yield factory
+
+    for client in clients:
+        await client.close()
+    await bot.session.close()
+
+
+async def _wait_handled(dispatcher: Dispatcher, count: int, timeout: float = 5.0) -> None:
+    """Wait until the dispatcher handled the given number of updates."""
+    deadline = time.perf_counter() + timeout
+    while len(dispatcher["handled"]) < count and time.perf_counter() < deadline:
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_valid_update_is_dispatched(make_client, dispatcher):
+    """Test that an authorized update reaches the dispatcher."""
+    _, client = await make_client()
+
+    response = await client.post(
+        "/telegram/webhook", json=make_update_data(1), headers={SECRET_TOKEN_HEADER: SECRET}
+    )
+    await _wait_handled(dispatcher, 1)
+
+    assert response.status == 200
+    assert [message_id for message_id, _ in dispatcher["handled"]] == [1]
+
+
+@pytest.mark.asyncio
+async def test_wrong_secret_is_rejected(make_client, dispatcher):
+    """Test that requests without the secret token are rejected."""
+    _, client = await make_client()
+
+    missing = await client.post("/telegram/webhook", json=make_update_data(1))
+    wrong = await client.post(
+        "/telegram/webhook", json=make_update_data(2), headers={SECRET_TOKEN_HEADER: "nope"}
+    )
+    await asyncio.sleep(0.05)
+
+    assert missing.status == 401
+    assert wrong.status == 401
+    assert dispatcher["handled"] == []
+
+
+@pytest.mark.asyncio
+async def test_malformed_update_is_rejected(make_client):
+    """Test that a non-JSON body returns 400."""
+    _, client = await make_client()
+
+    response = await client.post(
+        "/telegram/webhook", data=b"not json", headers={SECRET_TOKEN_HEADER: SECRET}
+    )
+
+    assert response.status == 400
+
+
+@pytest.mark.asyncio
+async def test_in_flight_is_bounded(make_client, dispatcher):
+    """Test that no more than max_in_flight updates are processed at once."""
+    dispatcher["delay"] = 0.1
+    server, client = await make_client(max_in_flight=2)
+    peak = 0
+
+    async def post(update_id: int) -> None:
+        await client.post(
+            "/telegram/webhook",
+            json=make_update_data(update_id, user_id=update_id),
+            headers={SECRET_TOKEN_HEADER: SECRET},
+        )
+
+    posts = asyncio.gather(*(post(i) for i in range(6)))
+    while not posts.done():
+        peak = max(peak, server.in_flight)
+        await asyncio.sleep(0.01)
+    await _wait_handled(dispatcher, 6)
+
+    assert peak <= 2
+    assert len(dispatcher["handled"]) == 6
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_webhook_load_throughput(make_client, dispatcher):
+    """
+    Post synthetic updates at a target rate and measure end-to-end throughput.
+
+    Configure with WEBHOOK_LOAD_RPS, WEBHOOK_LOAD_UPDATES and
+    WEBHOOK_LOAD_HANDLER_MS (simulated handler latency).
+    """
+    rps = float(os.getenv("WEBHOOK_LOAD_RPS", "500"))
+    total = int(os.getenv("WEBHOOK_LOAD_UPDATES", "500"))
+    dispatcher["delay"] = float(os.getenv("WEBHOOK_LOAD_HANDLER_MS", "20")) / 1000
+    _, client = await make_client(max_in_flight=100)
+
+    sent_at: dict[int, float] = {}
+    statuses: list[int] = []
+
+    async def post(update_id: int) -> None:
+        sent_at[update_id] = time.perf_counter()
+        response = await client.post(
+            "/telegram/webhook",
+            json=make_update_data(update_id, user_id=update_id % 50),
+            headers={SECRET_TOKEN_HEADER: SECRET},
+        )
+        statuses.append(response.status)
+
+    start = time.perf_counter()
+    senders = []
+    for i in range(total):
+        senders.append(asyncio.create_task(post(i)))
+        await asyncio.sleep(max(0.0, start + (i + 1) / rps - time.perf_counter()))
+    await asyncio.gather(*senders)
+    await _wait_handled(dispatcher, total, timeout=30.0)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(done - sent_at[message_id] for message_id, done in dispatcher["handled"])
+    print(
+        f"webhook load: {total} updates at {rps:.0f} rps target -> "
+        f"{total / elapsed:.0f} updates/s, "
+        f"p50={statistics.median(latencies) * 1000:.1f} ms, "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms"
+    )
+
+    assert statuses.count(200) == total
+    assert len(dispatcher["handled"]) == total